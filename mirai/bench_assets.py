@@ -0,0 +1,145 @@
+"""
+Load and reload cost of the AR page: plain static files vs fingerprinted assets.
+
+Renders studio/index.html, then fetches every local file it references
+(scripts, stylesheets, the character catalog and its preview thumbnails;
+characters themselves are only downloaded when picked) the way a browser
+would:
+- first visit: GET with Accept-Encoding: gzip, deflate, br
+- reload: files cached as immutable are not requested at all; the others
+  are revalidated with If-None-Match / If-Modified-Since (the plain static
+  view answers 304 but the round trip is still made)
+
+"static" renders the page without a fingerprint manifest ({% asset %} falls
+back to /static/ as served by runserver), "fingerprinted" with the one
+written by ``python manage.py fingerprint_assets`` (run that first).
+
+Usage: python bench_assets.py [--repeat 5]
+"""
+import argparse
+import os
+import re
+import statistics
+import tempfile
+import time
+from urllib.parse import unquote
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mirai.settings')
+
+ACCEPT_ENCODING = 'gzip, deflate, br'
+# src/href/data-* attributes and module imports of the page
+URL_PATTERN = re.compile(r'(?:src|href|data-model|data-catalog-url)="([^"]+)"|from "([^"]+)"')
+
+
+def page_assets(html, prefixes):
+    """Static/asset URLs referenced by the page (not the camera stream), in order, without duplicates."""
+    urls = []
+    for match in URL_PATTERN.finditer(html):
+        url = match.group(1) or match.group(2)
+        if url.startswith(tuple(prefixes)) and url not in urls:
+            urls.append(url)
+    return urls
+
+
+def fetch(client, url, headers):
+    """GET through the URLconf, or the staticfiles view for /static/ (what runserver does)."""
+    from django.contrib.staticfiles.views import serve
+    from django.templatetags.static import static
+    from django.test import RequestFactory
+
+    static_prefix = static('')
+    start = time.perf_counter()
+    if url.startswith(static_prefix):
+        request = RequestFactory().get(url, **headers)
+        try:
+            response = serve(request, unquote(url[len(static_prefix):]), insecure=True)
+        except django.http.Http404:
+            response = django.http.HttpResponseNotFound()
+    else:
+        response = client.get(url, **headers)
+    body = b''.join(response.streaming_content) if response.streaming else response.content
+    return response, len(body), time.perf_counter() - start
+
+
+def visit(client, urls):
+    """First visit, then a reload. Returns counters for both."""
+    cold = {'requests': 0, 'bytes': 0, 'seconds': 0.0, 'missing': 0}
+    warm = {'requests': 0, 'bytes': 0, 'seconds': 0.0}
+    cached = []
+    for url in urls:
+        response, size, seconds = fetch(client, url, {'HTTP_ACCEPT_ENCODING': ACCEPT_ENCODING})
+        cold['requests'] += 1
+        cold['bytes'] += size
+        cold['seconds'] += seconds
+        if response.status_code != 200:
+            cold['missing'] += 1
+            continue
+        cached.append((url, response))
+
+    for url, response in cached:
+        if 'immutable' in response.get('Cache-Control', ''):
+            continue
+        headers = {'HTTP_ACCEPT_ENCODING': ACCEPT_ENCODING}
+        if response.has_header('ETag'):
+            headers['HTTP_IF_NONE_MATCH'] = response['ETag']
+        if response.has_header('Last-Modified'):
+            headers['HTTP_IF_MODIFIED_SINCE'] = response['Last-Modified']
+        _, size, seconds = fetch(client, url, headers)
+        warm['requests'] += 1
+        warm['bytes'] += size
+        warm['seconds'] += seconds
+    return cold, warm
+
+
+def run(mode, repeat):
+    from django.template.loader import render_to_string
+    from django.templatetags.static import static
+    from django.test import Client, RequestFactory
+    from django.urls import reverse
+
+    from studio.assets.fingerprint import assets_prefix
+
+    html = render_to_string('studio/index.html', request=RequestFactory().get('/studio/'))
+    catalog_url = reverse('catalog')
+    urls = page_assets(html, [static(''), assets_prefix(), catalog_url])
+    client = Client()
+    if catalog_url in urls:
+        urls += [asset['thumbnail'] for asset in client.get(catalog_url).json()['assets']]
+    runs = [visit(client, urls) for _ in range(repeat)]
+    cold, warm = runs[-1]
+    cold_ms = statistics.median(r[0]['seconds'] for r in runs) * 1000
+    warm_ms = statistics.median(r[1]['seconds'] for r in runs) * 1000
+    print(f"{mode:<14} {len(urls):>6} {cold['bytes'] / 1024:>10.0f} {cold_ms:>9.1f} "
+          f"{warm['requests']:>8} {warm['bytes'] / 1024:>10.1f} {warm_ms:>9.1f}")
+    if cold['missing']:
+        print(f"    [WARN] {cold['missing']} referenced file(s) not found")
+    return cold, warm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    django.setup()
+    from django.conf import settings
+    from django.test.utils import override_settings, setup_test_environment
+
+    from studio.assets.fingerprint import MANIFEST_NAME
+
+    setup_test_environment()
+    if not os.path.exists(os.path.join(str(settings.STUDIO_ASSETS_ROOT), MANIFEST_NAME)):
+        print("[ERROR] No fingerprint manifest; run: python manage.py fingerprint_assets")
+        return
+
+    print(f"{'':<14} {'files':>6} {'first KB':>10} {'first ms':>9} "
+          f"{'reload':>8} {'reload KB':>10} {'reload ms':>9}")
+    with tempfile.TemporaryDirectory() as empty, override_settings(STUDIO_ASSETS_ROOT=empty):
+        run('static', args.repeat)
+    run('fingerprinted', args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Compositing time per capture (studio/compositing.py) at 720p and 4K.
+
+Templates use synthetic overlays written to a temporary folder:
+- single: the photo fills the canvas, with a border frame, a corner logo
+  (alpha PNGs) and a "{session} - {date}" line rendered per capture
+- strip: three shots on a 600x1800 (at 720p) canvas with a printed border
+  and a static title
+
+For each it reports:
+- cold: the first capture, including flattening the template into layers
+- warm: later captures (cached premultiplied layers, tile-limited blend)
+- naive: decode the overlay PNGs, resize them and alpha-blend in float32
+  for every capture, the straightforward approach
+- encode: the JPEG of the result, as stored
+Finally, how long CameraService waits when handing a strip to the pool.
+
+Usage: python bench_compositing.py [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from studio.compositing import Compositor, TemplateSpec, build_layers, compose
+
+RESOLUTIONS = {'720p': (1280, 720), '4K': (3840, 2160)}
+
+
+def time_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return statistics.median(timings)
+
+
+def write_overlays(folder):
+    # Border frame: opaque 6% band with a soft inner edge, transparent centre
+    frame = np.zeros((1080, 1920, 4), dtype=np.uint8)
+    frame[..., :3] = (40, 90, 200)
+    alpha = np.zeros((1080, 1920), dtype=np.float32)
+    band = 64
+    alpha[:band], alpha[-band:], alpha[:, :band], alpha[:, -band:] = 1, 1, 1, 1
+    frame[..., 3] = (cv2.GaussianBlur(alpha, (0, 0), 6) * 255).astype(np.uint8)
+    cv2.imwrite(os.path.join(folder, 'frame.png'), frame)
+
+    logo = np.zeros((256, 256, 4), dtype=np.uint8)
+    cv2.circle(logo, (128, 128), 110, (255, 255, 255, 230), -1, cv2.LINE_AA)
+    cv2.putText(logo, 'M', (70, 170), cv2.FONT_HERSHEY_DUPLEX, 4, (200, 60, 30, 255), 8, cv2.LINE_AA)
+    cv2.imwrite(os.path.join(folder, 'logo.png'), logo)
+
+    strip = np.zeros((1800, 600, 4), dtype=np.uint8)
+    strip[..., :3] = (30, 30, 30)
+    strip[:12, :, 3] = strip[-12:, :, 3] = strip[:, :12, 3] = strip[:, -12:, 3] = 255
+    cv2.imwrite(os.path.join(folder, 'strip.png'), strip)
+
+
+def templates(folder):
+    single = TemplateSpec.from_dict({
+        'overlays': [{'image': os.path.join(folder, 'frame.png')},
+                     {'image': os.path.join(folder, 'logo.png'), 'rect': [0.86, 0.04, 0.1, 0.1778]}],
+        'texts': [{'text': '{session} - {date}', 'position': [0.5, 0.93], 'size': 0.045}],
+    })
+    strip = TemplateSpec.from_dict({
+        'canvas': [600, 1800],
+        'slots': [[0.05, 0.03, 0.9, 0.28], [0.05, 0.33, 0.9, 0.28], [0.05, 0.63, 0.9, 0.28]],
+        'background': '#ffffff',
+        'overlays': [{'image': os.path.join(folder, 'strip.png')}],
+        'texts': [{'text': 'MIRAI STUDIO', 'position': [0.5, 0.955], 'size': 0.03, 'color': '#222222'}],
+    })
+    return {'single': single, 'strip': strip}
+
+
+def naive(spec, frames, size):
+    # Everything per capture, float32 over the whole canvas
+    width, height = size
+    canvas = np.empty((height, width, 3), dtype=np.float32)
+    canvas[:] = 255 if spec.canvas else 0
+    for frame, (x, y, w, h) in zip(frames, spec.slots):
+        x0, y0, x1, y1 = round(x * width), round(y * height), round((x + w) * width), round((y + h) * height)
+        canvas[y0:y1, x0:x1] = cv2.resize(frame, (x1 - x0, y1 - y0)).astype(np.float32)
+    for overlay in spec.overlays:
+        image = cv2.imread(overlay.image, cv2.IMREAD_UNCHANGED)
+        x, y, w, h = overlay.rect
+        x0, y0, x1, y1 = round(x * width), round(y * height), round((x + w) * width), round((y + h) * height)
+        image = cv2.resize(image, (x1 - x0, y1 - y0)).astype(np.float32)
+        alpha = image[..., 3:] / 255.0
+        canvas[y0:y1, x0:x1] = image[..., :3] * alpha + canvas[y0:y1, x0:x1] * (1 - alpha)
+    return canvas.astype(np.uint8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    context = {'session': 'Expo 2026', 'date': '18-10-2026', 'time': '12:00'}
+    with tempfile.TemporaryDirectory() as folder:
+        write_overlays(folder)
+        specs = templates(folder)
+
+        print(f"{'ms':<16} {'canvas':>10} {'cold':>8} {'warm':>8} {'naive':>8} {'encode':>8} {'layers MB':>10}")
+        for resolution, (width, height) in RESOLUTIONS.items():
+            frames = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(3)]
+            for name, spec in specs.items():
+                shots = frames[:spec.shots]
+                size = spec.canvas_size((width, height))
+                compositor = Compositor()
+                start = time.perf_counter()
+                image = compositor.compose(name, spec, shots, context)
+                cold = (time.perf_counter() - start) * 1000.0
+                warm = time_ms(lambda: compositor.compose(name, spec, shots, context), args.repeat)
+                slow = time_ms(lambda: naive(spec, shots, size), max(3, args.repeat // 4))
+                encode = time_ms(lambda: cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 95]), args.repeat)
+                layers = build_layers(spec, size)
+                print(f"{name + ' ' + resolution:<16} {f'{size[0]}x{size[1]}':>10} {cold:>8.1f} {warm:>8.2f} "
+                      f"{slow:>8.1f} {encode:>8.1f} {layers.nbytes / 1e6:>10.1f}")
+
+        # What the capture thread pays: a submit, composition runs on the pool
+        compositor = Compositor()
+        compositor.compose('strip', specs['strip'], frames, context)
+        start = time.perf_counter()
+        future = compositor.submit(compositor.compose, 'strip', specs['strip'], frames, context)
+        handoff = (time.perf_counter() - start) * 1000.0
+        future.result()
+        print(f"[INFO] Handing a 4K strip to the pool: {handoff:.2f} ms on the capture thread "
+              f"(composed in the background in {(time.perf_counter() - start) * 1000.0:.1f} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark for ResNet50GestureDetector classification.
+
+Measures one batched classifier call for N hand crops against N separate
+single-crop calls, showing how the per-frame cost grows with hand count.
+
+With --replay, frames from a folder of images (e.g. captures/) or a video are
+run through the full detection pipeline with and without the crop cache.
+Each image is held for --hold detections with a little sensor noise, like a
+guest holding a palm during the trigger window. The script fails if the
+cached run disagrees with the uncached run on more than 1 - --min_agreement
+of the detections.
+
+Usage: python bench_detector.py [--model path/to/best_model.keras] [--hands 1 2 3 4]
+       python bench_detector.py --replay captures/ [--hold 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from studio.utils.crop_cache import CropCache
+from studio.utils.efficientnet_detector import ResNet50GestureDetector
+
+DEFAULT_MODEL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'models', 'resnet50', 'best_model.keras')
+
+
+def time_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return float(np.median(timings))
+
+
+def bench_batching(detector, hand_counts, repeat):
+    rng = np.random.default_rng(72)
+    print(f"\n{'hands':>5} {'batched (ms)':>13} {'sequential (ms)':>16} {'batched/hand':>13}")
+    for hands in hand_counts:
+        batch = rng.uniform(0, 255, size=(hands, 224, 224, 3)).astype(np.float32)
+        detector.classify_batch(batch)  # warm the shape
+        batched = time_ms(lambda: detector.classify_batch(batch), repeat)
+        sequential = time_ms(lambda: [detector.classify_batch(batch[i:i + 1]) for i in range(hands)], repeat)
+        print(f"{hands:>5} {batched:>13.2f} {sequential:>16.2f} {batched / hands:>13.2f}")
+
+
+def load_replay_frames(source, limit):
+    if os.path.isdir(source):
+        names = sorted(n for n in os.listdir(source) if n.lower().endswith(('.jpg', '.jpeg', '.png')))
+        frames = (cv2.imread(os.path.join(source, n)) for n in names)
+    else:
+        cap = cv2.VideoCapture(source)
+        frames = iter(lambda: cap.read()[1], None)
+    result = []
+    for frame in frames:
+        if frame is None:
+            continue
+        # Same input as the camera loop: mirrored, detection at 50% scale
+        result.append(cv2.resize(cv2.flip(frame, 1), (0, 0), fx=0.5, fy=0.5))
+        if len(result) >= limit:
+            break
+    return result
+
+
+def run_replay(detector, frames, hold, seed=72):
+    rng = np.random.default_rng(seed)
+    labels, timings = [], []
+    for frame in frames:
+        for _ in range(hold):
+            noise = rng.normal(0, 2.0, frame.shape)
+            noisy = np.clip(frame + noise, 0, 255).astype(np.uint8)
+            start = time.perf_counter()
+            result = detector.get_detection_result(noisy)
+            timings.append((time.perf_counter() - start) * 1000.0)
+            labels.append(tuple(hand["label"] for hand in result["hands"]))
+    return labels, timings
+
+
+def bench_replay(detector, source, hold, limit, min_agreement):
+    frames = load_replay_frames(source, limit)
+    if not frames:
+        print(f"[ERROR] No frames found in {source}")
+        return False
+
+    detector.crop_cache = None
+    baseline_labels, baseline_ms = run_replay(detector, frames, hold)
+
+    detector.crop_cache = CropCache(capacity=8, ttl=0.5)
+    cached_labels, cached_ms = run_replay(detector, frames, hold)
+    stats = detector.crop_cache.stats()
+
+    agreement = np.mean([a == b for a, b in zip(baseline_labels, cached_labels)])
+    print(f"\n[INFO] Replayed {len(frames)} frames x {hold} detections")
+    print(f"  uncached: {np.mean(baseline_ms):.2f} ms/detection (p95 {np.percentile(baseline_ms, 95):.2f})")
+    print(f"  cached:   {np.mean(cached_ms):.2f} ms/detection (p95 {np.percentile(cached_ms, 95):.2f})")
+    print(f"  cache hit rate {stats['hit_rate']:.1%}, classifier time saved {stats['saved_ms']:.0f} ms")
+    print(f"  label agreement {agreement:.2%}")
+    if agreement < min_agreement:
+        print(f"[FAIL] Agreement below {min_agreement:.0%}: the cache thresholds are too loose")
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gesture classification")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL)
+    parser.add_argument("--hands", type=int, nargs="+", default=[1, 2, 3, 4])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--replay", type=str, help="Folder of frames or a video file to replay")
+    parser.add_argument("--hold", type=int, default=10, help="Detections per replayed frame")
+    parser.add_argument("--limit", type=int, default=50, help="Maximum frames to replay")
+    parser.add_argument("--min_agreement", type=float, default=0.98)
+    args = parser.parse_args()
+
+    detector = ResNet50GestureDetector(model_path=args.model, max_num_hands=max(args.hands))
+    print(f"[INFO] Model {detector.model_version}, warm latency {detector.warmup():.2f} ms")
+    bench_batching(detector, args.hands, args.repeat)
+
+    if args.replay and not bench_replay(detector, args.replay, args.hold, args.limit, args.min_agreement):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
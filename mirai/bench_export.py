@@ -0,0 +1,116 @@
+"""
+Throughput and memory of the streaming capture export (studio/export.py).
+
+Writes --files synthetic photos (incompressible, like JPEGs) to a temporary
+folder, then compares:
+- raw read: every file read sequentially, the ceiling for any export
+- stored stream: StoredZip.iter_range, what /studio/export sends
+- deflate stream: zipfile with ZIP_DEFLATED, i.e. recompressing the JPEGs
+- in-memory zip: zipfile ZIP_STORED into a BytesIO, the "bundle it in
+  Python" approach
+CPU % is process time over wall time: near 100% means CPU-bound. Peak is the
+largest Python allocation during the run (tracemalloc, separate pass).
+Also times a resumed download (Range from the middle) to its first byte.
+
+The files were just written, so they are read from the page cache; on a
+cold cache the stream follows the disk's sequential read speed.
+
+Usage: python bench_export.py [--files 400] [--size-kb 400]
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime
+
+from studio.export import StoredZip, ZipEntry
+
+
+def raw_read(entries):
+    total = 0
+    for entry in entries:
+        with open(entry.path, 'rb', buffering=0) as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                total += len(block)
+    return total
+
+
+def stored_stream(entries):
+    return sum(len(chunk) for chunk in StoredZip(entries).iter_range())
+
+
+class _Sink(io.RawIOBase):
+    # Counts bytes like a socket would receive them; zipfile streams into any unseekable file
+    def __init__(self):
+        self.bytes = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.bytes += len(data)
+        return len(data)
+
+
+def deflate_stream(entries):
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for entry in entries:
+            zf.write(entry.path, entry.name)
+    return sink.bytes
+
+
+def in_memory(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as zf:
+        for entry in entries:
+            with open(entry.path, 'rb') as f:
+                zf.writestr(entry.name, f.read())
+    return len(buffer.getvalue())
+
+
+def measure(label, fn, entries):
+    wall, cpu = time.perf_counter(), time.process_time()
+    size = fn(entries)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+    tracemalloc.start()
+    fn(entries)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<16} {size / 1e6:>9.1f} {size / 1e6 / wall:>9.0f} {cpu / wall:>6.0%} {peak / 1e6:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--files', type=int, default=400)
+    parser.add_argument('--size-kb', type=int, default=400)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        entries = []
+        for i in range(args.files):
+            path = os.path.join(folder, f"capture_{i}.jpg")
+            with open(path, 'wb') as f:
+                f.write(os.urandom(args.size_kb * 1024))
+            entries.append(ZipEntry(f"export/{i:06d}_capture_{i}.jpg", path, args.size_kb * 1024,
+                                    datetime(2026, 10, 18, 12, 0), os.stat(path).st_mtime_ns))
+
+        print(f"{'':<16} {'MB':>9} {'MB/s':>9} {'CPU':>6} {'peak MB':>9}")
+        measure('raw read', raw_read, entries)
+        measure('stored stream', stored_stream, entries)
+        measure('deflate stream', deflate_stream, entries)
+        measure('in-memory zip', in_memory, entries)
+
+        archive = StoredZip(entries)
+        start = time.perf_counter()
+        next(archive.iter_range(archive.size // 2))
+        print(f"[INFO] Resume at {archive.size // 2 / 1e6:.0f} MB: first byte after "
+              f"{(time.perf_counter() - start) * 1000:.1f} ms (CRCs of skipped files are read on demand, later)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+Gallery listing and thumbnail latency at venue scale.
+
+Builds a throwaway test database with --rows captures spread over a year
+(timestamps rounded to the second, so bursts share a timestamp and the id
+tie-break is exercised), then measures:
+- listing: the first page and a page --depth rows in, keyset cursor vs
+  OFFSET, with and without the capture indexes (query plans are printed)
+- the /studio/gallery view itself (query + JSON + ETag), and a 304
+- thumbnails: first request (decode, resize and encode every size in the
+  pool), cached request, and revalidation with If-None-Match
+
+Photos are synthetic 1280x720 JPEGs (--photos files shared by all rows),
+written to a temporary MEDIA_ROOT.
+
+Usage: python bench_gallery.py [--rows 100000] [--depth 50000] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import cv2
+import django
+import numpy as np
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mirai.settings')
+
+GESTURES = ['Auto/Timer', 'Palm', 'Manual']
+
+
+def time_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return statistics.median(timings)
+
+
+def write_photos(media_root, count):
+    rng = np.random.default_rng(0)
+    names = []
+    os.makedirs(os.path.join(media_root, 'captures'), exist_ok=True)
+    for i in range(count):
+        gradient = np.linspace(0, 255, 1280, dtype=np.float32)[None, :, None]
+        image = (gradient * rng.uniform(0.3, 1.0, 3) + rng.normal(0, 12, (720, 1280, 3))).clip(0, 255)
+        name = f"captures/bench_{i}.jpg"
+        cv2.imwrite(os.path.join(media_root, name), image.astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 90])
+        names.append(name)
+    return names
+
+
+def fill(rows, photos):
+    from django.db import connection, transaction
+
+    random.seed(0)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    seconds = sorted(random.randrange(365 * 24 * 3600) for _ in range(rows))
+    # auto_now_add would overwrite the timestamps, so insert directly
+    values = [(photos[i % len(photos)], start + timedelta(seconds=s), random.choice(GESTURES), '{}', '')
+              for i, s in enumerate(seconds)]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany("INSERT INTO studio_capture (image, timestamp, gesture, thumbnails, session) "
+                           "VALUES (%s, %s, %s, %s, %s)", values)
+
+
+def listing(label, depth, repeat, show_plan):
+    from studio.gallery import PAGE_SIZE, encode_cursor, page
+    from studio.models import Capture
+
+    ordered = Capture.objects.order_by('-timestamp', '-id')
+    deep = ordered.values_list('timestamp', 'id')[depth - 1]
+    cursor = encode_cursor(*deep)
+    gesture_deep = ordered.filter(gesture='Palm').values_list('timestamp', 'id')[depth // len(GESTURES) - 1]
+    gesture_cursor = encode_cursor(*gesture_deep)
+
+    results = {
+        'keyset first': time_ms(lambda: page(None, PAGE_SIZE), repeat),
+        'keyset deep': time_ms(lambda: page(cursor, PAGE_SIZE), repeat),
+        'offset deep': time_ms(lambda: list(ordered[depth:depth + PAGE_SIZE]), repeat),
+        'gesture deep': time_ms(lambda: page(gesture_cursor, PAGE_SIZE, 'Palm'), repeat),
+    }
+    print(f"{label:<12} " + " ".join(f"{v:>13.2f}" for v in results.values()))
+    if show_plan:
+        timestamp, capture_id = deep
+        keyset = ordered.filter(timestamp__lte=timestamp).exclude(timestamp=timestamp, id__gte=capture_id)
+        print(f"    keyset plan: {keyset[:PAGE_SIZE].explain()}")
+        print(f"    offset plan: {ordered[depth:depth + PAGE_SIZE].explain()}")
+    return results
+
+
+def set_indexes(enabled):
+    from django.db import connection
+
+    from studio.models import Capture
+
+    with connection.schema_editor() as editor:
+        for index in Capture._meta.indexes:
+            (editor.add_index if enabled else editor.remove_index)(Capture, index)
+
+
+def thumbnails(client, ids, repeat):
+    from django.urls import reverse
+
+    from studio.gallery import thumbnail_sizes
+
+    size = min(thumbnail_sizes())
+    urls = [reverse('gallery_thumbnail', kwargs={'capture_id': i, 'size': size}) for i in ids]
+    first = []
+    for url in urls:
+        start = time.perf_counter()
+        response = client.get(url)
+        b''.join(response.streaming_content)
+        first.append((time.perf_counter() - start) * 1000.0)
+    etag = response['ETag']
+
+    def cached():
+        b''.join(client.get(urls[-1]).streaming_content)
+
+    revalidate_status = client.get(urls[-1], HTTP_IF_NONE_MATCH=etag).status_code
+    print(f"thumbnail first request (all sizes)  {statistics.median(first):>8.2f} ms  (median of {len(urls)})")
+    print(f"thumbnail cached                     {time_ms(cached, repeat):>8.2f} ms")
+    print(f"thumbnail If-None-Match ({revalidate_status})        "
+          f"{time_ms(lambda: client.get(urls[-1], HTTP_IF_NONE_MATCH=etag), repeat):>8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--depth', type=int, default=50000, help='Rows skipped before the "deep" page')
+    parser.add_argument('--photos', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    django.setup()
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import override_settings, setup_test_environment
+    from django.urls import reverse
+
+    from studio.models import Capture
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            start = time.perf_counter()
+            fill(args.rows, write_photos(media_root, args.photos))
+            print(f"[INFO] {Capture.objects.count()} captures inserted in {time.perf_counter() - start:.1f}s "
+                  f"({connection.vendor}), page depth {args.depth}")
+
+            print(f"{'ms':<12} {'keyset first':>13} {'keyset deep':>13} {'offset deep':>13} {'gesture deep':>13}")
+            listing('indexed', args.depth, args.repeat, show_plan=True)
+            set_indexes(False)
+            listing('no index', args.depth, max(3, args.repeat // 5), show_plan=False)
+            set_indexes(True)
+
+            client = Client()
+            client.force_login(User.objects.create_superuser('bench', 'bench@example.com', 'bench'))
+            gallery_url = reverse('gallery')
+            response = client.get(gallery_url)
+            revalidate = {'HTTP_IF_NONE_MATCH': response['ETag']}
+            print(f"gallery view first page              {time_ms(lambda: client.get(gallery_url), args.repeat):>8.2f} ms"
+                  f"  ({len(response.content) / 1024:.1f} KB)")
+            print(f"gallery view If-None-Match ({client.get(gallery_url, **revalidate).status_code})      "
+                  f"{time_ms(lambda: client.get(gallery_url, **revalidate), args.repeat):>8.2f} ms")
+            ids = list(Capture.objects.order_by('-timestamp', '-id').values_list('id', flat=True)[:args.photos])
+            thumbnails(client, ids, args.repeat)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
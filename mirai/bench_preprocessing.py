@@ -0,0 +1,103 @@
+"""
+Micro-benchmark and equivalence check for the detector preprocessing path.
+
+Compares the old per-crop path (resize -> BGR2RGB -> astype/255 -> expand_dims,
+plus the separate full-frame BGR2RGB for MediaPipe) with CropPreprocessor,
+and verifies both produce bit-identical tensors.
+
+Usage: python bench_preprocessing.py [--hands 1 2 4] [--repeat 200]
+"""
+import argparse
+import timeit
+
+import cv2
+import numpy as np
+
+from studio.utils.preprocessing import CropPreprocessor
+
+PADDING = 20
+SIZE = 224
+
+
+def legacy_preprocess(frame, bbox, divisor):
+    # Copy of the pre-CropPreprocessor ResNet50GestureDetector.preprocess_frame
+    x, y, w, h = bbox
+    x = max(0, x - PADDING)
+    y = max(0, y - PADDING)
+    w = min(frame.shape[1] - x, w + 2 * PADDING)
+    h = min(frame.shape[0] - y, h + 2 * PADDING)
+    cropped = frame[y:y+h, x:x+w]
+    resized = cv2.resize(cropped, (SIZE, SIZE))
+    rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+    normalized = rgb.astype(np.float32) / divisor
+    return np.expand_dims(normalized, axis=0)
+
+
+def legacy_frame(frame, bboxes, divisor):
+    cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)  # MediaPipe input
+    return np.concatenate([legacy_preprocess(frame, b, divisor) for b in bboxes])
+
+
+def make_inputs(hands, rng):
+    # Detection runs on the half-scale 1280x720 frame
+    frame = rng.integers(0, 256, size=(360, 640, 3), dtype=np.uint8)
+    bboxes = []
+    for _ in range(hands):
+        w, h = rng.integers(60, 160, size=2)
+        x = int(rng.integers(0, 640 - w))
+        y = int(rng.integers(0, 360 - h))
+        bboxes.append((x, y, int(w), int(h)))
+    return frame, bboxes
+
+
+def check_equivalence(rng):
+    for divisor in (255.0, 1.0):
+        pre = CropPreprocessor(size=SIZE, padding=PADDING, divisor=divisor)
+        for hands in (1, 3):
+            frame, bboxes = make_inputs(hands, rng)
+            expected = legacy_frame(frame, bboxes, divisor)
+            actual = pre.prepare(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), bboxes)
+            assert actual.dtype == np.float32 and actual.shape == expected.shape
+            assert np.array_equal(actual, expected), f"mismatch (divisor={divisor}, hands={hands})"
+
+    # What the training Lambda (resnet50.preprocess_input, caffe mode) expects:
+    # float RGB in [0, 255], same as pipeline.py's decode_jpeg + resize.
+    pre = CropPreprocessor(size=SIZE, padding=PADDING, divisor=1.0)
+    frame = np.zeros((360, 640, 3), dtype=np.uint8)
+    frame[..., 0] = 10   # B
+    frame[..., 1] = 20   # G
+    frame[..., 2] = 250  # R
+    batch = pre.prepare(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), [(100, 100, 80, 80)])
+    assert batch.flags['C_CONTIGUOUS']
+    assert tuple(batch[0, 0, 0]) == (250.0, 20.0, 10.0), "channel order must be RGB"
+    assert batch.min() >= 0.0 and batch.max() <= 255.0
+    print("[OK] CropPreprocessor output is bit-identical to the legacy path")
+    print("[OK] divisor=1.0 yields float32 RGB in [0, 255] as expected by the preprocess_input Lambda")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark detector preprocessing")
+    parser.add_argument("--hands", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(72)
+    check_equivalence(rng)
+
+    pre = CropPreprocessor(size=SIZE, padding=PADDING, divisor=1.0)
+    print(f"\n{'hands':>5} {'legacy (ms)':>12} {'new (ms)':>10} {'speedup':>8}")
+    for hands in args.hands:
+        frame, bboxes = make_inputs(hands, rng)
+
+        def run_new():
+            pre.prepare(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), bboxes)
+
+        legacy = min(timeit.repeat(lambda: legacy_frame(frame, bboxes, 1.0), number=args.repeat, repeat=3))
+        new = min(timeit.repeat(run_new, number=args.repeat, repeat=3))
+        legacy_ms = legacy / args.repeat * 1000.0
+        new_ms = new / args.repeat * 1000.0
+        print(f"{hands:>5} {legacy_ms:>12.3f} {new_ms:>10.3f} {legacy_ms / new_ms:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Per-frame cost of the server-side sticker (studio/stickers.py).
+
+Draws 3d/mordo and riggs.png (or --sticker) for 1, 2 and 4 hands on 720p,
+1080p and 4K frames and reports, per frame:
+- cached: the scaled bitmap is already in its size bucket (the steady state)
+- miss: the first frame at a new size bucket (one resize of the source)
+- naive: resize the sticker and alpha-blend it in float32 over the whole
+  frame, for every hand on every frame
+Then a hand walking towards the camera (its box growing 0.5% per frame)
+shows how often the size buckets actually miss.
+
+Usage: python bench_stickers.py [--sticker "3d/mordo and riggs.png"] [--repeat 50]
+"""
+import argparse
+import os
+import statistics
+import time
+
+import cv2
+import numpy as np
+
+from studio.stickers import Sticker, StickerRenderer
+
+RESOLUTIONS = {'720p': (1280, 720), '1080p': (1920, 1080), '4K': (3840, 2160)}
+
+
+def time_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return statistics.median(timings)
+
+
+def detection(width, height, hands, hand_size):
+    # Hands spread over the lower half of the frame, as MediaPipe bboxes (x, y, w, h)
+    size = round(hand_size * height)
+    return {"hands": [{"bbox": (round((i + 0.5) * width / hands - size / 2), height // 2, size, size),
+                       "landmarks": None} for i in range(hands)]}
+
+
+def naive(frame, image, result):
+    for hand in result["hands"]:
+        x, y, w, h = hand["bbox"]
+        sticker_h = round(w * image.shape[0] / image.shape[1])
+        scaled = cv2.resize(image, (w, sticker_h)).astype(np.float32)
+        layer = np.zeros(frame.shape[:2] + (4,), dtype=np.float32)
+        top = max(0, y - sticker_h)
+        layer[top:y, x:x + w] = scaled[sticker_h - (y - top):]
+        alpha = layer[..., 3:] / 255.0
+        frame[:] = (layer[..., :3] * alpha + frame * (1 - alpha)).astype(np.uint8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sticker', default=os.path.join(os.path.dirname(__file__), '3d', 'mordo and riggs.png'))
+    parser.add_argument('--hand-size', type=float, default=0.3, help='Hand box side, fraction of the frame height')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    image = cv2.imread(args.sticker, cv2.IMREAD_UNCHANGED)
+    print(f"[INFO] Sticker {os.path.basename(args.sticker)} {image.shape[1]}x{image.shape[0]}, "
+          f"hand box {args.hand_size:.0%} of the frame height")
+    print(f"{'ms per frame':<16} {'cached':>8} {'miss':>8} {'naive':>8}")
+    rng = np.random.default_rng(0)
+    for resolution, (width, height) in RESOLUTIONS.items():
+        frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        for hands in (1, 2, 4):
+            result = detection(width, height, hands, args.hand_size)
+            renderer = StickerRenderer()
+            renderer.select(Sticker('bench', image))
+            start = time.perf_counter()
+            renderer.draw(frame, result)
+            miss = (time.perf_counter() - start) * 1000.0
+            cached = time_ms(lambda: renderer.draw(frame, result), args.repeat)
+            slow = time_ms(lambda: naive(frame, image, result), max(3, args.repeat // 10))
+            print(f"{f'{resolution} x{hands}':<16} {cached:>8.3f} {miss:>8.2f} {slow:>8.1f}")
+
+    width, height = RESOLUTIONS['720p']
+    frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    renderer = StickerRenderer()
+    renderer.select(Sticker('bench', image))
+    timings, size, frames = [], 0.1, 0
+    while size < 0.5:
+        result = detection(width, height, 1, size)
+        start = time.perf_counter()
+        renderer.draw(frame, result)
+        timings.append((time.perf_counter() - start) * 1000.0)
+        size *= 1.005
+        frames += 1
+    print(f"[INFO] Approaching hand over {frames} frames: {len(renderer.sticker.bitmaps)} resizes, "
+          f"median {statistics.median(timings):.3f} ms, worst {max(timings):.2f} ms per frame")
+
+
+if __name__ == '__main__':
+    main()
@@ -121,10 +121,33 @@ STATICFILES_DIRS = [
     BASE_DIR / "3d",
 ]
 
+# Content-hashed, precompressed copies of the static files, served from
+# studio/assets/ with immutable caching (python manage.py fingerprint_assets).
+# Until the command has run, {% asset %} falls back to the plain static URL.
+STUDIO_ASSETS_ROOT = BASE_DIR / 'build' / 'assets'
+
 # Media files (Uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Gesture detector model
+# New models can be hot-swapped from the admin or the studio/model/deploy endpoint.
+# Before going live a candidate must reach DETECTOR_MIN_ACCURACY on the newest
+# DETECTOR_HOLDOUT_PER_CLASS crops of each class in DETECTOR_HOLDOUT_DIR
+# (same layout as dataset_cropped: fist/, palm/). Missing folder = no validation.
+DETECTOR_MODEL_PATH = BASE_DIR.parent / 'models' / 'resnet50' / 'best_model.keras'
+DETECTOR_HOLDOUT_DIR = BASE_DIR.parent / 'models' / 'holdout'
+DETECTOR_HOLDOUT_PER_CLASS = 20
+DETECTOR_MIN_ACCURACY = 0.8
+# 'auto': run the fastest variant that passed ml-self-studio/scripts/export_model.py
+# (read from export/export_report.json next to the model), 'keras': always the .keras file
+DETECTOR_BACKEND = 'auto'
+
+# Camera/detection pipeline knobs (see studio.config.PipelineConfig for the
+# full list and defaults), e.g. {'detection_interval': 3, 'confidence': 0.7}.
+# Can be changed live from the admin (Pipeline settings) or studio/config.
+STUDIO_PIPELINE = {}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -1,35 +1,227 @@
+"""
+Geometry statistics for the OBJ assets of the AR studio.
 
+The OBJ is parsed with studio.assets.obj (memory-mapped, tokenized in bulk
+with numpy), so files of hundreds of MB take seconds. Reported per file:
+vertex/face/triangle counts per group and per material, bounding boxes,
+degenerate triangles, unused vertices and the textures referenced by the
+MTL files (found or missing).
+
+Usage:
+    python obj_analyzer.py 3d/reva/reva.obj
+    python obj_analyzer.py 3d --json obj_report.json     # every .obj under 3d/
+"""
+import argparse
+import json
+import os
 import sys
+import time
+
+import numpy as np
+
+from studio.assets.mtl import parse_mtl
+from studio.assets.obj import ObjMesh, parse_obj
+
+# Triangles with an area below this fraction of the squared bbox diagonal count as zero-area
+ZERO_AREA_EPSILON = 1e-12
+
+
+def bounding_box(points):
+    if not len(points):
+        return None
+    lo, hi = points.min(axis=0), points.max(axis=0)
+    return {'min': lo.tolist(), 'max': hi.tolist(), 'size': (hi - lo).tolist()}
+
+
+def per_part(mesh: ObjMesh, names, polygon_part, triangle_part):
+    """Faces, triangles, distinct vertices and bbox of every group / material."""
+    count = len(names)
+    faces = np.bincount(polygon_part, minlength=count)
+    triangles = np.bincount(triangle_part, minlength=count)
+    # Distinct (part, position) pairs, sorted by part
+    corner_part = np.repeat(triangle_part, 3).astype(np.int64)
+    pairs = np.unique(corner_part * max(len(mesh.positions), 1) + mesh.corners[:, 0])
+    pair_part, pair_position = np.divmod(pairs, max(len(mesh.positions), 1))
+    vertices = np.bincount(pair_part, minlength=count)
+    starts = np.searchsorted(pair_part, np.arange(count))
+    points = mesh.positions[pair_position]
+
+    result = {}
+    for i, name in enumerate(names):
+        if not faces[i]:
+            continue
+        result[name] = {
+            'faces': int(faces[i]),
+            'triangles': int(triangles[i]),
+            'vertices': int(vertices[i]),
+            'bbox': bounding_box(points[starts[i]:starts[i] + vertices[i]])
+        }
+    return result
+
+
+def degenerate_triangles(mesh: ObjMesh, diagonal):
+    """
+    Returns:
+        (triangles with a repeated position index, other triangles with zero area)
+    """
+    tris = mesh.corners[:, 0].reshape(-1, 3)
+    repeated = (tris[:, 0] == tris[:, 1]) | (tris[:, 1] == tris[:, 2]) | (tris[:, 0] == tris[:, 2])
+    p = mesh.positions.astype(np.float64)
+    a, b, c = p[tris[:, 0]], p[tris[:, 1]], p[tris[:, 2]]
+    area = 0.5 * np.linalg.norm(np.cross(b - a, c - a), axis=1)
+    zero_area = ~repeated & (area <= ZERO_AREA_EPSILON * diagonal ** 2)
+    return int(repeated.sum()), int(zero_area.sum())
+
+
+def unused(array, indices):
+    """Elements of ``array`` that no face corner references."""
+    if not len(array):
+        return 0
+    used = np.bincount(indices[indices >= 0], minlength=len(array)) > 0
+    return int((~used).sum())
+
+
+def texture_references(filepath, mesh: ObjMesh):
+    """MTL libraries and the textures of every material, relative to the OBJ folder."""
+    base_dir = os.path.dirname(os.path.abspath(filepath))
+    libraries, materials = [], {}
+    for library in mesh.mtllibs or [os.path.splitext(os.path.basename(filepath))[0] + '.mtl']:
+        path = os.path.join(base_dir, library)
+        found = os.path.isfile(path)
+        libraries.append({'file': library, 'found': found})
+        if found:
+            materials.update(parse_mtl(path))
+    textures = {}
+    for name, material in materials.items():
+        for key, path in material.textures.items():
+            textures.setdefault(os.path.relpath(path, base_dir), {'found': True, 'materials': []})['materials'].append(f"{name} ({key})")
+        for key, value in material.missing_textures.items():
+            textures.setdefault(value, {'found': False, 'materials': []})['materials'].append(f"{name} ({key})")
+    return libraries, materials, textures
+
 
 def analyze_obj(filepath):
-    print(f"Analyzing {filepath}...")
-    usemtl_counts = {}
-    group_counts = {}
-    
-    try:
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith('usemtl '):
-                    mat = line.split()[1]
-                    usemtl_counts[mat] = usemtl_counts.get(mat, 0) + 1
-                elif line.startswith('g '):
-                    grp = line.split()[1]
-                    group_counts[grp] = group_counts.get(grp, 0) + 1
-                    
-        print("Materials used:")
-        for k, v in usemtl_counts.items():
-            print(f"  {k}: {v}")
-            
-        print("Groups:")
-        for k, v in group_counts.items():
-            print(f"  {k}: {v}")
-            
-    except Exception as e:
-        print(f"Error: {e}")
+    """
+    Statistics of one OBJ file as a JSON-serializable dict.
+
+    Raises:
+        OSError, ValueError: unreadable or malformed file.
+    """
+    start = time.perf_counter()
+    mesh = parse_obj(filepath)
+    parse_seconds = time.perf_counter() - start
+
+    referenced = np.unique(mesh.corners[:, 0])
+    bbox = bounding_box(mesh.positions[referenced])
+    diagonal = float(np.linalg.norm(bbox['size'])) if bbox else 0.0
+    repeated, zero_area = degenerate_triangles(mesh, diagonal)
+    sizes = np.bincount(np.minimum(mesh.polygon_sizes, 5), minlength=6)
+
+    libraries, mtl_materials, textures = texture_references(filepath, mesh)
+    materials = per_part(mesh, mesh.materials, mesh.polygon_material, mesh.face_material)
+    for name, stats in materials.items():
+        material = mtl_materials.get(name)
+        stats['defined'] = material is not None
+        stats['textures'] = {} if material is None else {
+            key: os.path.relpath(path, os.path.dirname(os.path.abspath(filepath)))
+            for key, path in material.textures.items()}
+        stats['missing_textures'] = {} if material is None else dict(material.missing_textures)
+
+    return {
+        'file': filepath,
+        'bytes': os.path.getsize(filepath),
+        'parse_ms': round(parse_seconds * 1000, 1),
+        'counts': {
+            'positions': len(mesh.positions),
+            'uvs': len(mesh.uvs),
+            'normals': len(mesh.normals),
+            'faces': mesh.polygons,
+            'triangles': mesh.triangles,
+            'draw_calls': mesh.material_runs
+        },
+        'face_sizes': {'<3': int(sizes[:3].sum()), '3': int(sizes[3]), '4': int(sizes[4]), '5+': int(sizes[5])},
+        'bbox': bbox,
+        'bbox_all_positions': bounding_box(mesh.positions),
+        'degenerate': {'invalid_faces': int(sizes[:3].sum()), 'repeated_index': repeated, 'zero_area': zero_area},
+        'unused': {
+            'positions': unused(mesh.positions, mesh.corners[:, 0]),
+            'uvs': unused(mesh.uvs, mesh.corners[:, 1]),
+            'normals': unused(mesh.normals, mesh.corners[:, 2])
+        },
+        'corners_without': {
+            'uv': int((mesh.corners[:, 1] < 0).sum()),
+            'normal': int((mesh.corners[:, 2] < 0).sum())
+        },
+        'groups': per_part(mesh, mesh.groups, mesh.polygon_group, mesh.face_group),
+        'materials': materials,
+        'undefined_materials': sorted(name for name in materials if not materials[name]['defined'] and name != 'default'),
+        'unused_mtl_materials': sorted(set(mtl_materials) - set(mesh.materials)),
+        'mtllibs': libraries,
+        'textures': textures
+    }
+
+
+def print_report(report):
+    counts = report['counts']
+    print(f"{report['file']} ({report['bytes'] / 1024 / 1024:.2f} MB, parsed in {report['parse_ms']} ms)")
+    print(f"  positions {counts['positions']}, uvs {counts['uvs']}, normals {counts['normals']}")
+    print(f"  faces {counts['faces']} {report['face_sizes']}, triangles {counts['triangles']}, "
+          f"draw calls {counts['draw_calls']}")
+    if report['bbox']:
+        print(f"  bbox min {[round(x, 4) for x in report['bbox']['min']]} "
+              f"max {[round(x, 4) for x in report['bbox']['max']]}")
+    print(f"  degenerate: {report['degenerate']}")
+    print(f"  unused: {report['unused']}, corners without {report['corners_without']}")
+    for title, key in (("Groups", 'groups'), ("Materials", 'materials')):
+        print(f"  {title}:")
+        for name, stats in report[key].items():
+            flag = '' if stats.get('defined', True) else '  [not in MTL]'
+            print(f"    {name}: {stats['faces']} faces, {stats['triangles']} triangles, "
+                  f"{stats['vertices']} vertices{flag}")
+    print("  Textures:")
+    for path, info in report['textures'].items():
+        print(f"    {'ok     ' if info['found'] else 'MISSING'} {path}  <- {', '.join(info['materials'])}")
+    for library in report['mtllibs']:
+        if not library['found']:
+            print(f"  [WARN] MTL library not found: {library['file']}")
+    if report['unused_mtl_materials']:
+        print(f"  [WARN] MTL materials never used: {', '.join(report['unused_mtl_materials'])}")
+
+
+def find_obj_files(path):
+    if os.path.isfile(path):
+        return [path]
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(path)
+                  for name in names if name.lower().endswith('.obj'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze OBJ geometry (file or folder)")
+    parser.add_argument('paths', nargs='+', help='.obj files or folders searched recursively (e.g. 3d)')
+    parser.add_argument('--json', help="Write all reports as JSON to this file ('-' = stdout)")
+    args = parser.parse_args()
+
+    reports, failed = [], 0
+    for filepath in (f for path in args.paths for f in find_obj_files(path)):
+        try:
+            report = analyze_obj(filepath)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] {filepath}: {e}", file=sys.stderr)
+            failed += 1
+            continue
+        reports.append(report)
+        if args.json != '-':
+            print_report(report)
+
+    if args.json == '-':
+        json.dump(reports, sys.stdout, indent=2)
+    elif args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
+        print(f"[INFO] Wrote {len(reports)} report(s) to {args.json}")
+    if failed or not reports:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        analyze_obj(sys.argv[1])
-    else:
-        print("Usage: python script.py <obj_file>")
+    main()
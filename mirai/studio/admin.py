@@ -1,8 +1,175 @@
-from django.contrib import admin
-from .models import Capture
+from django import forms
+from django.contrib import admin, messages
+from django.urls import reverse
+from django.utils.html import format_html
+from .catalog import ensure_thumbnail
+from .compositing import TemplateSpec, build_layers
+from .config import PipelineConfig
+from .gallery import thumbnail_sizes
+from .models import CatalogAsset, Capture, Composite, DetectorModel, FrameTemplate, PipelineSettings
 
 @admin.register(Capture)
 class CaptureAdmin(admin.ModelAdmin):
-    list_display = ('id', 'timestamp', 'gesture')
-    list_filter = ('timestamp', 'gesture')
+    list_display = ('id', 'thumbnail', 'timestamp', 'gesture', 'session')
+    list_filter = ('timestamp', 'gesture', 'session')
     search_fields = ('gesture',)
+    # Matches capture_gallery_idx, so a page is an index range scan
+    ordering = ('-timestamp', '-id')
+    # Skip the unfiltered COUNT(*) over the whole table on every changelist load
+    show_full_result_count = False
+    readonly_fields = ('thumbnails',)
+
+    @admin.display(description="Thumbnail")
+    def thumbnail(self, obj):
+        url = reverse('gallery_thumbnail', kwargs={'capture_id': obj.id, 'size': min(thumbnail_sizes())})
+        return format_html('<img src="{}" height="48" loading="lazy" alt="">', url)
+
+
+@admin.register(DetectorModel)
+class DetectorModelAdmin(admin.ModelAdmin):
+    list_display = ('id', 'version', 'status', 'holdout_accuracy', 'latency_ms', 'deployed_at', 'path')
+    list_filter = ('status',)
+    readonly_fields = ('version', 'status', 'holdout_accuracy', 'latency_ms', 'message', 'created', 'deployed_at')
+    actions = ['deploy_model', 'rollback_model']
+
+    @admin.action(description="Deploy selected model (background load, validate, swap)")
+    def deploy_model(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, "Select exactly one model to deploy.", messages.ERROR)
+            return
+        from .services import CameraService
+
+        detector_model = queryset.get()
+        if not detector_model.start_deploy(CameraService()):
+            self.message_user(request, "Another deployment is already in progress.", messages.WARNING)
+            return
+        self.message_user(request, "Deployment started. Refresh to see the result.", messages.INFO)
+
+    @admin.action(description="Roll back to the previous model")
+    def rollback_model(self, request, queryset):
+        from .services import CameraService
+
+        if not CameraService().rollback_model():
+            self.message_user(request, "No previous model is loaded.", messages.ERROR)
+            return
+        DetectorModel.record_rollback()
+        self.message_user(request, "Rolled back to the previous model.", messages.SUCCESS)
+
+
+class PipelineSettingsForm(forms.ModelForm):
+    class Meta:
+        model = PipelineSettings
+        fields = ('overrides',)
+
+    def clean_overrides(self):
+        overrides = self.cleaned_data['overrides'] or {}
+        if not isinstance(overrides, dict):
+            raise forms.ValidationError("Overrides must be a JSON object.")
+        try:
+            self.cleaned_config = PipelineConfig.from_settings(overrides)
+        except (ValueError, TypeError) as e:
+            raise forms.ValidationError(str(e))
+        return overrides
+
+
+@admin.register(PipelineSettings)
+class PipelineSettingsAdmin(admin.ModelAdmin):
+    form = PipelineSettingsForm
+    readonly_fields = ('effective_config', 'updated')
+
+    @admin.display(description="Effective config")
+    def effective_config(self, obj):
+        # From the stored overrides, not CameraService(): opening this page must not start the camera
+        try:
+            return PipelineConfig.from_settings(obj.overrides if obj else {}).to_dict()
+        except ValueError as e:
+            return f"Invalid overrides: {e}"
+
+    def has_add_permission(self, request):
+        return not PipelineSettings.objects.exists()
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        from .services import CameraService
+
+        # Apply live; the camera loop switches over between two frames
+        CameraService().set_config(form.cleaned_config)
+
+
+@admin.register(CatalogAsset)
+class CatalogAssetAdmin(admin.ModelAdmin):
+    list_display = ('preview', 'label', 'icon', 'name', 'kind', 'order', 'enabled', 'available', 'bytes')
+    list_display_links = ('preview', 'name')
+    list_editable = ('label', 'icon', 'order', 'enabled')
+    list_filter = ('kind', 'enabled', 'available')
+    search_fields = ('name', 'label')
+    readonly_fields = ('preview', 'name', 'kind', 'source', 'compiled', 'content_hash', 'bytes', 'source_bytes',
+                       'vertices', 'triangles', 'lods', 'available', 'updated')
+    actions = ['render_thumbnails']
+
+    def has_add_permission(self, request):
+        # Rows come from `manage.py sync_catalog`
+        return False
+
+    @admin.display(description="Preview")
+    def preview(self, obj):
+        url = reverse('catalog_thumbnail', kwargs={'content_hash': obj.content_hash})
+        return format_html('<img src="{}" width="48" height="48" alt="{}">', url, obj.icon)
+
+    @admin.action(description="Render thumbnails of selected assets")
+    def render_thumbnails(self, request, queryset):
+        failed = []
+        for asset in queryset:
+            try:
+                ensure_thumbnail(asset)
+            except ValueError as e:
+                failed.append(f"{asset.name}: {e}")
+        if failed:
+            self.message_user(request, "No thumbnail for " + "; ".join(failed), messages.WARNING)
+        else:
+            self.message_user(request, f"Rendered {queryset.count()} thumbnail(s).", messages.SUCCESS)
+
+
+class FrameTemplateForm(forms.ModelForm):
+    class Meta:
+        model = FrameTemplate
+        fields = ('name', 'spec', 'active')
+
+    def clean_spec(self):
+        spec = self.cleaned_data['spec'] or {}
+        try:
+            # Builds the layers once, small, so missing or broken images are reported here
+            parsed = TemplateSpec.from_dict(spec)
+            build_layers(parsed, parsed.canvas_size((320, 180)))
+        except (ValueError, TypeError) as e:
+            raise forms.ValidationError(str(e))
+        return spec
+
+
+@admin.register(FrameTemplate)
+class FrameTemplateAdmin(admin.ModelAdmin):
+    form = FrameTemplateForm
+    list_display = ('name', 'active', 'shots', 'updated')
+    list_editable = ('active',)
+
+    @admin.display(description="Shots")
+    def shots(self, obj):
+        try:
+            return TemplateSpec.from_dict(obj.spec).shots
+        except ValueError:
+            return "invalid"
+
+
+@admin.register(Composite)
+class CompositeAdmin(admin.ModelAdmin):
+    list_display = ('id', 'preview', 'timestamp', 'template', 'width', 'height', 'compose_ms')
+    list_filter = ('template',)
+    ordering = ('-timestamp', '-id')
+    readonly_fields = ('preview', 'template', 'captures', 'width', 'height', 'compose_ms')
+
+    @admin.display(description="Preview")
+    def preview(self, obj):
+        return format_html('<img src="{}" height="48" loading="lazy" alt="">', obj.image.url) if obj.image else ""
@@ -0,0 +1,10 @@
+# Build step for the AR studio's 3D assets (OBJ/MTL -> GLB)
+from .compiler import compile_obj
+from .decimate import Simplified, simplify
+from .gltf import GlbBuilder, read_accessor, read_glb
+from .mtl import Material, parse_mtl
+from .obj import ObjMesh, parse_obj
+from .textures import TextureSettings, optimize_textures
+
+__all__ = ['compile_obj', 'GlbBuilder', 'read_accessor', 'read_glb', 'Material', 'parse_mtl', 'ObjMesh', 'parse_obj',
+           'Simplified', 'simplify', 'TextureSettings', 'optimize_textures']
@@ -0,0 +1,341 @@
+"""
+OBJ/MTL -> GLB compiler for the AR studio characters.
+
+three.js' OBJLoader parses the ASCII file on the kiosk's main thread every
+time a character is picked. The compiled GLB is ready to upload: vertices
+are deduplicated, attributes are quantized (KHR_mesh_quantization), every
+material is drawn with a single primitive, and textures are resized,
+atlased and compressed (textures.py) before they are embedded.
+Simplified levels of detail (decimate.py) are written next to it so that
+slow devices can load a lighter mesh.
+"""
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .decimate import Simplified, simplify
+from .gltf import ELEMENT_ARRAY_BUFFER, GlbBuilder, read_accessor, read_glb
+from .mtl import Material, parse_mtl
+from .obj import ObjMesh, parse_obj
+from .textures import TextureSettings, glb_textures, optimize_textures
+
+# Triangle ratios of the simplified levels written next to every GLB
+DEFAULT_LODS = (0.5, 0.25)
+
+
+def weld_corners(mesh: ObjMesh) -> np.ndarray:
+    """
+    Corners with every index replaced by the first index of an identical value.
+
+    Exporters often repeat the same position/uv/normal under new indices
+    (per group or per strip); welding them lets those corners share a vertex.
+    """
+    corners = mesh.corners.copy()
+    for column, array in enumerate((mesh.positions, mesh.uvs, mesh.normals)):
+        if len(array):
+            _, first, inverse = np.unique(array, axis=0, return_index=True, return_inverse=True)
+            canonical = first[inverse.reshape(-1)]
+            given = corners[:, column] >= 0
+            corners[given, column] = canonical[corners[given, column]]
+    return corners
+
+
+def deduplicate(corners: np.ndarray, sizes: List[int]) -> tuple:
+    """
+    Merge identical (position, uv, normal) corners.
+
+    Returns:
+        (unique corners (V, 3) in first-use order, index of every corner into them)
+    """
+    # One int64 key per corner; +1 so that "missing" (-1) maps to 0
+    key = np.zeros(len(corners), dtype=np.int64)
+    for column, size in enumerate(sizes):
+        key = key * (size + 1) + (corners[:, column] + 1)
+    _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+    # Renumber in order of first use: neighbouring triangles share nearby vertices
+    order = np.argsort(first, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return corners[first[order]], rank[inverse.reshape(-1)]
+
+
+def quantize_positions(positions: np.ndarray) -> tuple:
+    """
+    int16 positions in a cube around the mesh.
+
+    Returns:
+        (int16 (V, 3), center, half extent). The node transform scales them
+        back; the scale is uniform so normals stay correct.
+    """
+    lo, hi = positions.min(axis=0), positions.max(axis=0)
+    center = (lo + hi) / 2
+    half = float(max((hi - lo).max() / 2, 1e-9))
+    quantized = np.round((positions - center) / half * 32767).clip(-32767, 32767).astype(np.int16)
+    return quantized, center, half
+
+
+def quantize_normals(normals: np.ndarray) -> np.ndarray:
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    unit = normals / np.where(lengths > 0, lengths, 1)
+    return np.round(unit * 127).clip(-127, 127).astype(np.int8)
+
+
+def gltf_material(builder: GlbBuilder, name: str, material: Optional[Material]) -> Dict[str, Any]:
+    """OBJ/MTL (Phong) material approximated as glTF metallic-roughness."""
+    result: Dict[str, Any] = {'name': name, 'doubleSided': True}
+    pbr: Dict[str, Any] = {'metallicFactor': 0.0}
+    if material is None:
+        pbr['roughnessFactor'] = 1.0
+        result['pbrMetallicRoughness'] = pbr
+        return result
+    pbr['baseColorFactor'] = [*material.diffuse, material.opacity]
+    # Common Phong exponent -> roughness mapping
+    pbr['roughnessFactor'] = float(np.sqrt(2.0 / (material.shininess + 2.0))) if material.shininess is not None else 1.0
+    for key, path in glb_textures(material).items():
+        if key == 'map_Kd':
+            pbr['baseColorTexture'] = {'index': builder.add_texture(path)}
+        else:
+            # map_Bump/bump files of these exports are tangent-space normal maps (*_nmap.png)
+            result['normalTexture'] = {'index': builder.add_texture(path)}
+    if material.opacity < 1.0:
+        result['alphaMode'] = 'BLEND'
+    result['pbrMetallicRoughness'] = pbr
+    return result
+
+
+def load_materials(obj_path: str, mesh: ObjMesh) -> Dict[str, Material]:
+    materials: Dict[str, Material] = {}
+    base_dir = os.path.dirname(obj_path)
+    libraries = mesh.mtllibs or [os.path.splitext(os.path.basename(obj_path))[0] + '.mtl']
+    for library in libraries:
+        path = os.path.join(base_dir, library)
+        if os.path.isfile(path):
+            materials.update(parse_mtl(path))
+    return materials
+
+
+@dataclass
+class MeshBuffers:
+    """Indexed triangle mesh ready for the GPU (one vertex per distinct position/uv/normal)."""
+    positions: np.ndarray            # (V, 3) float32
+    uvs: Optional[np.ndarray]        # (V, 2) float32, OBJ orientation (v up)
+    normals: Optional[np.ndarray]    # (V, 3) float32
+    triangles: np.ndarray            # (F, 3) int64
+    face_material: np.ndarray        # (F,) index into the OBJ's materials
+
+
+def mesh_buffers(mesh: ObjMesh) -> MeshBuffers:
+    vertices, indices = deduplicate(weld_corners(mesh), [len(mesh.positions), len(mesh.uvs), len(mesh.normals)])
+    has_uvs = len(mesh.uvs) > 0 and (vertices[:, 1] >= 0).all()
+    has_normals = len(mesh.normals) > 0 and (vertices[:, 2] >= 0).all()
+    return MeshBuffers(
+        positions=mesh.positions[vertices[:, 0]],
+        uvs=mesh.uvs[vertices[:, 1]] if has_uvs else None,
+        normals=mesh.normals[vertices[:, 2]] if has_normals else None,
+        triangles=indices.reshape(-1, 3),
+        face_material=mesh.face_material
+    )
+
+
+def build_lods(buffers: MeshBuffers, ratios: Sequence[float]) -> List[Tuple[MeshBuffers, Simplified]]:
+    """Simplified copies of ``buffers`` with about ``ratio`` of its triangles each."""
+    attributes = [a for a in (buffers.uvs, buffers.normals) if a is not None]
+    levels = simplify(buffers.positions, buffers.triangles,
+                      [int(len(buffers.triangles) * ratio) for ratio in ratios],
+                      attributes=attributes, face_labels=buffers.face_material)
+    result = []
+    for level in levels:
+        attrs = list(level.attributes)
+        uvs = attrs.pop(0) if buffers.uvs is not None else None
+        normals = attrs.pop(0) if buffers.normals is not None else None
+        if normals is not None:
+            # Interpolated normals are shorter than 1
+            normals = normals / np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+        result.append((MeshBuffers(level.positions, uvs, normals, level.triangles,
+                                   buffers.face_material[level.faces]), level))
+    return result
+
+
+def build_glb(buffers: MeshBuffers, material_names: List[str], materials: Dict[str, Material],
+              quantize: bool = True) -> GlbBuilder:
+    builder = GlbBuilder()
+    positions = buffers.positions
+    node: Dict[str, Any] = {'mesh': 0, 'name': 'model'}
+    attributes: Dict[str, int] = {}
+    if quantize:
+        builder.use_extension('KHR_mesh_quantization', required=True)
+        quantized, center, half = quantize_positions(positions)
+        attributes['POSITION'] = builder.add_accessor(quantized, normalized=True, bounds=True)
+        node['translation'] = [float(x) for x in center]
+        node['scale'] = [half] * 3
+    else:
+        attributes['POSITION'] = builder.add_accessor(positions, bounds=True)
+    if buffers.normals is not None:
+        normals = buffers.normals
+        attributes['NORMAL'] = builder.add_accessor(quantize_normals(normals), normalized=True) if quantize \
+            else builder.add_accessor(normals.astype(np.float32))
+    if buffers.uvs is not None:
+        uvs = buffers.uvs.copy()
+        # OBJ's v axis points up, glTF's points down
+        uvs[:, 1] = 1.0 - uvs[:, 1]
+        if quantize and uvs.min() >= 0.0 and uvs.max() <= 1.0:
+            attributes['TEXCOORD_0'] = builder.add_accessor(np.round(uvs * 65535).astype(np.uint16), normalized=True)
+        else:
+            # Tiled UVs outside [0, 1] can't use normalized integers
+            attributes['TEXCOORD_0'] = builder.add_accessor(uvs.astype(np.float32))
+
+    index_dtype = np.uint16 if len(positions) <= 65535 else np.uint32
+    primitives = []
+    for material_index, name in enumerate(material_names):
+        selected = buffers.triangles[buffers.face_material == material_index]
+        if not len(selected):
+            continue
+        gltf_index = builder.add('materials', gltf_material(builder, name, materials.get(name)))
+        primitives.append({
+            'attributes': attributes,
+            'indices': builder.add_accessor(selected.reshape(-1).astype(index_dtype), target=ELEMENT_ARRAY_BUFFER),
+            'material': gltf_index,
+            'mode': 4
+        })
+    builder.add('meshes', {'name': 'model', 'primitives': primitives})
+    builder.add('nodes', node)
+    builder.gltf['scenes'] = [{'nodes': [0]}]
+    builder.gltf['scene'] = 0
+    return builder
+
+
+def lod_path(glb_path: str, level: int) -> str:
+    """model.glb -> model.lod1.glb (level 0 is the full mesh)."""
+    root, ext = os.path.splitext(glb_path)
+    return glb_path if level == 0 else f"{root}.lod{level}{ext}"
+
+
+def load_glb_geometry(path: str) -> Dict[str, np.ndarray]:
+    """Read every accessor of a compiled GLB, as a loader would (used for timing and checks)."""
+    gltf, binary = read_glb(path)
+    return {str(i): read_accessor(gltf, binary, i) for i in range(len(gltf['accessors']))}
+
+
+def used_textures(materials: Dict[str, Material]) -> Set[str]:
+    """Texture files the GLB embeds (see glb_textures)."""
+    return {path for material in materials.values() for path in glb_textures(material).values()}
+
+
+def dropped_textures(materials: Dict[str, Material]) -> List[str]:
+    """'material: key file' of every referenced texture file the GLB does not embed."""
+    used = used_textures(materials)
+    return sorted({f"{name}: {key} {os.path.basename(path)}" for name, material in materials.items()
+                   for key, path in material.textures.items() if path not in used})
+
+
+def source_requests(obj_path: str, mesh: ObjMesh, materials: Dict[str, Material]) -> Tuple[int, int]:
+    """
+    What loading the raw OBJ in the browser costs.
+
+    Returns:
+        (requests, bytes): the OBJ, its MTL libraries and the texture files the
+        GLB replaces (dropped maps are not counted as savings).
+    """
+    base_dir = os.path.dirname(obj_path)
+    files = {obj_path} | used_textures(materials)
+    files |= {os.path.join(base_dir, library) for library in mesh.mtllibs
+              if os.path.isfile(os.path.join(base_dir, library))}
+    return len(files), sum(os.path.getsize(path) for path in files)
+
+
+def texture_dir(glb_path: str) -> str:
+    """model.glb -> model.textures/ (encoded images and their power-of-two PNG masters)."""
+    return os.path.splitext(glb_path)[0] + '.textures'
+
+
+def compile_obj(obj_path: str, glb_path: str, quantize: bool = True, lods: Sequence[float] = DEFAULT_LODS,
+                textures: Optional[TextureSettings] = TextureSettings()) -> Dict[str, Any]:
+    """
+    Compile one OBJ (and its MTL/textures) into a GLB, plus one simplified
+    GLB per ratio in ``lods`` (model.lod1.glb, model.lod2.glb, ...).
+    ``textures=None`` embeds the original texture files unchanged.
+
+    Returns:
+        report dict: sizes, geometry counts, parse/load/decimation times, LODs.
+    """
+    start = time.perf_counter()
+    mesh = parse_obj(obj_path)
+    parse_seconds = time.perf_counter() - start
+    materials = load_materials(obj_path, mesh)
+    requests_before, source_bytes = source_requests(obj_path, mesh, materials)
+    texture_source_bytes = sum(os.path.getsize(path) for path in used_textures(materials))
+    dropped = dropped_textures(materials)
+
+    buffers = mesh_buffers(mesh)
+    material_names = mesh.materials
+    texture_report: Dict[str, Any] = {'images': [], 'atlases': 0}
+    shutil.rmtree(texture_dir(glb_path), ignore_errors=True)
+    if textures is not None:
+        start = time.perf_counter()
+        result = optimize_textures(buffers.positions, buffers.uvs, buffers.triangles, buffers.face_material,
+                                   material_names, materials, texture_dir(glb_path), textures)
+        source = result.vertex_source
+        buffers = MeshBuffers(buffers.positions[source], result.uvs,
+                              buffers.normals[source] if buffers.normals is not None else None,
+                              result.triangles, result.face_material)
+        material_names, materials, texture_report = result.material_names, result.materials, result.report
+        texture_report['ms'] = round((time.perf_counter() - start) * 1000, 1)
+    builder = build_glb(buffers, material_names, materials, quantize)
+    glb_bytes = builder.write(glb_path)
+
+    start = time.perf_counter()
+    load_glb_geometry(glb_path)
+    load_seconds = time.perf_counter() - start
+
+    levels = [{'level': 0, 'ratio': 1.0, 'path': glb_path, 'bytes': glb_bytes,
+               'triangles': len(buffers.triangles), 'vertices': len(buffers.positions), 'decimate_ms': 0.0}]
+    for level, (lod, simplified) in enumerate(build_lods(buffers, lods) if lods else [], start=1):
+        path = lod_path(glb_path, level)
+        levels.append({
+            'level': level,
+            'ratio': lods[level - 1],
+            'path': path,
+            'bytes': build_glb(lod, material_names, materials, quantize).write(path),
+            'triangles': len(lod.triangles),
+            'vertices': len(lod.positions),
+            'decimate_ms': round(simplified.seconds * 1000, 1)
+        })
+    # Levels left over from a previous run with more ratios
+    stale = len(levels)
+    while os.path.exists(lod_path(glb_path, stale)):
+        os.remove(lod_path(glb_path, stale))
+        stale += 1
+
+    texture_bytes = sum(view['byteLength'] for view in
+                        (builder.gltf['bufferViews'][image['bufferView']] for image in builder.gltf.get('images', [])))
+    missing = sorted({f"{name}: {value}" for name, material in materials.items()
+                      for value in material.missing_textures.values()})
+    return {
+        'source': obj_path,
+        'output': glb_path,
+        'obj_bytes': os.path.getsize(obj_path),
+        'source_bytes': source_bytes,
+        'glb_bytes': glb_bytes,
+        'geometry_bytes': glb_bytes - texture_bytes,
+        'texture_bytes': texture_bytes,
+        'texture_source_bytes': texture_source_bytes,
+        'requests_before': requests_before,
+        'requests_after': 1,
+        'textures': texture_report,
+        'obj_parse_ms': round(parse_seconds * 1000, 1),
+        'glb_load_ms': round(load_seconds * 1000, 1),
+        'missing_textures': missing,
+        'dropped_textures': dropped,
+        'positions': len(mesh.positions),
+        'corners': len(mesh.corners),
+        'vertices': len(buffers.positions),
+        'triangles': len(buffers.triangles),
+        'draws_before': mesh.material_runs,
+        'draws_after': len(builder.gltf['meshes'][0]['primitives']),
+        'quantized': quantize,
+        'lods': levels
+    }
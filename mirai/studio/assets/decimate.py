@@ -0,0 +1,368 @@
+"""
+Quadric-error edge-collapse simplification (Garland & Heckbert), in numpy.
+
+Instead of a priority queue collapsing one edge at a time, every pass
+rebuilds the edge/adjacency arrays, scores all edges at once and collapses
+a batch of cheap edges that are independent: no endpoint of another chosen
+edge lies in the 1-ring of either endpoint. Independent collapses touch
+disjoint triangles, so the fold-over and link-condition checks of each
+collapse stay exact while the whole batch is applied with array operations.
+
+Collapses run on welded positions; the attribute vertices (uv, normal) of
+a position follow it. Borders, UV seams and material boundaries are
+special edges: a vertex on exactly one chain of them only slides along it
+(half-edge collapse onto a chain neighbour), with extra quadric planes
+keeping the chain's shape, so seams stay closed and outlines don't shrink.
+Corners where chains meet and non-manifold vertices are locked.
+"""
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# A collapse is rejected when a triangle's normal turns by more than ~78 degrees
+FOLD_OVER_COSINE = 0.2
+MAX_PASSES = 500
+# Weight of the planes that keep borders, seams and material boundaries in place
+BORDER_WEIGHT = 10.0
+
+
+@dataclass
+class Simplified:
+    positions: np.ndarray          # (V, 3) float32, unreferenced vertices removed
+    triangles: np.ndarray          # (F, 3) int64
+    attributes: List[np.ndarray]   # per-vertex arrays, same order as given
+    faces: np.ndarray              # (F,) index of the source triangle each one comes from
+    collapses: int
+    passes: int
+    seconds: float                 # since the start of simplify(), cumulative over levels
+
+
+def _unique_edges(triangles: np.ndarray, count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Undirected edges (E, 2) with a < b, plus the number of triangles on each."""
+    edges = np.sort(triangles[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    keys, faces = np.unique(edges[:, 0] * count + edges[:, 1], return_counts=True)
+    return np.stack(np.divmod(keys, count), axis=1), faces
+
+
+def _degenerate(triangles: np.ndarray) -> np.ndarray:
+    return (triangles[:, 0] == triangles[:, 1]) | (triangles[:, 1] == triangles[:, 2]) | \
+        (triangles[:, 0] == triangles[:, 2])
+
+
+def face_quadrics(positions: np.ndarray, triangles: np.ndarray) -> np.ndarray:
+    """(F, 4, 4) area-weighted plane quadrics."""
+    a, b, c = (positions[triangles[:, k]] for k in range(3))
+    normal = np.cross(b - a, c - a)
+    double_area = np.linalg.norm(normal, axis=1)
+    unit = normal / np.where(double_area > 0, double_area, 1)[:, None]
+    plane = np.concatenate([unit, -np.einsum('ij,ij->i', unit, a)[:, None]], axis=1)
+    return 0.5 * double_area[:, None, None] * plane[:, :, None] * plane[:, None, :]
+
+
+def vertex_quadrics(positions: np.ndarray, triangles: np.ndarray) -> np.ndarray:
+    """(V, 4, 4) sum of the quadrics of the triangles around every vertex."""
+    quadrics = face_quadrics(positions, triangles).reshape(-1, 16)
+    corners = triangles.reshape(-1)
+    per_corner = np.repeat(quadrics, 3, axis=0)
+    out = np.stack([np.bincount(corners, weights=per_corner[:, i], minlength=len(positions))
+                    for i in range(16)], axis=1)
+    return out.reshape(-1, 4, 4)
+
+
+def _error(quadrics: np.ndarray, points: np.ndarray) -> np.ndarray:
+    homogeneous = np.concatenate([points, np.ones((len(points), 1))], axis=1)
+    return np.maximum(np.einsum('ei,eij,ej->e', homogeneous, quadrics, homogeneous), 0.0)
+
+
+def _placement(quadrics: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Point minimizing the quadric error; the best of a, b, midpoint when that is ill-conditioned or far off."""
+    candidates = np.stack([a, b, (a + b) / 2], axis=1)
+    errors = np.stack([_error(quadrics, candidates[:, k]) for k in range(3)], axis=1)
+    best = candidates[np.arange(len(a)), errors.argmin(axis=1)]
+    system = quadrics[:, :3, :3]
+    solvable = np.abs(np.linalg.det(system)) > 1e-12
+    if solvable.any():
+        optimal = np.linalg.solve(system[solvable], -quadrics[solvable, :3, 3:])[:, :, 0]
+        # Keep the solution only near the edge (long thin quadrics can throw it far away)
+        length = np.linalg.norm(a[solvable] - b[solvable], axis=1)
+        near = np.linalg.norm(optimal - (a[solvable] + b[solvable]) / 2, axis=1) <= length
+        chosen = np.flatnonzero(solvable)[near]
+        best[chosen] = optimal[near]
+    return best
+
+
+@dataclass
+class _Topology:
+    edges: np.ndarray          # (E, 2) position edges, a < b
+    faces: np.ndarray          # (E,) triangles on each edge
+    first_face: np.ndarray     # (E,) one triangle on each edge
+    special: np.ndarray        # (E,) border, seam, material boundary or non-manifold
+    attribute_edges: np.ndarray  # (A, 2) attribute vertex edges, both directions
+    interior: np.ndarray       # (W,) may move anywhere
+    simple: np.ndarray         # (W,) on exactly two special edges: may slide along them
+    used: np.ndarray           # attribute vertices referenced by a triangle
+
+
+def _topology(tris: np.ndarray, weld: np.ndarray, weld_count: int, labels: np.ndarray,
+              fixed: np.ndarray) -> _Topology:
+    count = len(weld)
+    half = tris[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2)
+    half_face = np.repeat(np.arange(len(tris)), 3)
+    half_weld = np.sort(weld[half], axis=1)
+    keys, first, inverse, faces = np.unique(half_weld[:, 0] * weld_count + half_weld[:, 1],
+                                            return_index=True, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    edges = np.stack(np.divmod(keys, weld_count), axis=1)
+
+    # A position edge carried by two different attribute edges is a UV / normal seam
+    half_attr = np.sort(half, axis=1)
+    attr_keys, attr_first = np.unique(half_attr[:, 0] * count + half_attr[:, 1], return_index=True)
+    seam = np.bincount(inverse[attr_first], minlength=len(keys)) > 1
+    low = np.full(len(keys), np.iinfo(np.int64).max)
+    high = np.full(len(keys), np.iinfo(np.int64).min)
+    np.minimum.at(low, inverse, labels[half_face])
+    np.maximum.at(high, inverse, labels[half_face])
+    special = (faces != 2) | seam | (low != high)
+
+    degree = np.bincount(edges[special].reshape(-1), minlength=weld_count)
+    used = np.unique(tris)
+    copies = np.bincount(weld[used], minlength=weld_count)
+    locked = fixed | (degree == 1) | (degree > 2) | ((copies > 1) & (degree == 0))
+    locked[edges[faces > 2].reshape(-1)] = True
+    attribute_edges = np.stack(np.divmod(attr_keys, count), axis=1)
+    return _Topology(
+        edges=edges,
+        faces=faces,
+        first_face=half_face[first],
+        special=special,
+        attribute_edges=np.concatenate([attribute_edges, attribute_edges[:, ::-1]]),
+        interior=(degree == 0) & ~locked,
+        simple=(degree == 2) & ~locked,
+        used=used
+    )
+
+
+def _edge_quadrics(positions: np.ndarray, tris: np.ndarray, topology: _Topology, weight: float) -> np.ndarray:
+    """Quadrics of planes through every special edge, perpendicular to its triangle (keep outlines and seams in place)."""
+    edges = topology.edges[topology.special]
+    tri = tris[topology.first_face[topology.special]]
+    a, b = positions[edges[:, 0]], positions[edges[:, 1]]
+    face_normal = np.cross(positions[tri[:, 1]] - positions[tri[:, 0]], positions[tri[:, 2]] - positions[tri[:, 0]])
+    normal = np.cross(b - a, face_normal)
+    length = np.linalg.norm(normal, axis=1)
+    normal = normal / np.where(length > 0, length, 1)[:, None]
+    plane = np.concatenate([normal, -np.einsum('ij,ij->i', normal, a)[:, None]], axis=1)
+    edge_length = np.linalg.norm(b - a, axis=1)
+    quadrics = (weight * edge_length ** 2)[:, None, None] * plane[:, :, None] * plane[:, None, :]
+    out = np.zeros((len(positions), 4, 4))
+    np.add.at(out, edges[:, 0], quadrics)
+    np.add.at(out, edges[:, 1], quadrics)
+    return out
+
+
+def _link_condition(topology: _Topology, collapse_edges: np.ndarray, weld_count: int) -> np.ndarray:
+    """
+    True for the edges whose endpoints share exactly as many neighbours
+    as triangles (otherwise the collapse pinches the surface).
+    """
+    edges = topology.edges
+    both = np.concatenate([edges, edges[:, ::-1]])
+    both = both[np.argsort(both[:, 0], kind='stable')]
+    offsets = np.searchsorted(both[:, 0], np.arange(weld_count + 1))
+    ends = edges[collapse_edges]
+    degrees = (offsets[ends + 1] - offsets[ends]).reshape(-1)
+    starts = np.repeat(offsets[ends].reshape(-1), degrees)
+    within = np.arange(len(starts)) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+    owners = np.repeat(np.arange(len(collapse_edges)), degrees.reshape(-1, 2).sum(axis=1))
+    unique, counts = np.unique(owners * weld_count + both[starts + within, 1], return_counts=True)
+    shared = np.bincount(unique[counts > 1] // weld_count, minlength=len(collapse_edges))
+    return shared == topology.faces[collapse_edges]
+
+
+def weld_positions(positions: np.ndarray) -> np.ndarray:
+    """Index of every vertex's position among the distinct positions."""
+    if not len(positions):
+        return np.zeros(0, dtype=np.int64)
+    _, inverse = np.unique(positions, axis=0, return_inverse=True)
+    return inverse.reshape(-1).astype(np.int64)
+
+
+class _Simplifier:
+    """Mesh state between collapse passes (positions are tracked per welded position)."""
+
+    def __init__(self, positions, triangles, attributes, face_labels, locked):
+        self.pos = positions.astype(np.float64)
+        self.attrs = [np.asarray(a, dtype=np.float64).copy() for a in attributes]
+        self.tris = triangles.astype(np.int64)
+        self.labels = np.zeros(len(self.tris), dtype=np.int64) if face_labels is None \
+            else face_labels.astype(np.int64)
+        self.count = len(self.pos)
+        self.weld = weld_positions(self.pos)
+        self.weld_count = int(self.weld.max()) + 1 if self.count else 0
+        self.fixed = np.zeros(self.weld_count, dtype=bool)
+        if locked is not None:
+            self.fixed[self.weld[locked]] = True
+        self.weld_pos = np.zeros((self.weld_count, 3))
+        self.weld_pos[self.weld] = self.pos
+        self.quadrics = vertex_quadrics(self.weld_pos, self.weld[self.tris])
+        self.faces = np.arange(len(self.tris))
+        self.blocked = np.zeros(0, dtype=np.int64)
+        self.collapses = self.passes = 0
+
+    def _block(self, r: np.ndarray, w: np.ndarray) -> None:
+        """Rejected collapses (fold-over, link condition, ambiguous seam) are not retried."""
+        self.blocked = np.union1d(self.blocked, r * self.weld_count + w)
+
+    def collapse_pass(self, target_triangles: int) -> bool:
+        """One batch of independent collapses; False when no edge can collapse any more."""
+        weld, weld_count, count, pos = self.weld, self.weld_count, self.count, self.pos
+        topology = _topology(self.tris, weld, weld_count, self.labels, self.fixed)
+        if self.passes == 0:
+            self.quadrics += _edge_quadrics(self.weld_pos, weld[self.tris], topology, BORDER_WEIGHT)
+        self.passes += 1
+
+        # Every edge in both directions: r is removed, w stays
+        edge_ids = np.arange(len(topology.edges))
+        r = np.concatenate([topology.edges[:, 0], topology.edges[:, 1]])
+        w = np.concatenate([topology.edges[:, 1], topology.edges[:, 0]])
+        ids = np.concatenate([edge_ids, edge_ids])
+        full = topology.interior[r] & topology.interior[w]
+        valid = (full & (r < w)) | (topology.interior[r] & ~topology.interior[w]) | \
+            (topology.simple[r] & topology.special[ids])
+        valid &= ~np.isin(r * weld_count + w, self.blocked)
+        r, w, ids, full = r[valid], w[valid], ids[valid], full[valid]
+        edge_quadrics = self.quadrics[r] + self.quadrics[w]
+        point = self.weld_pos[w].copy()
+        if full.any():
+            point[full] = _placement(edge_quadrics[full], self.weld_pos[r[full]], self.weld_pos[w[full]])
+        cost = _error(edge_quadrics, point)
+        # Cheapest direction of every edge
+        order = np.lexsort((cost, ids))
+        order = order[np.concatenate(([True], ids[order][1:] != ids[order][:-1]))]
+        r, w, ids, full, point, cost = r[order], w[order], ids[order], full[order], point[order], cost[order]
+
+        # Candidates: the cheapest edges, about as many as collapses still needed
+        needed = max(1, (len(self.tris) - target_triangles + 1) // 2)
+        order = np.argsort(cost, kind='stable')[:needed]
+        if not len(order):
+            return False
+        rank = np.full(len(cost), len(cost), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        # Independent set: a collapse wins if it has the lowest rank in the 1-ring of both endpoints
+        best = np.full(weld_count, len(cost), dtype=np.int64)
+        np.minimum.at(best, r, rank)
+        np.minimum.at(best, w, rank)
+        ring = best.copy()
+        np.minimum.at(ring, topology.edges[:, 0], best[topology.edges[:, 1]])
+        np.minimum.at(ring, topology.edges[:, 1], best[topology.edges[:, 0]])
+        selected = order[(ring[r[order]] == rank[order]) & (ring[w[order]] == rank[order])]
+        linked = _link_condition(topology, ids[selected], weld_count)
+        self._block(r[selected[~linked]], w[selected[~linked]])
+        selected = selected[linked]
+        if not len(selected):
+            return True
+        r, w, full, point = r[selected], w[selected], full[selected], point[selected]
+        used = topology.used
+
+        # Every copy of r must map to exactly one copy of w it shares an edge with
+        collapse_of = np.full(weld_count, -1, dtype=np.int64)
+        collapse_of[r] = np.arange(len(r))
+        source, dest = topology.attribute_edges[:, 0], topology.attribute_edges[:, 1]
+        owner = collapse_of[weld[source]]
+        match = (owner >= 0) & (weld[dest] == w[np.maximum(owner, 0)])
+        matches = np.bincount(source[match], minlength=count)
+        copies = used[collapse_of[weld[used]] >= 0]
+        accepted = np.ones(len(r), dtype=bool)
+        accepted[collapse_of[weld[copies[matches[copies] != 1]]]] = False
+        remap = np.arange(count)
+        remap[source[match]] = dest[match]
+
+        # Moving vertices: the copies of r, and the copy of w for full collapses
+        single = np.full(weld_count, -1, dtype=np.int64)
+        single[weld[used]] = used
+        moving = np.full(count, -1, dtype=np.int64)
+        moving[copies] = collapse_of[weld[copies]]
+        moving[single[w[full]]] = np.flatnonzero(full)
+        # Fold-over check on the triangles that move and survive
+        tri_owner = moving[self.tris].max(axis=1)
+        check = np.flatnonzero((tri_owner >= 0) & ~_degenerate(weld[remap[self.tris]]))
+        if len(check):
+            corners = pos[self.tris[check]]
+            moved = corners.copy()
+            mover = moving[self.tris[check]]
+            moved[mover >= 0] = point[mover[mover >= 0]]
+            before = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+            after = np.cross(moved[:, 1] - moved[:, 0], moved[:, 2] - moved[:, 0])
+            flipped = np.einsum('ij,ij->i', before, after) <= \
+                FOLD_OVER_COSINE * np.linalg.norm(before, axis=1) * np.linalg.norm(after, axis=1)
+            accepted[tri_owner[check[flipped]]] = False
+        self._block(r[~accepted], w[~accepted])
+        if not accepted.any():
+            return True
+        rejected = copies[~accepted[collapse_of[weld[copies]]]]
+        remap[rejected] = rejected
+        r, w, full, point = r[accepted], w[accepted], full[accepted], point[accepted]
+
+        # Full collapses: the copy of w moves to the optimal point, attributes follow
+        keep, drop = single[w[full]], single[r[full]]
+        if len(keep):
+            span = pos[drop] - pos[keep]
+            t = np.einsum('ij,ij->i', point[full] - pos[keep], span) / \
+                np.maximum(np.einsum('ij,ij->i', span, span), 1e-30)
+            t = np.clip(t, 0.0, 1.0)[:, None]
+            for attr in self.attrs:
+                attr[keep] = attr[keep] + (attr[drop] - attr[keep]) * t
+            pos[keep] = point[full]
+            self.weld_pos[w[full]] = point[full]
+        self.quadrics[w] += self.quadrics[r]
+        tris = remap[self.tris]
+        alive = ~_degenerate(weld[tris])
+        self.tris, self.faces, self.labels = tris[alive], self.faces[alive], self.labels[alive]
+        self.collapses += len(r)
+        return True
+
+    def snapshot(self, seconds: float) -> Simplified:
+        used = np.unique(self.tris)
+        compact = np.full(self.count, -1, dtype=np.int64)
+        compact[used] = np.arange(len(used))
+        return Simplified(
+            positions=self.pos[used].astype(np.float32),
+            triangles=compact[self.tris],
+            attributes=[attr[used].astype(np.float32) for attr in self.attrs],
+            faces=self.faces,
+            collapses=self.collapses,
+            passes=self.passes,
+            seconds=seconds
+        )
+
+
+def simplify(positions: np.ndarray, triangles: np.ndarray, targets: Sequence[int],
+             attributes: Sequence[np.ndarray] = (), face_labels: Optional[np.ndarray] = None,
+             locked: Optional[np.ndarray] = None) -> List[Simplified]:
+    """
+    Collapse edges down to each of the ``targets`` triangle counts in turn;
+    a level stops early when no edge can collapse any more.
+
+    Args:
+        positions: (V, 3) vertex positions; vertices at the same position are
+            copies split by their attributes.
+        triangles: (F, 3) vertex indices.
+        targets: triangle counts, one result per entry.
+        attributes: per-vertex arrays (uvs, normals) interpolated along collapses.
+        face_labels: (F,) e.g. material of every triangle; label boundaries are kept.
+        locked: (V,) vertices that must not move.
+
+    Returns:
+        one Simplified per target, in the order of ``targets``.
+    """
+    start = time.perf_counter()
+    simplifier = _Simplifier(positions, triangles, attributes, face_labels, locked)
+    levels: Dict[int, Simplified] = {}
+    for target in sorted(set(targets), reverse=True):
+        while len(simplifier.tris) > target and simplifier.passes < MAX_PASSES:
+            if not simplifier.collapse_pass(target):
+                break
+        levels[target] = simplifier.snapshot(time.perf_counter() - start)
+    return [levels[target] for target in targets]
@@ -0,0 +1,265 @@
+"""
+Content-hashed copies of the static files, with gzip/brotli variants.
+
+``python manage.py fingerprint_assets`` copies every file the staticfiles
+finders see (3d/, studio/static/, ...) to STUDIO_ASSETS_ROOT as
+``name.<sha256[:12]>.ext``. For text-like formats (OBJ, MTL, JS, GLB, ...) it
+also writes ``.gz`` and ``.br`` copies when they save at least MIN_SAVING.
+manifest.json maps every logical name to its hashed file.
+
+The ``{% asset %}`` tag (templatetags/studio_assets.py) turns a logical
+name into the hashed URL, served by ``asset_response``: the hashed name never
+changes content, so it is cached for a year as immutable, in the smallest
+encoding the browser accepts. Logical names are served too, with no-cache
+and an ETag, so relative references (url() in CSS) keep working.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.templatetags.static import static
+from django.urls import reverse
+
+try:
+    import brotli
+except ImportError:
+    # Optional (pip install brotli): without it only gzip copies are written
+    brotli = None
+
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+# collectstatic's defaults, plus the PNG masters compile_assets keeps next to each GLB
+IGNORE_PATTERNS = ['CVS', '.*', '*~', '*.textures']
+# Formats worth compressing; PNG/JPEG/WebP/woff2 are compressed already
+COMPRESSIBLE_EXTENSIONS = {'.obj', '.mtl', '.glb', '.gltf', '.fbx', '.js', '.mjs', '.css', '.json', '.svg',
+                           '.html', '.txt', '.map', '.wasm', '.ttf', '.eot'}
+# A compressed copy is kept only if it is at least this much smaller
+MIN_SAVING = 0.05
+# Preferred first when the browser accepts several
+ENCODINGS = ('br', 'gzip')
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+CONTENT_TYPES = {
+    '.glb': 'model/gltf-binary', '.gltf': 'model/gltf+json', '.obj': 'text/plain; charset=utf-8',
+    '.mtl': 'text/plain; charset=utf-8', '.fbx': 'application/octet-stream', '.webp': 'image/webp',
+    '.js': 'text/javascript; charset=utf-8', '.mjs': 'text/javascript; charset=utf-8',
+    '.json': 'application/json', '.wasm': 'application/wasm'
+}
+
+
+def assets_root() -> str:
+    return str(getattr(settings, 'STUDIO_ASSETS_ROOT', settings.BASE_DIR / 'build' / 'assets'))
+
+
+def file_digest(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def hashed_name(name: str, digest: str) -> str:
+    """'reva/reva.glb' -> 'reva/reva.<digest[:12]>.glb'"""
+    root, ext = os.path.splitext(name)
+    return f"{root}.{digest[:HASH_LENGTH]}{ext}"
+
+
+def content_type(name: str) -> str:
+    ext = os.path.splitext(name)[1].lower()
+    return CONTENT_TYPES.get(ext) or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def static_files() -> Dict[str, str]:
+    """Logical name -> absolute path of every file the staticfiles finders list (first finder wins)."""
+    from django.contrib.staticfiles.finders import get_finders
+
+    files: Dict[str, str] = {}
+    for finder in get_finders():
+        for relative, storage in finder.list(IGNORE_PATTERNS):
+            name = relative.replace(os.sep, '/')
+            prefix = getattr(storage, 'prefix', None)
+            if prefix:
+                name = f"{prefix}/{name}"
+            files.setdefault(name, storage.path(relative))
+    return files
+
+
+def _compress(path: str, encoding: str) -> Optional[int]:
+    """Write path.gz / path.br; returns its size, or None when it isn't worth keeping."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=11)
+    else:
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) > len(data) * (1 - MIN_SAVING):
+        return None
+    target = path + ENCODING_SUFFIXES[encoding]
+    with open(target + '.tmp', 'wb') as f:
+        f.write(compressed)
+    os.replace(target + '.tmp', target)
+    return len(compressed)
+
+
+def build(files: Dict[str, str], root: str, workers: int = os.cpu_count() or 1,
+          prune: bool = True) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Copy ``files`` (logical name -> path) under ``root`` by content hash and write manifest.json.
+
+    Files already present under their hashed name are content-identical and
+    are not copied or compressed again. With ``prune``, hashed files of
+    earlier builds that are no longer in the manifest are deleted.
+
+    Returns:
+        (manifest, counters: files, copied, compressed, pruned)
+    """
+    old = load_manifest(root)
+    encodings = [e for e in ENCODINGS if e != 'br' or brotli is not None]
+
+    def process(item: Tuple[str, str]) -> Tuple[str, str, Dict[str, Any], int, int]:
+        name, path = item
+        hashed = hashed_name(name, file_digest(path))
+        target = os.path.join(root, hashed)
+        entry = {'source': name, 'bytes': os.path.getsize(path), 'content_type': content_type(name), 'encodings': {}}
+        previous = old['files'].get(hashed) if old else None
+        if previous and os.path.exists(target) and all(
+                os.path.exists(target + ENCODING_SUFFIXES[e]) for e in previous['encodings']):
+            entry['encodings'] = previous['encodings']
+            return name, hashed, entry, 0, 0
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(path, target + '.tmp')
+        os.replace(target + '.tmp', target)
+        compressed = 0
+        if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            for encoding in encodings:
+                size = _compress(target, encoding)
+                if size is not None:
+                    entry['encodings'][encoding] = size
+                    compressed += 1
+        return name, hashed, entry, 1, compressed
+
+    manifest: Dict[str, Any] = {'version': 1, 'paths': {}, 'files': {}}
+    counters = {'files': len(files), 'copied': 0, 'compressed': 0, 'pruned': 0}
+    # zlib, brotli and file I/O release the GIL
+    with ThreadPoolExecutor(max(1, workers)) as pool:
+        for name, hashed, entry, copied, compressed in pool.map(process, sorted(files.items())):
+            manifest['paths'][name] = hashed
+            manifest['files'][hashed] = entry
+            counters['copied'] += copied
+            counters['compressed'] += compressed
+
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+    if prune:
+        keep = {os.path.normpath(os.path.join(root, MANIFEST_NAME))}
+        for hashed, entry in manifest['files'].items():
+            target = os.path.normpath(os.path.join(root, hashed))
+            keep.add(target)
+            keep.update(target + ENCODING_SUFFIXES[e] for e in entry['encodings'])
+        for directory, _, names in os.walk(root):
+            for file_name in names:
+                full = os.path.normpath(os.path.join(directory, file_name))
+                if full not in keep:
+                    os.remove(full)
+                    counters['pruned'] += 1
+    return manifest, counters
+
+
+_cache: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+
+
+def load_manifest(root: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    The manifest under ``root`` (default STUDIO_ASSETS_ROOT), or None if there is no build.
+
+    Re-read whenever the file changes, so a rebuild needs no server restart.
+    """
+    path = os.path.join(root or assets_root(), MANIFEST_NAME)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    _cache[path] = (mtime, manifest)
+    return manifest
+
+
+def asset_url(name: str) -> str:
+    """Hashed URL of a static file; the plain static URL when it hasn't been fingerprinted."""
+    manifest = load_manifest()
+    hashed = manifest['paths'].get(name) if manifest else None
+    if hashed is None:
+        return static(name)
+    return reverse('asset', kwargs={'path': hashed})
+
+
+def asset_urls(prefix: str = '', exclude: str = '') -> Dict[str, str]:
+    """Logical name -> hashed URL of every fingerprinted file under ``prefix`` (minus those under ``exclude``)."""
+    manifest = load_manifest()
+    if not manifest:
+        return {}
+    return {name: reverse('asset', kwargs={'path': hashed}) for name, hashed in manifest['paths'].items()
+            if name.startswith(prefix) and not (exclude and name.startswith(exclude))}
+
+
+def assets_prefix() -> str:
+    """URL the fingerprinted files are served under, e.g. /studio/assets/"""
+    return reverse('asset', kwargs={'path': MANIFEST_NAME})[:-len(MANIFEST_NAME)]
+
+
+def _accepted(request, available: Iterable[str]) -> Optional[str]:
+    accepted = {part.split(';')[0].strip().lower()
+                for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')}
+    return next((e for e in ENCODINGS if e in available and e in accepted), None)
+
+
+def asset_response(request, path: str):
+    """
+    Serve a fingerprinted file (hashed or logical name) from STUDIO_ASSETS_ROOT.
+
+    Raises:
+        Http404: unknown name or no build.
+    """
+    manifest = load_manifest()
+    if manifest is None:
+        raise Http404("Assets have not been fingerprinted (python manage.py fingerprint_assets)")
+    immutable = path in manifest['files']
+    hashed = path if immutable else manifest['paths'].get(path)
+    if hashed is None:
+        raise Http404(path)
+    entry = manifest['files'][hashed]
+    encoding = _accepted(request, entry['encodings'])
+    etag = f'"{hashed.rsplit("/", 1)[-1]}{"-" + encoding if encoding else ""}"'
+
+    headers = {
+        'Cache-Control': IMMUTABLE if immutable else 'no-cache',
+        'Vary': 'Accept-Encoding',
+        'ETag': etag
+    }
+    if etag in (tag.strip() for tag in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')):
+        response = HttpResponseNotModified()
+    else:
+        file_path = os.path.join(assets_root(), hashed) + (ENCODING_SUFFIXES[encoding] if encoding else '')
+        response = FileResponse(open(file_path, 'rb'), content_type=entry['content_type'],
+                                filename=os.path.basename(hashed))
+        if encoding:
+            response['Content-Encoding'] = encoding
+    for key, value in headers.items():
+        response[key] = value
+    return response
@@ -0,0 +1,199 @@
+"""Minimal binary glTF 2.0 (GLB) writer and reader."""
+import json
+import os
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+GLB_MAGIC = b'glTF'
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+# glTF componentType codes
+BYTE = 5120
+UNSIGNED_BYTE = 5121
+SHORT = 5122
+UNSIGNED_SHORT = 5123
+UNSIGNED_INT = 5125
+FLOAT = 5126
+
+COMPONENT_DTYPES = {
+    BYTE: np.int8, UNSIGNED_BYTE: np.uint8, SHORT: np.int16,
+    UNSIGNED_SHORT: np.uint16, UNSIGNED_INT: np.uint32, FLOAT: np.float32
+}
+DTYPE_COMPONENTS = {np.dtype(v): k for k, v in COMPONENT_DTYPES.items()}
+TYPE_SIZES = {'SCALAR': 1, 'VEC2': 2, 'VEC3': 3, 'VEC4': 4}
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+IMAGE_MIME_TYPES = {'.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.webp': 'image/webp'}
+
+
+def _pad(data: bytes, fill: bytes) -> bytes:
+    return data + fill * (-len(data) % 4)
+
+
+class GlbBuilder:
+    """Collects glTF JSON and one binary buffer, then serializes them as GLB."""
+
+    def __init__(self, generator: str = 'mirai compile_assets'):
+        self.gltf: Dict[str, Any] = {
+            'asset': {'version': '2.0', 'generator': generator},
+            'buffers': [], 'bufferViews': [], 'accessors': []
+        }
+        self.bin = bytearray()
+        self._images: Dict[str, int] = {}
+
+    def _append(self, key: str, item: Dict[str, Any]) -> int:
+        items = self.gltf.setdefault(key, [])
+        items.append(item)
+        return len(items) - 1
+
+    def use_extension(self, name: str, required: bool = False) -> None:
+        used = self.gltf.setdefault('extensionsUsed', [])
+        if name not in used:
+            used.append(name)
+        if required:
+            needed = self.gltf.setdefault('extensionsRequired', [])
+            if name not in needed:
+                needed.append(name)
+
+    def add_buffer_view(self, data: bytes, target: Optional[int] = None, byte_stride: Optional[int] = None) -> int:
+        self.bin.extend(b'\0' * (-len(self.bin) % 4))
+        view: Dict[str, Any] = {'buffer': 0, 'byteOffset': len(self.bin), 'byteLength': len(data)}
+        if target is not None:
+            view['target'] = target
+        if byte_stride is not None:
+            view['byteStride'] = byte_stride
+        self.bin.extend(data)
+        return self._append('bufferViews', view)
+
+    def add_accessor(self, array: np.ndarray, normalized: bool = False, target: Optional[int] = ARRAY_BUFFER,
+                     bounds: bool = False) -> int:
+        """
+        Store ``array`` ((count,) or (count, n)) in its own buffer view.
+
+        Vertex attributes are padded so that every element starts on a
+        4-byte boundary, as the spec requires for byteStride.
+        """
+        array = np.ascontiguousarray(array)
+        count = len(array)
+        width = 1 if array.ndim == 1 else array.shape[1]
+        element = array.dtype.itemsize * width
+        stride = None
+        data = array.tobytes()
+        if target == ARRAY_BUFFER and element % 4:
+            stride = element + (-element % 4)
+            padded = np.zeros((count, stride), dtype=np.uint8)
+            padded[:, :element] = array.reshape(count, -1).view(np.uint8)
+            data = padded.tobytes()
+        accessor: Dict[str, Any] = {
+            'bufferView': self.add_buffer_view(data, target, stride),
+            'componentType': DTYPE_COMPONENTS[array.dtype],
+            'count': count,
+            'type': 'SCALAR' if width == 1 else f'VEC{width}'
+        }
+        if normalized:
+            accessor['normalized'] = True
+        if bounds and count:
+            flat = array.reshape(count, -1)
+            cast = float if array.dtype.kind == 'f' else int
+            accessor['min'] = [cast(x) for x in flat.min(axis=0)]
+            accessor['max'] = [cast(x) for x in flat.max(axis=0)]
+        return self._append('accessors', accessor)
+
+    def add_image(self, path: str) -> int:
+        """Embed an image file in the binary chunk (each file only once)."""
+        path = os.path.abspath(path)
+        if path in self._images:
+            return self._images[path]
+        with open(path, 'rb') as f:
+            data = f.read()
+        mime = IMAGE_MIME_TYPES.get(os.path.splitext(path)[1].lower(), 'image/png')
+        index = self._append('images', {'bufferView': self.add_buffer_view(data), 'mimeType': mime})
+        self._images[path] = index
+        return index
+
+    def add_texture(self, path: str, sampler: int = 0) -> int:
+        if not self.gltf.get('samplers'):
+            # Repeat + trilinear filtering, the three.js defaults
+            self.gltf['samplers'] = [{'magFilter': 9729, 'minFilter': 9987, 'wrapS': 10497, 'wrapT': 10497}]
+        image = self.add_image(path)
+        if self.gltf['images'][image]['mimeType'] == 'image/webp':
+            # glTF core only allows PNG/JPEG sources
+            self.use_extension('EXT_texture_webp', required=True)
+            return self._append('textures', {'sampler': sampler, 'extensions': {'EXT_texture_webp': {'source': image}}})
+        return self._append('textures', {'sampler': sampler, 'source': image})
+
+    def add(self, key: str, item: Dict[str, Any]) -> int:
+        return self._append(key, item)
+
+    def to_bytes(self) -> bytes:
+        self.gltf['buffers'] = [{'byteLength': len(self.bin)}]
+        json_chunk = _pad(json.dumps(self.gltf, separators=(',', ':')).encode('utf-8'), b' ')
+        bin_chunk = _pad(bytes(self.bin), b'\0')
+        length = 12 + 8 + len(json_chunk) + 8 + len(bin_chunk)
+        return b''.join([
+            struct.pack('<4sII', GLB_MAGIC, 2, length),
+            struct.pack('<II', len(json_chunk), CHUNK_JSON), json_chunk,
+            struct.pack('<II', len(bin_chunk), CHUNK_BIN), bin_chunk
+        ])
+
+    def write(self, path: str) -> int:
+        """Write the GLB atomically; returns its size in bytes."""
+        data = self.to_bytes()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return len(data)
+
+
+def read_glb(path: str) -> Tuple[Dict[str, Any], memoryview]:
+    """
+    Read a GLB file.
+
+    Returns:
+        (glTF JSON, binary chunk)
+
+    Raises:
+        ValueError: not a GLB 2.0 file.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, length = struct.unpack_from('<4sII', data, 0)
+    if magic != GLB_MAGIC or version != 2:
+        raise ValueError(f"{path} is not a GLB 2.0 file")
+    json_length, _ = struct.unpack_from('<II', data, 12)
+    gltf = json.loads(data[20:20 + json_length])
+    offset = 20 + json_length
+    binary = memoryview(b'')
+    if offset < length:
+        bin_length, _ = struct.unpack_from('<II', data, offset)
+        binary = memoryview(data)[offset + 8:offset + 8 + bin_length]
+    return gltf, binary
+
+
+def read_accessor(gltf: Dict[str, Any], binary: memoryview, index: int, dequantize: bool = True) -> np.ndarray:
+    """
+    An accessor as a numpy array (zero-copy unless the view is strided).
+
+    With ``dequantize``, normalized integers are mapped to floats in [-1, 1] / [0, 1].
+    """
+    accessor = gltf['accessors'][index]
+    view = gltf['bufferViews'][accessor['bufferView']]
+    dtype = np.dtype(COMPONENT_DTYPES[accessor['componentType']])
+    width = TYPE_SIZES[accessor['type']]
+    count = accessor['count']
+    start = view.get('byteOffset', 0) + accessor.get('byteOffset', 0)
+    stride = view.get('byteStride', dtype.itemsize * width)
+    raw = np.frombuffer(binary, dtype=np.uint8, count=stride * count, offset=start).reshape(count, stride)
+    array = raw[:, :dtype.itemsize * width].copy().view(dtype) if stride != dtype.itemsize * width \
+        else raw.view(dtype)
+    array = array.reshape(count, width) if width > 1 else array.reshape(count)
+    if dequantize and accessor.get('normalized'):
+        info = np.iinfo(dtype)
+        array = np.maximum(array.astype(np.float32) / info.max, -1.0)
+    return array
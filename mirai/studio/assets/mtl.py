@@ -0,0 +1,79 @@
+"""Wavefront MTL material library reader."""
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+# MTL texture statements -> what they are used for in glTF
+TEXTURE_KEYS = ('map_Kd', 'map_Bump', 'bump', 'norm', 'map_Ns', 'map_Ka', 'map_d')
+
+
+@dataclass
+class Material:
+    name: str
+    diffuse: Tuple[float, float, float] = (1.0, 1.0, 1.0)
+    opacity: float = 1.0
+    shininess: Optional[float] = None
+    # MTL key -> texture file (resolved path, or the raw value if it was not found)
+    textures: Dict[str, str] = field(default_factory=dict)
+    missing_textures: Dict[str, str] = field(default_factory=dict)
+
+
+def _texture_file(value: str) -> str:
+    """Strip texture options (-bm 1, -o 0 0 0, ...) from a map_* statement."""
+    tokens = value.split()
+    while tokens and tokens[0].startswith('-'):
+        tokens.pop(0)
+        while tokens:
+            try:
+                float(tokens[0])
+            except ValueError:
+                break
+            tokens.pop(0)
+    return ' '.join(tokens)
+
+
+def resolve_texture(value: str, base_dir: str) -> Optional[str]:
+    """
+    Find a texture referenced by an MTL file.
+
+    Exporters often write absolute paths from the artist's machine
+    (e.g. C:/TEX2.png); those are looked up by file name next to the MTL.
+    """
+    name = _texture_file(value).replace('\\', '/')
+    for candidate in (name, os.path.join(base_dir, name), os.path.join(base_dir, os.path.basename(name))):
+        if candidate and os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def parse_mtl(path: str) -> Dict[str, Material]:
+    """Materials of an MTL file by name (a later definition of a name wins)."""
+    materials: Dict[str, Material] = {}
+    base_dir = os.path.dirname(path)
+    current: Optional[Material] = None
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            parts = line.strip().split(None, 1)
+            if len(parts) < 2 or parts[0].startswith('#'):
+                continue
+            key, value = parts
+            if key == 'newmtl':
+                current = materials[value.strip()] = Material(value.strip())
+            elif current is None:
+                continue
+            elif key == 'Kd':
+                rgb = [float(x) for x in value.split()[:3]]
+                current.diffuse = tuple(rgb + [rgb[-1]] * (3 - len(rgb)))
+            elif key == 'd':
+                current.opacity = float(value.split()[0])
+            elif key == 'Tr':
+                current.opacity = 1.0 - float(value.split()[0])
+            elif key == 'Ns':
+                current.shininess = float(value.split()[0])
+            elif key in TEXTURE_KEYS:
+                resolved = resolve_texture(value, base_dir)
+                if resolved:
+                    current.textures[key] = resolved
+                else:
+                    current.missing_textures[key] = value.strip()
+    return materials
@@ -0,0 +1,357 @@
+"""
+Streaming Wavefront OBJ parser.
+
+The file is memory-mapped and cut into blocks of whole lines. Every block
+is tokenized with numpy: lines are classified by their first bytes, the
+payloads of each record type are gathered with one byte mask and converted
+in bulk, and faces are triangulated with index arithmetic. Python code only
+runs for the rare state records (usemtl, g, o, mtllib), never per vertex or
+per face, so large files parse at close to memory speed.
+"""
+import mmap
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+BLOCK_SIZE = 16 * 1024 * 1024
+
+_NEWLINE, _SLASH = ord('\n'), ord('/')
+_WHITESPACE = np.zeros(256, dtype=bool)
+_WHITESPACE[list(b' \t\r\n\v\f')] = True
+_LEADING_WHITESPACE = re.compile(rb'^[ \t]+', re.M)
+_CONTINUATION = re.compile(rb'\\\r?\n')
+_COMMENT = re.compile(rb'#[^\r\n]*')
+_SLASH_TO_SPACE = bytes.maketrans(b'/', b' ')
+_STATE_KEYWORDS = (b'usemtl', b'g', b'o', b'mtllib')
+# Line kinds
+_OTHER, _V, _VT, _VN, _F = range(5)
+
+
+@dataclass
+class ObjMesh:
+    """Triangulated OBJ geometry. Indices are zero-based, -1 = not given."""
+    positions: np.ndarray          # (P, 3) float32
+    uvs: np.ndarray                # (T, 2) float32
+    normals: np.ndarray            # (N, 3) float32
+    corners: np.ndarray            # (triangles * 3, 3) int64: position, uv, normal index
+    face_material: np.ndarray      # (triangles,) int32 index into materials
+    face_group: np.ndarray         # (triangles,) int32 index into groups
+    polygon_sizes: np.ndarray      # (faces,) int32 corners of every face record
+    polygon_material: np.ndarray   # (faces,) int32
+    polygon_group: np.ndarray      # (faces,) int32
+    materials: List[str] = field(default_factory=list)
+    groups: List[str] = field(default_factory=list)
+    mtllibs: List[str] = field(default_factory=list)
+    material_runs: int = 0         # usemtl switches with faces (draw calls of a naive loader)
+
+    @property
+    def triangles(self) -> int:
+        return len(self.face_material)
+
+    @property
+    def polygons(self) -> int:
+        """Faces before triangulation."""
+        return len(self.polygon_sizes)
+
+
+def _continued(mapped: mmap.mmap, newline: int) -> bool:
+    """Whether the newline at ``newline`` ends a backslash-continued line."""
+    before = newline - 1
+    if before >= 0 and mapped[before] == ord('\r'):
+        before -= 1
+    return before >= 0 and mapped[before] == ord('\\')
+
+
+def map_blocks(path: str, block_size: int = BLOCK_SIZE) -> Iterator[bytes]:
+    """Memory-map ``path`` and yield blocks of whole lines, each ending with a newline."""
+    with open(path, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            return
+        with mapped:
+            start, size = 0, len(mapped)
+            while start < size:
+                end = size
+                if start + block_size < size:
+                    # Never cut inside a continued line: its parts are joined within one block
+                    cut = mapped.rfind(b'\n', start, start + block_size)
+                    while cut >= 0 and _continued(mapped, cut):
+                        cut = mapped.rfind(b'\n', start, cut)
+                    if cut < 0:
+                        # A single line longer than a block: extend to its end
+                        cut = mapped.find(b'\n', start + block_size)
+                        while cut >= 0 and _continued(mapped, cut):
+                            cut = mapped.find(b'\n', cut + 1)
+                    end = cut + 1 if cut >= 0 else size
+                block = mapped[start:end]
+                yield block if block.endswith(b'\n') else block + b'\n'
+                start = end
+
+
+def _split_lines(data: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(start, end) of every line; ``end`` is the index of its newline."""
+    ends = np.flatnonzero(data == _NEWLINE)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    return starts, ends
+
+
+def _payload(data: np.ndarray, byte_kind: np.ndarray, kind: int,
+             lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Gather the lines of one record kind (their keywords already blanked).
+
+    Returns:
+        (payload bytes with the newlines kept, offset of every line in them
+        plus the total length, token count of every line)
+    """
+    text = data[byte_kind == kind]
+    whitespace = _WHITESPACE[text]
+    token_starts = np.flatnonzero(~whitespace & np.concatenate(([True], whitespace[:-1])))
+    line_offsets = np.concatenate(([0], np.cumsum(lengths)))
+    tokens = np.diff(np.searchsorted(token_starts, line_offsets))
+    return text, line_offsets, tokens
+
+
+def _floats(data: np.ndarray, byte_kind: np.ndarray, kind: int, lengths: np.ndarray, width: int) -> np.ndarray:
+    """(lines, width) float32 of records like ``v 0.1 0.2 0.3``; extra columns are dropped, missing ones are 0."""
+    if not len(lengths):
+        return np.zeros((0, width), dtype=np.float32)
+    text, _, tokens = _payload(data, byte_kind, kind, lengths)
+    values = np.fromstring(text.tobytes(), dtype=np.float32, sep=' ')
+    if len(values) != tokens.sum():
+        raise ValueError("malformed vertex record")
+    if (tokens == tokens[0]).all() and tokens[0] >= width:
+        return values.reshape(len(tokens), -1)[:, :width]
+    # Mixed column counts (e.g. some vertices with colors)
+    offsets = np.concatenate(([0], np.cumsum(tokens)[:-1]))
+    columns = np.arange(width)
+    present = columns < tokens[:, None]
+    out = np.zeros((len(tokens), width), dtype=np.float32)
+    out[present] = values[(offsets[:, None] + columns)[present]]
+    return out
+
+
+def _faces(data: np.ndarray, byte_kind: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Corner indices of face records as written (1-based, negative = relative, 0 = not given).
+
+    Returns:
+        (corners (sum of sizes, 3) int64, corners per face)
+    """
+    text, line_offsets, sizes = _payload(data, byte_kind, _F, lengths)
+    slashes = np.diff(np.searchsorted(np.flatnonzero(text == _SLASH), line_offsets))
+    components = slashes // np.maximum(sizes, 1) + 1
+    if ((slashes % np.maximum(sizes, 1)) != 0).any() or (components > 3).any():
+        raise ValueError("face with mixed or invalid corner formats")
+    # v//vn: the empty uv index becomes 0 (= not given)
+    raw = text.tobytes().replace(b'//', b'/0/').translate(_SLASH_TO_SPACE)
+    values = np.fromstring(raw, dtype=np.int64, sep=' ')
+    if len(values) != (sizes * components).sum():
+        raise ValueError("malformed face record")
+
+    corner_face = np.repeat(np.arange(len(sizes)), sizes)
+    first_corner = np.cumsum(sizes) - sizes
+    corner_in_face = np.arange(len(corner_face)) - first_corner[corner_face]
+    face_values = np.cumsum(sizes * components) - sizes * components
+    width = components[corner_face]
+    base = face_values[corner_face] + corner_in_face * width
+    corners = np.zeros((len(corner_face), 3), dtype=np.int64)
+    for k in range(3):
+        given = width > k
+        corners[given, k] = values[base[given] + k]
+    return corners, sizes
+
+
+def _triangulate(sizes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fan triangulation of faces with ``sizes`` corners (faces with < 3 are dropped).
+
+    Returns:
+        (corner positions (triangles, 3) into the face corners, face of every triangle)
+    """
+    fans = np.maximum(sizes - 2, 0)
+    triangle_face = np.repeat(np.arange(len(sizes)), fans)
+    first_corner = (np.cumsum(sizes) - sizes)[triangle_face]
+    step = np.arange(len(triangle_face)) - (np.cumsum(fans) - fans)[triangle_face] + 1
+    return np.stack([first_corner, first_corner + step, first_corner + step + 1], axis=1), triangle_face
+
+
+class _Parser:
+    def __init__(self):
+        self.positions: List[np.ndarray] = []
+        self.uvs: List[np.ndarray] = []
+        self.normals: List[np.ndarray] = []
+        self.corners: List[np.ndarray] = []
+        self.face_material: List[np.ndarray] = []
+        self.face_group: List[np.ndarray] = []
+        self.polygon_sizes: List[np.ndarray] = []
+        self.polygon_material: List[np.ndarray] = []
+        self.polygon_group: List[np.ndarray] = []
+        self.counts = np.zeros(3, dtype=np.int64)  # positions, uvs, normals so far
+        self.materials: Dict[str, int] = {}
+        self.groups: Dict[str, int] = {'default': 0}
+        self.material = -1
+        self.group = 0
+        self.mtllibs: List[str] = []
+        self.material_runs = 0
+        self._run_has_faces = False
+
+    def _index(self, table: Dict[str, int], name: str) -> int:
+        return table.setdefault(name, len(table))
+
+    def _states(self, block: bytes, starts: np.ndarray, ends: np.ndarray, lines: np.ndarray) -> Tuple[tuple, tuple]:
+        """
+        Read the usemtl/g/o/mtllib lines of a block.
+
+        Returns:
+            ((usemtl line numbers, material ids), (g/o line numbers, group ids))
+        """
+        material_lines, material_ids, group_lines, group_ids = [], [], [], []
+        for line in lines:
+            parts = block[starts[line]:ends[line]].split(None, 1)
+            if parts[0] not in _STATE_KEYWORDS:
+                continue
+            keyword = parts[0]
+            value = parts[1].strip().decode('utf-8', 'replace') if len(parts) > 1 else ''
+            if keyword == b'usemtl':
+                material_lines.append(line)
+                material_ids.append(self._index(self.materials, value))
+            elif keyword == b'mtllib':
+                self.mtllibs.append(value)
+            else:
+                group_lines.append(line)
+                group_ids.append(self._index(self.groups, value or 'default'))
+        as_array = lambda values: np.array(values, dtype=np.int64)
+        return ((as_array(material_lines), as_array(material_ids)),
+                (as_array(group_lines), as_array(group_ids)))
+
+    def feed(self, block: bytes) -> None:
+        if b'#' in block:
+            block = _COMMENT.sub(b'', block)
+        if b'\\' in block:
+            block = _CONTINUATION.sub(b' ', block)
+        data = np.frombuffer(block, dtype=np.uint8)
+        starts, ends = _split_lines(data)
+        if np.isin(data[starts], list(b' \t')).any():
+            block = _LEADING_WHITESPACE.sub(b'', block)
+            data = np.frombuffer(block, dtype=np.uint8)
+            starts, ends = _split_lines(data)
+
+        # Keyword of every line from its first three bytes
+        last = len(data) - 1
+        first = data[starts]
+        second = data[np.minimum(starts + 1, last)]
+        third = data[np.minimum(starts + 2, last)]
+        second_blank = _WHITESPACE[second]
+        third_blank = _WHITESPACE[third]
+        is_v = (first == ord('v')) & second_blank
+        is_vt = (first == ord('v')) & (second == ord('t')) & third_blank
+        is_vn = (first == ord('v')) & (second == ord('n')) & third_blank
+        is_f = (first == ord('f')) & second_blank
+        maybe_state = np.isin(first, list(b'ugom'))
+
+        kinds = np.full(len(starts), _OTHER, dtype=np.uint8)
+        for kind, selected in ((_V, is_v), (_VT, is_vt), (_VN, is_vn), (_F, is_f)):
+            kinds[selected] = kind
+        # Blank the keywords, then every kind's payload is one masked gather
+        data = data.copy()
+        data[starts[is_v | is_vt | is_vn | is_f]] = ord(' ')
+        data[starts[is_vt | is_vn] + 1] = ord(' ')
+        lengths = ends + 1 - starts
+        byte_kind = np.repeat(kinds, lengths)
+
+        lines = np.arange(len(starts))
+        v_lines, vt_lines, vn_lines, f_lines = lines[is_v], lines[is_vt], lines[is_vn], lines[is_f]
+        self.positions.append(_floats(data, byte_kind, _V, lengths[is_v], 3))
+        self.uvs.append(_floats(data, byte_kind, _VT, lengths[is_vt], 2))
+        self.normals.append(_floats(data, byte_kind, _VN, lengths[is_vn], 3))
+        (material_lines, material_ids), (group_lines, group_ids) = \
+            self._states(block, starts, ends, lines[maybe_state])
+
+        if len(f_lines):
+            raw, sizes = _faces(data, byte_kind, lengths[is_f])
+            if (raw < 0).any():
+                # Relative indices: count the elements defined before every face
+                before = np.stack([self.counts[k] + np.searchsorted(kind_lines, f_lines)
+                                   for k, kind_lines in enumerate((v_lines, vt_lines, vn_lines))], axis=-1)
+                corner_before = np.repeat(before, sizes, axis=0)
+                raw = np.where(raw < 0, corner_before + raw + 1, raw)
+
+            # State of every face: the last usemtl / g before it, else the one carried over
+            run = np.searchsorted(material_lines, f_lines)
+            material = np.concatenate(([self.material], material_ids))[run].astype(np.int32)
+            group = np.concatenate(([self.group], group_ids))[np.searchsorted(group_lines, f_lines)].astype(np.int32)
+            runs = np.unique(run)
+            self.material_runs += len(runs) - int(runs[0] == 0 and self._run_has_faces)
+
+            corner_index, triangle_face = _triangulate(sizes)
+            self.corners.append(raw[corner_index.reshape(-1)] - 1)
+            self.face_material.append(material[triangle_face])
+            self.face_group.append(group[triangle_face])
+            self.polygon_sizes.append(sizes.astype(np.int32))
+            self.polygon_material.append(material)
+            self.polygon_group.append(group)
+        if len(material_ids):
+            self.material = int(material_ids[-1])
+            self._run_has_faces = bool(len(f_lines)) and f_lines[-1] > material_lines[-1]
+        elif len(f_lines):
+            self._run_has_faces = True
+        if len(group_ids):
+            self.group = int(group_ids[-1])
+
+        self.counts += [len(v_lines), len(vt_lines), len(vn_lines)]
+
+    def result(self) -> ObjMesh:
+        def cat(parts, shape, dtype):
+            return np.concatenate(parts).astype(dtype, copy=False) if parts else np.zeros(shape, dtype=dtype)
+
+        materials = list(self.materials)
+        face_material = cat(self.face_material, (0,), np.int32)
+        polygon_material = cat(self.polygon_material, (0,), np.int32)
+        if (polygon_material < 0).any():
+            # Faces before any usemtl
+            face_material = np.where(face_material < 0, len(materials), face_material)
+            polygon_material = np.where(polygon_material < 0, len(materials), polygon_material)
+            materials.append('default')
+        return ObjMesh(
+            positions=cat(self.positions, (0, 3), np.float32),
+            uvs=cat(self.uvs, (0, 2), np.float32),
+            normals=cat(self.normals, (0, 3), np.float32),
+            corners=cat(self.corners, (0, 3), np.int64),
+            face_material=face_material,
+            face_group=cat(self.face_group, (0,), np.int32),
+            polygon_sizes=cat(self.polygon_sizes, (0,), np.int32),
+            polygon_material=polygon_material,
+            polygon_group=cat(self.polygon_group, (0,), np.int32),
+            materials=materials,
+            groups=list(self.groups),
+            mtllibs=self.mtllibs,
+            material_runs=self.material_runs
+        )
+
+
+def parse_obj(path: str, block_size: int = BLOCK_SIZE) -> ObjMesh:
+    """
+    Parse an OBJ file into triangulated, zero-based index arrays.
+
+    Raises:
+        ValueError: malformed records, or a face references a vertex that does not exist.
+    """
+    parser = _Parser()
+    try:
+        for block in map_blocks(path, block_size):
+            parser.feed(block)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from e
+    mesh = parser.result()
+    for column, array in enumerate((mesh.positions, mesh.uvs, mesh.normals)):
+        indices = mesh.corners[:, column]
+        if len(indices) and (indices.max() >= len(array) or indices.min() < -1):
+            raise ValueError(f"{path}: face index out of range ({('position', 'uv', 'normal')[column]})")
+    return mesh
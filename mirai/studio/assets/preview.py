@@ -0,0 +1,343 @@
+"""
+Offscreen preview thumbnails of the AR characters, rendered in numpy.
+
+A small z-buffered software rasterizer: no GPU or GL context is needed on
+the kiosk server. Triangles are rasterized in bulk (every triangle's
+bounding-box pixels are expanded with np.repeat and tested with
+barycentric coordinates), the nearest fragment per pixel wins, and visible
+pixels are shaded with the base colour texture and a headlight-style
+Lambert term. The image is rendered at SUPERSAMPLE times the target size
+and averaged down for anti-aliasing.
+
+Sources: compiled GLB (as written by compile_assets), OBJ/MTL, or an image
+(stickers are fitted into the square).
+"""
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from .gltf import read_accessor, read_glb
+
+THUMBNAIL_SIZE = 160
+SUPERSAMPLE = 3
+# Border left around the model, as a fraction of the image
+MARGIN = 0.06
+# Three-quarter view: turned this far from the model's front (see front_yaw)
+VIEW_ANGLE = np.radians(25)
+PITCH = np.radians(12)
+# Triangles count towards a side when their normal is at most ~72 degrees off it
+FACING = 0.3
+# Part of the thumbnail file names and URLs: bump it when renders of the same file change
+PREVIEW_VERSION = 2
+AMBIENT = 0.45
+LIGHT = np.array([0.35, 0.5, 1.0]) / np.linalg.norm([0.35, 0.5, 1.0])
+# Candidate fragments generated per rasterization chunk (memory bound)
+CHUNK_FRAGMENTS = 1 << 22
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+@dataclass
+class PreviewMesh:
+    positions: np.ndarray                # (V, 3) float
+    triangles: np.ndarray                # (F, 3) int
+    normals: Optional[np.ndarray]        # (V, 3)
+    uvs: Optional[np.ndarray]            # (V, 2), glTF orientation (v down)
+    face_material: np.ndarray            # (F,)
+    colors: List[np.ndarray]             # per material: RGBA factor in [0, 1]
+    textures: List[Optional[np.ndarray]] # per material: BGR(A) uint8 image
+
+
+def _node_matrix(node) -> np.ndarray:
+    if 'matrix' in node:
+        return np.array(node['matrix'], dtype=np.float64).reshape(4, 4).T
+    x, y, z, w = node.get('rotation', [0, 0, 0, 1])
+    rotation = np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]
+    ])
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.array(node.get('scale', [1, 1, 1]))
+    matrix[:3, 3] = node.get('translation', [0, 0, 0])
+    return matrix
+
+
+def _glb_image(gltf, binary, texture_index) -> Optional[np.ndarray]:
+    texture = gltf['textures'][texture_index]
+    source = texture.get('source', texture.get('extensions', {}).get('EXT_texture_webp', {}).get('source'))
+    if source is None or 'bufferView' not in gltf['images'][source]:
+        return None
+    view = gltf['bufferViews'][gltf['images'][source]['bufferView']]
+    start = view.get('byteOffset', 0)
+    data = np.frombuffer(binary[start:start + view['byteLength']], dtype=np.uint8)
+    return cv2.imdecode(data, cv2.IMREAD_UNCHANGED)
+
+
+def mesh_from_glb(path: str) -> PreviewMesh:
+    """All triangle primitives of the default scene, in world space."""
+    gltf, binary = read_glb(path)
+    positions, normals, uvs, triangles, face_material = [], [], [], [], []
+    colors: List[np.ndarray] = []
+    textures: List[Optional[np.ndarray]] = []
+    material_slot = {}
+    has_normals = has_uvs = True
+    count = 0
+
+    scene = gltf.get('scenes', [{'nodes': list(range(len(gltf.get('nodes', []))))}])[gltf.get('scene', 0)]
+    stack = [(index, np.eye(4)) for index in scene.get('nodes', [])]
+    while stack:
+        index, parent = stack.pop()
+        node = gltf['nodes'][index]
+        matrix = parent @ _node_matrix(node)
+        stack.extend((child, matrix) for child in node.get('children', []))
+        if 'mesh' not in node:
+            continue
+        normal_matrix = np.linalg.inv(matrix[:3, :3]).T
+        for primitive in gltf['meshes'][node['mesh']]['primitives']:
+            if primitive.get('mode', 4) != 4:
+                continue
+            attributes = primitive['attributes']
+            p = read_accessor(gltf, binary, attributes['POSITION']).astype(np.float64)
+            positions.append(p @ matrix[:3, :3].T + matrix[:3, 3])
+            if 'NORMAL' in attributes:
+                normals.append(read_accessor(gltf, binary, attributes['NORMAL']).astype(np.float64) @ normal_matrix.T)
+            has_normals = has_normals and 'NORMAL' in attributes
+            if 'TEXCOORD_0' in attributes:
+                uvs.append(read_accessor(gltf, binary, attributes['TEXCOORD_0']).astype(np.float64))
+            has_uvs = has_uvs and 'TEXCOORD_0' in attributes
+            indices = read_accessor(gltf, binary, primitive['indices']).astype(np.int64) \
+                if 'indices' in primitive else np.arange(len(p))
+            triangles.append(indices.reshape(-1, 3) + count)
+            count += len(p)
+
+            material_index = primitive.get('material', -1)
+            if material_index not in material_slot:
+                material = gltf['materials'][material_index] if material_index >= 0 else {}
+                pbr = material.get('pbrMetallicRoughness', {})
+                colors.append(np.array(pbr.get('baseColorFactor', [1, 1, 1, 1]), dtype=np.float64))
+                texture = pbr.get('baseColorTexture')
+                textures.append(_glb_image(gltf, binary, texture['index']) if texture else None)
+                material_slot[material_index] = len(colors) - 1
+            face_material.append(np.full(len(triangles[-1]), material_slot[material_index]))
+
+    if not triangles:
+        raise ValueError(f"{path} has no triangles")
+    return PreviewMesh(
+        positions=np.concatenate(positions),
+        triangles=np.concatenate(triangles),
+        normals=np.concatenate(normals) if has_normals else None,
+        uvs=np.concatenate(uvs) if has_uvs else None,
+        face_material=np.concatenate(face_material),
+        colors=colors,
+        textures=textures
+    )
+
+
+def mesh_from_obj(path: str) -> PreviewMesh:
+    from .compiler import load_materials, mesh_buffers
+    from .obj import parse_obj
+
+    mesh = parse_obj(path)
+    materials = load_materials(path, mesh)
+    buffers = mesh_buffers(mesh)
+    colors, textures = [], []
+    for name in mesh.materials:
+        material = materials.get(name)
+        colors.append(np.array([*material.diffuse, material.opacity] if material else [0.8, 0.8, 0.8, 1.0]))
+        texture = material.textures.get('map_Kd') if material else None
+        textures.append(cv2.imread(texture, cv2.IMREAD_UNCHANGED) if texture else None)
+    uvs = None
+    if buffers.uvs is not None:
+        uvs = buffers.uvs.astype(np.float64)
+        uvs[:, 1] = 1.0 - uvs[:, 1]
+    return PreviewMesh(buffers.positions.astype(np.float64), buffers.triangles, buffers.normals, uvs,
+                       buffers.face_material, colors, textures)
+
+
+def front_yaw(mesh: PreviewMesh) -> float:
+    """
+    Rotation about Y that turns the model's front towards the camera (+Z).
+
+    Exports disagree on whether characters face +Z or -Z (ar_logic.js
+    assumes -Z). Both sides of a closed mesh have the same facing area, but
+    the front (face, hands, buttons) is modelled with more triangles, so
+    the side more triangles face is taken as the front; a tie keeps -Z.
+    """
+    p = mesh.positions[mesh.triangles]
+    normal = np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])
+    facing = normal[:, 2] / np.maximum(np.linalg.norm(normal, axis=1), 1e-12)
+    return 0.0 if (facing > FACING).sum() > (facing < -FACING).sum() else np.pi
+
+
+def _view_rotation(yaw: float) -> np.ndarray:
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    cp, sp = np.cos(PITCH), np.sin(PITCH)
+    yaw = np.array([[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]])
+    pitch = np.array([[1, 0, 0], [0, cp, -sp], [0, sp, cp]])
+    return pitch @ yaw
+
+
+def _sample(texture: np.ndarray, uv: np.ndarray) -> np.ndarray:
+    """Nearest texel (repeat wrapping) as BGR floats in [0, 1]."""
+    if texture.ndim == 2:
+        texture = cv2.cvtColor(texture, cv2.COLOR_GRAY2BGR)
+    if texture.dtype != np.uint8:
+        texture = (texture / (np.iinfo(texture.dtype).max / 255)).astype(np.uint8)
+    h, w = texture.shape[:2]
+    x = np.floor(np.mod(uv[:, 0], 1.0) * w).astype(np.int64).clip(0, w - 1)
+    y = np.floor(np.mod(uv[:, 1], 1.0) * h).astype(np.int64).clip(0, h - 1)
+    return texture[y, x, :3] / 255.0
+
+
+def rasterize(mesh: PreviewMesh, size: int = THUMBNAIL_SIZE, yaw: Optional[float] = None) -> np.ndarray:
+    """
+    Orthographic three-quarter view of ``mesh``.
+
+    Args:
+        yaw: rotation about Y before the view angle, default front_yaw(mesh).
+
+    Returns:
+        (size, size, 4) uint8 BGRA image, transparent background.
+    """
+    canvas = size * SUPERSAMPLE
+    rotation = _view_rotation((front_yaw(mesh) if yaw is None else yaw) + VIEW_ANGLE)
+    p = mesh.positions @ rotation.T
+    lo, hi = p[:, :2].min(axis=0), p[:, :2].max(axis=0)
+    scale = canvas * (1 - 2 * MARGIN) / max(float((hi - lo).max()), 1e-12)
+    center = (lo + hi) / 2
+    sx = (p[:, 0] - center[0]) * scale + canvas / 2
+    sy = canvas / 2 - (p[:, 1] - center[1]) * scale
+    depth = p[:, 2]
+
+    tris = mesh.triangles
+    x, y = sx[tris], sy[tris]
+    area = (x[:, 1] - x[:, 0]) * (y[:, 2] - y[:, 0]) - (x[:, 2] - x[:, 0]) * (y[:, 1] - y[:, 0])
+    x0 = np.ceil(x.min(axis=1) - 0.5).clip(0, canvas).astype(np.int64)
+    x1 = np.floor(x.max(axis=1) - 0.5).clip(-1, canvas - 1).astype(np.int64)
+    y0 = np.ceil(y.min(axis=1) - 0.5).clip(0, canvas).astype(np.int64)
+    y1 = np.floor(y.max(axis=1) - 0.5).clip(-1, canvas - 1).astype(np.int64)
+    width, height = x1 - x0 + 1, y1 - y0 + 1
+    candidates = np.where((np.abs(area) > 1e-12) & (width > 0) & (height > 0))[0]
+    counts = width[candidates] * height[candidates]
+
+    # Z-buffer: nearest (largest z, the camera looks down -z) fragment per pixel
+    zbuffer = np.full(canvas * canvas, -np.inf)
+    face = np.full(canvas * canvas, -1, dtype=np.int64)
+    bary = np.zeros((canvas * canvas, 2))
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(candidates):
+        stop = max(int(np.searchsorted(ends, (ends[start - 1] if start else 0) + CHUNK_FRAGMENTS)), start + 1)
+        chunk, chunk_counts = candidates[start:stop], counts[start:stop]
+        tri = np.repeat(chunk, chunk_counts)
+        local = np.arange(len(tri)) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+        px = x0[tri] + local % width[tri]
+        py = y0[tri] + local // width[tri]
+        cx, cy = px + 0.5, py + 0.5
+        tx, ty = x[tri], y[tri]
+        l1 = ((cx - tx[:, 0]) * (ty[:, 2] - ty[:, 0]) - (tx[:, 2] - tx[:, 0]) * (cy - ty[:, 0])) / area[tri]
+        l2 = ((tx[:, 1] - tx[:, 0]) * (cy - ty[:, 0]) - (cx - tx[:, 0]) * (ty[:, 1] - ty[:, 0])) / area[tri]
+        inside = (l1 >= 0) & (l2 >= 0) & (l1 + l2 <= 1)
+        tri, px, py, l1, l2 = tri[inside], px[inside], py[inside], l1[inside], l2[inside]
+        z = depth[tris[tri, 0]] * (1 - l1 - l2) + depth[tris[tri, 1]] * l1 + depth[tris[tri, 2]] * l2
+        pixel = py * canvas + px
+        # Nearest fragment of this chunk per pixel, then against the buffer
+        order = np.lexsort((-z, pixel))
+        pixel, z, tri, l1, l2 = pixel[order], z[order], tri[order], l1[order], l2[order]
+        first = np.r_[True, pixel[1:] != pixel[:-1]]
+        pixel, z, tri, l1, l2 = pixel[first], z[first], tri[first], l1[first], l2[first]
+        closer = z > zbuffer[pixel]
+        pixel = pixel[closer]
+        zbuffer[pixel] = z[closer]
+        face[pixel] = tri[closer]
+        bary[pixel] = np.stack([l1[closer], l2[closer]], axis=1)
+        start = stop
+
+    visible = np.where(face >= 0)[0]
+    tri = face[visible]
+    l1, l2 = bary[visible, 0], bary[visible, 1]
+    weights = np.stack([1 - l1 - l2, l1, l2], axis=1)[:, :, None]
+    corners = tris[tri]
+
+    if mesh.normals is not None:
+        normal = (mesh.normals[corners] * weights).sum(axis=1) @ rotation.T
+    else:
+        a, b, c = p[corners[:, 0]], p[corners[:, 1]], p[corners[:, 2]]
+        normal = np.cross(b - a, c - a)
+    normal /= np.maximum(np.linalg.norm(normal, axis=1, keepdims=True), 1e-12)
+    # Double-sided: light the side facing the camera
+    normal[normal[:, 2] < 0] *= -1
+    shade = AMBIENT + (1 - AMBIENT) * np.clip(normal @ LIGHT, 0, 1)
+
+    color = np.ones((len(visible), 3))
+    material = mesh.face_material[tri]
+    uv = (mesh.uvs[corners] * weights).sum(axis=1) if mesh.uvs is not None else None
+    for index, (factor, texture) in enumerate(zip(mesh.colors, mesh.textures)):
+        selected = material == index
+        if not selected.any():
+            continue
+        # glTF factors are RGB, images BGR
+        color[selected] = factor[2::-1]
+        if texture is not None and uv is not None:
+            color[selected] *= _sample(texture, uv[selected])
+
+    image = np.zeros((canvas * canvas, 4))
+    image[visible, :3] = color * shade[:, None]
+    image[visible, 3] = 1.0
+    # Premultiplied average down to the target size, so edges don't pick up the black background
+    small = cv2.resize(image.reshape(canvas, canvas, 4).astype(np.float32), (size, size), interpolation=cv2.INTER_AREA)
+    alpha = small[..., 3:]
+    small[..., :3] = np.where(alpha > 0, small[..., :3] / np.maximum(alpha, 1e-6), 0)
+    return np.round(small * 255).clip(0, 255).astype(np.uint8)
+
+
+def fit_image(path: str, size: int = THUMBNAIL_SIZE) -> np.ndarray:
+    """A sticker scaled into a transparent ``size`` square (BGRA)."""
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError(f"cannot decode {path}")
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+    elif image.shape[2] == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+    h, w = image.shape[:2]
+    scale = size / max(h, w)
+    resized = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    canvas = np.zeros((size, size, 4), dtype=np.uint8)
+    top, left = (size - resized.shape[0]) // 2, (size - resized.shape[1]) // 2
+    canvas[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return canvas
+
+
+def render_thumbnail(path: str, size: int = THUMBNAIL_SIZE) -> np.ndarray:
+    """
+    Thumbnail of a GLB, OBJ or image file (BGRA).
+
+    Raises:
+        ValueError: unsupported or unreadable file.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        return fit_image(path, size)
+    if ext == '.glb':
+        return rasterize(mesh_from_glb(path), size)
+    if ext == '.obj':
+        return rasterize(mesh_from_obj(path), size)
+    raise ValueError(f"no preview renderer for {ext} files")
+
+
+def write_thumbnail(path: str, out_path: str, size: int = THUMBNAIL_SIZE) -> int:
+    """Render ``path`` to ``out_path`` (WebP or PNG, by extension) atomically; returns its size in bytes."""
+    image = render_thumbnail(path, size)
+    ext = os.path.splitext(out_path)[1].lower()
+    ok, data = cv2.imencode(ext, image, [cv2.IMWRITE_WEBP_QUALITY, 90] if ext == '.webp' else [])
+    if not ok:
+        raise ValueError(f"cannot encode {out_path}")
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    with open(out_path + '.tmp', 'wb') as f:
+        f.write(data.tobytes())
+    os.replace(out_path + '.tmp', out_path)
+    return len(data)
@@ -0,0 +1,359 @@
+"""
+Texture stage of the asset compiler: resize, atlas, compress.
+
+The characters ship one 1024px PNG per part. The kiosk never shows them
+that large, and every file is a separate request and decode. This stage:
+
+1. Picks the size each texture needs from the mesh itself: the texel
+   density a part needs when the character fills ``display_size`` pixels
+   of screen height, snapped to a power of two (KTX2/mipmap friendly).
+2. Packs small textures of UV-clamped parts into one atlas and remaps
+   the UVs of those parts; parts with equal factors then share a material
+   (one draw call).
+3. Encodes the results as WebP (EXT_texture_webp) or PNG and keeps a
+   power-of-two PNG master next to them as input for KTX2 tools (toktx).
+
+Images are decoded, resized and encoded in a thread pool: OpenCV releases
+the GIL in all three.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .mtl import Material
+
+# Screen pixels the character's tallest side covers. ar_logic.js fits it into
+# 1.5 of the ~7.7 world units visible at z=5 (a fifth of the screen height);
+# this leaves room for pinch-zooming to two thirds of a 1080p screen.
+DISPLAY_SIZE = 720
+# Percentile (weighted by UV area) of the per-triangle texel demand a texture must meet
+DEMAND_PERCENTILE = 75
+MIN_TEXTURE_SIZE = 64
+# Pixels of edge colour inside every atlas cell, so bilinear/mip sampling doesn't bleed
+ATLAS_PADDING = 4
+# UVs this far outside [0, 1] still count as clamped (exporter rounding)
+UV_TOLERANCE = 1e-3
+# MTL keys of a normal map, in order of preference: exporters often write it as map_Bump/bump
+NORMAL_KEYS = ('norm', 'map_Bump', 'bump')
+FORMATS = ('webp', 'png')
+
+
+@dataclass
+class TextureSettings:
+    max_size: int = 1024
+    display_size: int = DISPLAY_SIZE
+    atlas: bool = True
+    atlas_part_max: int = 512      # larger textures are never packed
+    atlas_size: int = 2048
+    format: str = 'webp'
+    quality: int = 90              # WebP quality (ignored for PNG)
+    workers: int = os.cpu_count() or 1
+
+
+@dataclass
+class TextureResult:
+    uvs: Optional[np.ndarray]
+    triangles: np.ndarray
+    vertex_source: np.ndarray      # (V,) index of the input vertex each output vertex copies
+    face_material: np.ndarray
+    material_names: List[str]
+    materials: Dict[str, Material]
+    report: Dict[str, Any] = field(default_factory=dict)
+
+
+def glb_textures(material: Optional[Material]) -> Dict[str, str]:
+    """
+    MTL key -> file of the textures the GLB embeds: map_Kd (base colour) and
+    the first normal map key. Specular, ambient and opacity maps have no glTF
+    counterpart and are dropped.
+    """
+    if material is None:
+        return {}
+    normal = next((key for key in NORMAL_KEYS if key in material.textures), None)
+    return {key: material.textures[key] for key in ('map_Kd', normal) if key in material.textures}
+
+
+def _pot(size: float) -> int:
+    """Nearest power of two (in log scale)."""
+    return int(2 ** round(np.log2(max(size, 1))))
+
+
+def texel_demand(positions: np.ndarray, uvs: np.ndarray, triangles: np.ndarray, face_material: np.ndarray,
+                 material_count: int, display_size: int) -> np.ndarray:
+    """
+    Texture size (texels per UV unit) every material needs on screen.
+
+    The character's tallest extent maps to ``display_size`` pixels. Each
+    triangle needs sqrt(world area / uv area) * pixels-per-unit texels; the
+    per-triangle figure stays right when UV islands overlap or are mirrored.
+    Weighting by UV area ignores faces squeezed onto a few texels of flat
+    colour, which would otherwise ask for huge textures.
+
+    Returns:
+        (material_count,) float, 0 for materials without usable UVs.
+    """
+    p = positions.astype(np.float64)
+    extent = float(np.ptp(p, axis=0).max()) if len(p) else 0.0
+    demand = np.zeros(material_count)
+    if not extent or not len(triangles):
+        return demand
+    a, b, c = p[triangles[:, 0]], p[triangles[:, 1]], p[triangles[:, 2]]
+    world = 0.5 * np.linalg.norm(np.cross(b - a, c - a), axis=1)
+    u = uvs.astype(np.float64)
+    e1, e2 = u[triangles[:, 1]] - u[triangles[:, 0]], u[triangles[:, 2]] - u[triangles[:, 0]]
+    uv_area = 0.5 * np.abs(e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0])
+    valid = (uv_area > 1e-12) & (world > 0)
+    texels = np.zeros(len(triangles))
+    texels[valid] = np.sqrt(world[valid] / uv_area[valid]) * display_size / extent
+    for material in range(material_count):
+        selected = valid & (face_material == material)
+        if not selected.any():
+            continue
+        order = np.argsort(texels[selected])
+        weights = np.cumsum(uv_area[selected][order])
+        demand[material] = texels[selected][order][np.searchsorted(weights, weights[-1] * DEMAND_PERCENTILE / 100)]
+    return demand
+
+
+def _image_size(path: str) -> Tuple[int, int]:
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError(f"cannot decode texture {path}")
+    return image.shape[1], image.shape[0]
+
+
+def _load(path: str) -> np.ndarray:
+    """8-bit BGR or BGRA image; opaque alpha channels are dropped."""
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError(f"cannot decode texture {path}")
+    if image.dtype != np.uint8:
+        image = (image / (np.iinfo(image.dtype).max / 255)).astype(np.uint8)
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    if image.shape[2] == 4 and image[..., 3].min() == 255:
+        image = image[..., :3]
+    return np.ascontiguousarray(image)
+
+
+def _resize(path: str, size: Tuple[int, int]) -> np.ndarray:
+    image = _load(path)
+    if image.shape[1::-1] == size:
+        return image
+    shrinking = size[0] * size[1] < image.shape[0] * image.shape[1]
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_CUBIC)
+
+
+def _encode(image: np.ndarray, stem: str, fmt: str, quality: int) -> Tuple[str, int]:
+    """
+    Write ``stem``.png (lossless master) and the compressed variant.
+
+    Returns:
+        (path of the variant the GLB embeds, its size in bytes)
+    """
+    cv2.imwrite(stem + '.png', image, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+    if fmt == 'png':
+        return stem + '.png', os.path.getsize(stem + '.png')
+    cv2.imwrite(stem + '.webp', image, [cv2.IMWRITE_WEBP_QUALITY, quality])
+    return stem + '.webp', os.path.getsize(stem + '.webp')
+
+
+def pack_atlas(sizes: List[Tuple[int, int]], max_size: int) -> Optional[Tuple[int, List[Tuple[int, int]]]]:
+    """
+    Shelf-pack (width, height) rectangles into the smallest square power-of-two atlas.
+
+    Returns:
+        (atlas size, top-left corner of every rectangle), or None if they don't fit.
+    """
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    side = _pot(max(max(w, h) for w, h in sizes))
+    while side <= max_size:
+        corners: List[Tuple[int, int]] = [(0, 0)] * len(sizes)
+        x = y = shelf = 0
+        fits = True
+        for i in order:
+            w, h = sizes[i]
+            if x + w > side:
+                x, y, shelf = 0, y + shelf, 0
+            if x + w > side or y + h > side:
+                fits = False
+                break
+            corners[i] = (x, y)
+            x, shelf = x + w, max(shelf, h)
+        if fits:
+            return side, corners
+        side *= 2
+    return None
+
+
+def _uv_range(uvs: np.ndarray, triangles: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    used = uvs[np.unique(triangles)]
+    return used.min(axis=0), used.max(axis=0)
+
+
+def optimize_textures(positions: np.ndarray, uvs: Optional[np.ndarray], triangles: np.ndarray,
+                      face_material: np.ndarray, material_names: List[str], materials: Dict[str, Material],
+                      out_dir: str, settings: TextureSettings = TextureSettings()) -> TextureResult:
+    """
+    Resize, atlas and encode the textures the GLB embeds.
+
+    Returns:
+        TextureResult: the mesh with atlas UVs (vertices are split where two
+        atlased parts met), the merged material list and materials whose
+        textures point to the encoded files in ``out_dir``. ``report`` lists
+        every output image with its size before and after.
+    """
+    if settings.format not in FORMATS:
+        raise ValueError(f"texture format must be one of {', '.join(FORMATS)}")
+    identity = TextureResult(uvs, triangles, np.arange(len(positions)), face_material, list(material_names),
+                             dict(materials), {'images': [], 'atlases': 0})
+    # (texture file -> materials using it as base colour or normal map)
+    users: Dict[str, List[int]] = {}
+    for index, name in enumerate(material_names):
+        for path in glb_textures(materials.get(name)).values():
+            users.setdefault(path, []).append(index)
+    if not users:
+        return identity
+    os.makedirs(out_dir, exist_ok=True)
+
+    demand = texel_demand(positions, uvs, triangles, face_material, len(material_names), settings.display_size) \
+        if uvs is not None else np.zeros(len(material_names))
+    targets: Dict[str, Tuple[int, int]] = {}
+    source_sizes: Dict[str, Tuple[int, int]] = {}
+    for path, indices in users.items():
+        width, height = source_sizes[path] = _image_size(path)
+        need = float(demand[indices].max()) or max(width, height)
+        cap = min(settings.max_size, _pot(need))
+        # Each side to the nearest power of two, never above what is needed / allowed
+        targets[path] = (max(MIN_TEXTURE_SIZE, min(_pot(width), cap)), max(MIN_TEXTURE_SIZE, min(_pot(height), cap)))
+
+    with ThreadPoolExecutor(max(1, settings.workers)) as pool:
+        paths = list(targets)
+        images = dict(zip(paths, pool.map(lambda p: _resize(p, targets[p]), paths)))
+
+        # Atlas candidates: diffuse-only materials whose UVs stay inside the texture
+        packable: Dict[str, List[int]] = {}
+        if settings.atlas and uvs is not None:
+            for path, indices in users.items():
+                if max(targets[path]) > settings.atlas_part_max:
+                    continue
+                ok = True
+                for index in indices:
+                    material = materials[material_names[index]]
+                    selected = triangles[face_material == index]
+                    if set(glb_textures(material)) != {'map_Kd'} or not len(selected):
+                        ok = False
+                        break
+                    lo, hi = _uv_range(uvs, selected)
+                    ok = ok and lo.min() >= -UV_TOLERANCE and hi.max() <= 1 + UV_TOLERANCE
+                if ok:
+                    packable[path] = indices
+        packed = pack_atlas([targets[p] for p in packable], settings.atlas_size) if len(packable) > 1 else None
+
+        jobs: List[Tuple[np.ndarray, str]] = []
+        sources: List[List[str]] = []
+        stems: Dict[str, str] = {}
+        for path in paths:
+            if packed and path in packable:
+                continue
+            stem = os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0])
+            stems[path] = stem
+            jobs.append((images[path], stem))
+            sources.append([path])
+        atlas_stem = None
+        if packed:
+            side, corners = packed
+            channels = max(images[p].shape[2] for p in packable)
+            atlas = np.zeros((side, side, channels), dtype=np.uint8)
+            if channels == 4:
+                atlas[..., 3] = 255
+            for path, (x, y) in zip(packable, corners):
+                w, h = targets[path]
+                image = images[path]
+                if image.shape[2] < channels:
+                    image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+                # The part shrinks by the padding so the cell stays a power of two
+                pad = ATLAS_PADDING
+                image = cv2.resize(image, (w - 2 * pad, h - 2 * pad), interpolation=cv2.INTER_AREA)
+                atlas[y:y + h, x:x + w] = cv2.copyMakeBorder(image, pad, pad, pad, pad, cv2.BORDER_REPLICATE)
+            atlas_stem = os.path.join(out_dir, 'atlas')
+            jobs.append((atlas, atlas_stem))
+            sources.append(list(packable))
+        encoded = list(pool.map(lambda job: _encode(job[0], job[1], settings.format, settings.quality), jobs))
+
+    out_path = {stem: result for (_, stem), result in zip(jobs, encoded)}
+    report = {'images': [], 'atlases': 1 if packed else 0}
+    for (image, stem), files in zip(jobs, sources):
+        path, size = out_path[stem]
+        report['images'].append({
+            'file': os.path.basename(path),
+            'sources': [os.path.basename(f) for f in files],
+            'size': list(image.shape[1::-1]),
+            'source_sizes': [list(source_sizes[f]) for f in files],
+            'bytes': size,
+            'source_bytes': sum(os.path.getsize(f) for f in files)
+        })
+
+    # Materials pointing at the encoded files
+    new_materials = dict(materials)
+    for index, name in enumerate(material_names):
+        material = materials.get(name)
+        if material is None:
+            continue
+        textures = dict(material.textures)
+        for key, path in glb_textures(material).items():
+            textures[key] = out_path[atlas_stem if packed and path in packable else stems[path]][0]
+        new_materials[name] = replace(material, textures=textures)
+    if not packed:
+        return replace(identity, materials=new_materials, report=report)
+
+    # Atlas transform (scale, offset in OBJ uv orientation) of every packed material
+    side, corners = packed
+    transforms = np.zeros((len(material_names), 4))
+    atlased = np.zeros(len(material_names), dtype=bool)
+    for path, (x, y) in zip(packable, corners):
+        w, h = targets[path][0] - 2 * ATLAS_PADDING, targets[path][1] - 2 * ATLAS_PADDING
+        x, y = x + ATLAS_PADDING, y + ATLAS_PADDING
+        for index in packable[path]:
+            # v points up in OBJ: image row y is v = 1 - y / side
+            transforms[index] = [w / side, h / side, x / side, 1 - (y + h) / side]
+            atlased[index] = True
+
+    # Split vertices shared by parts with different transforms, then move their UVs
+    corner_material = np.repeat(face_material, 3)
+    slot = np.where(atlased[corner_material], corner_material + 1, 0).astype(np.int64)
+    keys, inverse = np.unique(triangles.reshape(-1).astype(np.int64) * (len(material_names) + 1) + slot,
+                              return_inverse=True)
+    vertex_source, vertex_slot = np.divmod(keys, len(material_names) + 1)
+    new_uvs = uvs[vertex_source].astype(np.float64)
+    moved = vertex_slot > 0
+    t = transforms[vertex_slot[moved] - 1]
+    new_uvs[moved] = np.clip(new_uvs[moved], 0, 1) * t[:, :2] + t[:, 2:]
+
+    # Atlased materials with the same factors become one material
+    names: List[str] = []
+    remap = np.arange(len(material_names))
+    merged: Dict[Tuple, int] = {}
+    for index, name in enumerate(material_names):
+        if atlased[index]:
+            material = new_materials[name]
+            key = (material.diffuse, material.opacity, material.shininess)
+            if key in merged:
+                remap[index] = merged[key]
+                continue
+            merged[key] = len(names)
+        remap[index] = len(names)
+        names.append(name)
+    return TextureResult(
+        uvs=new_uvs.astype(uvs.dtype),
+        triangles=inverse.reshape(-1, 3),
+        vertex_source=vertex_source,
+        face_material=remap[face_material],
+        material_names=names,
+        materials=new_materials,
+        report=report
+    )
@@ -0,0 +1,233 @@
+"""
+Character catalog of the AR studio.
+
+``python manage.py sync_catalog`` scans 3d/ and stores every character
+(OBJ/FBX/GLB/glTF) and sticker (an image no MTL uses as a texture) as a
+CatalogAsset row, joined with what compile_assets wrote to
+studio/models/assets.json (compiled GLB, sizes, LODs). Label, icon, order
+and enabled are the operator's (admin) and survive a resync.
+
+The page fetches the catalog as JSON and only downloads a character when it
+is picked. Each entry has a small preview thumbnail, rendered on first
+request by assets/preview.py and cached under MEDIA_ROOT by content hash.
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.urls import reverse
+
+from .assets.fingerprint import asset_url, file_digest
+from .assets.mtl import parse_mtl
+from .assets.preview import PREVIEW_VERSION, THUMBNAIL_SIZE, write_thumbnail
+from .models import CatalogAsset
+
+MODEL_EXTENSIONS = ('.obj', '.fbx', '.glb', '.gltf')
+STICKER_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+# Static prefix of the compile_assets output (studio/static/studio/models)
+COMPILED_PREFIX = 'studio/models/'
+THUMBNAIL_FORMAT = '.webp'
+DEFAULT_ICONS = {CatalogAsset.KIND_MODEL: '🧍', CatalogAsset.KIND_STICKER: '🖼️'}
+
+
+def source_dir() -> str:
+    return str(getattr(settings, 'STUDIO_CATALOG_SOURCE', settings.BASE_DIR / '3d'))
+
+
+def compiled_dir() -> str:
+    return str(getattr(settings, 'STUDIO_CATALOG_COMPILED',
+                       settings.BASE_DIR / 'studio' / 'static' / 'studio' / 'models'))
+
+
+def thumbnail_dir() -> str:
+    return os.path.join(str(settings.MEDIA_ROOT), 'catalog')
+
+
+def thumbnail_path(content_hash: str) -> str:
+    return os.path.join(thumbnail_dir(), f"{content_hash}-{THUMBNAIL_SIZE}-v{PREVIEW_VERSION}{THUMBNAIL_FORMAT}")
+
+
+def default_label(name: str) -> str:
+    """'reva/reva' -> 'Reva', 'mordo and riggs' -> 'Mordo And Riggs'"""
+    return os.path.basename(name).replace('_', ' ').replace('-', ' ').strip().title()
+
+
+def scan(source: Optional[str] = None, compiled: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Catalog entries for the files under ``source`` (default 3d/).
+
+    A model that compile_assets has compiled points to its GLB (and LODs);
+    the others are loaded from the source file as before.
+    """
+    source = source or source_dir()
+    compiled = compiled or compiled_dir()
+    manifest: Dict[str, Any] = {}
+    manifest_path = os.path.join(compiled, 'assets.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+    walk = sorted(os.walk(source))
+    textures = set()
+    for directory, _, files in walk:
+        for file_name in files:
+            if file_name.lower().endswith('.mtl'):
+                for material in parse_mtl(os.path.join(directory, file_name)).values():
+                    textures.update(os.path.normpath(p) for p in material.textures.values())
+
+    entries = []
+    for directory, _, files in walk:
+        # A character's own folder: its loose images are textures (or leftovers), not stickers
+        character_dir = os.path.normpath(directory) != os.path.normpath(source) and any(
+            os.path.splitext(f)[1].lower() in (*MODEL_EXTENSIONS, '.mtl') for f in files)
+        for file_name in sorted(files):
+            ext = os.path.splitext(file_name)[1].lower()
+            path = os.path.join(directory, file_name)
+            if ext in MODEL_EXTENSIONS:
+                kind = CatalogAsset.KIND_MODEL
+            elif ext in STICKER_EXTENSIONS and not character_dir and os.path.normpath(path) not in textures:
+                kind = CatalogAsset.KIND_STICKER
+            else:
+                continue
+            relative = os.path.relpath(path, source).replace(os.sep, '/')
+            name = os.path.splitext(relative)[0]
+            entry = {
+                'name': name, 'kind': kind, 'source': relative, 'compiled': '',
+                'source_bytes': os.path.getsize(path), 'vertices': None, 'triangles': None, 'lods': []
+            }
+            built = manifest.get(name) if ext == '.obj' else None
+            glb_path = os.path.join(compiled, built['glb']) if built else None
+            if glb_path and os.path.exists(glb_path):
+                path = glb_path
+                entry.update({
+                    'compiled': COMPILED_PREFIX + built['glb'],
+                    'vertices': built.get('vertices'),
+                    'triangles': built.get('triangles'),
+                    'lods': [{
+                        'name': COMPILED_PREFIX + level['glb'],
+                        'ratio': level['ratio'],
+                        'bytes': level['bytes'],
+                        'vertices': level['vertices'],
+                        'triangles': level['triangles']
+                    } for level in built.get('lods', [])]
+                })
+            entry['bytes'] = os.path.getsize(path)
+            entry['content_hash'] = file_digest(path)
+            entries.append(entry)
+    return entries
+
+
+def sync(source: Optional[str] = None, compiled: Optional[str] = None, prune: bool = True) -> Dict[str, int]:
+    """
+    Update the CatalogAsset rows from ``scan``.
+
+    Rows whose file is gone are kept (with their operator settings) but
+    marked unavailable. With ``prune``, thumbnails of content that is no
+    longer in the catalog are deleted.
+
+    Returns:
+        counters: created, updated, unchanged, unavailable, pruned
+    """
+    counters = {'created': 0, 'updated': 0, 'unchanged': 0, 'unavailable': 0, 'pruned': 0}
+    existing = {asset.name: asset for asset in CatalogAsset.objects.all()}
+    next_order = max((asset.order for asset in existing.values()), default=-1) + 1
+    fields = ('kind', 'source', 'compiled', 'content_hash', 'bytes', 'source_bytes', 'vertices', 'triangles', 'lods')
+
+    for entry in scan(source, compiled):
+        asset = existing.pop(entry['name'], None)
+        if asset is None:
+            CatalogAsset.objects.create(label=default_label(entry['name']), icon=DEFAULT_ICONS[entry['kind']],
+                                        order=next_order, **entry)
+            next_order += 1
+            counters['created'] += 1
+            continue
+        if asset.available and all(getattr(asset, field) == entry[field] for field in fields):
+            counters['unchanged'] += 1
+            continue
+        for field in fields:
+            setattr(asset, field, entry[field])
+        asset.available = True
+        asset.save()
+        counters['updated'] += 1
+
+    for asset in existing.values():
+        if asset.available:
+            asset.available = False
+            asset.save(update_fields=['available', 'updated'])
+            counters['unavailable'] += 1
+
+    if prune and os.path.isdir(thumbnail_dir()):
+        keep = {os.path.basename(thumbnail_path(h)) for h in CatalogAsset.objects.values_list('content_hash', flat=True)}
+        for file_name in os.listdir(thumbnail_dir()):
+            if file_name not in keep:
+                os.remove(os.path.join(thumbnail_dir(), file_name))
+                counters['pruned'] += 1
+    return counters
+
+
+def serialize(asset: CatalogAsset) -> Dict[str, Any]:
+    """Catalog entry as sent to the page; URLs are fingerprinted when a build exists."""
+    return {
+        'name': asset.name,
+        'label': asset.label,
+        'icon': asset.icon,
+        'kind': asset.kind,
+        'url': asset_url(asset.static_name),
+        'bytes': asset.bytes,
+        'source_bytes': asset.source_bytes,
+        'vertices': asset.vertices,
+        'triangles': asset.triangles,
+        'lods': [{
+            'level': level,
+            'url': asset_url(lod['name']),
+            'ratio': lod['ratio'],
+            'bytes': lod['bytes'],
+            'triangles': lod['triangles']
+        } for level, lod in enumerate(asset.lods)],
+        # The version keeps browsers from reusing an immutable thumbnail from an older renderer
+        'thumbnail': reverse('catalog_thumbnail', kwargs={'content_hash': asset.content_hash})
+                     + f"?v={PREVIEW_VERSION}"
+    }
+
+
+def catalog() -> List[Dict[str, Any]]:
+    return [serialize(asset) for asset in CatalogAsset.objects.filter(enabled=True, available=True)]
+
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+# Hashes whose thumbnail could not be rendered (e.g. FBX), not retried until restart
+_failed: Dict[str, str] = {}
+
+
+def ensure_thumbnail(asset: CatalogAsset) -> str:
+    """
+    Path of the asset's thumbnail, rendering it first if needed.
+
+    Concurrent requests for the same hash wait for a single render.
+
+    Raises:
+        ValueError: the file cannot be previewed.
+    """
+    path = thumbnail_path(asset.content_hash)
+    if os.path.exists(path):
+        return path
+    if asset.content_hash in _failed:
+        raise ValueError(_failed[asset.content_hash])
+    with _locks_guard:
+        lock = _locks.setdefault(asset.content_hash, threading.Lock())
+    with lock:
+        if os.path.exists(path):
+            return path
+        source = finders.find(asset.static_name)
+        try:
+            if source is None:
+                raise ValueError(f"{asset.static_name} not found")
+            write_thumbnail(source, path, THUMBNAIL_SIZE)
+        except (OSError, ValueError) as e:
+            _failed[asset.content_hash] = str(e)
+            raise ValueError(str(e))
+    return path
@@ -0,0 +1,476 @@
+"""
+Event templates composited onto captures: background, photo slots (one
+for a single shot, several for a photo strip), overlay PNGs with alpha and
+text.
+
+Everything that does not depend on the photos is flattened once per
+template and canvas size into Layers: the background, and every overlay and
+fixed text merged into one premultiplied-alpha layer. Composing a capture
+is then a copy of the photos into their slots and, only on the tiles the
+overlay touches,
+
+    out = photo * (1 - alpha) + premultiplied
+
+done in uint8 by OpenCV (two saturating SIMD passes, no float copy of the
+frame). Text with {date}, {time} or {session} is rendered per capture into
+a small cached patch.
+
+Compositor runs jobs on its own thread pool, so CameraService can take the
+next shot of a strip while the previous one is being composed.
+"""
+import os
+import string
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# A template's "canvas" is given in pixels for 720p captures and scaled with the capture height
+REFERENCE_HEIGHT = 720
+TILE = 64
+PLACEHOLDERS = {'date', 'time', 'session'}
+ALIGNS = ('left', 'center', 'right')
+
+Rect = Tuple[float, float, float, float]
+
+
+def _rect(value, name: str) -> Rect:
+    if not (isinstance(value, (list, tuple)) and len(value) == 4 and
+            all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)):
+        raise ValueError(f"{name} must be [x, y, width, height] (fractions of the canvas)")
+    x, y, w, h = (float(v) for v in value)
+    if w <= 0 or h <= 0:
+        raise ValueError(f"{name} must have a positive size")
+    return x, y, w, h
+
+
+def parse_color(value: str) -> Tuple[int, int, int]:
+    """'#rrggbb' -> (b, g, r)"""
+    if not (isinstance(value, str) and len(value) == 7 and value.startswith('#')):
+        raise ValueError(f"Invalid color {value!r}, expected #rrggbb")
+    try:
+        r, g, b = (int(value[i:i + 2], 16) for i in (1, 3, 5))
+    except ValueError:
+        raise ValueError(f"Invalid color {value!r}, expected #rrggbb")
+    return b, g, r
+
+
+@dataclass(frozen=True)
+class Overlay:
+    image: str
+    rect: Rect = (0.0, 0.0, 1.0, 1.0)
+
+
+@dataclass(frozen=True)
+class Text:
+    text: str
+    # Anchor point, fractions of the canvas; the text is centred on it vertically
+    position: Tuple[float, float] = (0.5, 0.95)
+    # Line height as a fraction of the canvas height
+    size: float = 0.04
+    color: str = '#ffffff'
+    align: str = 'center'
+    font: str = ''
+
+    @property
+    def dynamic(self) -> bool:
+        return any(name for _, name, _, _ in string.Formatter().parse(self.text) if name)
+
+
+@dataclass(frozen=True)
+class TemplateSpec:
+    """
+    A validated FrameTemplate.spec.
+
+    Example (a three-shot strip):
+        {"canvas": [600, 1800],
+         "slots": [[0.05, 0.03, 0.9, 0.28], [0.05, 0.33, 0.9, 0.28], [0.05, 0.63, 0.9, 0.28]],
+         "background": "#ffffff",
+         "overlays": [{"image": "templates/expo-strip.png"}],
+         "texts": [{"text": "Expo 2026 - {date}", "position": [0.5, 0.96], "color": "#222222"}]}
+    """
+    canvas: Optional[Tuple[int, int]] = None
+    slots: Tuple[Rect, ...] = ((0.0, 0.0, 1.0, 1.0),)
+    background: str = '#000000'
+    overlays: Tuple[Overlay, ...] = ()
+    texts: Tuple[Text, ...] = ()
+
+    @property
+    def shots(self) -> int:
+        return len(self.slots)
+
+    def canvas_size(self, frame_size: Tuple[int, int]) -> Tuple[int, int]:
+        """Output (width, height) for captures of ``frame_size``."""
+        if self.canvas is None:
+            return frame_size
+        scale = frame_size[1] / REFERENCE_HEIGHT
+        return max(1, round(self.canvas[0] * scale)), max(1, round(self.canvas[1] * scale))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TemplateSpec":
+        """
+        Raises:
+            ValueError: unknown keys or invalid values.
+        """
+        if not isinstance(data, dict):
+            raise ValueError("Template spec must be a JSON object")
+        unknown = set(data) - {'canvas', 'slots', 'background', 'overlays', 'texts'}
+        if unknown:
+            raise ValueError(f"Unknown template key(s): {', '.join(sorted(unknown))}")
+
+        canvas = data.get('canvas')
+        if canvas is not None:
+            if not (isinstance(canvas, (list, tuple)) and len(canvas) == 2 and
+                    all(isinstance(v, int) and v > 0 for v in canvas)):
+                raise ValueError("canvas must be [width, height] in pixels")
+            canvas = tuple(canvas)
+        slots = tuple(_rect(slot, 'slot') for slot in data.get('slots', [[0, 0, 1, 1]]))
+        if not slots:
+            raise ValueError("A template needs at least one photo slot")
+        background = data.get('background', '#000000')
+        if not isinstance(background, str) or not background:
+            raise ValueError("background must be a #rrggbb color or an image path")
+        if background.startswith('#'):
+            parse_color(background)
+
+        overlays = []
+        for item in data.get('overlays', []):
+            if not isinstance(item, dict) or not isinstance(item.get('image'), str):
+                raise ValueError('overlays must be objects like {"image": "frame.png"}')
+            overlays.append(Overlay(item['image'], _rect(item.get('rect', [0, 0, 1, 1]), 'overlay rect')))
+
+        texts = []
+        for item in data.get('texts', []):
+            if not isinstance(item, dict) or not isinstance(item.get('text'), str):
+                raise ValueError('texts must be objects like {"text": "Hello"}')
+            text = Text(**{k: (tuple(v) if k == 'position' else v) for k, v in item.items()
+                           if k in Text.__dataclass_fields__})
+            names = {name for _, name, _, _ in string.Formatter().parse(text.text) if name is not None}
+            if names - PLACEHOLDERS:
+                raise ValueError(f"Unknown placeholder(s) {sorted(names - PLACEHOLDERS)}; "
+                                 f"use {sorted(PLACEHOLDERS)}")
+            parse_color(text.color)
+            if text.align not in ALIGNS or not 0 < text.size <= 1:
+                raise ValueError(f"text align must be one of {ALIGNS} and size in (0, 1]")
+            texts.append(text)
+        return cls(canvas, slots, background, tuple(overlays), tuple(texts))
+
+
+def resolve_image(name: str) -> str:
+    """An absolute path, a file under MEDIA_ROOT, or a static file name."""
+    if os.path.isabs(name):
+        return name
+    from django.conf import settings
+    from django.contrib.staticfiles import finders
+
+    media = os.path.join(str(settings.MEDIA_ROOT), name)
+    if os.path.exists(media):
+        return media
+    found = finders.find(name)
+    if not found:
+        raise ValueError(f"Template image {name} not found in MEDIA_ROOT or static files")
+    return found
+
+
+def _read(name: str, flags: int) -> np.ndarray:
+    image = cv2.imread(resolve_image(name), flags)
+    if image is None:
+        raise ValueError(f"Cannot decode template image {name}")
+    return image
+
+
+def _cover(image: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Scale ``image`` to fill width x height, cropping the overflow evenly."""
+    h, w = image.shape[:2]
+    if (w, h) == (width, height):
+        return image
+    scale = max(width / w, height / h)
+    crop_w, crop_h = min(w, round(width / scale)), min(h, round(height / scale))
+    x0, y0 = (w - crop_w) // 2, (h - crop_h) // 2
+    cropped = image[y0:y0 + crop_h, x0:x0 + crop_w]
+    # INTER_AREA is ~6x slower than linear at fractional ratios; use it only for exact halvings,
+    # which is where linear would alias, and finish the last step (> 0.5x) with linear
+    while scale <= 0.5:
+        cropped = cv2.resize(cropped, (cropped.shape[1] // 2, cropped.shape[0] // 2), interpolation=cv2.INTER_AREA)
+        scale *= 2
+    return cv2.resize(cropped, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+def _pixel_rect(rect: Rect, width: int, height: int) -> Tuple[int, int, int, int]:
+    """Fractions -> (x0, y0, x1, y1) clipped to the canvas."""
+    x, y, w, h = rect
+    x0, y0 = round(x * width), round(y * height)
+    x1, y1 = x0 + max(1, round(w * width)), y0 + max(1, round(h * height))
+    return max(0, x0), max(0, y0), min(width, x1), min(height, y1)
+
+
+@lru_cache(maxsize=64)
+def _font(path: str, pixels: int):
+    return ImageFont.truetype(path, pixels) if path else ImageFont.load_default(pixels)
+
+
+@lru_cache(maxsize=64)
+def text_patch(text: str, pixels: int, color: str, font: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rendered text as a premultiplied BGR patch and its alpha (both uint8).
+
+    Cached: a template's date line is the same string all day.
+    """
+    face = _font(font, pixels)
+    left, top, right, bottom = face.getbbox(text)
+    mask = Image.new('L', (max(1, right - left), max(1, bottom - top)), 0)
+    ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=face)
+    alpha = np.asarray(mask, dtype=np.uint8)[..., None]
+    premultiplied = (np.array(parse_color(color), dtype=np.uint16) * alpha // 255).astype(np.uint8)
+    return premultiplied, alpha
+
+
+def _text_origin(text: Text, patch: np.ndarray, width: int, height: int) -> Tuple[int, int]:
+    h, w = patch.shape[:2]
+    x = round(text.position[0] * width)
+    x -= {'left': 0, 'center': w // 2, 'right': w}[text.align]
+    return x, round(text.position[1] * height) - h // 2
+
+
+def _paste(canvas_c: np.ndarray, canvas_a: np.ndarray, color: np.ndarray, alpha: np.ndarray, x: int, y: int) -> None:
+    """Premultiplied 'over' of a float layer into the accumulated overlay (clipped)."""
+    height, width = canvas_a.shape[:2]
+    h, w = alpha.shape[:2]
+    x0, y0, x1, y1 = max(0, x), max(0, y), min(width, x + w), min(height, y + h)
+    if x0 >= x1 or y0 >= y1:
+        return
+    c = color[y0 - y:y1 - y, x0 - x:x1 - x]
+    a = alpha[y0 - y:y1 - y, x0 - x:x1 - x]
+    canvas_c[y0:y1, x0:x1] = c + canvas_c[y0:y1, x0:x1] * (1 - a)
+    canvas_a[y0:y1, x0:x1] = a + canvas_a[y0:y1, x0:x1] * (1 - a)
+
+
+def blend(dst: np.ndarray, premultiplied: np.ndarray, inverse_alpha: np.ndarray) -> None:
+    """dst = dst * inverse_alpha / 255 + premultiplied, in place (uint8, same shape)."""
+    cv2.multiply(dst, inverse_alpha, dst=dst, scale=1 / 255)
+    cv2.add(dst, premultiplied, dst=dst)
+
+
+@dataclass
+class Layers:
+    """The photo-independent part of a template at one canvas size."""
+    size: Tuple[int, int]
+    background: np.ndarray                                    # (H, W, 3) uint8
+    slots: List[Tuple[int, int, int, int]]                    # x0, y0, x1, y1
+    # Overlay tiles: (x0, y0, x1, y1, premultiplied BGR, 255 - alpha), uint8, only where alpha > 0
+    tiles: List[Tuple[int, int, int, int, np.ndarray, np.ndarray]] = field(default_factory=list)
+    dynamic_texts: List[Text] = field(default_factory=list)
+
+    @property
+    def nbytes(self) -> int:
+        return self.background.nbytes + sum(t[4].nbytes + t[5].nbytes for t in self.tiles)
+
+
+def build_layers(spec: TemplateSpec, size: Tuple[int, int]) -> Layers:
+    width, height = size
+    if spec.background.startswith('#'):
+        background = np.empty((height, width, 3), dtype=np.uint8)
+        background[:] = parse_color(spec.background)
+    else:
+        background = np.ascontiguousarray(_cover(_read(spec.background, cv2.IMREAD_COLOR), width, height))
+
+    static_texts = [t for t in spec.texts if not t.dynamic]
+    layers = Layers(size, background, [_pixel_rect(slot, width, height) for slot in spec.slots],
+                    dynamic_texts=[t for t in spec.texts if t.dynamic])
+    if not spec.overlays and not static_texts:
+        return layers
+
+    color = np.zeros((height, width, 3), dtype=np.float32)
+    alpha = np.zeros((height, width, 1), dtype=np.float32)
+    for overlay in spec.overlays:
+        image = _read(overlay.image, cv2.IMREAD_UNCHANGED)
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+        elif image.shape[2] == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+        x0, y0, x1, y1 = _pixel_rect(overlay.rect, width, height)
+        interpolation = cv2.INTER_AREA if x1 - x0 < image.shape[1] else cv2.INTER_LINEAR
+        image = cv2.resize(image, (x1 - x0, y1 - y0), interpolation=interpolation).astype(np.float32) / 255
+        a = image[..., 3:]
+        _paste(color, alpha, image[..., :3] * a, a, x0, y0)
+    for text in static_texts:
+        patch, patch_alpha = text_patch(text.text, max(1, round(text.size * height)), text.color, text.font)
+        x, y = _text_origin(text, patch, width, height)
+        _paste(color, alpha, patch.astype(np.float32) / 255, patch_alpha.astype(np.float32) / 255, x, y)
+
+    premultiplied = np.round(color * 255).astype(np.uint8)
+    inverse = np.repeat(255 - np.round(alpha * 255).astype(np.uint8), 3, axis=2)
+    # Tiles the overlay covers, merged into horizontal runs per tile row
+    rows = np.arange(0, height, TILE)
+    cols = np.arange(0, width, TILE)
+    covered = np.maximum.reduceat(np.maximum.reduceat(alpha[..., 0] > 0, rows, axis=0), cols, axis=1)
+    for r, y0 in enumerate(rows):
+        y1 = min(y0 + TILE, height)
+        c = 0
+        while c < len(cols):
+            if not covered[r, c]:
+                c += 1
+                continue
+            start = c
+            while c < len(cols) and covered[r, c]:
+                c += 1
+            x0, x1 = cols[start], min(cols[c - 1] + TILE, width)
+            layers.tiles.append((int(x0), int(y0), int(x1), int(y1),
+                                 np.ascontiguousarray(premultiplied[y0:y1, x0:x1]),
+                                 np.ascontiguousarray(inverse[y0:y1, x0:x1])))
+    return layers
+
+
+class LayerCache:
+    """Layers per (template key, canvas size), least recently used evicted first."""
+
+    def __init__(self, size: int = 4):
+        self.size = size
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[Tuple[Hashable, Tuple[int, int]], Layers]" = OrderedDict()
+
+    def get(self, key: Hashable, spec: TemplateSpec, size: Tuple[int, int]) -> Layers:
+        with self.lock:
+            layers = self.entries.get((key, size))
+            if layers is not None:
+                self.entries.move_to_end((key, size))
+                return layers
+        # Built outside the lock: a 4K template takes a while, other templates shouldn't wait
+        layers = build_layers(spec, size)
+        with self.lock:
+            self.entries[(key, size)] = layers
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return layers
+
+
+def compose(layers: Layers, frames: Sequence[np.ndarray], context: Optional[Dict[str, str]] = None) -> np.ndarray:
+    """
+    Photos placed into the slots (missing shots leave the background), then the overlay.
+
+    Returns:
+        (H, W, 3) uint8 BGR image; never one of ``frames`` or the cached layers.
+    """
+    width, height = layers.size
+    full = layers.slots == [(0, 0, width, height)] and frames and frames[0].shape[:2] == (height, width)
+    if full:
+        # Single shot at capture resolution: the photo is the canvas
+        canvas = frames[0].copy()
+    else:
+        canvas = layers.background.copy()
+        for frame, (x0, y0, x1, y1) in zip(frames, layers.slots):
+            canvas[y0:y1, x0:x1] = _cover(frame, x1 - x0, y1 - y0)
+
+    for x0, y0, x1, y1, premultiplied, inverse in layers.tiles:
+        region = canvas[y0:y1, x0:x1]
+        # OpenCV writes into the view only if it is contiguous per row, which a slice of the canvas is
+        blend(region, premultiplied, inverse)
+
+    for text in layers.dynamic_texts:
+        value = text.text.format(**{**dict.fromkeys(PLACEHOLDERS, ''), **(context or {})})
+        if not value.strip():
+            continue
+        patch, alpha = text_patch(value, max(1, round(text.size * height)), text.color, text.font)
+        x, y = _text_origin(text, patch, width, height)
+        h, w = alpha.shape[:2]
+        x0, y0, x1, y1 = max(0, x), max(0, y), min(width, x + w), min(height, y + h)
+        if x0 < x1 and y0 < y1:
+            inverse = np.repeat(255 - alpha[y0 - y:y1 - y, x0 - x:x1 - x], 3, axis=2)
+            blend(canvas[y0:y1, x0:x1], np.ascontiguousarray(patch[y0 - y:y1 - y, x0 - x:x1 - x]), inverse)
+    return canvas
+
+
+class Compositor:
+    """Layer cache plus a worker pool; composition runs off the capture thread."""
+
+    def __init__(self, workers: int = 1, cache_size: int = 4):
+        self.cache = LayerCache(cache_size)
+        self.executor = ThreadPoolExecutor(max(1, workers), thread_name_prefix='compositor')
+
+    def compose(self, key: Hashable, spec: TemplateSpec, frames: Sequence[np.ndarray],
+                context: Optional[Dict[str, str]] = None) -> np.ndarray:
+        if not frames:
+            raise ValueError("Nothing to compose")
+        height, width = frames[0].shape[:2]
+        return compose(self.cache.get(key, spec, spec.canvas_size((width, height))), frames, context)
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        return self.executor.submit(fn, *args, **kwargs)
+
+
+_compositor: Optional[Compositor] = None
+_compositor_lock = threading.Lock()
+
+
+def compositor() -> Compositor:
+    global _compositor
+    from django.conf import settings
+
+    with _compositor_lock:
+        if _compositor is None:
+            _compositor = Compositor(getattr(settings, 'STUDIO_COMPOSITE_WORKERS', 1),
+                                     getattr(settings, 'STUDIO_COMPOSITE_CACHE', 4))
+        return _compositor
+
+
+def active_template():
+    """
+    The active FrameTemplate and its parsed spec, or (None, None).
+
+    Raises:
+        ValueError: the active template's spec is invalid.
+    """
+    from .models import FrameTemplate
+
+    template = FrameTemplate.objects.filter(active=True).first()
+    if template is None:
+        return None, None
+    return template, TemplateSpec.from_dict(template.spec)
+
+
+def save_composite(template, spec: TemplateSpec, frames: Sequence[np.ndarray], captures: Sequence[Any],
+                   quality: int, session: str = ''):
+    """
+    Compose ``frames`` with ``template`` and store the result as a Composite.
+
+    Runs on the compositor pool (see submit_composite).
+    """
+    from django.core.files.base import ContentFile
+    from django.utils import timezone
+
+    from .models import Composite
+
+    now = timezone.localtime()
+    context = {'date': now.strftime('%d-%m-%Y'), 'time': now.strftime('%H:%M'), 'session': session}
+    start = time.perf_counter()
+    image = compositor().compose((template.pk, template.updated), spec, frames, context)
+    compose_ms = (time.perf_counter() - start) * 1000.0
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Cannot encode the composite")
+    composite = Composite(template=template, width=image.shape[1], height=image.shape[0], compose_ms=compose_ms)
+    composite.image.save(f"composite_{now.strftime('%Y%m%d_%H%M%S')}.jpg", ContentFile(buffer.tobytes()),
+                         save=False)
+    composite.save()
+    composite.captures.set([c for c in captures if c is not None])
+    print(f"[SUCCESS] {composite} {image.shape[1]}x{image.shape[0]} composed in {compose_ms:.1f} ms")
+    return composite
+
+
+def submit_composite(template, spec: TemplateSpec, frames: Sequence[np.ndarray], captures: Sequence[Any],
+                     quality: int, session: str = '') -> Future:
+    """Queue save_composite on the compositor pool; returns at once."""
+    def job():
+        try:
+            return save_composite(template, spec, frames, captures, quality, session)
+        except Exception as e:
+            print(f"[ERROR] Compositing with template {template} failed: {e}")
+            raise
+    return compositor().submit(job)
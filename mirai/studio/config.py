@@ -0,0 +1,97 @@
+import dataclasses
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional
+
+from django.conf import settings
+
+from .stickers import ANCHORS as STICKER_ANCHORS
+from .utils.triggers import TRIGGER_POLICIES
+
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    """
+    Runtime knobs of the camera/detection pipeline.
+
+    Instances are immutable: CameraService swaps the whole object, and the
+    camera loop reads it once per frame, so a change is applied atomically
+    between two frames. Defaults can be overridden per venue through the
+    STUDIO_PIPELINE dict in settings, then live through the admin or the
+    studio/config endpoint.
+    """
+    # Run detection on every Nth frame
+    detection_interval: int = 5
+    # Scale of the frame handed to the detector
+    detection_scale: float = 0.5
+    # Consecutive palm detections before the countdown starts
+    # (at 30fps / 5 skip = 6 checks/sec -> 10 checks ~ 1.6s)
+    min_frames: int = 10
+    # Pause after each camera loop iteration / each streamed frame (seconds)
+    loop_sleep: float = 0.01
+    stream_sleep: float = 0.03
+    # JPEG quality of the MJPEG stream and of saved captures
+    stream_jpeg_quality: int = 95
+    capture_jpeg_quality: int = 95
+    # Classifier threshold for a palm to count
+    confidence: float = 0.60
+    max_num_hands: int = 4
+    trigger_policy: str = 'any_palm'
+    crop_cache: bool = True
+    crop_cache_ttl: float = 0.5
+    countdown_seconds: int = 3
+    # Label stamped on new captures (e.g. the event name), to export them together
+    session: str = ''
+    # Where the picked sticker sits ('above' the hand or on the 'palm') and its width relative to the hand
+    sticker_anchor: str = 'above'
+    sticker_scale: float = 1.0
+
+    def __post_init__(self):
+        for field in dataclasses.fields(self):
+            value = getattr(self, field.name)
+            expected = field.type if isinstance(field.type, type) else type(field.default)
+            if expected is float and isinstance(value, int) and not isinstance(value, bool):
+                object.__setattr__(self, field.name, float(value))
+            elif not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+                raise ValueError(f"{field.name} must be {expected.__name__}, got {value!r}")
+
+        if self.detection_interval < 1:
+            raise ValueError("detection_interval must be >= 1")
+        if not 0.1 <= self.detection_scale <= 1.0:
+            raise ValueError("detection_scale must be between 0.1 and 1.0")
+        if self.min_frames < 1:
+            raise ValueError("min_frames must be >= 1")
+        if self.loop_sleep < 0 or self.stream_sleep < 0 or self.crop_cache_ttl < 0:
+            raise ValueError("sleep and ttl values must be >= 0")
+        for name in ('stream_jpeg_quality', 'capture_jpeg_quality'):
+            if not 1 <= getattr(self, name) <= 100:
+                raise ValueError(f"{name} must be between 1 and 100")
+        if not 0.0 <= self.confidence <= 1.0:
+            raise ValueError("confidence must be between 0 and 1")
+        if not 1 <= self.max_num_hands <= 8:
+            raise ValueError("max_num_hands must be between 1 and 8")
+        if self.trigger_policy not in TRIGGER_POLICIES:
+            raise ValueError(f"trigger_policy must be one of {TRIGGER_POLICIES}")
+        if self.countdown_seconds < 0:
+            raise ValueError("countdown_seconds must be >= 0")
+        if len(self.session) > 100:
+            raise ValueError("session must be at most 100 characters")
+        if self.sticker_anchor not in STICKER_ANCHORS:
+            raise ValueError(f"sticker_anchor must be one of {STICKER_ANCHORS}")
+        if not 0.1 <= self.sticker_scale <= 4.0:
+            raise ValueError("sticker_scale must be between 0.1 and 4.0")
+
+    def updated(self, changes: Mapping[str, Any]) -> "PipelineConfig":
+        """Return a validated copy with ``changes`` applied."""
+        unknown = set(changes) - {field.name for field in dataclasses.fields(self)}
+        if unknown:
+            raise ValueError(f"Unknown setting(s): {', '.join(sorted(unknown))}")
+        return dataclasses.replace(self, **changes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def from_settings(cls, overrides: Optional[Mapping[str, Any]] = None) -> "PipelineConfig":
+        """Defaults, then settings.STUDIO_PIPELINE, then ``overrides``."""
+        config = cls().updated(getattr(settings, 'STUDIO_PIPELINE', {}))
+        return config.updated(overrides or {})
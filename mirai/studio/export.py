@@ -0,0 +1,350 @@
+"""
+Streaming ZIP export of captures.
+
+The archive is written on the fly while it is sent: entries are stored (the
+JPEGs are compressed already, deflating them again only burns CPU), so the
+byte layout of the whole archive follows from the file names and sizes
+alone. That gives an exact Content-Length up front and lets any byte range
+be produced without building what precedes it, which is what makes
+interrupted downloads resumable (Range / If-Range).
+
+CRC-32s are only known after a file has been read, so every entry sets
+general purpose bit 3 and carries its CRC in a data descriptor after the
+data, and again in the central directory. A request that starts past some
+entries reads those files once more just for their CRC (cached per file).
+Memory stays at one read buffer plus a few bytes of metadata per entry.
+Zip64 records are added when the archive passes 65535 entries or 4 GiB.
+"""
+import bisect
+import hashlib
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import quote_etag
+from django.utils.text import slugify
+
+READ_SIZE = 1 << 20
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP32_COUNT_LIMIT = 0xFFFF
+VERSION = 20
+VERSION_ZIP64 = 45
+# Data descriptor follows the data (bit 3), names are UTF-8 (bit 11)
+FLAGS = 0x0808
+# Made by Unix, regular file rw-r--r--
+MADE_BY_UNIX = 3 << 8
+EXTERNAL_ATTR = 0o100644 << 16
+
+LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+DATA_DESCRIPTOR = struct.Struct('<IIII')
+CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+ZIP64_OFFSET_EXTRA = struct.Struct('<HHQ')
+ZIP64_END = struct.Struct('<IQHHIIQQQQ')
+ZIP64_LOCATOR = struct.Struct('<IIQI')
+END = struct.Struct('<IHHHHIIH')
+
+LOCAL, DATA, DESCRIPTOR, CENTRAL, TAIL = range(5)
+
+
+@dataclass
+class ZipEntry:
+    name: str            # path inside the archive
+    path: str            # file on disk
+    size: int
+    mtime: datetime      # stored as DOS local time
+    mtime_ns: int = 0    # of the file, part of the ETag and the CRC cache key
+
+
+def _dos_datetime(value: datetime) -> Tuple[int, int]:
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    if value.year < 1980:
+        return 0, (1 << 5) | 1
+    return ((value.hour << 11) | (value.minute << 5) | (value.second // 2),
+            ((value.year - 1980) << 9) | (value.month << 5) | value.day)
+
+
+# (path, size, mtime_ns) -> CRC-32, so a resumed download doesn't re-read what it already hashed
+_crc_cache: Dict[Tuple[str, int, int], int] = {}
+CRC_CACHE_SIZE = 200000
+
+
+def _advise(path_or_fd, advice_name: str) -> None:
+    # Sequential read-ahead hints; not available on Windows
+    advice = getattr(os, advice_name, None)
+    if advice is None or not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        if isinstance(path_or_fd, int):
+            os.posix_fadvise(path_or_fd, 0, 0, advice)
+        else:
+            fd = os.open(path_or_fd, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, advice)
+            finally:
+                os.close(fd)
+    except OSError:
+        pass
+
+
+class StoredZip:
+    """
+    A stored (uncompressed) ZIP of ``entries`` that is produced lazily, by byte range.
+
+    Raises:
+        ValueError: duplicate names or a file of 4 GiB or more.
+    """
+
+    def __init__(self, entries: List[ZipEntry]):
+        self.entries = entries
+        self.crcs: List[Optional[int]] = [None] * len(entries)
+        self.names = [entry.name.encode('utf-8') for entry in entries]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("Duplicate entry names")
+
+        # Segment table: start offset, kind, entry index (length follows from the next start)
+        self.starts: List[int] = []
+        self.kinds: List[Tuple[int, int]] = []
+        self.offsets: List[int] = []
+        position = 0
+        for index, entry in enumerate(entries):
+            if entry.size >= ZIP32_LIMIT:
+                raise ValueError(f"{entry.path} is too large for a stored entry")
+            self.offsets.append(position)
+            for kind, length in ((LOCAL, LOCAL_HEADER.size + len(self.names[index])), (DATA, entry.size),
+                                 (DESCRIPTOR, DATA_DESCRIPTOR.size)):
+                self._segment(position, kind, index)
+                position += length
+        self.central_offset = position
+        for index in range(len(entries)):
+            self._segment(position, CENTRAL, index)
+            position += CENTRAL_HEADER.size + len(self.names[index]) + self._central_extra_size(index)
+        self.central_size = position - self.central_offset
+        self.zip64 = (len(entries) >= ZIP32_COUNT_LIMIT or self.central_offset >= ZIP32_LIMIT
+                      or self.central_size >= ZIP32_LIMIT)
+        self._segment(position, TAIL, 0)
+        self.tail_offset = position
+        position += END.size + (ZIP64_END.size + ZIP64_LOCATOR.size if self.zip64 else 0)
+        self.size = position
+        self.starts.append(position)
+
+    def _segment(self, start: int, kind: int, index: int) -> None:
+        self.starts.append(start)
+        self.kinds.append((kind, index))
+
+    def _central_extra_size(self, index: int) -> int:
+        return ZIP64_OFFSET_EXTRA.size if self.offsets[index] >= ZIP32_LIMIT else 0
+
+    @property
+    def etag(self) -> str:
+        """Strong validator: changes whenever any entry's name, size or file mtime does."""
+        sha = hashlib.sha1()
+        for entry in self.entries:
+            sha.update(f"{entry.name}\0{entry.size}\0{entry.mtime_ns}\n".encode('utf-8'))
+        return quote_etag(sha.hexdigest())
+
+    # --- content -----------------------------------------------------------
+
+    def _crc(self, index: int) -> int:
+        if self.crcs[index] is None:
+            entry = self.entries[index]
+            key = (entry.path, entry.size, entry.mtime_ns)
+            crc = _crc_cache.get(key)
+            if crc is None:
+                crc = 0
+                for block in self._read(entry):
+                    crc = zlib.crc32(block, crc)
+                self._remember(key, crc)
+            self.crcs[index] = crc
+        return self.crcs[index]
+
+    @staticmethod
+    def _remember(key: Tuple[str, int, int], crc: int) -> None:
+        if len(_crc_cache) >= CRC_CACHE_SIZE:
+            _crc_cache.pop(next(iter(_crc_cache)))
+        _crc_cache[key] = crc
+
+    def _read(self, entry: ZipEntry) -> Iterator[bytes]:
+        remaining = entry.size
+        with open(entry.path, 'rb', buffering=0) as f:
+            _advise(f.fileno(), 'POSIX_FADV_SEQUENTIAL')
+            while remaining > 0:
+                block = f.read(min(READ_SIZE, remaining))
+                if not block:
+                    raise OSError(f"{entry.path} shrank while it was being exported")
+                remaining -= len(block)
+                yield block
+
+    def _data(self, index: int, start: int, end: int) -> Iterator[bytes]:
+        """Bytes [start, end) of an entry's file; the whole file is read once to get its CRC."""
+        entry = self.entries[index]
+        if index + 1 < len(self.entries):
+            # Let the kernel fetch the next photo while this one is being sent
+            _advise(self.entries[index + 1].path, 'POSIX_FADV_WILLNEED')
+        crc, position = 0, 0
+        for block in self._read(entry):
+            if self.crcs[index] is None:
+                crc = zlib.crc32(block, crc)
+            block_end = position + len(block)
+            if block_end > start and position < end:
+                yield block[max(start - position, 0):min(end, block_end) - position]
+            elif position >= end and self.crcs[index] is not None:
+                return
+            position = block_end
+        if self.crcs[index] is None:
+            self.crcs[index] = crc
+            self._remember((entry.path, entry.size, entry.mtime_ns), crc)
+
+    def _local_header(self, index: int) -> bytes:
+        time_, date = _dos_datetime(self.entries[index].mtime)
+        return LOCAL_HEADER.pack(0x04034b50, VERSION, FLAGS, 0, time_, date, 0, 0, 0,
+                                 len(self.names[index]), 0) + self.names[index]
+
+    def _descriptor(self, index: int) -> bytes:
+        size = self.entries[index].size
+        return DATA_DESCRIPTOR.pack(0x08074b50, self._crc(index), size, size)
+
+    def _central_header(self, index: int) -> bytes:
+        entry, offset = self.entries[index], self.offsets[index]
+        time_, date = _dos_datetime(entry.mtime)
+        extra = ZIP64_OFFSET_EXTRA.pack(0x0001, 8, offset) if offset >= ZIP32_LIMIT else b''
+        version = VERSION_ZIP64 if extra else VERSION
+        return CENTRAL_HEADER.pack(0x02014b50, MADE_BY_UNIX | version, version, FLAGS, 0, time_, date,
+                                   self._crc(index), entry.size, entry.size, len(self.names[index]), len(extra),
+                                   0, 0, 0, EXTERNAL_ATTR, min(offset, ZIP32_LIMIT)) + self.names[index] + extra
+
+    def _tail(self) -> bytes:
+        count = len(self.entries)
+        records = b''
+        if self.zip64:
+            records += ZIP64_END.pack(0x06064b50, ZIP64_END.size - 12, VERSION_ZIP64, VERSION_ZIP64, 0, 0,
+                                      count, count, self.central_size, self.central_offset)
+            records += ZIP64_LOCATOR.pack(0x07064b50, 0, self.tail_offset, 1)
+        return records + END.pack(0x06054b50, 0, 0, min(count, ZIP32_COUNT_LIMIT), min(count, ZIP32_COUNT_LIMIT),
+                                  min(self.central_size, ZIP32_LIMIT), min(self.central_offset, ZIP32_LIMIT), 0)
+
+    def iter_range(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """The archive's bytes [start, end) in chunks of at most READ_SIZE."""
+        end = self.size if end is None else min(end, self.size)
+        if start >= end:
+            return
+        segment = bisect.bisect_right(self.starts, start) - 1
+        pending = bytearray()
+        while segment < len(self.kinds) and self.starts[segment] < end:
+            seg_start, seg_end = self.starts[segment], self.starts[segment + 1]
+            kind, index = self.kinds[segment]
+            lo, hi = max(start, seg_start) - seg_start, min(end, seg_end) - seg_start
+            if kind == DATA:
+                if pending:
+                    yield bytes(pending)
+                    pending.clear()
+                yield from self._data(index, lo, hi)
+            else:
+                if kind == LOCAL:
+                    record = self._local_header(index)
+                elif kind == DESCRIPTOR:
+                    record = self._descriptor(index)
+                elif kind == CENTRAL:
+                    record = self._central_header(index)
+                else:
+                    record = self._tail()
+                # Headers are tiny: batch them instead of yielding a few dozen bytes at a time
+                pending += record[lo:hi]
+                if len(pending) >= READ_SIZE:
+                    yield bytes(pending)
+                    pending.clear()
+            segment += 1
+        if pending:
+            yield bytes(pending)
+
+
+def _parse_bound(value: str, end: bool) -> datetime:
+    """A date (whole day, so an end date is inclusive) or an ISO datetime, in the current time zone."""
+    try:
+        # Date first: parse_datetime also accepts a bare date, as midnight
+        day = parse_date(value)
+        moment = parse_datetime(value) if day is None else None
+    except ValueError:
+        day = moment = None
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    elif moment is None:
+        raise ValueError(f"Invalid date {value!r} (use YYYY-MM-DD or an ISO datetime)")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def select_captures(session: Optional[str] = None, start: Optional[str] = None,
+                    end: Optional[str] = None) -> Tuple[Iterable, str]:
+    """
+    Captures of a session and/or date range, oldest first, and a name for the archive.
+
+    Raises:
+        ValueError: no filter given, or a date that cannot be parsed.
+    """
+    from .models import Capture
+
+    if not (session or start or end):
+        raise ValueError("Give a session and/or a start/end date")
+    queryset = Capture.objects.order_by('timestamp', 'id').only('id', 'image', 'timestamp')
+    if session:
+        queryset = queryset.filter(session=session)
+    if start:
+        queryset = queryset.filter(timestamp__gte=_parse_bound(start, end=False))
+    if end:
+        queryset = queryset.filter(timestamp__lt=_parse_bound(end, end=True))
+    name = slugify('-'.join(part for part in ('captures', session, start, end) if part)) or 'captures'
+    return queryset.iterator(chunk_size=2000), name
+
+
+def capture_entries(captures: Iterable, folder: str) -> Tuple[List[ZipEntry], int]:
+    """
+    Archive entries for Capture rows (with ``image`` and ``timestamp``), in the given order.
+
+    Returns:
+        (entries, number of captures whose file is missing)
+    """
+    entries, missing = [], 0
+    for capture in captures:
+        try:
+            path = capture.image.path
+            stat = os.stat(path)
+        except (ValueError, OSError):
+            missing += 1
+            continue
+        name = f"{folder}/{capture.id:06d}_{os.path.basename(capture.image.name)}"
+        entries.append(ZipEntry(name, path, stat.st_size, capture.timestamp, stat.st_mtime_ns))
+    return entries, missing
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    A single ``bytes=`` range as [start, end), or None to send everything
+    (no header, several ranges, other units: all allowed by RFC 9110).
+
+    Raises:
+        ValueError: the range is not satisfiable (416).
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[len('bytes='):].strip().partition('-')
+    try:
+        first_byte = int(first) if first else None
+        last_byte = int(last) if last else None
+    except ValueError:
+        return None
+    if first_byte is None:
+        # Suffix range: the last N bytes
+        if not last_byte:
+            raise ValueError(header)
+        return max(size - last_byte, 0), size
+    end = size if last_byte is None else min(last_byte + 1, size)
+    if first_byte >= size or end <= first_byte:
+        raise ValueError(header)
+    return first_byte, end
@@ -0,0 +1,181 @@
+"""
+Capture gallery: keyset-paginated listing and per-capture thumbnails.
+
+Pages are ordered newest first by (timestamp, id) and continue from an
+opaque cursor holding the last row's key, so page 1000 costs the same index
+range scan as page 1 (OFFSET would read and discard every earlier row). The
+capture_gallery_idx / capture_gesture_idx indexes serve both orderings.
+
+Thumbnails (THUMBNAIL_SIZES, WebP) are generated once per capture by a small
+background pool: scheduled right after the photo is saved, or on the first
+request for a capture that has none yet (older rows, failed jobs).
+Concurrent requests for the same capture share one job.
+"""
+import base64
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+from django.conf import settings
+from django.urls import reverse
+
+from .models import Capture
+
+THUMBNAIL_SIZES = (160, 480)
+THUMBNAIL_QUALITY = 80
+# Seconds a request waits for a thumbnail that is not generated yet
+THUMBNAIL_TIMEOUT = 10.0
+PAGE_SIZE = 48
+MAX_PAGE_SIZE = 200
+
+
+def thumbnail_sizes() -> Tuple[int, ...]:
+    return tuple(getattr(settings, 'STUDIO_GALLERY_THUMBNAILS', THUMBNAIL_SIZES))
+
+
+def thumbnail_path(capture_id: int, size: int) -> str:
+    return os.path.join(str(settings.MEDIA_ROOT), 'captures', 'thumbs', str(size), f"{capture_id}.webp")
+
+
+def encode_cursor(timestamp: datetime, capture_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{capture_id}".encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Raises:
+        ValueError: not a cursor returned by ``page``.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        timestamp, capture_id = raw.split('|')
+        return datetime.fromisoformat(timestamp), int(capture_id)
+    except ValueError:
+        raise ValueError(f"Invalid cursor {cursor!r}")
+
+
+def page(cursor: Optional[str] = None, limit: int = PAGE_SIZE,
+         gesture: Optional[str] = None) -> Tuple[List[Capture], Optional[str]]:
+    """
+    One gallery page, newest first.
+
+    Returns:
+        (captures, cursor of the next page or None on the last page)
+    """
+    queryset = Capture.objects.order_by('-timestamp', '-id')
+    if gesture is not None:
+        queryset = queryset.filter(gesture=gesture)
+    if cursor:
+        timestamp, capture_id = decode_cursor(cursor)
+        # (timestamp, id) < (cursor): a range on the index, the tie on equal timestamps filtered out
+        queryset = queryset.filter(timestamp__lte=timestamp).exclude(timestamp=timestamp, id__gte=capture_id)
+    captures = list(queryset[:limit + 1])
+    if len(captures) <= limit:
+        return captures, None
+    last = captures[limit - 1]
+    return captures[:limit], encode_cursor(last.timestamp, last.id)
+
+
+def serialize(capture: Capture) -> Dict[str, Any]:
+    return {
+        'id': capture.id,
+        'timestamp': capture.timestamp.isoformat(),
+        'gesture': capture.gesture,
+        'image': capture.image.url if capture.image else None,
+        'thumbnails': {str(size): reverse('gallery_thumbnail', kwargs={'capture_id': capture.id, 'size': size})
+                       for size in thumbnail_sizes()}
+    }
+
+
+def render_thumbnails(capture_id: int, image_path: str) -> Dict[str, int]:
+    """
+    Write every thumbnail size of one capture and record them on the row.
+
+    The photo is decoded once and scaled down step by step from the largest
+    size, which is cheaper than resizing the full frame for each.
+
+    Returns:
+        size (str) -> bytes
+
+    Raises:
+        ValueError: the image cannot be decoded.
+    """
+    image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"cannot decode {image_path}")
+    written = {}
+    for size in sorted(thumbnail_sizes(), reverse=True):
+        h, w = image.shape[:2]
+        scale = size / max(h, w)
+        if scale < 1:
+            image = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))),
+                               interpolation=cv2.INTER_AREA)
+        ok, data = cv2.imencode('.webp', image, [cv2.IMWRITE_WEBP_QUALITY, THUMBNAIL_QUALITY])
+        if not ok:
+            raise ValueError(f"cannot encode a thumbnail of {image_path}")
+        path = thumbnail_path(capture_id, size)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data.tobytes())
+        os.replace(path + '.tmp', path)
+        written[str(size)] = len(data)
+    Capture.objects.filter(pk=capture_id).update(thumbnails=written)
+    return written
+
+
+class ThumbnailPool:
+    """Background thumbnail jobs, at most one in flight per capture."""
+
+    def __init__(self, workers: int):
+        self.executor = ThreadPoolExecutor(max(1, workers), thread_name_prefix='thumbnails')
+        # Reentrant: a job that is already done runs its callback inside submit()
+        self.lock = threading.RLock()
+        self.pending: Dict[int, Future] = {}
+
+    def submit(self, capture_id: int, image_path: str) -> Future:
+        with self.lock:
+            future = self.pending.get(capture_id)
+            if future is None:
+                future = self.executor.submit(render_thumbnails, capture_id, image_path)
+                self.pending[capture_id] = future
+                future.add_done_callback(lambda _: self._done(capture_id))
+            return future
+
+    def _done(self, capture_id: int) -> None:
+        with self.lock:
+            self.pending.pop(capture_id, None)
+
+
+_pool: Optional[ThumbnailPool] = None
+_pool_lock = threading.Lock()
+
+
+def pool() -> ThumbnailPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThumbnailPool(getattr(settings, 'STUDIO_GALLERY_WORKERS', 2))
+        return _pool
+
+
+def schedule_thumbnails(capture: Capture) -> Future:
+    return pool().submit(capture.id, capture.image.path)
+
+
+def ensure_thumbnail(capture: Capture, size: int, timeout: float = THUMBNAIL_TIMEOUT) -> str:
+    """
+    Path of a capture's thumbnail, waiting for its job if it doesn't exist yet.
+
+    Raises:
+        ValueError, OSError: the photo cannot be read.
+        TimeoutError: the job did not finish within ``timeout``.
+    """
+    path = thumbnail_path(capture.id, size)
+    if str(size) in capture.thumbnails and os.path.exists(path):
+        return path
+    schedule_thumbnails(capture).result(timeout)
+    return path
@@ -0,0 +1,46 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from studio.gallery import pool, thumbnail_sizes
+from studio.models import Capture
+
+
+class Command(BaseCommand):
+    help = ("Generate the missing gallery thumbnails of existing captures "
+            "(new captures get theirs in the background when saved).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune', action='store_true',
+                            help='Also delete thumbnails of captures that no longer exist')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        sizes = [str(size) for size in thumbnail_sizes()]
+        jobs, failed = [], 0
+        for capture in Capture.objects.only('id', 'image', 'thumbnails').iterator(chunk_size=2000):
+            if capture.image and not all(size in capture.thumbnails for size in sizes):
+                jobs.append((capture.id, pool().submit(capture.id, capture.image.path)))
+        for capture_id, job in jobs:
+            try:
+                job.result()
+            except (OSError, ValueError) as e:
+                failed += 1
+                self.stderr.write(f"[WARN] capture {capture_id}: {e}")
+        seconds = time.perf_counter() - start
+        rate = f", {len(jobs) / seconds:.1f}/s" if jobs else ""
+        self.stdout.write(f"[INFO] {len(jobs) - failed} capture(s) thumbnailed, {failed} failed ({seconds:.1f}s{rate})")
+
+        if options['prune']:
+            root = os.path.join(str(settings.MEDIA_ROOT), 'captures', 'thumbs')
+            existing = set(Capture.objects.values_list('id', flat=True))
+            pruned = 0
+            for directory, _, files in os.walk(root):
+                for file_name in files:
+                    stem = os.path.splitext(file_name)[0]
+                    if not stem.isdigit() or int(stem) not in existing:
+                        os.remove(os.path.join(directory, file_name))
+                        pruned += 1
+            self.stdout.write(f"[INFO] {pruned} orphaned thumbnail(s) removed")
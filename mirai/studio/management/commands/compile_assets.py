@@ -0,0 +1,147 @@
+import json
+import os
+from dataclasses import asdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from studio.assets import compile_obj
+from studio.assets.compiler import DEFAULT_LODS
+from studio.assets.textures import DISPLAY_SIZE, FORMATS, TextureSettings
+
+
+def _size(num_bytes: int) -> str:
+    return f"{num_bytes / 1024 / 1024:.2f} MB" if num_bytes >= 1024 * 1024 else f"{num_bytes / 1024:.0f} KB"
+
+
+class Command(BaseCommand):
+    help = "Compile the OBJ/MTL characters in 3d/ into compact GLB files for the AR studio."
+
+    # A build step: skip the system checks, whose URL check imports CameraService (TensorFlow, MediaPipe)
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=str(settings.BASE_DIR / '3d'),
+                            help='Folder with the OBJ/MTL assets (searched recursively)')
+        parser.add_argument('--output', default=str(settings.BASE_DIR / 'studio' / 'static' / 'studio' / 'models'),
+                            help='Folder for the compiled GLB files and assets.json')
+        parser.add_argument('--no-quantize', action='store_true',
+                            help='Keep float32 attributes (no KHR_mesh_quantization)')
+        parser.add_argument('--lods', default=','.join(str(r) for r in DEFAULT_LODS),
+                            help="Triangle ratios of the simplified levels, e.g. '0.5,0.25' ('' = none)")
+        parser.add_argument('--max-texture-size', type=int, default=1024,
+                            help='Largest texture side after resizing (power of two)')
+        parser.add_argument('--display-size', type=int, default=DISPLAY_SIZE,
+                            help='Screen pixels the character covers at most; sets the texture resolution')
+        parser.add_argument('--texture-format', choices=FORMATS, default='webp',
+                            help='Format of the embedded textures (PNG masters are always written)')
+        parser.add_argument('--texture-quality', type=int, default=90, help='WebP quality (1-100)')
+        parser.add_argument('--no-atlas', action='store_true', help='Do not pack small textures into an atlas')
+        parser.add_argument('--raw-textures', action='store_true',
+                            help='Embed the original texture files unchanged (skip the texture stage)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Threads used to resize and encode textures')
+        parser.add_argument('--force', action='store_true',
+                            help='Recompile even if the GLB is newer than its sources')
+
+    def handle(self, *args, **options):
+        source = Path(options['source'])
+        output = Path(options['output'])
+        quantize = not options['no_quantize']
+        lods = [float(r) for r in options['lods'].split(',') if r.strip()]
+        if any(not 0 < r < 1 for r in lods):
+            self.stderr.write("[ERROR] --lods ratios must be between 0 and 1")
+            return
+        textures = None if options['raw_textures'] else TextureSettings(
+            max_size=options['max_texture_size'], display_size=options['display_size'],
+            atlas=not options['no_atlas'], format=options['texture_format'],
+            quality=options['texture_quality'], workers=options['workers'])
+        # Settings that change the output (the worker count doesn't)
+        texture_key = None if textures is None else {k: v for k, v in asdict(textures).items() if k != 'workers'}
+        obj_files = sorted(p for p in source.rglob('*') if p.suffix.lower() == '.obj')
+        if not obj_files:
+            self.stderr.write(f"[ERROR] No .obj files under {source}")
+            return
+
+        manifest_path = output / 'assets.json'
+        manifest = {}
+        if manifest_path.exists():
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+
+        reports = []
+        for obj_path in obj_files:
+            relative = obj_path.relative_to(source).with_suffix('.glb')
+            glb_path = output / relative
+            name = relative.with_suffix('').as_posix()
+            sources = [obj_path, *(p for p in obj_path.parent.iterdir()
+                                   if p.suffix.lower() in ('.mtl', '.png', '.jpg', '.jpeg'))]
+            entry = manifest.get(name, {})
+            if not options['force'] and glb_path.exists() and \
+                    [level['ratio'] for level in entry.get('lods', [])[1:]] == lods and \
+                    entry.get('texture_settings') == texture_key and \
+                    glb_path.stat().st_mtime >= max(p.stat().st_mtime for p in sources):
+                self.stdout.write(f"[INFO] {name}: up to date")
+                continue
+            try:
+                report = compile_obj(str(obj_path), str(glb_path), quantize=quantize, lods=lods, textures=textures)
+            except (OSError, ValueError) as e:
+                self.stderr.write(f"[ERROR] {name}: {e}")
+                continue
+            reports.append((name, report))
+            manifest[name] = {
+                'glb': relative.as_posix(),
+                'source': obj_path.relative_to(source).as_posix(),
+                'bytes': report['glb_bytes'],
+                'vertices': report['vertices'],
+                'triangles': report['triangles'],
+                'requests': report['requests_after'],
+                'texture_bytes': report['texture_bytes'],
+                'texture_settings': texture_key,
+                'lods': [{
+                    'glb': Path(level['path']).relative_to(output).as_posix(),
+                    'ratio': level['ratio'],
+                    'bytes': level['bytes'],
+                    'vertices': level['vertices'],
+                    'triangles': level['triangles'],
+                    'decimate_ms': level['decimate_ms']
+                } for level in report['lods']]
+            }
+
+        os.makedirs(output, exist_ok=True)
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+        if not reports:
+            return
+        self.stdout.write(f"{'asset':<24} {'source':>10} {'glb':>10} {'saved':>7} "
+                          f"{'parse obj':>10} {'load glb':>9} {'draws':>7}")
+        for name, r in reports:
+            saved = 1 - r['glb_bytes'] / r['source_bytes'] if r['source_bytes'] else 0.0
+            self.stdout.write(
+                f"{name:<24} {_size(r['source_bytes']):>10} {_size(r['glb_bytes']):>10} {saved:>7.0%} "
+                f"{r['obj_parse_ms']:>8.1f}ms {r['glb_load_ms']:>7.1f}ms "
+                f"{r['draws_before']:>3}->{r['draws_after']:<3}")
+            self.stdout.write(f"    OBJ alone {_size(r['obj_bytes'])} -> geometry {_size(r['geometry_bytes'])}, "
+                              f"{r['vertices']} vertices / {r['triangles']} triangles")
+            t = r['textures']
+            if t['images']:
+                self.stdout.write(f"    textures {_size(r['texture_source_bytes'])} -> {_size(r['texture_bytes'])} "
+                                  f"({len(t['images'])} image(s), {t['atlases']} atlas, {t.get('ms', 0):.0f}ms)")
+            for image in t['images']:
+                sizes = ', '.join(f"{w}x{h}" for w, h in image['source_sizes'])
+                self.stdout.write(f"      {image['file']:<28} {image['size'][0]}x{image['size'][1]:<5} "
+                                  f"{_size(image['bytes']):>8}  <- {', '.join(image['sources'])} "
+                                  f"({sizes}, {_size(image['source_bytes'])})")
+            self.stdout.write(f"    browser requests {r['requests_before']} -> {r['requests_after']}, "
+                              f"{_size(r['source_bytes'])} -> {_size(r['glb_bytes'])}")
+            for level in r['lods'][1:]:
+                self.stdout.write(f"    LOD{level['level']} x{level['ratio']:<5} {_size(level['bytes']):>10}, "
+                                  f"{level['vertices']} vertices / {level['triangles']} triangles, "
+                                  f"simplified after {level['decimate_ms']:.0f}ms")
+            for dropped in r['dropped_textures']:
+                self.stdout.write(f"    dropped texture {dropped} (no glTF counterpart)")
+            for missing in r['missing_textures']:
+                self.stdout.write(self.style.WARNING(f"    [WARN] missing texture {missing}"))
+        self.stdout.write(self.style.SUCCESS(f"[INFO] Wrote {len(reports)} GLB file(s) and {manifest_path}"))
@@ -0,0 +1,58 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from studio.assets.fingerprint import ENCODINGS, assets_root, brotli, build, static_files
+
+
+def _size(num_bytes: int) -> str:
+    return f"{num_bytes / 1024 / 1024:.2f} MB" if num_bytes >= 1024 * 1024 else f"{num_bytes / 1024:.0f} KB"
+
+
+class Command(BaseCommand):
+    help = ("Copy the static files under content-hashed names with gzip/brotli variants "
+            "and write the manifest used by {% asset %}. Run after compile_assets.")
+
+    # A build step: skip the system checks, whose URL check imports CameraService (TensorFlow, MediaPipe)
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=assets_root(),
+                            help='Folder for the hashed files and manifest.json (STUDIO_ASSETS_ROOT)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Threads used to hash and compress')
+        parser.add_argument('--no-prune', action='store_true',
+                            help='Keep hashed files of earlier builds that are no longer referenced')
+
+    def handle(self, *args, **options):
+        if brotli is None:
+            self.stdout.write(self.style.WARNING("[WARN] brotli is not installed (pip install brotli); "
+                                                 "writing gzip copies only"))
+        start = time.perf_counter()
+        files = static_files()
+        manifest, counters = build(files, options['output'], workers=options['workers'],
+                                   prune=not options['no_prune'])
+        seconds = time.perf_counter() - start
+
+        entries = manifest['files'].values()
+        raw = sum(e['bytes'] for e in entries)
+        compressible = [e for e in entries if e['encodings']]
+        self.stdout.write(f"[INFO] {counters['files']} files, {_size(raw)}: {counters['copied']} copied, "
+                          f"{counters['compressed']} compressed copies written, {counters['pruned']} stale removed "
+                          f"({seconds:.1f}s)")
+        if compressible:
+            self.stdout.write(f"{'encoding':<10} {'files':>6} {'raw':>10} {'encoded':>10} {'saved':>7}")
+            for encoding in ENCODINGS:
+                encoded = [e for e in compressible if encoding in e['encodings']]
+                if not encoded:
+                    continue
+                before = sum(e['bytes'] for e in encoded)
+                after = sum(e['encodings'][encoding] for e in encoded)
+                self.stdout.write(f"{encoding:<10} {len(encoded):>6} {_size(before):>10} {_size(after):>10} "
+                                  f"{1 - after / before:>7.0%}")
+            largest = sorted(compressible, key=lambda e: e['bytes'], reverse=True)[:5]
+            for e in largest:
+                best = min(e['encodings'].items(), key=lambda item: item[1])
+                self.stdout.write(f"    {e['source']:<40} {_size(e['bytes']):>10} -> {_size(best[1]):>10} ({best[0]})")
+        self.stdout.write(self.style.SUCCESS(f"[INFO] Wrote {os.path.join(options['output'], 'manifest.json')}"))
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from studio.catalog import compiled_dir, ensure_thumbnail, source_dir, sync
+from studio.models import CatalogAsset
+
+
+def _size(num_bytes: int) -> str:
+    return f"{num_bytes / 1024 / 1024:.2f} MB" if num_bytes >= 1024 * 1024 else f"{num_bytes / 1024:.0f} KB"
+
+
+class Command(BaseCommand):
+    help = ("Scan 3d/ and the compile_assets output into the character catalog shown by the AR page. "
+            "Run after compile_assets.")
+
+    # A build step: skip the system checks, whose URL check imports CameraService (TensorFlow, MediaPipe)
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=source_dir(), help='Folder with the source assets')
+        parser.add_argument('--compiled', default=compiled_dir(),
+                            help='Folder with the compiled GLB files and assets.json')
+        parser.add_argument('--thumbnails', action='store_true',
+                            help='Render missing preview thumbnails now instead of on first request')
+        parser.add_argument('--no-prune', action='store_true',
+                            help='Keep thumbnails of content that is no longer in the catalog')
+
+    def handle(self, *args, **options):
+        counters = sync(options['source'], options['compiled'], prune=not options['no_prune'])
+        self.stdout.write(f"[INFO] {counters['created']} added, {counters['updated']} updated, "
+                          f"{counters['unchanged']} unchanged, {counters['unavailable']} no longer found, "
+                          f"{counters['pruned']} stale thumbnail(s) removed")
+
+        assets = CatalogAsset.objects.filter(available=True)
+        self.stdout.write(f"{'asset':<24} {'kind':<8} {'loads':<36} {'size':>9} {'lods':>5} {'thumbnail':>10}")
+        for asset in assets:
+            thumbnail = ''
+            if options['thumbnails']:
+                start = time.perf_counter()
+                try:
+                    ensure_thumbnail(asset)
+                    thumbnail = f"{(time.perf_counter() - start) * 1000:.0f}ms"
+                except ValueError as e:
+                    thumbnail = 'none'
+                    self.stderr.write(f"[WARN] {asset.name}: no thumbnail ({e})")
+            self.stdout.write(f"{asset.name:<24} {asset.kind:<8} {asset.static_name:<36} {_size(asset.bytes):>9} "
+                              f"{max(len(asset.lods) - 1, 0):>5} {thumbnail:>10}"
+                              + ('' if asset.enabled else '  (disabled)'))
+        self.stdout.write(self.style.SUCCESS(f"[INFO] Catalog has {assets.filter(enabled=True).count()} asset(s)"))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Capture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(upload_to='captures/')),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('gesture', models.CharField(blank=True, max_length=50, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DetectorModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(help_text='Absolute path to the .keras model file', max_length=500)),
+                ('version', models.CharField(blank=True, max_length=64)),
+                ('status', models.CharField(choices=[('registered', 'Registered'), ('deploying', 'Deploying'), ('active', 'Active'), ('standby', 'Standby (rollback target)'), ('failed', 'Failed'), ('retired', 'Retired')], default='registered', max_length=20)),
+                ('holdout_accuracy', models.FloatField(blank=True, null=True)),
+                ('latency_ms', models.FloatField(blank=True, null=True)),
+                ('message', models.CharField(blank=True, max_length=255)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('deployed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
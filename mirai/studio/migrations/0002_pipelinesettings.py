@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 22:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studio', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PipelineSettings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('overrides', models.JSONField(blank=True, default=dict, help_text='e.g. {"detection_interval": 3, "confidence": 0.7}')),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'pipeline settings',
+                'verbose_name_plural': 'pipeline settings',
+            },
+        ),
+    ]
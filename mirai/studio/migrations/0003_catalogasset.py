@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studio', '0002_pipelinesettings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Source path in 3d/ without extension', max_length=255, unique=True)),
+                ('label', models.CharField(max_length=100)),
+                ('icon', models.CharField(blank=True, help_text='Emoji shown until the thumbnail is loaded', max_length=16)),
+                ('kind', models.CharField(choices=[('model', 'Model'), ('sticker', 'Sticker')], default='model', max_length=20)),
+                ('source', models.CharField(help_text='Static name of the original file', max_length=500)),
+                ('compiled', models.CharField(blank=True, help_text='Static name of the compiled GLB', max_length=500)),
+                ('content_hash', models.CharField(db_index=True, max_length=64)),
+                ('bytes', models.BigIntegerField(default=0)),
+                ('source_bytes', models.BigIntegerField(default=0)),
+                ('vertices', models.IntegerField(blank=True, null=True)),
+                ('triangles', models.IntegerField(blank=True, null=True)),
+                ('lods', models.JSONField(blank=True, default=list)),
+                ('enabled', models.BooleanField(default=True)),
+                ('available', models.BooleanField(default=True, help_text='Source file was found by the last sync')),
+                ('order', models.IntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ('order', 'label'),
+            },
+        ),
+    ]
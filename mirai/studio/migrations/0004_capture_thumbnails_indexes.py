@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studio', '0003_catalogasset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='capture',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddIndex(
+            model_name='capture',
+            index=models.Index(fields=['-timestamp', '-id'], name='capture_gallery_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='capture',
+            index=models.Index(fields=['gesture', '-timestamp', '-id'], name='capture_gesture_idx'),
+        ),
+    ]
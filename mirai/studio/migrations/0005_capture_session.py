@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studio', '0004_capture_thumbnails_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='capture',
+            name='session',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='capture',
+            index=models.Index(fields=['session', 'timestamp', 'id'], name='capture_session_idx'),
+        ),
+    ]
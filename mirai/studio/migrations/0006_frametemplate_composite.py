@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('studio', '0005_capture_session'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FrameTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('spec', models.JSONField(blank=True, default=dict, help_text='e.g. {"canvas": [600, 1800], "slots": [[0.05, 0.03, 0.9, 0.28], [0.05, 0.33, 0.9, 0.28], [0.05, 0.63, 0.9, 0.28]], "background": "#ffffff", "overlays": [{"image": "templates/strip.png"}], "texts": [{"text": "Expo 2026 - {date}", "position": [0.5, 0.96], "color": "#222222"}]}')),
+                ('active', models.BooleanField(default=False)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Composite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(upload_to='composites/')),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('width', models.IntegerField(default=0)),
+                ('height', models.IntegerField(default=0)),
+                ('compose_ms', models.FloatField(blank=True, null=True)),
+                ('captures', models.ManyToManyField(blank=True, related_name='composites', to='studio.capture')),
+                ('template', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='studio.frametemplate')),
+            ],
+        ),
+    ]
@@ -1,9 +1,193 @@
 from django.db import models
+from django.utils import timezone
 
 class Capture(models.Model):
     image = models.ImageField(upload_to='captures/')
     timestamp = models.DateTimeField(auto_now_add=True)
     gesture = models.CharField(max_length=50, blank=True, null=True)
+    # PipelineConfig.session at capture time (event name), for exports
+    session = models.CharField(max_length=100, blank=True, default='')
+    # Thumbnail size (px) -> bytes of the generated file (studio.gallery)
+    thumbnails = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            # Gallery keyset pagination: ORDER BY timestamp DESC, id DESC
+            models.Index(fields=['-timestamp', '-id'], name='capture_gallery_idx'),
+            models.Index(fields=['gesture', '-timestamp', '-id'], name='capture_gesture_idx'),
+            models.Index(fields=['session', 'timestamp', 'id'], name='capture_session_idx'),
+        ]
 
     def __str__(self):
         return f"Capture {self.id} at {self.timestamp}"
+
+
+class DetectorModel(models.Model):
+    # A trained gesture model file that can be hot-swapped into the running CameraService.
+    STATUS_REGISTERED = 'registered'
+    STATUS_DEPLOYING = 'deploying'
+    STATUS_ACTIVE = 'active'
+    STATUS_STANDBY = 'standby'
+    STATUS_FAILED = 'failed'
+    STATUS_RETIRED = 'retired'
+    STATUS_CHOICES = [
+        (STATUS_REGISTERED, 'Registered'),
+        (STATUS_DEPLOYING, 'Deploying'),
+        (STATUS_ACTIVE, 'Active'),
+        (STATUS_STANDBY, 'Standby (rollback target)'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_RETIRED, 'Retired'),
+    ]
+
+    path = models.CharField(max_length=500, help_text="Absolute path to the .keras model file")
+    version = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_REGISTERED)
+    holdout_accuracy = models.FloatField(blank=True, null=True)
+    latency_ms = models.FloatField(blank=True, null=True)
+    message = models.CharField(max_length=255, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    deployed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Model {self.version or self.path} ({self.status})"
+
+    def start_deploy(self, service):
+        """
+        Mark the model as deploying, then hand it to CameraService.deploy_model.
+
+        DEPLOYING is saved first: record_deploy may run (and save the outcome)
+        before deploy_model even returns, e.g. when the file is missing.
+
+        Returns:
+            False if another deployment is already in progress (status left unchanged).
+        """
+        previous = self.status
+        self.status = self.STATUS_DEPLOYING
+        self.save(update_fields=['status'])
+        if not service.deploy_model(self.path, on_complete=self.record_deploy):
+            self.status = previous
+            self.save(update_fields=['status'])
+            return False
+        return True
+
+    def record_deploy(self, result):
+        # Persist the outcome of CameraService.deploy_model
+        self.version = result.get("version") or self.version
+        self.holdout_accuracy = result.get("accuracy")
+        self.latency_ms = result.get("latency_ms")
+        if not result.get("ok"):
+            self.status = self.STATUS_FAILED
+            self.message = (result.get("error") or "")[:255]
+            self.save()
+            return
+
+        # Only one model stays resident as rollback target
+        DetectorModel.objects.filter(status=self.STATUS_STANDBY).update(status=self.STATUS_RETIRED)
+        DetectorModel.objects.filter(status=self.STATUS_ACTIVE).exclude(pk=self.pk).update(status=self.STATUS_STANDBY)
+        self.status = self.STATUS_ACTIVE
+        self.message = f"backend: {result['backend']}" if result.get("backend") else ""
+        self.deployed_at = timezone.now()
+        self.save()
+
+    @classmethod
+    def record_rollback(cls):
+        active = list(cls.objects.filter(status=cls.STATUS_ACTIVE))
+        cls.objects.filter(status=cls.STATUS_STANDBY).update(status=cls.STATUS_ACTIVE, deployed_at=timezone.now())
+        cls.objects.filter(pk__in=[m.pk for m in active]).update(status=cls.STATUS_STANDBY)
+
+
+class PipelineSettings(models.Model):
+    # Singleton row with live overrides of studio.config.PipelineConfig (applied on top of settings.STUDIO_PIPELINE)
+    overrides = models.JSONField(default=dict, blank=True,
+                                 help_text='e.g. {"detection_interval": 3, "confidence": 0.7}')
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "pipeline settings"
+        verbose_name_plural = "pipeline settings"
+
+    def __str__(self):
+        return "Pipeline settings"
+
+    @classmethod
+    def load(cls):
+        obj, _ = cls.objects.get_or_create(pk=1)
+        return obj
+
+    @classmethod
+    def store(cls, changes):
+        obj = cls.load()
+        obj.overrides = {**obj.overrides, **changes}
+        obj.save()
+        return obj
+
+
+class CatalogAsset(models.Model):
+    # A character or sticker offered by the AR studio, kept in sync with 3d/ by `manage.py sync_catalog`
+    KIND_MODEL = 'model'
+    KIND_STICKER = 'sticker'
+    KIND_CHOICES = [
+        (KIND_MODEL, 'Model'),
+        (KIND_STICKER, 'Sticker'),
+    ]
+
+    name = models.CharField(max_length=255, unique=True, help_text="Source path in 3d/ without extension")
+    label = models.CharField(max_length=100)
+    icon = models.CharField(max_length=16, blank=True, help_text="Emoji shown until the thumbnail is loaded")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_MODEL)
+    source = models.CharField(max_length=500, help_text="Static name of the original file")
+    compiled = models.CharField(max_length=500, blank=True, help_text="Static name of the compiled GLB")
+    content_hash = models.CharField(max_length=64, db_index=True)
+    bytes = models.BigIntegerField(default=0)
+    source_bytes = models.BigIntegerField(default=0)
+    vertices = models.IntegerField(blank=True, null=True)
+    triangles = models.IntegerField(blank=True, null=True)
+    lods = models.JSONField(default=list, blank=True)
+    enabled = models.BooleanField(default=True)
+    available = models.BooleanField(default=True, help_text="Source file was found by the last sync")
+    order = models.IntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ('order', 'label')
+
+    def __str__(self):
+        return self.label
+
+    @property
+    def static_name(self):
+        # The file the browser loads
+        return self.compiled or self.source
+
+
+class FrameTemplate(models.Model):
+    # Event branding composited onto captures by studio.compositing; at most one is active
+    name = models.CharField(max_length=100, unique=True)
+    spec = models.JSONField(default=dict, blank=True, help_text=(
+        'e.g. {"canvas": [600, 1800], "slots": [[0.05, 0.03, 0.9, 0.28], [0.05, 0.33, 0.9, 0.28], '
+        '[0.05, 0.63, 0.9, 0.28]], "background": "#ffffff", "overlays": [{"image": "templates/strip.png"}], '
+        '"texts": [{"text": "Expo 2026 - {date}", "position": [0.5, 0.96], "color": "#222222"}]}'))
+    active = models.BooleanField(default=False)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self.active:
+            FrameTemplate.objects.filter(active=True).exclude(pk=self.pk).update(active=False)
+
+
+class Composite(models.Model):
+    # A template applied to one capture, or to the shots of a photo strip
+    image = models.ImageField(upload_to='composites/')
+    template = models.ForeignKey(FrameTemplate, blank=True, null=True, on_delete=models.SET_NULL)
+    captures = models.ManyToManyField(Capture, blank=True, related_name='composites')
+    timestamp = models.DateTimeField(auto_now_add=True)
+    width = models.IntegerField(default=0)
+    height = models.IntegerField(default=0)
+    compose_ms = models.FloatField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Composite {self.id} ({self.template or 'no template'})"
@@ -5,12 +5,18 @@ import os
 import sys
 import atexit
 import numpy as np
-from typing import Optional, Generator, Dict, Any
+from typing import Optional, Generator, Dict, Any, Callable, Tuple
 from django.conf import settings
 from django.core.files.base import ContentFile
 from .utils.camera import Camera
 from .utils.efficientnet_detector import ResNet50GestureDetector
-from .models import Capture
+from .utils.model_registry import load_holdout
+from .utils.crop_cache import CropCache
+from .compositing import active_template, submit_composite
+from .config import PipelineConfig
+from .gallery import schedule_thumbnails
+from .models import Capture, PipelineSettings
+from .stickers import StickerRenderer, load_sticker
 
 class CameraService:
     # Singleton service to manage the camera feed, gesture detection, and photo capture.
@@ -38,17 +44,27 @@ class CameraService:
         
         # Initialize detector
         # Path to model: ../models/resnet50/best_model.keras relative to BASE_DIR
-        model_path = os.path.join(settings.BASE_DIR.parent, 'models', 'resnet50', 'best_model.keras')
+        model_path = str(settings.DETECTOR_MODEL_PATH)
+        # Runtime-tunable knobs (detection interval/scale, pacing, thresholds, ...)
+        self.config = self._load_config()
+        # (detector, config) pair last applied by the camera loop
+        self._applied_config = None
+        # Detector being swapped out stays resident for instant rollback
+        self.previous_detector: Optional[ResNet50GestureDetector] = None
+        self.model_lock = threading.Lock()
+        self.model_state: Dict[str, Any] = {
+            "deploying": False,
+            "last_deploy": None
+        }
         try:
-            # User requested 60% confidence threshold
-            self.detector = ResNet50GestureDetector(model_path=model_path, confidence=0.60)
-            print(f"[SUCCESS] ResNet50 model loaded from {model_path}")
+            self.detector = self._load_detector(model_path)
+            self.detector.warmup()
+            print(f"[SUCCESS] ResNet50 model {self.detector.model_version} ({self.detector.backend.name}) loaded from {model_path}")
         except Exception as e:
             print(f"[ERROR] Failed to load ResNet50 model: {e}")
             self.detector = None
 
         self.imaging_edge = None # Not implemented yet
-        self.countdown_seconds = 3
         
         self.frame: Optional[np.ndarray] = None
         self.clean_frame: Optional[np.ndarray] = None
@@ -64,6 +80,8 @@ class CameraService:
         
         self.frame_count = 0
         self.last_result: Optional[Dict[str, Any]] = None
+        # Sticker picked on the page, drawn next to the hands on the stream and on captures
+        self.stickers = StickerRenderer()
         
         # Start camera thread
         self.thread = threading.Thread(target=self._camera_loop, daemon=True)
@@ -71,6 +89,79 @@ class CameraService:
         
         self._initialized = True
 
+    def _load_config(self) -> PipelineConfig:
+        # settings.STUDIO_PIPELINE plus the overrides saved from the admin/endpoint
+        try:
+            overrides = PipelineSettings.load().overrides
+        except Exception as db_err:
+            print(f"[WARN] Could not read pipeline overrides (using settings): {db_err}")
+            overrides = {}
+        try:
+            return PipelineConfig.from_settings(overrides)
+        except ValueError as e:
+            print(f"[WARN] Ignoring invalid pipeline overrides: {e}")
+            return PipelineConfig.from_settings()
+
+    def _load_detector(self, model_path: str) -> ResNet50GestureDetector:
+        config = self.config
+        return ResNet50GestureDetector(
+            model_path=model_path,
+            confidence=config.confidence,
+            max_num_hands=config.max_num_hands,
+            trigger_policy=config.trigger_policy,
+            # Reuse classifications while a guest holds the same pose
+            crop_cache=CropCache(capacity=8, ttl=config.crop_cache_ttl) if config.crop_cache else None,
+            backend=getattr(settings, 'DETECTOR_BACKEND', 'auto')
+        )
+
+    def _apply_config(self, detector: ResNet50GestureDetector, config: PipelineConfig) -> None:
+        # Runs on the camera thread between two frames
+        detector.confidence = config.confidence
+        detector.trigger_policy = config.trigger_policy
+        detector.set_max_num_hands(config.max_num_hands)
+        if not config.crop_cache:
+            detector.crop_cache = None
+        elif detector.crop_cache is None:
+            detector.crop_cache = CropCache(capacity=8, ttl=config.crop_cache_ttl)
+        else:
+            detector.crop_cache.ttl = config.crop_cache_ttl
+
+    def set_config(self, config: PipelineConfig) -> None:
+        """
+        Replace the runtime configuration. The camera loop picks it up on its next frame.
+        """
+        self.config = config
+        print(f"[INFO] Pipeline config updated: {config.to_dict()}")
+
+    def update_config(self, changes: Dict[str, Any]) -> PipelineConfig:
+        """
+        Validate and apply a partial configuration change.
+
+        Raises:
+            ValueError: unknown setting or invalid value (nothing is applied).
+        """
+        config = self.config.updated(changes)
+        self.set_config(config)
+        return config
+
+    def set_sticker(self, name: str) -> None:
+        """
+        Pick the catalog sticker drawn next to the hands ('' removes it).
+
+        Raises:
+            ValueError: not an enabled sticker of the catalog.
+        """
+        self.stickers.select(load_sticker(name) if name else None)
+        print(f"[INFO] Sticker: {name or 'none'}")
+
+    def set_trigger_policy(self, policy: str) -> None:
+        """
+        Choose how multiple hands decide the trigger:
+        'any_palm' (any raised palm), 'majority' (more palms than fists)
+        or 'largest' (only the hand closest to the camera counts).
+        """
+        self.update_config({"trigger_policy": policy})
+
     def cleanup(self):
         print(f"[INFO] Cleaning up CameraService in PID: {os.getpid()}")
         self.is_running = False
@@ -123,24 +214,33 @@ class CameraService:
                 self.clean_frame = frame.copy()
             
             # Detect
-            if self.detector:
+            # Grab the detector and config once per frame so a hot swap or
+            # config change never lands mid-frame
+            detector = self.detector
+            config = self.config
+            if detector:
                 try:
-                    # Skip frames for detection to improve performance (Every 5th frame)
-                    if self.frame_count % 5 == 0:
-                        # Resize for faster detection (50% scale)
-                        small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
-                        self.last_result = self.detector.get_detection_result(small_frame)
+                    if self._applied_config != (detector, config):
+                        self._apply_config(detector, config)
+                        self._applied_config = (detector, config)
+
+                    # Skip frames for detection to improve performance
+                    if self.frame_count % config.detection_interval == 0:
+                        # Resize for faster detection
+                        scale = config.detection_scale
+                        small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale) if scale != 1.0 else frame
+                        self.last_result = detector.get_detection_result(small_frame, policy=config.trigger_policy)
                         
-                        # Scale bbox back up
-                        if self.last_result["bbox"]:
-                            x, y, w, h = self.last_result["bbox"]
-                            self.last_result["bbox"] = (x*2, y*2, w*2, h*2)
+                        # Scale bboxes back up
+                        detector.scale_result(self.last_result, 1.0 / scale)
                             
-                        self.detector.update_state(self.last_result)
+                        detector.update_state(self.last_result)
                     
                     # Always draw annotations
-                    # min_frames=10 ensures ~1.5s hold (at 30fps/5skip = 6 checks/sec -> 10 checks ~ 1.6s)
-                    frame, detected_gesture, should_trigger = self.detector.annotate_frame(frame, self.last_result, min_frames=10)
+                    frame, detected_gesture, should_trigger = detector.annotate_frame(frame, self.last_result, min_frames=config.min_frames)
+                    # The page mirrors the stream back, so the sticker is drawn flipped to read right there
+                    self.stickers.draw(frame, self.last_result, config.sticker_anchor, config.sticker_scale,
+                                       mirrored=True)
                     
                     if should_trigger and self.state["countdown"] is None:
                         print("[INFO] Triggering countdown")
@@ -153,7 +253,7 @@ class CameraService:
             with self.frame_lock:
                 self.frame = frame
             
-            time.sleep(0.01)
+            time.sleep(config.loop_sleep)
 
     def get_frame(self) -> Optional[np.ndarray]:
         """
@@ -183,12 +283,13 @@ class CameraService:
                 time.sleep(0.1)
                 continue
             
-            ret, buffer = cv2.imencode('.jpg', frame)
+            config = self.config
+            ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, config.stream_jpeg_quality])
             frame_bytes = buffer.tobytes()
             
             yield (b'--frame\r\n'
                    b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            time.sleep(0.03)
+            time.sleep(config.stream_sleep)
 
     def start_countdown(self) -> None:
         """
@@ -198,33 +299,58 @@ class CameraService:
             self.detector.set_trigger_active(True)
         
         self.state["message"] = "Get Ready..."
-        
-        for i in range(self.countdown_seconds, 0, -1):
-            self.state["countdown"] = i
-            self.state["message"] = str(i)
-            time.sleep(1)
-        
-        self.state["countdown"] = 0
-        self.state["message"] = "SMILE!"
-        
-        # Capture
-        self._capture()
-        
+
+        # Event template: a photo strip takes one shot per slot
+        try:
+            template, spec = active_template()
+        except Exception as e:
+            print(f"[WARN] Frame template unavailable (capturing without it): {e}")
+            template, spec = None, None
+        shots = spec.shots if spec else 1
+        frames, captures = [], []
+
+        for shot in range(shots):
+            for i in range(self.config.countdown_seconds, 0, -1):
+                self.state["countdown"] = i
+                self.state["message"] = str(i)
+                time.sleep(1)
+
+            self.state["countdown"] = 0
+            self.state["message"] = "SMILE!" if shots == 1 else f"SMILE! {shot + 1}/{shots}"
+
+            # Capture
+            frame, capture = self._capture()
+            if frame is not None:
+                frames.append(frame)
+                captures.append(capture)
+            if shot + 1 < shots:
+                time.sleep(1)
+
+        if template and frames:
+            # Composed on the compositor pool, never in the way of the next shot
+            submit_composite(template, spec, frames, captures, self.config.capture_jpeg_quality, self.config.session)
+
         time.sleep(2)
         self.state["countdown"] = None
         self.state["message"] = ""
         if self.detector:
             self.detector.set_trigger_active(False)
 
-    def _capture(self) -> None:
+    def _capture(self) -> Tuple[Optional[np.ndarray], Optional[Capture]]:
         """
         Captures the current frame, saves locally, and attempts DB save.
         Always triggers flash/frontend download.
+
+        Returns:
+            (frame, Capture row), either None if that step failed.
         """
+        frame, capture = None, None
         try:
             # Use clean frame for capture (no bounding box)
             frame = self.get_clean_frame()
             if frame is not None:
+                config = self.config
+                self.stickers.draw(frame, self.last_result, config.sticker_anchor, config.sticker_scale)
                 timestamp = time.strftime("%Y%m%d_%H%M%S")
                 filename = f"capture_{timestamp}.jpg"
                 
@@ -232,21 +358,24 @@ class CameraService:
                 save_dir = os.path.join(settings.MEDIA_ROOT, 'captures')
                 os.makedirs(save_dir, exist_ok=True)
                 local_path = os.path.join(save_dir, filename)
-                cv2.imwrite(local_path, frame)
+                quality = [cv2.IMWRITE_JPEG_QUALITY, self.config.capture_jpeg_quality]
+                cv2.imwrite(local_path, frame, quality)
                 print(f"[SUCCESS] Saved locally to: {local_path}")
 
                 # 2. Try Save to DB (Optional)
                 try:
                     # Convert to JPEG for DB
-                    ret, buffer = cv2.imencode('.jpg', frame)
+                    ret, buffer = cv2.imencode('.jpg', frame, quality)
                     if ret:
                         content = ContentFile(buffer.tobytes())
-                        capture = Capture(gesture="Auto/Timer")
+                        capture = Capture(gesture="Auto/Timer", session=self.config.session)
                         capture.image.save(filename, content)
                         capture.save()
                         print(f"[SUCCESS] Saved to DB: {capture}")
+                        schedule_thumbnails(capture)
                 except Exception as db_err:
                     print(f"[WARN] DB Save failed (ignoring): {db_err}")
+                    capture = None
 
                 # 3. Trigger Frontend Download
                 self.state["flash"] = True
@@ -262,12 +391,123 @@ class CameraService:
         except Exception as e:
             print(f"[ERROR] Capture process failed: {e}")
             self.state["message"] = "Error!"
+        return frame, capture
+
+    def deploy_model(self, model_path: str, on_complete: Optional[Callable[[Dict[str, Any]], None]] = None) -> bool:
+        """
+        Load, warm up and validate a new model in the background, then swap it in.
+        The camera loop keeps running on the current detector the whole time.
+
+        Returns:
+            False if another deployment is already in progress.
+        """
+        with self.model_lock:
+            if self.model_state["deploying"]:
+                return False
+            self.model_state["deploying"] = True
+
+        threading.Thread(target=self._deploy_model, args=(str(model_path), on_complete), daemon=True).start()
+        return True
+
+    def _deploy_model(self, model_path: str, on_complete: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+        result: Dict[str, Any] = {
+            "ok": False,
+            "path": model_path,
+            "version": None,
+            "accuracy": None,
+            "latency_ms": None,
+            "backend": None,
+            "error": None
+        }
+        try:
+            print(f"[INFO] Loading candidate model from {model_path}")
+            candidate = self._load_detector(model_path)
+            result["version"] = candidate.model_version
+            result["backend"] = candidate.backend.name
+            result["latency_ms"] = candidate.warmup()
+
+            samples = load_holdout(str(settings.DETECTOR_HOLDOUT_DIR), candidate.class_names,
+                                   per_class=settings.DETECTOR_HOLDOUT_PER_CLASS)
+            if samples:
+                accuracy = candidate.evaluate(samples)
+                result["accuracy"] = accuracy
+                result["latency_ms"] = candidate.latency_ms
+                if accuracy < settings.DETECTOR_MIN_ACCURACY:
+                    raise ValueError(
+                        f"holdout accuracy {accuracy:.3f} is below {settings.DETECTOR_MIN_ACCURACY:.3f}"
+                    )
+            else:
+                print(f"[WARN] No holdout samples in {settings.DETECTOR_HOLDOUT_DIR}, skipping validation")
+
+            self._swap_detector(candidate)
+            result["ok"] = True
+            print(f"[SUCCESS] Model {candidate.model_version} is now active")
+        except Exception as e:
+            result["error"] = str(e)
+            print(f"[ERROR] Model deployment failed: {e}")
+        finally:
+            self.model_state["last_deploy"] = result
+            self.model_state["deploying"] = False
+
+        if on_complete:
+            try:
+                on_complete(result)
+            except Exception as cb_err:
+                print(f"[WARN] Deploy callback failed (ignoring): {cb_err}")
+
+    def _swap_detector(self, candidate: ResNet50GestureDetector) -> None:
+        with self.model_lock:
+            current = self.detector
+            if current is not None:
+                candidate.adopt_state(current)
+            self.previous_detector = current
+            # Single attribute store: the camera loop picks it up on its next frame
+            self.detector = candidate
+
+    def rollback_model(self) -> bool:
+        """
+        Swap the previous (still loaded) detector back in.
+
+        Returns:
+            False if there is no previous model to roll back to.
+        """
+        with self.model_lock:
+            previous = self.previous_detector
+            if previous is None:
+                return False
+            current = self.detector
+            if current is not None:
+                previous.adopt_state(current)
+            self.previous_detector = current
+            self.detector = previous
+        print(f"[INFO] Rolled back to model {previous.model_version}")
+        return True
+
+    def get_model_info(self) -> Dict[str, Any]:
+        """
+        Returns the active/previous model versions and the measured latency.
+        """
+        detector = self.detector
+        previous = self.previous_detector
+        latency = detector.latency_ms if detector else None
+        return {
+            "version": detector.model_version if detector else None,
+            "latency_ms": round(latency, 2) if latency is not None else None,
+            "previous_version": previous.model_version if previous else None,
+            "deploying": self.model_state["deploying"],
+            "last_deploy": self.model_state["last_deploy"]
+        }
 
     def get_status(self) -> Dict[str, Any]:
         """
-        Returns the current status (countdown, message, flash).
+        Returns the current status (countdown, message, flash), model info and detector metrics.
         """
-        return self.state
+        status = dict(self.state)
+        status["model"] = self.get_model_info()
+        detector = self.detector
+        status["metrics"] = detector.get_metrics() if detector else None
+        status["sticker"] = self.stickers.info()
+        return status
 
     def __del__(self):
         if hasattr(self, 'camera') and self.camera:
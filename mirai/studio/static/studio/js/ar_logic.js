@@ -27,6 +27,24 @@ class ARManager {
             maxModels: 2
         };
 
+        // Character catalog (python manage.py sync_catalog): model URL -> entry with its LOD files
+        this.catalog = {};
+        this.lodLevel = this._pickLodLevel();
+
+        // Content-hashed URLs (python manage.py fingerprint_assets): static name -> URL.
+        // Every loader asks for files through loadingManager, which swaps in the hashed URL
+        // (e.g. the .mtl and textures an .obj pulls in by their plain names).
+        const assetUrlsScript = document.getElementById('asset-urls');
+        this.assetUrls = assetUrlsScript ? JSON.parse(assetUrlsScript.textContent) : {};
+        this.assetNames = {};
+        Object.entries(this.assetUrls).forEach(([name, url]) => {
+            this.assetNames[new URL(url, window.location.href).pathname] = name;
+        });
+        this.staticPrefix = this.container.dataset.staticUrl || '/static/';
+        this.assetsPrefix = this.container.dataset.assetsUrl || null;
+        this.loadingManager = new THREE.LoadingManager();
+        this.loadingManager.setURLModifier((url) => this._fingerprinted(url));
+
         // State
         this.scene = null;
         this.camera = null;
@@ -57,6 +75,7 @@ class ARManager {
         this.setupRenderer();
         this.setupInteraction();
         this.setupUI();
+        this._loadCatalog();
         
         // Start Loop
         this.animate = this.animate.bind(this);
@@ -103,7 +122,112 @@ class ARManager {
         console.log("Add Mode:", this.isAddMode);
     }
 
+    _pickLodLevel() {
+        // ?lod=0|1|2 forces a level (handy for comparing on one device)
+        const forced = new URLSearchParams(window.location.search).get('lod');
+        if (forced !== null && !isNaN(parseInt(forced, 10))) {
+            return Math.max(0, parseInt(forced, 10));
+        }
+        const memory = navigator.deviceMemory || 4; // GB, Chromium only
+        const cores = navigator.hardwareConcurrency || 4;
+        const isMobile = /Android|iPhone|iPad|iPod|Mobile/i.test(navigator.userAgent);
+        const pixels = window.screen.width * window.screen.height * (window.devicePixelRatio || 1) ** 2;
+
+        if (memory <= 2 || cores <= 2) return 2;
+        if (isMobile && (memory <= 4 || cores <= 4 || pixels > 2560 * 1440)) return 1;
+        return 0;
+    }
+
+    _loadCatalog() {
+        // Buttons come from the catalog; a model is only downloaded when its button is pressed
+        const list = document.getElementById('character-list');
+        if (!list || !list.dataset.catalogUrl) return;
+        fetch(list.dataset.catalogUrl)
+            .then(response => response.ok ? response.json() : Promise.reject(response.status))
+            .then(catalog => {
+                const clearButton = list.querySelector('.character-btn:not([data-model])');
+                catalog.assets.forEach(asset => {
+                    this.catalog[asset.url] = asset;
+                    list.insertBefore(this._characterButton(asset), clearButton);
+                });
+                console.log(`Catalog: ${catalog.assets.length} assets, LOD level ${this.lodLevel}`);
+            })
+            .catch(err => console.warn("Catalog not available:", err));
+    }
+
+    _setServerSticker(name) {
+        const list = document.getElementById('character-list');
+        if (!list || !list.dataset.stickerUrl) return Promise.reject('no sticker endpoint');
+        const body = new FormData();
+        body.append('name', name);
+        return fetch(list.dataset.stickerUrl, {
+            method: 'POST',
+            body,
+            headers: { 'X-CSRFToken': list.dataset.csrfToken }
+        }).then(response => response.ok ? response.json() : Promise.reject(response.status))
+            .catch(err => {
+                console.warn("Server sticker not available:", err);
+                return Promise.reject(err);
+            });
+    }
+
+    _characterButton(asset) {
+        const button = document.createElement('button');
+        button.className = 'character-btn group relative w-14 h-14 rounded-xl overflow-hidden border-2 border-transparent transition-all duration-200 hover:scale-110 focus:outline-none';
+        button.dataset.model = asset.url;
+        button.title = asset.label;
+
+        const background = document.createElement('div');
+        background.className = 'absolute inset-0 bg-gradient-to-br from-slate-500 to-slate-800 opacity-80 group-hover:opacity-100 transition';
+        // Emoji until the preview thumbnail has loaded (or if there is none, e.g. FBX)
+        const icon = document.createElement('div');
+        icon.className = 'absolute inset-0 flex items-center justify-center text-2xl';
+        icon.textContent = asset.icon;
+        const thumbnail = document.createElement('img');
+        thumbnail.className = 'absolute inset-0 w-full h-full object-contain';
+        thumbnail.loading = 'lazy';
+        thumbnail.alt = asset.label;
+        thumbnail.addEventListener('load', () => icon.remove());
+        thumbnail.addEventListener('error', () => thumbnail.remove());
+        thumbnail.src = asset.thumbnail;
+        const bar = document.createElement('div');
+        bar.className = 'absolute bottom-0 left-0 right-0 h-1 bg-white/50 scale-x-0 group-[.active]:scale-x-100 transition-transform';
+
+        button.append(background, icon, thumbnail, bar);
+        return button;
+    }
+
+    _assetName(url) {
+        // Static name ('reva/reva.obj') of a hashed, fingerprinted or plain static URL
+        if (/^(data|blob):/.test(url)) return null;
+        const path = new URL(url, window.location.href).pathname;
+        if (this.assetNames[path]) return this.assetNames[path];
+        for (const prefix of [this.assetsPrefix, this.staticPrefix]) {
+            if (prefix && path.startsWith(prefix)) return decodeURIComponent(path.slice(prefix.length));
+        }
+        return null;
+    }
+
+    _assetUrl(name) {
+        if (this.assetUrls[name]) return this.assetUrls[name];
+        const encoded = name.split('/').map(encodeURIComponent).join('/');
+        return new URL(encoded, new URL(this.staticPrefix, window.location.href)).pathname;
+    }
+
+    _fingerprinted(url) {
+        const name = this._assetName(url);
+        return name && this.assetUrls[name] ? this.assetUrls[name] : url;
+    }
+
+    _resolveLod(url) {
+        // Swap a catalog model for its simplified level; other models load as given
+        const asset = this.catalog[url];
+        if (!asset || !this.lodLevel || asset.lods.length < 2) return url;
+        return asset.lods[Math.min(this.lodLevel, asset.lods.length - 1)].url;
+    }
+
     loadModel(url) {
+        url = this._resolveLod(url);
         console.log("Loading model:", url);
 
         if (!this.isAddMode) {
@@ -124,7 +248,7 @@ class ARManager {
 
         const isObj = url.toLowerCase().endsWith('.obj');
         const isFbx = url.toLowerCase().endsWith('.fbx');
-        const isImg = /\.(png|jpg|jpeg)$/i.test(url);
+        const isImg = /\.(png|jpg|jpeg|webp)$/i.test(url);
 
         if (isObj) {
             this._loadOBJ(url);
@@ -138,17 +262,19 @@ class ARManager {
     }
 
     _loadOBJ(url) {
-        const mtlUrl = url.replace('.obj', '.mtl');
+        // The .mtl sits next to the .obj; hashed names differ, so go through the static name
+        const name = this._assetName(url);
+        const mtlUrl = name ? this._assetUrl(name.replace(/\.obj$/i, '.mtl')) : url.replace('.obj', '.mtl');
         const path = url.substring(0, url.lastIndexOf('/') + 1);
         
-        const mtlLoader = new MTLLoader();
+        const mtlLoader = new MTLLoader(this.loadingManager);
         mtlLoader.setPath(path);
 
         mtlLoader.load(
             mtlUrl.substring(mtlUrl.lastIndexOf('/') + 1),
             (materials) => {
                 materials.preload();
-                const objLoader = new OBJLoader();
+                const objLoader = new OBJLoader(this.loadingManager);
                 objLoader.setMaterials(materials);
                 objLoader.load(url, (obj) => this.onModelLoaded(obj, false), 
                     undefined, 
@@ -159,7 +285,7 @@ class ARManager {
             (err) => {
                 console.warn("MTL failed, loading OBJ only.", err);
                 // Fallback
-                const objLoader = new OBJLoader();
+                const objLoader = new OBJLoader(this.loadingManager);
                 objLoader.load(url, (obj) => {
                     // Apply magenta debug material
                     obj.traverse(child => {
@@ -172,17 +298,17 @@ class ARManager {
     }
 
     _loadGLTF(url) {
-        const loader = new GLTFLoader();
+        const loader = new GLTFLoader(this.loadingManager);
         loader.load(url, (gltf) => this.onModelLoaded(gltf, true), undefined, (err) => console.error("GLTF Error:", err));
     }
 
     _loadFBX(url) {
-        const loader = new FBXLoader();
+        const loader = new FBXLoader(this.loadingManager);
         loader.load(url, (fbx) => this.onModelLoaded(fbx, false, true), undefined, (err) => console.error("FBX Error:", err));
     }
 
     _loadImage(url) {
-        const loader = new THREE.TextureLoader();
+        const loader = new THREE.TextureLoader(this.loadingManager);
         loader.load(url, (texture) => {
             const material = new THREE.SpriteMaterial({ map: texture });
             const sprite = new THREE.Sprite(material);
@@ -504,21 +630,34 @@ class ARManager {
     // --- UI & Loop ---
 
     setupUI() {
-        // Character Buttons
-        document.querySelectorAll('.character-btn').forEach(btn => {
-            btn.addEventListener('click', (e) => {
-                const target = e.currentTarget;
-                
+        // Character Buttons (added from the catalog after load, hence delegated)
+        const characterList = document.getElementById('character-list');
+        if (characterList) {
+            characterList.addEventListener('click', (e) => {
+                const target = e.target.closest('.character-btn');
+                if (!target) return;
+
                 // If it's the clear button
                 if (!target.dataset.model) {
                     this.clearAllModels();
+                    this._setServerSticker('').catch(() => {});
+                    return;
+                }
+
+                // Catalog stickers are drawn by the server next to the hand, so they are in the
+                // saved capture too; the browser sprite is only the fallback
+                const asset = this.catalog[target.dataset.model];
+                if (asset && asset.kind === 'sticker') {
+                    this._setServerSticker(asset.name)
+                        .catch(() => this.loadModel(target.dataset.model));
                     return;
                 }
 
                 // Load Model
+                if (!this.isAddMode) this._setServerSticker('').catch(() => {});
                 this.loadModel(target.dataset.model);
             });
-        });
+        }
 
         // Add Mode Toggle
         const addModeToggle = document.getElementById('add-mode-toggle');
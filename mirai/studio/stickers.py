@@ -0,0 +1,218 @@
+"""
+2D stickers drawn by the server next to the detected hands, so they are
+part of the MJPEG stream and of the saved capture (sprites added by
+ar_logic.js only exist in the browser).
+
+A sticker is decoded, trimmed to its visible pixels, premultiplied and
+halved into mip levels once, when it is picked. Each hand then needs it at
+some width: widths are rounded to geometric size buckets (BUCKET_STEP
+apart) and the scaled premultiplied bitmap and its inverse alpha are cached
+per bucket, so a hand moving towards the camera costs one short resize per
+~8% of growth instead of one per frame. Drawing is the blend of studio.compositing on the sticker's
+rectangle only, in place, clipped to the frame. The size is capped at
+MAX_SIZE of the frame height, which bounds the per-frame work.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .compositing import blend
+
+BUCKET_STEP = 1.08
+MIN_WIDTH = 16
+# Largest side of a sticker as a fraction of the frame height
+MAX_SIZE = 0.6
+# Scaled bitmaps kept per sticker (both orientations count)
+CACHE_SIZE = 48
+ANCHORS = ('above', 'palm')
+# MediaPipe wrist and finger bases: their mean is the centre of the palm
+PALM_LANDMARKS = (0, 5, 9, 13, 17)
+
+
+def bucket_width(width: float) -> int:
+    """``width`` rounded to the nearest size bucket."""
+    if width <= MIN_WIDTH:
+        return MIN_WIDTH
+    return max(MIN_WIDTH, round(BUCKET_STEP ** round(math.log(width, BUCKET_STEP))))
+
+
+@dataclass
+class Bitmap:
+    premultiplied: np.ndarray  # (h, w, 3) uint8
+    inverse: np.ndarray        # (h, w, 3) uint8, 255 - alpha
+
+
+class Sticker:
+    """One sticker image and its scaled bitmaps."""
+
+    def __init__(self, name: str, image: np.ndarray):
+        """
+        Args:
+            image: BGRA (or BGR, drawn opaque) as read by cv2.imread(..., IMREAD_UNCHANGED).
+
+        Raises:
+            ValueError: the image is fully transparent.
+        """
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+        elif image.shape[2] == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+        if image.dtype != np.uint8:
+            image = (image >> 8).astype(np.uint8)
+        # Anchor on what is visible, not on a transparent margin
+        ys, xs = np.nonzero(image[..., 3])
+        if not len(xs):
+            raise ValueError(f"Sticker {name} is fully transparent")
+        image = image[ys.min():ys.max() + 1, xs.min():xs.max() + 1]
+
+        # Premultiplied before scaling, so resizing never bleeds hidden colors into the edges
+        alpha = image[..., 3:].astype(np.uint16)
+        source = np.dstack([(image[..., :3] * alpha // 255).astype(np.uint8), image[..., 3]])
+        # Mip levels (exact halvings): a size bucket is a short linear resize from the next larger level
+        self.levels = [source]
+        while min(self.levels[-1].shape[:2]) >= 2 * MIN_WIDTH:
+            level = self.levels[-1]
+            self.levels.append(cv2.resize(level, (level.shape[1] // 2, level.shape[0] // 2),
+                                          interpolation=cv2.INTER_AREA))
+        self.name = name
+        self.aspect = image.shape[0] / image.shape[1]
+        self.lock = threading.Lock()
+        self.bitmaps: "OrderedDict[Tuple[int, bool], Bitmap]" = OrderedDict()
+
+    @classmethod
+    def from_file(cls, name: str, path: str) -> "Sticker":
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise ValueError(f"Cannot decode sticker {path}")
+        return cls(name, image)
+
+    def bitmap(self, width: float, mirrored: bool = False) -> Bitmap:
+        """The sticker at the size bucket of ``width``, flipped horizontally if ``mirrored``."""
+        key = (bucket_width(width), mirrored)
+        with self.lock:
+            bitmap = self.bitmaps.get(key)
+            if bitmap is not None:
+                self.bitmaps.move_to_end(key)
+                return bitmap
+
+        w = key[0]
+        h = max(1, round(w * self.aspect))
+        level = next((level for level in reversed(self.levels) if level.shape[1] >= w), self.levels[0])
+        scaled = cv2.resize(level, (w, h), interpolation=cv2.INTER_LINEAR)
+        if mirrored:
+            scaled = cv2.flip(scaled, 1)
+        bitmap = Bitmap(np.ascontiguousarray(scaled[..., :3]), cv2.cvtColor(255 - scaled[..., 3], cv2.COLOR_GRAY2BGR))
+        with self.lock:
+            self.bitmaps[key] = bitmap
+            while len(self.bitmaps) > CACHE_SIZE:
+                self.bitmaps.popitem(last=False)
+        return bitmap
+
+
+def _palm_center(landmarks: Any, width: int, height: int) -> Optional[Tuple[float, float]]:
+    # MediaPipe landmarks are normalized, so they hold for the full frame as for the detection frame
+    try:
+        points = [landmarks.landmark[i] for i in PALM_LANDMARKS]
+    except (AttributeError, IndexError, TypeError):
+        return None
+    return sum(p.x for p in points) / len(points) * width, sum(p.y for p in points) / len(points) * height
+
+
+class StickerRenderer:
+    """The sticker currently picked by the guest, drawn onto frames."""
+
+    def __init__(self):
+        self.sticker: Optional[Sticker] = None
+        # Milliseconds spent by the last draw() with hands in view
+        self.last_ms = 0.0
+
+    def select(self, sticker: Optional[Sticker]) -> None:
+        # A plain attribute swap: the camera loop reads it once per frame
+        self.sticker = sticker
+
+    def draw(self, frame: np.ndarray, result: Optional[Dict[str, Any]], anchor: str = 'above',
+             scale: float = 1.0, mirrored: bool = False) -> int:
+        """
+        Draw the sticker in place for every hand of a detection result.
+
+        Args:
+            frame: BGR frame the result's bboxes refer to.
+            anchor: 'above' (standing on top of the hand's box) or 'palm' (centred on the palm).
+            scale: sticker width relative to the hand's box width.
+            mirrored: flip the sticker, for the stream (which the page mirrors back).
+
+        Returns:
+            Number of stickers drawn.
+        """
+        sticker = self.sticker
+        if sticker is None or not result:
+            return 0
+        hands = result.get("hands")
+        if hands is None:
+            hands = [result] if result.get("bbox") else []
+        if not hands:
+            return 0
+
+        start = time.perf_counter()
+        frame_h, frame_w = frame.shape[:2]
+        drawn = 0
+        for hand in hands:
+            x, y, w, h = hand["bbox"]
+            width = w * scale
+            largest = max(width, width * sticker.aspect)
+            if largest > MAX_SIZE * frame_h:
+                width *= MAX_SIZE * frame_h / largest
+            bitmap = sticker.bitmap(width, mirrored)
+            bh, bw = bitmap.inverse.shape[:2]
+
+            center = _palm_center(hand.get("landmarks"), frame_w, frame_h) if anchor == 'palm' else None
+            if anchor == 'palm':
+                cx, cy = center or (x + w / 2, y + h / 2)
+                left, top = round(cx - bw / 2), round(cy - bh / 2)
+            else:
+                left, top = round(x + w / 2 - bw / 2), y - bh
+
+            x0, y0 = max(0, left), max(0, top)
+            x1, y1 = min(frame_w, left + bw), min(frame_h, top + bh)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            bx, by = x0 - left, y0 - top
+            blend(frame[y0:y1, x0:x1],
+                  bitmap.premultiplied[by:by + y1 - y0, bx:bx + x1 - x0],
+                  bitmap.inverse[by:by + y1 - y0, bx:bx + x1 - x0])
+            drawn += 1
+        self.last_ms = (time.perf_counter() - start) * 1000.0
+        return drawn
+
+    def info(self) -> Optional[Dict[str, Any]]:
+        sticker = self.sticker
+        if sticker is None:
+            return None
+        return {"name": sticker.name, "bitmaps": len(sticker.bitmaps), "draw_ms": round(self.last_ms, 3)}
+
+
+def load_sticker(name: str) -> Sticker:
+    """
+    A sticker of the catalog by name (CatalogAsset.name).
+
+    Raises:
+        ValueError: not an enabled, available sticker, or its file cannot be read.
+    """
+    from django.contrib.staticfiles import finders
+
+    from .models import CatalogAsset
+
+    asset = CatalogAsset.objects.filter(name=name, kind=CatalogAsset.KIND_STICKER,
+                                        enabled=True, available=True).first()
+    if asset is None:
+        raise ValueError(f"Unknown sticker {name!r}")
+    path = finders.find(asset.source)
+    if not path:
+        raise ValueError(f"Sticker file {asset.source} not found")
+    return Sticker.from_file(asset.name, path)
@@ -0,0 +1,22 @@
+from django import template
+
+from studio.assets.fingerprint import asset_url, asset_urls, assets_prefix
+
+register = template.Library()
+
+
+@register.simple_tag
+def asset(name):
+    """{% asset 'studio/models/reva/reva.glb' %}: content-hashed URL, or the static URL before fingerprint_assets ran."""
+    return asset_url(name)
+
+
+@register.simple_tag(name='asset_urls')
+def asset_urls_tag(prefix='', exclude=''):
+    """{% asset_urls 'studio/models/' as urls %}: logical name -> hashed URL, e.g. for json_script."""
+    return asset_urls(prefix, exclude)
+
+
+@register.simple_tag(name='assets_prefix')
+def assets_prefix_tag():
+    return assets_prefix()
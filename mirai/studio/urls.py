@@ -6,4 +6,14 @@ urlpatterns = [
     path('video_feed', views.video_feed, name='video_feed'),
     path('status', views.status, name='status'),
     path('ar/', views.ar, name='ar'),
+    path('assets/<path:path>', views.asset, name='asset'),
+    path('catalog', views.catalog, name='catalog'),
+    path('catalog/<slug:content_hash>.webp', views.catalog_thumbnail, name='catalog_thumbnail'),
+    path('sticker', views.sticker, name='sticker'),
+    path('gallery', views.gallery, name='gallery'),
+    path('gallery/<int:capture_id>/<int:size>.webp', views.gallery_thumbnail, name='gallery_thumbnail'),
+    path('export', views.capture_export, name='capture_export'),
+    path('config', views.pipeline_config, name='pipeline_config'),
+    path('model/deploy', views.model_deploy, name='model_deploy'),
+    path('model/rollback', views.model_rollback, name='model_rollback'),
 ]
@@ -0,0 +1,107 @@
+# Utility untuk cache hasil klasifikasi crop tangan yang hampir identik
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+Signature = Tuple[np.ndarray, np.ndarray]
+
+
+class CropCache:
+    """
+    Small LRU cache of recent hand classifications.
+
+    Entries are keyed by a cheap perceptual signature of the normalized hand
+    crop: a 16x16 luma thumbnail plus the hand's landmark configuration
+    (landmarks relative to their own bounding box). A new crop reuses a cached
+    palm probability when both parts are within their thresholds and the entry
+    is younger than ``ttl`` seconds, so a held gesture is still re-checked a
+    few times per second.
+    """
+
+    def __init__(self, capacity: int = 8, luma_threshold: float = 4.0,
+                 landmark_threshold: float = 0.04, ttl: float = 0.5, thumb_size: int = 16):
+        """
+        Args:
+            capacity: Maximum number of cached crops.
+            luma_threshold: Max mean absolute luma difference (0-255 scale).
+            landmark_threshold: Max landmark displacement, as a fraction of hand size.
+            ttl: Seconds after which an entry must be reclassified.
+            thumb_size: Side of the luma thumbnail.
+        """
+        self.capacity = capacity
+        self.luma_threshold = luma_threshold
+        self.landmark_threshold = landmark_threshold
+        self.ttl = ttl
+        self.thumb_size = thumb_size
+        self._entries: "OrderedDict[int, Tuple[float, np.ndarray, np.ndarray, float]]" = OrderedDict()
+        self._next_key = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+
+    def signature(self, crop: np.ndarray, points: np.ndarray) -> Signature:
+        """
+        Args:
+            crop: Resized RGB uint8 hand crop.
+            points: (21, 2) normalized landmark coordinates.
+        """
+        gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY)
+        thumb = cv2.resize(gray, (self.thumb_size, self.thumb_size), interpolation=cv2.INTER_AREA)
+        origin = points.min(axis=0)
+        extent = max(float((points.max(axis=0) - origin).max()), 1e-6)
+        return thumb.astype(np.float32), ((points - origin) / extent).astype(np.float32)
+
+    def lookup(self, signature: Signature, now: Optional[float] = None) -> Optional[float]:
+        """Return the cached palm probability of a similar crop, or None."""
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+
+        if self._entries:
+            keys = list(self._entries)
+            thumbs = np.stack([self._entries[k][1] for k in keys])
+            configs = np.stack([self._entries[k][2] for k in keys])
+            thumb, config = signature
+            luma_dist = np.abs(thumbs - thumb).mean(axis=(1, 2))
+            landmark_dist = np.abs(configs - config).max(axis=(1, 2))
+            candidates = np.flatnonzero((luma_dist <= self.luma_threshold) &
+                                        (landmark_dist <= self.landmark_threshold))
+            if candidates.size:
+                best = keys[int(candidates[np.argmin(luma_dist[candidates])])]
+                self._entries.move_to_end(best)
+                self.hits += 1
+                return self._entries[best][3]
+
+        self.misses += 1
+        return None
+
+    def store(self, signature: Signature, palm_prob: float, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        self._entries[self._next_key] = (now, signature[0], signature[1], palm_prob)
+        self._next_key += 1
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def record_saving(self, elapsed_ms: float) -> None:
+        """Account for classifier time (or the share of a batch call) skipped thanks to the cache."""
+        self.saved_ms += elapsed_ms
+
+    def _expire(self, now: float) -> None:
+        expired = [k for k, entry in self._entries.items() if now - entry[0] > self.ttl]
+        for k in expired:
+            del self._entries[k]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "saved_ms": round(self.saved_ms, 1),
+            "size": len(self._entries)
+        }
@@ -4,10 +4,21 @@ import numpy as np
 import tensorflow as tf
 from tensorflow import keras
 import os
+import time
 import mediapipe as mp
 from typing import Tuple, Optional, Dict, List, Any
 
-from tensorflow.keras.applications.resnet50 import preprocess_input
+from .model_backends import load_backend
+from .model_registry import model_file_version
+from .preprocessing import CropPreprocessor
+from .crop_cache import CropCache
+from .triggers import TRIGGER_POLICIES
+
+
+def landmark_points(hand_landmarks: Any) -> np.ndarray:
+    """MediaPipe hand landmarks as a (21, 2) array of normalized x, y."""
+    return np.array([(lm.x, lm.y) for lm in hand_landmarks.landmark], dtype=np.float32)
+
 
 class ResNet50GestureDetector:
     """
@@ -15,14 +26,25 @@ class ResNet50GestureDetector:
     Detects 'Fist' (Class 0) and 'Palm' (Class 1).
     """
     
-    def __init__(self, model_path: str = "models/resnet50/best_model.keras", confidence: float = 0.85):
+    def __init__(self, model_path: str = "models/resnet50/best_model.keras", confidence: float = 0.85,
+                 model_version: Optional[str] = None, max_num_hands: int = 1,
+                 trigger_policy: str = 'any_palm', crop_cache: Optional[CropCache] = None,
+                 backend: str = 'auto'):
         """
         Initialize the detector.
         
         Args:
             model_path: Path to the .keras model file.
             confidence: Confidence threshold for classification.
+            model_version: Version label of the model file (defaults to its content hash).
+            max_num_hands: Maximum number of hands MediaPipe reports per frame.
+            trigger_policy: Default policy used to combine hands, one of TRIGGER_POLICIES.
+            crop_cache: Optional cache that reuses classifications of near-identical crops.
+            backend: 'auto' runs the fastest variant that passed export_model.py's
+                budgets (Keras if there is no export report), 'keras' always uses the .keras file.
         """
+        if trigger_policy not in TRIGGER_POLICIES:
+            raise ValueError(f"Unknown trigger policy '{trigger_policy}', expected one of {TRIGGER_POLICIES}")
         
         # Resolve model path (relatif dari root project)
         if not os.path.isabs(model_path):
@@ -36,24 +58,49 @@ class ResNet50GestureDetector:
                 "Please ensure the model file exists."
             )
         
-        # Load model with custom_objects for preprocess_input
-        self.model = keras.models.load_model(model_path, custom_objects={'preprocess_input': preprocess_input})
+        # Keras model, or the exported variant chosen from export/export_report.json
+        self.backend = load_backend(model_path, backend)
+        self.model_path = model_path
+        self.model_version = model_version or model_file_version(model_path)
         self.confidence = confidence
+        self.max_num_hands = max_num_hands
+        self.trigger_policy = trigger_policy
+        self.crop_cache = crop_cache
+        # Rata-rata bergerak latency klasifikasi (ms), diisi oleh classify_gesture
+        self.latency_ms: Optional[float] = None
         self.fist_detected_frames = 0
         self.trigger_active = False
         
         # Setup MediaPipe untuk deteksi tangan
         self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(
-            static_image_mode=True, # Changed to True to fix timestamp errors with frame skipping
-            max_num_hands=1,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        self.hands = self._create_hands(max_num_hands)
         self.mp_drawing = mp.solutions.drawing_utils
         
         # Class names (Alphabetical: 0=fist, 1=palm)
         self.class_names = ['fist', 'palm']
+        
+        # Model dari pipeline.py membawa Lambda preprocess_input sendiri, yang
+        # mengharapkan RGB float dalam [0, 255] (sama seperti saat training).
+        # Model lama tanpa layer itu tetap diberi input [0, 1].
+        divisor = 1.0 if self.backend.raw_pixels else 255.0
+        self.preprocessor = CropPreprocessor(size=224, padding=20, divisor=divisor, capacity=max_num_hands)
+    
+    def _create_hands(self, max_num_hands: int) -> Any:
+        return self.mp_hands.Hands(
+            static_image_mode=True, # Changed to True to fix timestamp errors with frame skipping
+            max_num_hands=max_num_hands,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+    
+    def set_max_num_hands(self, max_num_hands: int) -> None:
+        """Rebuild MediaPipe Hands for a new hand limit. Call between frames."""
+        if max_num_hands == self.max_num_hands:
+            return
+        old_hands = self.hands
+        self.hands = self._create_hands(max_num_hands)
+        self.max_num_hands = max_num_hands
+        old_hands.close()
     
     def preprocess_frame(self, frame: np.ndarray, bbox: Optional[Tuple[int, int, int, int]] = None) -> np.ndarray:
         """
@@ -64,34 +111,11 @@ class ResNet50GestureDetector:
             bbox: Optional (x, y, w, h) bounding box to crop.
             
         Returns:
-            Preprocessed image batch (1, 224, 224, 3).
+            Preprocessed image batch (1, 224, 224, 3), valid until the next preprocess call.
         """
         
-        if bbox:
-            x, y, w, h = bbox
-            # Crop hand region dengan padding
-            padding = 20
-            x = max(0, x - padding)
-            y = max(0, y - padding)
-            w = min(frame.shape[1] - x, w + 2 * padding)
-            h = min(frame.shape[0] - y, h + 2 * padding)
-            cropped = frame[y:y+h, x:x+w]
-        else:
-            cropped = frame
-        
-        # Resize ke 224x224
-        resized = cv2.resize(cropped, (224, 224))
-        
-        # Convert BGR ke RGB
-        rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
-        
-        # Normalize ke [0, 1]
-        normalized = rgb.astype(np.float32) / 255.0
-        
-        # Expand dimensions untuk batch
-        expanded = np.expand_dims(normalized, axis=0)
-        
-        return expanded
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return self.preprocessor.prepare(rgb, [bbox])
     
     def detect_hand(self, frame: np.ndarray) -> Tuple[Optional[Tuple[int, int, int, int]], Any]:
         """
@@ -102,26 +126,36 @@ class ResNet50GestureDetector:
         """
         
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return self._detect_hand_rgb(rgb_frame)
+    
+    def _detect_hand_rgb(self, rgb_frame: np.ndarray) -> Tuple[Optional[Tuple[int, int, int, int]], Any]:
+        hands = self._detect_hands_rgb(rgb_frame)
+        if hands:
+            return hands[0]
+        return None, None
+    
+    def _detect_hands_rgb(self, rgb_frame: np.ndarray) -> List[Tuple[Tuple[int, int, int, int], Any]]:
+        """
+        Detect up to max_num_hands hands using MediaPipe.
+        
+        Returns:
+            List of (bbox, landmarks), empty if no hand is visible.
+        """
         results = self.hands.process(rgb_frame)
+        hands = []
         
         if results.multi_hand_landmarks:
-            hand_landmarks = results.multi_hand_landmarks[0]
-            
-            # Get bounding box dari landmarks
-            h, w = frame.shape[:2]
-            x_coords = [lm.x * w for lm in hand_landmarks.landmark]
-            y_coords = [lm.y * h for lm in hand_landmarks.landmark]
-            
-            x_min = int(min(x_coords))
-            x_max = int(max(x_coords))
-            y_min = int(min(y_coords))
-            y_max = int(max(y_coords))
-            
-            bbox = (x_min, y_min, x_max - x_min, y_max - y_min)
-            
-            return bbox, hand_landmarks
+            h, w = rgb_frame.shape[:2]
+            for hand_landmarks in results.multi_hand_landmarks:
+                # Get bounding box dari landmarks
+                coords = np.array([(lm.x * w, lm.y * h) for lm in hand_landmarks.landmark])
+                x_min, y_min = coords.min(axis=0).astype(int)
+                x_max, y_max = coords.max(axis=0).astype(int)
+                
+                bbox = (int(x_min), int(y_min), int(x_max - x_min), int(y_max - y_min))
+                hands.append((bbox, hand_landmarks))
         
-        return None, None
+        return hands
     
     def classify_gesture(self, preprocessed_img: np.ndarray) -> Tuple[int, float, Tuple[float, float]]:
         """
@@ -131,11 +165,7 @@ class ResNet50GestureDetector:
             (predicted_class, confidence, (palm_prob, fist_prob))
         """
         
-        predictions = self.model.predict(preprocessed_img, verbose=0)
-        
-        # Binary classification: predictions[0][0] adalah probabilitas Class 1 (Palm)
-        # Karena alphabetical: 0=Fist, 1=Palm
-        palm_prob = float(predictions[0][0])
+        palm_prob = float(self.classify_batch(preprocessed_img)[0])
         fist_prob = 1.0 - palm_prob
         
         # Tentukan class berdasarkan threshold
@@ -148,41 +178,206 @@ class ResNet50GestureDetector:
         
         return predicted_class, confidence, (palm_prob, fist_prob)
     
-    def get_detection_result(self, frame: np.ndarray) -> Dict[str, Any]:
+    def classify_batch(self, batch: np.ndarray) -> np.ndarray:
         """
-        Perform full detection pipeline on a frame.
+        Classify every crop of a (N, 224, 224, 3) batch in a single model call.
         
         Returns:
-            Dictionary containing bbox, landmarks, label, confidence, etc.
+            Palm probabilities, shape (N,).
+        """
+        start = time.perf_counter()
+        predictions = self.backend(batch)
+        self._record_latency((time.perf_counter() - start) * 1000.0)
+        
+        # Binary classification: predictions[i] adalah probabilitas Class 1 (Palm)
+        # Karena alphabetical: 0=Fist, 1=Palm
+        return predictions
+    
+    def _classify_with_cache(self, batch: np.ndarray, landmarks_list: List[Any]) -> np.ndarray:
         """
+        Classify a batch, reusing cached results for crops that barely changed.
+        Only the crops that miss the cache are sent to the model.
+        """
+        cache = self.crop_cache
+        if cache is None:
+            return self.classify_batch(batch)
         
-        bbox, landmarks = self.detect_hand(frame)
+        signatures = [cache.signature(crop, landmark_points(landmarks))
+                      for crop, landmarks in zip(self.preprocessor.last_crops, landmarks_list)]
+        palm_probs = np.empty(len(signatures), dtype=np.float32)
+        misses = []
+        for i, signature in enumerate(signatures):
+            cached = cache.lookup(signature)
+            if cached is None:
+                misses.append(i)
+            else:
+                palm_probs[i] = cached
         
-        result = {
+        if misses:
+            fresh = self.classify_batch(batch if len(misses) == len(signatures) else batch[misses])
+            palm_probs[misses] = fresh
+            for i, prob in zip(misses, fresh):
+                cache.store(signatures[i], float(prob))
+        hits = len(signatures) - len(misses)
+        if hits and self.latency_ms is not None:
+            # Each hit saves its share of a call for the whole batch
+            cache.record_saving(self.latency_ms * hits / len(signatures))
+        
+        return palm_probs
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Classification latency and crop cache statistics."""
+        return {
+            "latency_ms": round(self.latency_ms, 2) if self.latency_ms is not None else None,
+            "backend": self.backend.name,
+            "crop_cache": self.crop_cache.stats() if self.crop_cache else None
+        }
+    
+    def _hand_result(self, bbox: Tuple[int, int, int, int], landmarks: Any, palm_prob: float) -> Dict[str, Any]:
+        # Tentukan class berdasarkan threshold
+        if palm_prob >= 0.5:
+            predicted_class, confidence = 1, palm_prob
+        else:
+            predicted_class, confidence = 0, 1.0 - palm_prob
+        return {
             "bbox": bbox,
             "landmarks": landmarks,
-            "detected_palm": False,
+            "predicted_class": predicted_class,
+            "label": self.class_names[predicted_class],
+            "confidence": confidence,
+            # User requested PALM trigger
+            "detected_palm": predicted_class == 1 and confidence >= self.confidence
+        }
+    
+    @staticmethod
+    def _combine_hands(hands: List[Dict[str, Any]], policy: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        Apply the trigger policy.
+        
+        Returns:
+            (primary hand shown in the top-level result, whether the policy fires)
+        """
+        if not hands:
+            return None, False
+        
+        largest = max(hands, key=lambda hand: hand["bbox"][2] * hand["bbox"][3])
+        palms = [hand for hand in hands if hand["detected_palm"]]
+        
+        if policy == 'largest':
+            return largest, largest["detected_palm"]
+        if policy == 'majority':
+            fired = len(palms) * 2 > len(hands)
+        else:  # any_palm
+            fired = bool(palms)
+        
+        if palms:
+            return max(palms, key=lambda hand: hand["confidence"]), fired
+        return largest, fired
+    
+    def _record_latency(self, elapsed_ms: float) -> None:
+        """Update the moving average of classification latency."""
+        if self.latency_ms is None:
+            self.latency_ms = elapsed_ms
+        else:
+            self.latency_ms = 0.9 * self.latency_ms + 0.1 * elapsed_ms
+
+    def warmup(self, runs: int = 3) -> float:
+        """
+        Run dummy inferences so the first real frame doesn't pay for graph tracing.
+        
+        Returns:
+            Median latency (ms) of the warm runs.
+        """
+        dummy = self.preprocess_frame(np.zeros((224, 224, 3), dtype=np.uint8))
+        # Panggilan pertama selalu lambat (tracing), jangan dihitung
+        self.backend(dummy)
+        timings = []
+        for _ in range(max(1, runs)):
+            start = time.perf_counter()
+            self.backend(dummy)
+            timings.append((time.perf_counter() - start) * 1000.0)
+        self.latency_ms = float(np.median(timings))
+        return self.latency_ms
+
+    def evaluate(self, samples: List[Tuple[np.ndarray, int]]) -> float:
+        """
+        Classify pre-cropped hand images and return the accuracy.
+        
+        Args:
+            samples: List of (BGR crop, class index) pairs.
+        """
+        if not samples:
+            return 0.0
+        correct = 0
+        for image, label in samples:
+            predicted_class, _, _ = self.classify_gesture(self.preprocess_frame(image))
+            correct += int(predicted_class == label)
+        return correct / len(samples)
+
+    def adopt_state(self, other: "ResNet50GestureDetector") -> None:
+        """Copy trigger state from the detector being replaced."""
+        self.fist_detected_frames = other.fist_detected_frames
+        self.trigger_active = other.trigger_active
+
+    def get_detection_result(self, frame: np.ndarray, policy: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Perform full detection pipeline on a frame.
+        
+        Args:
+            frame: BGR image frame.
+            policy: Trigger policy for this frame (defaults to self.trigger_policy).
+        
+        Returns:
+            Dictionary containing bbox, landmarks, label, confidence, etc. of the
+            primary hand, plus "hands" with the per-hand results.
+        """
+        policy = policy or self.trigger_policy
+        
+        # Konversi warna sekali per frame, dipakai MediaPipe dan crop
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        detections = self._detect_hands_rgb(rgb_frame)
+        
+        hands = []
+        if detections:
+            # Semua crop tangan diklasifikasi dalam satu batch
+            batch = self.preprocessor.prepare(rgb_frame, [bbox for bbox, _ in detections])
+            palm_probs = self._classify_with_cache(batch, [landmarks for _, landmarks in detections])
+            hands = [self._hand_result(bbox, landmarks, float(prob))
+                     for (bbox, landmarks), prob in zip(detections, palm_probs)]
+        
+        primary, fired = self._combine_hands(hands, policy)
+        
+        result = {
+            "bbox": None,
+            "landmarks": None,
+            "detected_palm": fired,
             "confidence": 0.0,
             "label": "no hand",
-            "predicted_class": None
+            "predicted_class": None,
+            "hands": hands,
+            "policy": policy
         }
         
-        if bbox:
-            # Preprocess dan classify
-            preprocessed = self.preprocess_frame(frame, bbox)
-            predicted_class, conf, probs = self.classify_gesture(preprocessed)
-            
-            result["confidence"] = conf
-            result["predicted_class"] = predicted_class
-            result["label"] = self.class_names[predicted_class]
-            
-            # Cek apakah PALM terdeteksi (Class 1)
-            # User requested PALM trigger
-            if predicted_class == 1 and conf >= self.confidence:
-                result["detected_palm"] = True
+        if primary:
+            result["bbox"] = primary["bbox"]
+            result["landmarks"] = primary["landmarks"]
+            result["confidence"] = primary["confidence"]
+            result["predicted_class"] = primary["predicted_class"]
+            result["label"] = primary["label"]
                 
         return result
 
+    @staticmethod
+    def scale_result(result: Dict[str, Any], factor: float) -> None:
+        """Scale every bbox in a detection result in place (e.g. back to full resolution)."""
+        def scale(bbox):
+            return tuple(int(round(v * factor)) for v in bbox)
+        
+        if result.get("bbox"):
+            result["bbox"] = scale(result["bbox"])
+        for hand in result.get("hands", []):
+            hand["bbox"] = scale(hand["bbox"])
+
     def annotate_frame(self, frame: np.ndarray, result: Dict[str, Any], min_frames: int = 5) -> Tuple[np.ndarray, bool, bool]:
         """
         Draw annotations on the frame and determine if trigger should fire.
@@ -198,36 +393,30 @@ class ResNet50GestureDetector:
         if not result:
             return frame, False, False
 
-        bbox = result.get("bbox")
-        landmarks = result.get("landmarks")
         detected_palm = result.get("detected_palm", False)
-        confidence = result.get("confidence", 0.0)
-        label = result.get("label", "")
-        
-        # Update state based on current detection
-        # Note: Ideally this should be separate, but for now we keep it here for visualization logic
-        # logic moved to update_state in services.py loop, but we read it here?
-        # Actually services.py calls update_state separately.
+        hands = result.get("hands")
+        if hands is None:
+            # Hasil lama (satu tangan) tanpa daftar "hands"
+            hands = [result] if result.get("bbox") else []
         
         should_trigger = self.fist_detected_frames >= min_frames and not self.trigger_active
+        stable = detected_palm and self.fist_detected_frames >= min_frames
 
-        if bbox:
-            x, y, w, h = bbox
+        for hand in hands:
+            x, y, w, h = hand["bbox"]
             # Warna hijau jika Trigger terdeteksi dan stabil, kuning jika tidak
-            color = (0, 255, 0) if detected_palm and self.fist_detected_frames >= min_frames else (0, 255, 255)
-            
-            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+            color = (0, 255, 0) if stable and hand.get("detected_palm") else (0, 255, 255)
             
             cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
             
             # Landmarks removed for cleaner "YOLO-style" look
-            # if landmarks: ...
             
             # Draw label
-            text = f"{label} {confidence:.2f}"
+            text = f"{hand.get('label', '')} {hand.get('confidence', 0.0):.2f}"
             cv2.putText(frame, text, (x, y - 10),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-        else:
+        
+        if not hands:
             # Tidak ada tangan terdeteksi
             cv2.putText(frame, "No hand detected", (10, 30),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
@@ -0,0 +1,159 @@
+# Runtime backend untuk model detector (Keras, SavedModel, TFLite, ONNX)
+import json
+import os
+from typing import Any, Dict, Optional
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras.applications.resnet50 import preprocess_input
+
+from .model_registry import model_file_version
+
+# Written next to the model by ml-self-studio/scripts/export_model.py
+EXPORT_REPORT = os.path.join('export', 'export_report.json')
+REPORT_VERSION = 1
+
+
+def expects_raw_pixels(model: Any) -> bool:
+    """True if the model normalizes its own [0, 255] RGB input via a preprocess_input layer."""
+    return any(layer.name == 'preprocess_input' for layer in model.layers)
+
+
+class KerasBackend:
+    name = 'keras'
+
+    def __init__(self, path: str):
+        self.model = keras.models.load_model(path, custom_objects={'preprocess_input': preprocess_input})
+        self.raw_pixels = expects_raw_pixels(self.model)
+
+    @classmethod
+    def from_model(cls, model: Any) -> "KerasBackend":
+        """Wrap a model that is already loaded."""
+        backend = cls.__new__(cls)
+        backend.model = model
+        backend.raw_pixels = expects_raw_pixels(model)
+        return backend
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        # Direct call instead of predict(): predict builds a tf.data pipeline per call,
+        # which dominates the cost for the handful of crops we get per frame
+        return np.asarray(self.model(batch, training=False), dtype=np.float32).reshape(-1)
+
+
+class SavedModelBackend:
+    name = 'savedmodel'
+
+    def __init__(self, path: str, raw_pixels: bool):
+        self.fn = tf.saved_model.load(path).signatures['serving_default']
+        self.raw_pixels = raw_pixels
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        outputs = self.fn(images=tf.constant(batch, dtype=tf.float32))
+        return next(iter(outputs.values())).numpy().reshape(-1)
+
+
+class TFLiteBackend:
+    name = 'tflite'
+
+    def __init__(self, path: str, raw_pixels: bool, threads: Optional[int] = None):
+        self.interpreter = tf.lite.Interpreter(model_path=path, num_threads=threads)
+        self.input = self.interpreter.get_input_details()[0]['index']
+        self.output = self.interpreter.get_output_details()[0]['index']
+        self.raw_pixels = raw_pixels
+        self.batch_size = None
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        # The tensors are only reallocated when the number of hands changes
+        if batch.shape[0] != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input, batch.shape)
+            self.interpreter.allocate_tensors()
+            self.batch_size = batch.shape[0]
+        self.interpreter.set_tensor(self.input, np.asarray(batch, dtype=np.float32))
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output).reshape(-1).copy()
+
+
+class OnnxBackend:
+    name = 'onnx'
+
+    def __init__(self, path: str, raw_pixels: bool, threads: Optional[int] = None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input = self.session.get_inputs()[0].name
+        self.raw_pixels = raw_pixels
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input: np.asarray(batch, dtype=np.float32)})[0].reshape(-1)
+
+
+def read_export_report(model_path: str) -> Optional[Dict[str, Any]]:
+    """
+    The export report of ``model_path``, or None if there is none or it was
+    made from a different version of the model file.
+    """
+    report_path = os.path.join(os.path.dirname(model_path), EXPORT_REPORT)
+    if not os.path.exists(report_path):
+        return None
+    try:
+        with open(report_path, 'r') as f:
+            report = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Ignoring unreadable export report {report_path}: {e}")
+        return None
+    if report.get('version') != REPORT_VERSION:
+        return None
+    source = report.get('source')
+    if not isinstance(source, dict) or 'raw_pixels' not in source:
+        print(f"[WARN] Export report {report_path} does not describe its source model, ignoring it")
+        return None
+    if source.get('version') != model_file_version(model_path):
+        print(f"[WARN] Export report {report_path} is for another model version, ignoring it")
+        return None
+    report['_dir'] = os.path.dirname(report_path)
+    return report
+
+
+def load_backend(model_path: str, backend: str = 'auto') -> Any:
+    """
+    Load the model with the requested runtime.
+
+    Args:
+        model_path: Path to the trained .keras file.
+        backend: 'keras', or 'auto' to run the fastest variant that passed the
+            budgets of export_model.py (falls back to Keras without a report,
+            or if that variant cannot be loaded here).
+    """
+    report = read_export_report(model_path) if backend == 'auto' else None
+    if report is None or report.get('selected') in (None, 'keras'):
+        return KerasBackend(model_path)
+
+    # Ranked on the percentile the budget was checked on, like the selection of export_model.py
+    ranking = f"p{report.get('budgets', {}).get('latency_percentile', 50)}"
+    passing = sorted((v for v in report['variants'] if v.get('passed')),
+                     key=lambda v: v['latency']['1'][ranking])
+    raw_pixels = report['source']['raw_pixels']
+    threads = report.get('threads')
+    for variant in passing:
+        path = os.path.join(report['_dir'], variant['path'])
+        try:
+            if variant['format'] == 'keras':
+                return KerasBackend(model_path)
+            if variant['format'] == 'savedmodel':
+                loaded = SavedModelBackend(path, raw_pixels)
+            elif variant['format'].startswith('tflite'):
+                loaded = TFLiteBackend(path, raw_pixels, threads)
+            elif variant['format'] == 'onnx':
+                loaded = OnnxBackend(path, raw_pixels, threads)
+            else:
+                continue
+        except (ImportError, OSError, ValueError, RuntimeError) as e:
+            print(f"[WARN] Could not load {variant['name']} variant ({e}), trying the next one")
+            continue
+        loaded.name = variant['name']
+        return loaded
+    return KerasBackend(model_path)
@@ -0,0 +1,51 @@
+# Utility untuk versioning model detector dan validasi holdout
+import hashlib
+import os
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def model_file_version(model_path: str, length: int = 12) -> str:
+    """
+    Derive a stable version label from the model file contents.
+
+    Two files with identical weights get the same version no matter where
+    they were copied to, so retraining is the only thing that bumps it.
+    """
+    digest = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def load_holdout(holdout_dir: str, class_names: List[str], per_class: int = 20) -> List[Tuple[np.ndarray, int]]:
+    """
+    Load a small labelled holdout set of hand crops.
+
+    Expects the same layout as ``dataset_cropped``: one sub-folder per class
+    (``fist/``, ``palm/``). The newest ``per_class`` files of each class are
+    used, matching the time-based validation split of the training pipeline.
+
+    Returns:
+        List of (BGR image, class index) pairs. Empty if the folder is missing.
+    """
+    samples: List[Tuple[np.ndarray, int]] = []
+    if not holdout_dir or not os.path.isdir(holdout_dir):
+        return samples
+
+    for label_idx, class_name in enumerate(class_names):
+        class_dir = os.path.join(holdout_dir, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        entries = [e for e in os.scandir(class_dir) if e.name.lower().endswith(IMAGE_EXTENSIONS)]
+        entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+        for entry in entries[:per_class]:
+            image = cv2.imread(entry.path)
+            if image is not None:
+                samples.append((image, label_idx))
+    return samples
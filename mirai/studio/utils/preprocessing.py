@@ -0,0 +1,84 @@
+# Utility untuk preprocessing crop tangan sebelum klasifikasi
+import cv2
+import numpy as np
+from typing import Optional, Sequence, Tuple
+
+BBox = Tuple[int, int, int, int]
+
+
+class CropPreprocessor:
+    """
+    Crops hand regions straight into a reusable (N, size, size, 3) float32 batch.
+
+    The frame is expected to be RGB already (it is converted once per frame
+    for MediaPipe), every crop is resized directly into a preallocated uint8
+    slot, and the uint8 -> float32 conversion and scaling happen in a single
+    pass into the preallocated input tensor. Buffers grow on demand and are
+    reused across calls, so the returned batch is only valid until the next
+    call to ``prepare``.
+    """
+
+    def __init__(self, size: int = 224, padding: int = 20, divisor: float = 255.0, capacity: int = 1):
+        """
+        Args:
+            size: Model input width/height.
+            padding: Pixels added around each bounding box before cropping.
+            divisor: Pixel values are divided by this (1.0 keeps [0, 255]).
+            capacity: Initial number of crops the buffers can hold.
+        """
+        self.size = size
+        self.padding = padding
+        self.divisor = float(divisor)
+        self._resized = np.empty((0, size, size, 3), dtype=np.uint8)
+        self._batch = np.empty((0, size, size, 3), dtype=np.float32)
+        self._ensure_capacity(capacity)
+        # uint8 RGB crops of the last prepare() call (view into the shared buffer)
+        self.last_crops = self._resized[:0]
+
+    def _ensure_capacity(self, count: int) -> None:
+        if count <= self._batch.shape[0]:
+            return
+        capacity = max(count, 2 * self._batch.shape[0])
+        self._resized = np.empty((capacity, self.size, self.size, 3), dtype=np.uint8)
+        self._batch = np.empty((capacity, self.size, self.size, 3), dtype=np.float32)
+
+    def pad_bbox(self, bbox: BBox, frame_shape: Tuple[int, ...]) -> BBox:
+        """Apply padding to (x, y, w, h) and clip it to the frame."""
+        x, y, w, h = bbox
+        x = min(max(0, x - self.padding), frame_shape[1] - 1)
+        y = min(max(0, y - self.padding), frame_shape[0] - 1)
+        w = max(1, min(frame_shape[1] - x, w + 2 * self.padding))
+        h = max(1, min(frame_shape[0] - y, h + 2 * self.padding))
+        return x, y, w, h
+
+    def prepare(self, rgb_frame: np.ndarray, bboxes: Sequence[Optional[BBox]]) -> np.ndarray:
+        """
+        Build the model input batch.
+
+        Args:
+            rgb_frame: RGB uint8 frame.
+            bboxes: One (x, y, w, h) per crop; None uses the whole frame.
+
+        Returns:
+            View of shape (len(bboxes), size, size, 3), dtype float32.
+        """
+        count = len(bboxes)
+        self._ensure_capacity(count)
+
+        for i, bbox in enumerate(bboxes):
+            if bbox:
+                x, y, w, h = self.pad_bbox(bbox, rgb_frame.shape)
+                crop = rgb_frame[y:y + h, x:x + w]
+            else:
+                crop = rgb_frame
+            cv2.resize(crop, (self.size, self.size), dst=self._resized[i])
+
+        resized = self._resized[:count]
+        self.last_crops = resized
+        batch = self._batch[:count]
+        if self.divisor == 1.0:
+            np.copyto(batch, resized, casting='unsafe')
+        else:
+            # Same float32 arithmetic as `rgb.astype(np.float32) / divisor`, without the temporary
+            np.divide(resized, self.divisor, out=batch, dtype=np.float32)
+        return batch
@@ -0,0 +1,4 @@
+# Konstanta trigger, tanpa dependensi TensorFlow/MediaPipe (dipakai juga oleh studio.config)
+
+# Cara menggabungkan hasil beberapa tangan menjadi satu keputusan trigger
+TRIGGER_POLICIES = ('any_palm', 'majority', 'largest')
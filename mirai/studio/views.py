@@ -1,5 +1,18 @@
-from django.shortcuts import render
-from django.http import StreamingHttpResponse, JsonResponse
+import hashlib
+import json
+import os
+from urllib.parse import urlencode
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import get_object_or_404, render
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_POST, require_http_methods
+from . import gallery as capture_gallery
+from .assets.fingerprint import IMMUTABLE, asset_response
+from .catalog import catalog as catalog_entries, ensure_thumbnail
+from .export import StoredZip, capture_entries, parse_range, select_captures
+from .models import CatalogAsset, Capture, DetectorModel, PipelineSettings
 from .services import CameraService
 
 def index(request):
@@ -16,3 +29,170 @@ def status(request):
 
 def ar(request):
     return render(request, 'studio/ar.html')
+
+@require_http_methods(["GET", "HEAD"])
+def asset(request, path):
+    # Content-hashed static files (manage.py fingerprint_assets), precompressed, cached as immutable
+    return asset_response(request, path)
+
+def _json_with_etag(request, data, cache_control='no-cache'):
+    # JSON response that is answered with 304 when the client already has this body
+    response = JsonResponse(data)
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    response = get_conditional_response(request, etag=etag, response=response)
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+@require_http_methods(["GET", "HEAD"])
+def catalog(request):
+    # Characters and stickers for the picker (manage.py sync_catalog); models are fetched only when picked
+    return _json_with_etag(request, {"assets": catalog_entries()})
+
+@require_http_methods(["GET", "HEAD"])
+def catalog_thumbnail(request, content_hash):
+    # Preview rendered on first request and cached per content hash, so the URL never changes content
+    asset = CatalogAsset.objects.filter(content_hash=content_hash).first()
+    if asset is None:
+        raise Http404(content_hash)
+    try:
+        path = ensure_thumbnail(asset)
+    except ValueError as e:
+        raise Http404(str(e))
+    response = FileResponse(open(path, 'rb'), content_type='image/webp')
+    response['Cache-Control'] = IMMUTABLE
+    return response
+
+@require_POST
+def sticker(request):
+    # Sticker picked on the page (name= of a catalog sticker, empty to remove), drawn by the server
+    name = request.POST.get('name', '')
+    try:
+        CameraService().set_sticker(name)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({"sticker": name or None})
+
+@staff_member_required
+@require_http_methods(["GET", "HEAD"])
+def gallery(request):
+    # Captures, newest first: ?limit=&gesture=, then follow "next" (keyset cursor) for older ones
+    try:
+        limit = int(request.GET.get('limit', capture_gallery.PAGE_SIZE))
+        if not 1 <= limit <= capture_gallery.MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {capture_gallery.MAX_PAGE_SIZE}")
+        gesture = request.GET.get('gesture')
+        captures, cursor = capture_gallery.page(request.GET.get('cursor'), limit, gesture)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    next_url = None
+    if cursor:
+        query = {'cursor': cursor, 'limit': limit, **({'gesture': gesture} if gesture is not None else {})}
+        next_url = f"{request.path}?{urlencode(query)}"
+    return _json_with_etag(request, {"results": [capture_gallery.serialize(c) for c in captures], "next": next_url},
+                           cache_control='private, no-cache')
+
+@staff_member_required
+@require_http_methods(["GET", "HEAD"])
+def gallery_thumbnail(request, capture_id, size):
+    # Generated once per capture by the background pool; waits for the job on a first request
+    if size not in capture_gallery.thumbnail_sizes():
+        raise Http404(f"No {size}px thumbnails")
+    capture = get_object_or_404(Capture.objects.only('id', 'image', 'thumbnails'), pk=capture_id)
+    try:
+        path = capture_gallery.ensure_thumbnail(capture, size)
+    except TimeoutError:
+        # Before OSError, of which TimeoutError is a subclass
+        return JsonResponse({"error": "Thumbnail is still being generated"}, status=503, headers={'Retry-After': '1'})
+    except (ValueError, OSError) as e:
+        raise Http404(str(e))
+    stat = os.stat(path)
+    etag = quote_etag(f"{capture_id}-{size}-{stat.st_mtime_ns:x}-{stat.st_size:x}")
+    headers = {'ETag': etag, 'Cache-Control': 'private, max-age=86400'}
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = FileResponse(open(path, 'rb'), content_type='image/webp')
+    for key, value in headers.items():
+        response[key] = value
+    return response
+
+@staff_member_required
+@require_http_methods(["GET", "HEAD"])
+def capture_export(request):
+    # ZIP of ?session= and/or ?start=&end= (YYYY-MM-DD, end inclusive), streamed from disk; resumable with Range
+    try:
+        captures, name = select_captures(request.GET.get('session'), request.GET.get('start'), request.GET.get('end'))
+        entries, missing = capture_entries(captures, name)
+        archive = StoredZip(entries)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    if missing:
+        print(f"[WARN] Export {name}: {missing} capture file(s) missing on disk, skipped")
+
+    byte_range = None
+    # A range only applies to the same archive the client started downloading
+    if request.META.get('HTTP_IF_RANGE', archive.etag) == archive.etag:
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE', ''), archive.size)
+        except ValueError:
+            return HttpResponse(status=416, headers={'Content-Range': f"bytes */{archive.size}"})
+    start, end = byte_range or (0, archive.size)
+
+    body = archive.iter_range(start, end) if request.method == "GET" else iter(())
+    response = StreamingHttpResponse(body, content_type='application/zip', status=206 if byte_range else 200)
+    response['Content-Length'] = str(end - start)
+    response['Content-Disposition'] = f'attachment; filename="{name}.zip"'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = archive.etag
+    response['Cache-Control'] = 'private, no-cache'
+    if byte_range:
+        response['Content-Range'] = f"bytes {start}-{end - 1}/{archive.size}"
+    return response
+
+@staff_member_required
+@require_http_methods(["GET", "POST"])
+def pipeline_config(request):
+    # GET: current runtime config. POST: JSON object with the settings to change.
+    service = CameraService()
+    if request.method == "POST":
+        try:
+            changes = json.loads(request.body or b"{}")
+            if not isinstance(changes, dict):
+                raise ValueError("Expected a JSON object")
+            config = service.update_config(changes)
+        except (ValueError, TypeError) as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        # Persist so the change survives a restart
+        PipelineSettings.store(changes)
+        return JsonResponse(config.to_dict())
+    return JsonResponse(service.config.to_dict())
+
+@staff_member_required
+@require_POST
+def model_deploy(request):
+    # Deploy a registered model (?id=) or register and deploy a file (?path=)
+    model_id = request.POST.get('id')
+    model_path = request.POST.get('path')
+    if model_id:
+        detector_model = DetectorModel.objects.filter(pk=model_id).first()
+        if detector_model is None:
+            return JsonResponse({"error": f"Unknown model id {model_id}"}, status=404)
+    elif model_path:
+        detector_model = DetectorModel.objects.filter(path=model_path).order_by('-id').first()
+        if detector_model is None:
+            detector_model = DetectorModel.objects.create(path=model_path)
+    else:
+        return JsonResponse({"error": "Provide 'id' or 'path'"}, status=400)
+
+    if not detector_model.start_deploy(CameraService()):
+        return JsonResponse({"error": "Another deployment is already in progress"}, status=409)
+    return JsonResponse({"id": detector_model.id, "status": detector_model.status}, status=202)
+
+@staff_member_required
+@require_POST
+def model_rollback(request):
+    service = CameraService()
+    if not service.rollback_model():
+        return JsonResponse({"error": "No previous model is loaded"}, status=409)
+    DetectorModel.record_rollback()
+    return JsonResponse(service.get_model_info())
@@ -0,0 +1,170 @@
+"""
+Compute settings for pipeline.py: precision, XLA, thread pools, determinism,
+and a short probing run that picks the fastest threads/batch size for the host.
+
+Thread pools can only be configured before TensorFlow initializes its
+runtime, so every probed configuration runs in its own subprocess
+(`pipeline.py --probe_run ...`) and reports its throughput on stdout.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tensorflow as tf
+
+PRECISIONS = ("auto", "float32", "mixed_float16", "mixed_bfloat16")
+PROBE_MARKER = "PROBE_RESULT "
+
+def add_compute_args(parser):
+    parser.add_argument("--precision", type=str, choices=PRECISIONS, default="auto", help="auto: mixed_float16 on GPU, float32 on CPU")
+    parser.add_argument("--xla", action="store_true", help="Compile train steps with XLA (jit_compile)")
+    parser.add_argument("--intra_op_threads", type=int, default=0, help="Threads inside one op (0 = TensorFlow default)")
+    parser.add_argument("--inter_op_threads", type=int, default=0, help="Ops run in parallel (0 = TensorFlow default)")
+    parser.add_argument("--deterministic", action="store_true", help="Deterministic ops and tf.data ordering (slower)")
+    parser.add_argument("--probe", action="store_true", help="Probe thread/batch settings for this host before training")
+    parser.add_argument("--probe_steps", type=int, default=10, help="Timed train steps per probed configuration")
+    parser.add_argument("--probe_run", action="store_true", help=argparse.SUPPRESS)
+
+def configure_compute(args):
+    """
+    Apply the compute settings. Must run before TensorFlow executes any op.
+
+    Returns:
+        dict of the effective settings.
+    """
+    if args.intra_op_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(args.intra_op_threads)
+    if args.inter_op_threads:
+        tf.config.threading.set_inter_op_parallelism_threads(args.inter_op_threads)
+    if args.deterministic:
+        tf.config.experimental.enable_op_determinism()
+
+    gpus = tf.config.list_physical_devices("GPU")
+    precision = args.precision
+    if precision == "auto":
+        # float16 math is slower than float32 on most CPUs
+        precision = "mixed_float16" if gpus else "float32"
+    tf.keras.mixed_precision.set_global_policy(precision)
+
+    return {
+        "precision": precision,
+        "xla": args.xla,
+        "intra_op_threads": tf.config.threading.get_intra_op_parallelism_threads(),
+        "inter_op_threads": tf.config.threading.get_inter_op_parallelism_threads(),
+        "deterministic": args.deterministic,
+        "batch_size": args.batch_size,
+        "gpus": len(gpus)
+    }
+
+def apply_data_options(ds, deterministic):
+    """Let tf.data reorder elements for speed unless determinism was asked for."""
+    options = tf.data.Options()
+    options.deterministic = deterministic
+    return ds.with_options(options)
+
+def run_probe(args, build_model):
+    """
+    Time a few train steps of the image model on synthetic data (probe child).
+
+    Only compute is measured: the input pipeline is a single repeated batch.
+    """
+    input_shape = (args.img_size, args.img_size, 3)
+    model = build_model(input_shape)
+    model.compile(optimizer="adam", loss="binary_crossentropy", jit_compile=args.xla)
+    x = tf.random.uniform((args.batch_size,) + input_shape, 0, 255)
+    y = tf.cast(tf.random.uniform((args.batch_size,), 0, 2, dtype=tf.int32), tf.float32)
+    ds = tf.data.Dataset.from_tensors((x, y)).repeat()
+
+    # Warmup (tracing, XLA compilation, thread pool start)
+    model.fit(ds, steps_per_epoch=3, epochs=1, verbose=0)
+    start = time.perf_counter()
+    model.fit(ds, steps_per_epoch=args.probe_steps, epochs=1, verbose=0)
+    elapsed = time.perf_counter() - start
+    print(PROBE_MARKER + json.dumps({"images_per_sec": args.probe_steps * args.batch_size / elapsed}), flush=True)
+
+def probe_compute(args, script):
+    """
+    Run short training probes in subprocesses and return the fastest settings.
+
+    Threads are probed first at the requested batch size, then the batch size
+    at the best thread setting.
+    """
+    cpus = os.cpu_count() or 1
+
+    def probe(intra, inter, batch_size):
+        command = [sys.executable, script, "--probe_run",
+                   "--batch_size", str(batch_size), "--img_size", str(args.img_size),
+                   "--intra_op_threads", str(intra), "--inter_op_threads", str(inter),
+                   "--precision", args.precision, "--probe_steps", str(args.probe_steps)]
+        if args.xla:
+            command.append("--xla")
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, timeout=900)
+        except subprocess.TimeoutExpired:
+            return None
+        for line in result.stdout.splitlines():
+            if line.startswith(PROBE_MARKER):
+                return json.loads(line[len(PROBE_MARKER):])["images_per_sec"]
+        return None
+
+    results = []
+
+    def record(intra, inter, batch_size):
+        speed = probe(intra, inter, batch_size)
+        results.append({"intra_op_threads": intra, "inter_op_threads": inter,
+                        "batch_size": batch_size, "images_per_sec": speed})
+        shown = f"{speed:.1f} images/s" if speed is not None else "failed"
+        print(f"  intra={intra:<3} inter={inter:<2} batch={batch_size:<4} {shown}")
+        return speed or 0.0
+
+    print("[INFO] Probing compute settings...")
+    thread_speeds = {}
+    for intra, inter in sorted({(cpus, 1), (cpus, 2), (max(1, cpus // 2), 1), (max(1, cpus // 2), 2)}):
+        thread_speeds[(intra, inter)] = record(intra, inter, args.batch_size)
+    best_threads = max(thread_speeds, key=thread_speeds.get)
+
+    speeds = {args.batch_size: thread_speeds[best_threads]}
+    for batch_size in (max(8, args.batch_size // 2), args.batch_size * 2):
+        speeds[batch_size] = record(best_threads[0], best_threads[1], batch_size)
+    best_batch = max(speeds, key=speeds.get)
+
+    best = {"intra_op_threads": best_threads[0], "inter_op_threads": best_threads[1],
+            "batch_size": best_batch, "images_per_sec": speeds[best_batch]}
+    print(f"[INFO] Fastest: intra={best['intra_op_threads']} inter={best['inter_op_threads']} "
+          f"batch={best['batch_size']} ({best['images_per_sec']:.1f} images/s)")
+    return {"best": best, "results": results}
+
+def write_training_config(model_dir, compute, probe=None):
+    """Record the compute settings next to the trained model."""
+    os.makedirs(model_dir, exist_ok=True)
+    config = {
+        "compute": compute,
+        "probe": probe,
+        "host": {"platform": platform.platform(), "cpus": os.cpu_count(), "python": platform.python_version()},
+        "tensorflow": tf.__version__
+    }
+    with open(os.path.join(model_dir, "training_config.json"), "w") as f:
+        json.dump(config, f, indent=2)
+
+def save_float32(model, build, path):
+    """
+    Save ``model`` with float32 layers.
+
+    A model trained under a mixed policy keeps it when saved, and would then
+    run float16 math in the detector on the kiosk CPU. Variables are float32
+    under mixed precision, so the weights carry over to a float32 rebuild.
+    """
+    policy = tf.keras.mixed_precision.global_policy()
+    if policy.name == "float32":
+        model.save(path)
+        return
+    tf.keras.mixed_precision.set_global_policy("float32")
+    try:
+        export = build()
+        export.set_weights(model.get_weights())
+        export.save(path)
+    finally:
+        tf.keras.mixed_precision.set_global_policy(policy)
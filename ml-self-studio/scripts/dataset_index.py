@@ -0,0 +1,233 @@
+"""
+Persistent index of an image dataset laid out as <dataset_dir>/<class>/<file>.
+
+The index (<dataset_dir>/index.json) stores, per file: class, mtime, size,
+sha1, and the assigned split and group. refresh() walks the class directories
+once with os.scandir and only reads (hashes) files that are new or whose size
+or mtime changed, so reopening a large dataset costs one directory scan
+instead of a full read.
+
+Splits are deterministic:
+    time     per class, files ordered by (mtime, path), the oldest `ratio` train
+    grouped  whole groups go to one side, ordered by their first mtime; groups
+             are capture bursts (files of a class less than `burst_gap` seconds
+             apart) unless a groups file (e.g. from dedup) is given
+"""
+import os
+import json
+import hashlib
+
+INDEX_VERSION = 1
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+SPLIT_METHODS = ('time', 'grouped')
+
+def file_hash(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+def load_groups(path):
+    """
+    Read a groups file: {"groups": [["class/a.jpg", "class/b.jpg"], ...]}.
+
+    Returns:
+        dict rel_path -> group id
+    """
+    with open(path, "r") as f:
+        groups = json.load(f)["groups"]
+    return {rel_path: f"g{i}" for i, members in enumerate(groups) for rel_path in members}
+
+class DatasetIndex:
+    def __init__(self, dataset_dir, index_path=None):
+        self.dataset_dir = dataset_dir
+        self.index_path = index_path or os.path.join(dataset_dir, "index.json")
+        self.entries = {}
+        self.class_names = []
+        self.split_params = None
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Rebuilding unreadable index {self.index_path}: {e}")
+            return
+        if data.get("version") != INDEX_VERSION:
+            return
+        self.entries = data.get("files", {})
+        self.class_names = data.get("class_names", [])
+        self.split_params = data.get("split_params")
+
+    def save(self):
+        """Write the index if anything changed since it was loaded."""
+        if not self._dirty:
+            return
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "version": INDEX_VERSION,
+                "class_names": self.class_names,
+                "split_params": self.split_params,
+                "files": self.entries
+            }, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+        self._dirty = False
+
+    def refresh(self):
+        """
+        Sync the index with the files on disk.
+
+        Returns:
+            dict with the number of added, changed, removed and unchanged files.
+        """
+        counts = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+        seen = set()
+        class_names = sorted(d.name for d in os.scandir(self.dataset_dir) if d.is_dir())
+        for class_name in class_names:
+            with os.scandir(os.path.join(self.dataset_dir, class_name)) as it:
+                for entry in it:
+                    if not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                        continue
+                    rel_path = f"{class_name}/{entry.name}"
+                    seen.add(rel_path)
+                    stat = entry.stat()
+                    old = self.entries.get(rel_path)
+                    if old and old["size"] == stat.st_size and old["mtime"] == stat.st_mtime:
+                        counts["unchanged"] += 1
+                        continue
+                    self.entries[rel_path] = {
+                        "class": class_name,
+                        "mtime": stat.st_mtime,
+                        "size": stat.st_size,
+                        "sha1": file_hash(entry.path),
+                        "split": None,
+                        "group": None
+                    }
+                    counts["changed" if old else "added"] += 1
+
+        for rel_path in set(self.entries) - seen:
+            del self.entries[rel_path]
+            counts["removed"] += 1
+
+        if counts["added"] or counts["changed"] or counts["removed"] or class_names != self.class_names:
+            self.class_names = class_names
+            # Split boundaries move when files come or go
+            self.split_params = None
+            self._dirty = True
+        return counts
+
+    def _by_class(self):
+        by_class = {name: [] for name in self.class_names}
+        for rel_path, entry in self.entries.items():
+            by_class.setdefault(entry["class"], []).append(rel_path)
+        for paths in by_class.values():
+            paths.sort(key=lambda p: (self.entries[p]["mtime"], p))
+        return by_class
+
+    def assign_splits(self, method="time", ratio=0.8, burst_gap=2.0, groups=None, groups_file=None):
+        """
+        Assign every file to "train" or "val". Does nothing if the files and
+        parameters are the same as for the stored assignment.
+
+        Args:
+            method: "time" or "grouped".
+            ratio: Fraction of each class that goes to train.
+            burst_gap: Seconds between files that starts a new burst group.
+            groups: Optional dict rel_path -> group id (overrides bursts).
+            groups_file: Path the groups were read from, recorded in the index
+                with a hash of the groups.
+        """
+        if method not in SPLIT_METHODS:
+            raise ValueError(f"split method must be one of {SPLIT_METHODS}")
+        params = {"method": method, "ratio": ratio}
+        if method == "grouped":
+            if groups is not None:
+                # Content, not just the path: a regenerated groups file must re-split
+                digest = hashlib.sha1(json.dumps(groups, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+                params["groups"] = f"{groups_file}@{digest}"
+            else:
+                params["groups"] = f"burst:{burst_gap}"
+        if params == self.split_params:
+            return
+
+        for paths in self._by_class().values():
+            if method == "time":
+                split_point = int(len(paths) * ratio)
+                for i, rel_path in enumerate(paths):
+                    self.entries[rel_path]["split"] = "train" if i < split_point else "val"
+                    self.entries[rel_path]["group"] = None
+                continue
+
+            # Grouped: keep the order of first appearance (paths are time-ordered)
+            ordered = {}
+            previous_mtime = None
+            burst = 0
+            for rel_path in paths:
+                mtime = self.entries[rel_path]["mtime"]
+                if groups is not None:
+                    group = groups.get(rel_path, rel_path)
+                else:
+                    if previous_mtime is not None and mtime - previous_mtime > burst_gap:
+                        burst += 1
+                    previous_mtime = mtime
+                    group = f"{self.entries[rel_path]['class']}:{burst}"
+                ordered.setdefault(group, []).append(rel_path)
+
+            target = int(len(paths) * ratio)
+            assigned = 0
+            for group, members in ordered.items():
+                split = "train" if assigned < target else "val"
+                assigned += len(members)
+                for rel_path in members:
+                    self.entries[rel_path]["split"] = split
+                    self.entries[rel_path]["group"] = group
+
+        self.split_params = params
+        self._dirty = True
+
+    def split(self, name):
+        """
+        Files of one split, per class in time order.
+
+        Returns:
+            (paths, labels, mtimes): absolute paths, integer labels (index
+            into class_names) and mtimes.
+        """
+        paths, labels, mtimes = [], [], []
+        by_class = self._by_class()
+        for label_idx, class_name in enumerate(self.class_names):
+            for rel_path in by_class.get(class_name, []):
+                entry = self.entries[rel_path]
+                if entry["split"] != name:
+                    continue
+                paths.append(os.path.join(self.dataset_dir, class_name, rel_path.split("/", 1)[1]))
+                labels.append(label_idx)
+                mtimes.append(entry["mtime"])
+        return paths, labels, mtimes
+
+    def hashes(self, paths):
+        """sha1 of files returned by split()."""
+        return [self.entries[os.path.relpath(p, self.dataset_dir).replace(os.sep, "/")]["sha1"] for p in paths]
+
+def open_index(dataset_dir, method="time", ratio=0.8, burst_gap=2.0, groups_file=None, verbose=True):
+    """Load, refresh, split and save the index of dataset_dir in one call."""
+    index = DatasetIndex(dataset_dir)
+    counts = index.refresh()
+    groups = load_groups(groups_file) if groups_file else None
+    index.assign_splits(method, ratio, burst_gap, groups, groups_file)
+    index.save()
+    if verbose:
+        print(f"[INFO] Dataset index: {len(index.entries)} files "
+              f"(+{counts['added']} ~{counts['changed']} -{counts['removed']}), split={method}")
+        for class_name in index.class_names:
+            splits = {e["split"] for e in index.entries.values() if e["class"] == class_name}
+            if len(splits) == 1:
+                print(f"[WARN] Every '{class_name}' file is in {splits.pop()}: "
+                      "the groups are too coarse (check mtimes or --burst_gap)")
+    return index
@@ -0,0 +1,398 @@
+"""
+Near-duplicate detection for a <class>/<file> image dataset.
+
+Burst captures produce runs of almost identical frames: they cost training
+time without adding information, and with a time-based split the last
+frames of a burst land in val while their neighbours are in train.
+
+1. Every image gets a 64-bit perceptual hash (DCT of a 32x32 grayscale
+   thumbnail, computed for all images in one batched matrix product).
+   Hashes are cached per content hash in <dataset_dir>/phash_cache.npz.
+2. A multi-index hash (the bits cut into --threshold + 1 bands) finds every
+   pair within --threshold bits without comparing all pairs.
+3. Optionally (--embeddings), ResNet50 features are compared through
+   random-hyperplane LSH buckets to catch duplicates the hash misses.
+4. Matches are merged with union-find into groups; the sharpest --keep
+   images of each group are its representatives.
+
+The groups are written as {"groups": [[rel_path, ...], ...]}, the format
+read by `pipeline.py --split grouped --groups_file`. --prune_dir writes a
+copy of the dataset with only the representatives.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import copy
+import numpy as np
+import cv2
+from multiprocessing import Pool
+from landmark_cache import read_image
+from dataset_index import DatasetIndex
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HASH_CACHE_VERSION = 1
+THUMB_SIZE = 32
+HASH_SIZE = 8  # 8x8 low-frequency DCT block -> 64-bit hash
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Find and prune near-duplicate images")
+    parser.add_argument("--dataset_dir", type=str, default=os.path.join(ROOT_DIR, "dataset_cropped"), help="Dataset to deduplicate (<class>/<file>)")
+    parser.add_argument("--output", type=str, default=None, help="Groups JSON (default: <dataset_dir>/dedup_groups.json)")
+    parser.add_argument("--threshold", type=int, default=6, help="Max Hamming distance between pHashes of near-duplicates (0-64)")
+    parser.add_argument("--keep", type=int, default=1, help="Representatives kept per group")
+    parser.add_argument("--embeddings", action="store_true", help="Also match ResNet50 embeddings (needs TensorFlow)")
+    parser.add_argument("--similarity", type=float, default=0.95, help="Cosine similarity of near-duplicate embeddings")
+    parser.add_argument("--lsh_bits", type=int, default=16, help="Hyperplanes per LSH table")
+    parser.add_argument("--lsh_tables", type=int, default=8, help="LSH tables (more = higher recall)")
+    parser.add_argument("--prune_dir", type=str, default=None, help="Write a deduplicated copy of the dataset here (hardlinks when possible)")
+    parser.add_argument("--images_per_sec", type=float, default=None, help="Training throughput for the epoch time estimate (default: from training_config.json)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes decoding images")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def hamming(a, b):
+    """Element-wise Hamming distance between uint64 hash arrays."""
+    x = np.bitwise_xor(np.asarray(a, dtype=np.uint64), np.asarray(b, dtype=np.uint64))
+    return POPCOUNT[x[..., None].view(np.uint8)].sum(axis=-1)
+
+def load_thumbnail(path):
+    """32x32 grayscale thumbnail and sharpness (Laplacian variance) of one image."""
+    img = read_image(path)
+    if img is None:
+        return None
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (128, 128), interpolation=cv2.INTER_AREA)
+    sharpness = float(cv2.Laplacian(small, cv2.CV_32F).var())
+    return cv2.resize(small, (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA), sharpness
+
+def dct_matrix(n):
+    """Orthonormal DCT-II matrix: dct(x) = M @ x."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m.astype(np.float32)
+
+def phash(thumbs):
+    """
+    Perceptual hashes of (N, 32, 32) thumbnails.
+
+    Returns:
+        uint64 array (N,): bit set where a low-frequency DCT coefficient is
+        above the median of the block (DC term excluded from the median).
+    """
+    d = dct_matrix(thumbs.shape[1])
+    coeffs = d @ thumbs.astype(np.float32) @ d.T
+    low = coeffs[:, :HASH_SIZE, :HASH_SIZE].reshape(len(thumbs), -1)
+    bits = low > np.median(low[:, 1:], axis=1, keepdims=True)
+    return np.packbits(bits, axis=1).view(">u8").reshape(-1).astype(np.uint64)
+
+def load_hash_cache(path):
+    if not os.path.exists(path):
+        return {}
+    data = np.load(path)
+    if int(data["version"]) != HASH_CACHE_VERSION:
+        return {}
+    return {sha1: (h, s) for sha1, h, s in zip(data["sha1"], data["hashes"], data["sharpness"])}
+
+def save_hash_cache(path, cache):
+    keys = sorted(cache)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, version=HASH_CACHE_VERSION, sha1=np.array(keys),
+             hashes=np.array([cache[k][0] for k in keys], dtype=np.uint64),
+             sharpness=np.array([cache[k][1] for k in keys], dtype=np.float32))
+    os.replace(tmp_path, path)
+
+def compute_hashes(paths, sha1s, cache_path, workers):
+    """
+    pHash and sharpness of every path, decoding only images missing from the cache.
+
+    Returns:
+        (hashes uint64 (N,), sharpness float32 (N,), valid bool (N,))
+    """
+    cache = load_hash_cache(cache_path)
+    todo = [i for i, sha1 in enumerate(sha1s) if sha1 not in cache]
+    if todo:
+        print(f"[INFO] Hashing {len(todo)} images ({len(paths) - len(todo)} cached)...")
+        todo_paths = [paths[i] for i in todo]
+        if workers > 1:
+            with Pool(workers) as pool:
+                results = pool.map(load_thumbnail, todo_paths, chunksize=32)
+        else:
+            results = [load_thumbnail(p) for p in todo_paths]
+        ok = [i for i, r in zip(todo, results) if r is not None]
+        if ok:
+            thumbs = np.stack([r[0] for r in results if r is not None])
+            for i, h, (_, sharpness) in zip(ok, phash(thumbs), (r for r in results if r is not None)):
+                cache[sha1s[i]] = (h, sharpness)
+        save_hash_cache(cache_path, cache)
+
+    valid = np.array([sha1 in cache for sha1 in sha1s], dtype=bool)
+    hashes = np.array([cache[s][0] if s in cache else 0 for s in sha1s], dtype=np.uint64)
+    sharpness = np.array([cache[s][1] if s in cache else 0.0 for s in sha1s], dtype=np.float32)
+    return hashes, sharpness, valid
+
+def hamming_pairs(hashes, threshold):
+    """
+    All pairs (i, j), i < j, of hashes at most ``threshold`` bits apart.
+
+    Multi-index hashing: the 64 bits are cut into threshold + 1 bands, and
+    by the pigeonhole principle two hashes within ``threshold`` bits agree
+    exactly on at least one band. Only pairs sharing a band value are
+    compared, so this is exact without comparing all N^2 pairs.
+
+    Returns:
+        (i, j) int arrays.
+    """
+    n = len(hashes)
+    if n < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    bands = min(threshold + 1, 64)
+    edges = np.linspace(0, 64, bands + 1).astype(int)
+    candidates = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        keys = (hashes >> np.uint64(lo)) & np.uint64((1 << (hi - lo)) - 1)
+        order = np.argsort(keys, kind="stable")
+        starts = np.flatnonzero(np.diff(keys[order], prepend=keys[order[0]] + np.uint64(1)))
+        for bucket in np.split(order, starts[1:]):
+            if len(bucket) < 2:
+                continue
+            i, j = np.triu_indices(len(bucket), k=1)
+            a, b = np.minimum(bucket[i], bucket[j]), np.maximum(bucket[i], bucket[j])
+            candidates.append(a.astype(np.int64) * n + b)
+    if not candidates:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pairs = np.unique(np.concatenate(candidates))
+    i, j = pairs // n, pairs % n
+    close = hamming(hashes[i], hashes[j]) <= threshold
+    return i[close], j[close]
+
+class UnionFind:
+    def __init__(self, n):
+        self.parent = np.arange(n)
+
+    def find(self, i):
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, i, j):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+def compute_embeddings(paths, batch_size=64):
+    """L2-normalized ResNet50 (ImageNet) pooled features, float32 (N, 2048)."""
+    import tensorflow as tf
+    from tensorflow.keras.applications.resnet50 import ResNet50, preprocess_input
+
+    def load_image(path):
+        img = tf.image.decode_jpeg(tf.io.read_file(path), channels=3)
+        return preprocess_input(tf.image.resize(img, [224, 224]))
+
+    model = ResNet50(include_top=False, weights="imagenet", pooling="avg", input_shape=(224, 224, 3))
+    ds = tf.data.Dataset.from_tensor_slices(paths).map(load_image, num_parallel_calls=tf.data.AUTOTUNE)
+    features = model.predict(ds.batch(batch_size).prefetch(tf.data.AUTOTUNE), verbose=1)
+    return features / np.maximum(np.linalg.norm(features, axis=1, keepdims=True), 1e-12)
+
+def lsh_pairs(embeddings, members, bits, tables, similarity, rng):
+    """
+    Pairs of ``members`` with cosine similarity >= ``similarity``.
+
+    Only images sharing a random-hyperplane signature in at least one table
+    are compared, so the cost grows with bucket sizes instead of N^2.
+    """
+    pairs = set()
+    vectors = embeddings[members]
+    for _ in range(tables):
+        planes = rng.standard_normal((vectors.shape[1], bits)).astype(np.float32)
+        codes = np.packbits(vectors @ planes > 0, axis=1)
+        _, buckets = np.unique(codes, axis=0, return_inverse=True)
+        buckets = buckets.reshape(-1)
+        order = np.argsort(buckets, kind="stable")
+        starts = np.flatnonzero(np.diff(buckets[order], prepend=-1))
+        for bucket in np.split(order, starts[1:]):
+            if len(bucket) < 2:
+                continue
+            sims = vectors[bucket] @ vectors[bucket].T
+            i, j = np.nonzero(np.triu(sims >= similarity, k=1))
+            pairs.update(zip(members[bucket[i]].tolist(), members[bucket[j]].tolist()))
+    return pairs
+
+def find_groups(labels, hashes, valid, threshold, embeddings=None, args=None):
+    """
+    Union-find groups of near-duplicates, never across classes.
+
+    Returns:
+        (group root per image, number of pHash matches, number of embedding
+        matches, pHash matches across classes as (i, j) pairs)
+    """
+    uf = UnionFind(len(labels))
+    members = np.flatnonzero(valid)
+    i, j = hamming_pairs(hashes[members], threshold)
+    i, j = members[i], members[j]
+    same = labels[i] == labels[j]
+    for a, b in zip(i[same], j[same]):
+        uf.union(a, b)
+
+    embedding_matches = 0
+    if embeddings is not None:
+        rng = np.random.default_rng(args.seed)
+        for label in np.unique(labels):
+            class_members = np.flatnonzero((labels == label) & valid)
+            if len(class_members) < 2:
+                continue
+            for a, b in lsh_pairs(embeddings, class_members, args.lsh_bits, args.lsh_tables, args.similarity, rng):
+                if uf.find(a) != uf.find(b):
+                    embedding_matches += 1
+                uf.union(a, b)
+    roots = np.array([uf.find(k) for k in range(len(labels))])
+    return roots, int(same.sum()), embedding_matches, list(zip(i[~same], j[~same]))
+
+def pick_representatives(roots, sharpness, keep):
+    """The ``keep`` sharpest images of every group, as a boolean mask."""
+    kept = np.zeros(len(roots), dtype=bool)
+    order = np.lexsort((-sharpness, roots))
+    sorted_roots = roots[order]
+    rank = np.arange(len(order)) - np.searchsorted(sorted_roots, sorted_roots, side="left")
+    kept[order[rank < keep]] = True
+    return kept
+
+def training_speed(args):
+    """Images/s for the epoch time estimate, from the flag or the last training_config.json."""
+    if args.images_per_sec:
+        return args.images_per_sec
+    config_path = os.path.join(ROOT_DIR, "models", "resnet50", "training_config.json")
+    try:
+        with open(config_path, "r") as f:
+            probe = json.load(f).get("probe") or {}
+        return probe.get("best", {}).get("images_per_sec")
+    except (OSError, ValueError):
+        return None
+
+def prune_copy(paths, rel_paths, kept, prune_dir):
+    """Hardlink (or copy) the kept images into prune_dir/<class>/."""
+    for path, rel_path in zip(np.array(paths)[kept], np.array(rel_paths)[kept]):
+        target = os.path.join(prune_dir, *rel_path.split("/"))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(target):
+            continue
+        try:
+            os.link(path, target)
+        except OSError:
+            shutil.copy2(path, target)
+
+def main():
+    args = get_args()
+    if not os.path.isdir(args.dataset_dir):
+        print(f"[ERROR] Dataset not found: {args.dataset_dir}")
+        sys.exit(1)
+    output_path = args.output or os.path.join(args.dataset_dir, "dedup_groups.json")
+    start = time.time()
+
+    # Refreshed hashes are saved, but the leak report uses the time split (pipeline.py's
+    # default) computed on a copy, so a grouped split stored in index.json is left alone
+    stored = DatasetIndex(args.dataset_dir)
+    stored.refresh()
+    stored.save()
+    index = copy.deepcopy(stored)
+    index.assign_splits("time")
+    rel_paths = sorted(index.entries, key=lambda p: (index.entries[p]["class"], index.entries[p]["mtime"], p))
+    entries = [index.entries[p] for p in rel_paths]
+    paths = [os.path.join(args.dataset_dir, *p.split("/")) for p in rel_paths]
+    labels = np.array([index.class_names.index(e["class"]) for e in entries])
+    splits = np.array([e["split"] for e in entries])
+
+    hashes, sharpness, valid = compute_hashes(paths, [e["sha1"] for e in entries],
+                                              os.path.join(args.dataset_dir, "phash_cache.npz"), args.workers)
+    if not valid.all():
+        print(f"[WARN] {int((~valid).sum())} unreadable images are left ungrouped")
+
+    embeddings = None
+    if args.embeddings:
+        print("[INFO] Computing ResNet50 embeddings...")
+        embeddings = compute_embeddings(paths)
+
+    group_start = time.time()
+    roots, hash_matches, embedding_matches, conflicts = find_groups(labels, hashes, valid, args.threshold, embeddings, args)
+    group_seconds = time.time() - group_start
+    kept = pick_representatives(roots, sharpness, args.keep)
+
+    # Export multi-image groups; singletons are their own group in the index
+    _, inverse, sizes = np.unique(roots, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    groups = {}
+    for i in np.flatnonzero(sizes[inverse] > 1):
+        groups.setdefault(roots[i], []).append(rel_paths[i])
+    leaking = [g for g in groups.values() if len({index.entries[p]["split"] for p in g}) > 1]
+
+    per_class = {}
+    for label, class_name in enumerate(index.class_names):
+        mask = labels == label
+        per_class[class_name] = {"images": int(mask.sum()), "kept": int((kept & mask).sum())}
+    train = splits == "train"
+    speed = training_speed(args)
+    stats = {
+        "images": len(paths),
+        "kept": int(kept.sum()),
+        "groups": len(groups),
+        "largest_group": int(sizes.max()) if len(sizes) else 0,
+        "hash_matches": hash_matches,
+        "embedding_matches": embedding_matches,
+        "leaking_groups": len(leaking),
+        "val_images_with_train_duplicate": int(sum(sum(index.entries[p]["split"] == "val" for p in g) for g in leaking)),
+        "cross_class_matches": [[rel_paths[i], rel_paths[j]] for i, j in conflicts[:50]],
+        "train_images": int(train.sum()),
+        "train_images_kept": int((train & kept).sum()),
+        "per_class": per_class,
+        "grouping_seconds": round(group_seconds, 3)
+    }
+    if speed:
+        stats["epoch_seconds"] = round(stats["train_images"] / speed, 1)
+        stats["epoch_seconds_kept"] = round(stats["train_images_kept"] / speed, 1)
+
+    result = {
+        "params": {"threshold": args.threshold, "keep": args.keep, "embeddings": args.embeddings,
+                   "similarity": args.similarity if args.embeddings else None},
+        "stats": stats,
+        "groups": [sorted(g, key=lambda p: (index.entries[p]["mtime"], p)) for g in groups.values()],
+        "drop": [rel_paths[i] for i in np.flatnonzero(~kept)]
+    }
+    with open(output_path, "w") as f:
+        json.dump(result, f, indent=1)
+
+    if args.prune_dir:
+        prune_copy(paths, rel_paths, kept, args.prune_dir)
+        print(f"[INFO] Deduplicated copy written to {args.prune_dir}")
+
+    shrink = 1 - stats["kept"] / max(1, stats["images"])
+    print(f"\n[INFO] {stats['images']} images -> {stats['kept']} kept ({shrink:.1%} smaller), "
+          f"{stats['groups']} near-duplicate groups (largest {stats['largest_group']})")
+    for class_name, counts in per_class.items():
+        print(f"  {class_name}: {counts['images']} -> {counts['kept']}")
+    print(f"[INFO] Matches: {hash_matches} by pHash (<= {args.threshold} bits)"
+          + (f", {embedding_matches} more by embedding" if args.embeddings else ""))
+    print(f"[INFO] Time split: {stats['leaking_groups']} groups span train and val, "
+          f"{stats['val_images_with_train_duplicate']} val images have a near-duplicate in train")
+    if conflicts:
+        print(f"[WARN] {len(conflicts)} near-identical pairs in different classes (check labels), "
+              f"e.g. {rel_paths[conflicts[0][0]]} ~ {rel_paths[conflicts[0][1]]}")
+    if speed:
+        print(f"[INFO] Estimated epoch time at {speed:.1f} images/s: "
+              f"{stats['epoch_seconds']:.0f}s -> {stats['epoch_seconds_kept']:.0f}s")
+    else:
+        print(f"[INFO] Train images per epoch: {stats['train_images']} -> {stats['train_images_kept']} "
+              f"(pass --images_per_sec for a time estimate)")
+    print(f"[INFO] Groups saved to {output_path} ({time.time() - start:.1f}s)")
+    print(f"[INFO] Train by group: python scripts/pipeline.py --split grouped --groups_file {output_path}")
+
+if __name__ == "__main__":
+    main()
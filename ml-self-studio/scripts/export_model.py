@@ -0,0 +1,283 @@
+"""
+Export a trained best_model.keras to several runtimes and verify each one.
+
+For every variant (Keras, SavedModel, TFLite float32, TFLite dynamic-range
+int8, ONNX if tf2onnx/onnxruntime are installed) the script measures
+accuracy on the validation split and single-image / batched latency
+percentiles with a fixed thread count, then checks them against the
+budgets. The result is written to <output_dir>/export_report.json; the
+detector (studio/utils/model_backends.py) reads it to run the fastest
+variant that passed.
+
+Exit code is 1 if no variant passes the budgets.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.applications.resnet50 import preprocess_input
+
+from dataset_index import SPLIT_METHODS, open_index
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The variants are verified with the detector's own runtimes, so what passes here is what runs there
+sys.path.insert(0, os.path.join(os.path.dirname(ROOT_DIR), "mirai"))
+
+from studio.utils.model_backends import (REPORT_VERSION, KerasBackend, OnnxBackend, SavedModelBackend,
+                                         TFLiteBackend, expects_raw_pixels)
+from studio.utils.model_registry import model_file_version
+
+FORMATS = ("keras", "savedmodel", "tflite", "tflite_dynamic", "onnx")
+PERCENTILES = (50, 90, 95, 99)
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Export and verify the gesture model")
+    parser.add_argument("--model", type=str, default=os.path.join(ROOT_DIR, "models", "resnet50", "best_model.keras"), help="Trained .keras model")
+    parser.add_argument("--output_dir", type=str, default=None, help="Where exports and the report go (default: <model dir>/export)")
+    parser.add_argument("--formats", type=str, nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--dataset_dir", type=str, default=os.path.join(ROOT_DIR, "dataset_cropped"), help="Dataset whose validation split is used")
+    parser.add_argument("--split", type=str, choices=SPLIT_METHODS, default="time", help="Split method, as in pipeline.py")
+    parser.add_argument("--burst_gap", type=float, default=2.0)
+    parser.add_argument("--groups_file", type=str, default=None)
+    parser.add_argument("--max_samples", type=int, default=0, help="Limit validation images (0 = all)")
+    parser.add_argument("--threads", type=int, default=2, help="Intra-op threads for every runtime")
+    parser.add_argument("--batch_size", type=int, default=8, help="Batch size of the batched latency test")
+    parser.add_argument("--runs", type=int, default=100, help="Timed calls per latency test")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--max_latency_ms", type=float, default=None, help="Budget for single-image latency")
+    parser.add_argument("--latency_percentile", type=int, choices=PERCENTILES, default=95, help="Percentile checked against --max_latency_ms")
+    parser.add_argument("--min_accuracy", type=float, default=0.8, help="Minimum validation accuracy")
+    parser.add_argument("--max_accuracy_drop", type=float, default=0.01, help="Maximum accuracy loss against the Keras model")
+    return parser.parse_args()
+
+def path_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+def serving_function(model, input_shape):
+    """Batch-size agnostic float32 entry point shared by every export."""
+    @tf.function(input_signature=[tf.TensorSpec((None,) + tuple(input_shape), tf.float32, name="images")])
+    def serve(images):
+        return model(images, training=False)
+    return serve
+
+def export_variant(fmt, model, serve, saved_model_dir, output_dir, raw_pixels, threads):
+    """
+    Write one variant and return (path, runner).
+    """
+    if fmt == "keras":
+        return None, KerasBackend.from_model(model)
+    if fmt == "savedmodel":
+        return saved_model_dir, SavedModelBackend(saved_model_dir, raw_pixels)
+    if fmt in ("tflite", "tflite_dynamic"):
+        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+        if fmt == "tflite_dynamic":
+            # int8 weights, float activations: no calibration data needed
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        path = os.path.join(output_dir, f"model_{fmt}.tflite" if fmt != "tflite" else "model.tflite")
+        with open(path, "wb") as f:
+            f.write(converter.convert())
+        return path, TFLiteBackend(path, raw_pixels, threads)
+    if fmt == "onnx":
+        import tf2onnx
+        path = os.path.join(output_dir, "model.onnx")
+        tf2onnx.convert.from_function(serve, input_signature=serve.input_signature, opset=13, output_path=path)
+        return path, OnnxBackend(path, raw_pixels, threads)
+    raise ValueError(f"Unknown format {fmt}")
+
+def missing_dependency(fmt):
+    """Name of the optional package a format needs but can't import, or None."""
+    if fmt != "onnx":
+        return None
+    for name in ("tf2onnx", "onnxruntime"):
+        try:
+            __import__(name)
+        except ImportError:
+            return name
+    return None
+
+def validation_batches(args, img_size, divisor):
+    """Validation split as (images, labels) numpy batches, same decoding as pipeline.py."""
+    index = open_index(args.dataset_dir, args.split, burst_gap=args.burst_gap, groups_file=args.groups_file)
+    paths, labels, _ = index.split("val")
+    if args.max_samples:
+        # Keep both classes: take an evenly spaced subset
+        keep = np.linspace(0, len(paths) - 1, min(args.max_samples, len(paths))).astype(int)
+        paths = [paths[i] for i in keep]
+        labels = [labels[i] for i in keep]
+
+    def load_image(path, label):
+        img = tf.io.read_file(path)
+        img = tf.image.decode_jpeg(img, channels=3)
+        img = tf.image.resize(img, [img_size, img_size])
+        return img / divisor, label
+
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    ds = ds.map(load_image, num_parallel_calls=tf.data.AUTOTUNE).batch(32).prefetch(tf.data.AUTOTUNE)
+    return ds, index.class_names, len(paths)
+
+def evaluate(runner, batches):
+    """Accuracy and palm probabilities over the validation batches."""
+    probs, truth = [], []
+    for images, labels in batches:
+        probs.append(runner(images.numpy().astype(np.float32)))
+        truth.append(labels.numpy())
+    probs = np.concatenate(probs)
+    truth = np.concatenate(truth)
+    return float(np.mean((probs >= 0.5).astype(int) == truth)), probs
+
+def measure_latency(runner, input_shape, batch_size, runs, warmup):
+    """Latency percentiles (ms) of one call with a batch of ``batch_size``."""
+    x = np.random.default_rng(0).uniform(0, 255, (batch_size,) + tuple(input_shape)).astype(np.float32)
+    for _ in range(warmup):
+        runner(x)
+    timings = np.empty(runs)
+    for i in range(runs):
+        start = time.perf_counter()
+        runner(x)
+        timings[i] = (time.perf_counter() - start) * 1000.0
+    stats = {f"p{q}": float(np.percentile(timings, q)) for q in PERCENTILES}
+    stats["mean"] = float(timings.mean())
+    stats["per_image_ms"] = stats["p50"] / batch_size
+    return stats
+
+def check_budgets(variant, reference_accuracy, args):
+    failures = []
+    if variant["accuracy"] < args.min_accuracy:
+        failures.append(f"accuracy {variant['accuracy']:.4f} < {args.min_accuracy:.4f}")
+    if reference_accuracy is not None and variant["accuracy"] < reference_accuracy - args.max_accuracy_drop:
+        failures.append(f"accuracy drop {reference_accuracy - variant['accuracy']:.4f} > {args.max_accuracy_drop:.4f}")
+    if args.max_latency_ms is not None:
+        latency = variant["latency"]["1"][f"p{args.latency_percentile}"]
+        if latency > args.max_latency_ms:
+            failures.append(f"p{args.latency_percentile} latency {latency:.2f} ms > {args.max_latency_ms:.2f} ms")
+    return failures
+
+def print_table(report):
+    batch_size = report["latency_batch_size"]
+    print(f"\n{'variant':<15} {'size MB':>8} {'accuracy':>9} {'p50 ms':>8} {'p95 ms':>8} {'b' + str(batch_size) + ' ms/img':>11}  result")
+    for v in report["variants"]:
+        if v.get("skipped"):
+            print(f"{v['name']:<15} {'-':>8} {'-':>9} {'-':>8} {'-':>8} {'-':>11}  skipped ({v['skipped']})")
+            continue
+        single, batched = v["latency"]["1"], v["latency"][str(batch_size)]
+        result = "PASS" if v["passed"] else "FAIL: " + "; ".join(v["failures"])
+        print(f"{v['name']:<15} {v['size_bytes'] / 2**20:>8.1f} {v['accuracy']:>9.2%} {single['p50']:>8.2f} "
+              f"{single['p95']:>8.2f} {batched['per_image_ms']:>11.2f}  {result}")
+
+def main():
+    args = get_args()
+
+    # Thread pools must be fixed before TensorFlow runs its first op
+    tf.config.threading.set_intra_op_parallelism_threads(args.threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    if not os.path.exists(args.model):
+        print(f"[ERROR] Model not found: {args.model}")
+        sys.exit(1)
+    output_dir = args.output_dir or os.path.join(os.path.dirname(os.path.abspath(args.model)), "export")
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"[INFO] Loading {args.model}")
+    model = tf.keras.models.load_model(args.model, custom_objects={'preprocess_input': preprocess_input})
+    input_shape = tuple(model.input_shape[1:])
+    # Same rule as the detector: models with their own preprocess_input take [0, 255]
+    raw_pixels = expects_raw_pixels(model)
+    divisor = 1.0 if raw_pixels else 255.0
+
+    serve = serving_function(model, input_shape)
+    saved_model_dir = os.path.join(output_dir, "saved_model")
+    if any(fmt in args.formats for fmt in ("savedmodel", "tflite", "tflite_dynamic")):
+        module = tf.Module()
+        module.model = model
+        module.serve = serve
+        tf.saved_model.save(module, saved_model_dir, signatures={"serving_default": serve})
+
+    batches, class_names, samples = validation_batches(args, input_shape[0], divisor)
+    print(f"[INFO] Validation samples: {samples}, threads: {args.threads}")
+
+    variants = []
+    reference_probs = None
+    reference_accuracy = None
+    # Keras goes first: it is the reference for the accuracy drop and agreement
+    for fmt in sorted(args.formats, key=lambda f: f != "keras"):
+        missing = missing_dependency(fmt)
+        if missing:
+            print(f"[WARN] Skipping {fmt}: {missing} is not installed")
+            variants.append({"name": fmt, "format": fmt, "skipped": f"{missing} not installed", "passed": False})
+            continue
+        print(f"[INFO] Exporting {fmt}...")
+        try:
+            start = time.perf_counter()
+            path, runner = export_variant(fmt, model, serve, saved_model_dir, output_dir, raw_pixels, args.threads)
+            export_seconds = time.perf_counter() - start
+        except Exception as e:
+            print(f"[ERROR] {fmt} export failed: {e}")
+            variants.append({"name": fmt, "format": fmt, "skipped": f"export failed: {e}", "passed": False})
+            continue
+
+        path = path or os.path.abspath(args.model)
+        accuracy, probs = evaluate(runner, batches)
+        if fmt == "keras":
+            reference_probs, reference_accuracy = probs, accuracy
+        variant = {
+            "name": fmt,
+            "format": fmt,
+            "path": os.path.relpath(path, output_dir),
+            "size_bytes": path_size(path),
+            "export_seconds": round(export_seconds, 2),
+            "accuracy": accuracy,
+            "agreement": float(np.mean((probs >= 0.5) == (reference_probs >= 0.5))) if reference_probs is not None else None,
+            "max_prob_diff": float(np.max(np.abs(probs - reference_probs))) if reference_probs is not None else None,
+            "latency": {str(n): measure_latency(runner, input_shape, n, args.runs, args.warmup)
+                        for n in sorted({1, args.batch_size})}
+        }
+        variant["failures"] = check_budgets(variant, reference_accuracy, args)
+        variant["passed"] = not variant["failures"]
+        variants.append(variant)
+
+    passing = [v for v in variants if v["passed"]]
+    # Ranked on the percentile the budget checks, like load_backend does
+    ranking = f"p{args.latency_percentile}"
+    selected = min(passing, key=lambda v: v["latency"]["1"][ranking])["name"] if passing else None
+    report = {
+        "version": REPORT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "source": {
+            "path": os.path.abspath(args.model),
+            "version": model_file_version(args.model),
+            "input_shape": list(input_shape),
+            "raw_pixels": raw_pixels,
+            "class_names": class_names
+        },
+        "host": {"platform": platform.platform(), "cpus": os.cpu_count(), "tensorflow": tf.__version__},
+        "threads": args.threads,
+        "latency_batch_size": args.batch_size,
+        "validation": {"dataset_dir": args.dataset_dir, "split": args.split, "samples": samples},
+        "budgets": {
+            "max_latency_ms": args.max_latency_ms,
+            "latency_percentile": args.latency_percentile,
+            "min_accuracy": args.min_accuracy,
+            "max_accuracy_drop": args.max_accuracy_drop
+        },
+        "variants": variants,
+        "selected": selected
+    }
+    report_path = os.path.join(output_dir, "export_report.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print_table(report)
+    print(f"\n[INFO] Report saved to {report_path}")
+    if selected is None:
+        print("[ERROR] No variant passed the budgets")
+        sys.exit(1)
+    print(f"[SUCCESS] Fastest passing variant: {selected}")
+
+if __name__ == "__main__":
+    main()
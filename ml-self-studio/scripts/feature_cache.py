@@ -0,0 +1,83 @@
+"""
+Disk cache of frozen-backbone activations for two-stage training.
+
+Layout: <cache_dir>/<version>/
+    keys.json     {"shape": [...], "variants": K, "keys": [sha1, ...]}
+    features.bin  float16 rows of shape (K, *shape), in the order of "keys"
+
+Rows are keyed by the image's content hash; ``version`` identifies the frozen
+prefix (weights, cut point, input size, augmentation variants), so a different
+backbone never reads stale activations. The file is append-only and read back
+through np.memmap, so the cache can be far larger than RAM.
+"""
+import os
+import json
+import numpy as np
+
+class FeatureCache:
+    def __init__(self, cache_dir, version, shape, variants):
+        self.dir = os.path.join(cache_dir, version)
+        self.shape = tuple(shape)
+        self.variants = variants
+        self.dtype = np.dtype(np.float16)
+        self.row_bytes = int(np.prod(self.shape)) * variants * self.dtype.itemsize
+        self.keys_path = os.path.join(self.dir, "keys.json")
+        self.data_path = os.path.join(self.dir, "features.bin")
+        os.makedirs(self.dir, exist_ok=True)
+
+        self.keys = []
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "r") as f:
+                data = json.load(f)
+            if tuple(data["shape"]) == self.shape and data["variants"] == variants:
+                self.keys = data["keys"]
+        # Drop bytes written after the last saved key (interrupted run)
+        with open(self.data_path, "ab") as f:
+            f.truncate(len(self.keys) * self.row_bytes)
+        self.rows = {key: i for i, key in enumerate(self.keys)}
+
+    def missing(self, hashes):
+        """Hashes without cached features, without duplicates, in input order."""
+        return list(dict.fromkeys(h for h in hashes if h not in self.rows))
+
+    def add(self, hashes, features):
+        """
+        Append features of shape (len(hashes), variants, *shape).
+        """
+        features = np.ascontiguousarray(features, dtype=self.dtype)
+        assert features.shape[1:] == (self.variants,) + self.shape
+        with open(self.data_path, "ab") as f:
+            f.write(features.tobytes())
+        for h in hashes:
+            self.rows[h] = len(self.keys)
+            self.keys.append(h)
+        tmp_path = self.keys_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"shape": list(self.shape), "variants": self.variants, "keys": self.keys}, f)
+        os.replace(tmp_path, self.keys_path)
+
+    def row_indices(self, hashes):
+        return np.array([self.rows[h] for h in hashes], dtype=np.int64)
+
+    def open(self):
+        """Read-only memmap of shape (rows, variants, *shape)."""
+        return np.memmap(self.data_path, dtype=self.dtype, mode="r",
+                         shape=(len(self.keys), self.variants) + self.shape)
+
+def feature_batches(features, rows, labels, batch_size, variants, rng=None):
+    """
+    Generator of (float32 features, labels) batches from the memmap.
+
+    With an rng the order is shuffled and every image uses one of its cached
+    augmented variants at random (a new draw each epoch); without one, the
+    order is kept and variant 0 (the unaugmented image) is used.
+    """
+    order = rng.permutation(len(rows)) if rng is not None else np.arange(len(rows))
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        variant = rng.integers(variants, size=len(batch)) if rng is not None else np.zeros(len(batch), dtype=int)
+        # Sorted reads keep the memmap access mostly sequential
+        sort = np.argsort(rows[batch], kind="stable")
+        x = np.empty((len(batch),) + features.shape[2:], dtype=np.float32)
+        x[sort] = features[rows[batch][sort], variant[sort]]
+        yield x, labels[batch]
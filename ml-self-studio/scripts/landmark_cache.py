@@ -0,0 +1,171 @@
+"""
+Columnar store of MediaPipe hand landmarks, written by preprocess_crops.py.
+
+One row per source image, saved as a compressed .npz next to the cropped
+dataset (dataset_cropped/landmarks.npz):
+
+    paths      (N,)        "class/file.jpg", relative to the raw dataset
+    labels     (N,)        class name (first path component)
+    mtimes     (N,)        float64 source mtime, for time-based splits
+    sizes      (N, 2)      int32 source image (height, width)
+    has_hand   (N,)        bool, False when MediaPipe found no hand
+    landmarks  (N, 21, 3)  float32 normalized x, y, z (NaN without a hand)
+
+Because the landmarks do not depend on --padding or --img_size, crops can be
+regenerated from this file with vectorized box math instead of rerunning
+MediaPipe, and the landmark features for training come from the same rows.
+"""
+import os
+import cv2
+import numpy as np
+
+NUM_LANDMARKS = 21
+COLUMNS = ("paths", "labels", "mtimes", "sizes", "has_hand", "landmarks")
+
+def empty_row():
+    return np.full((NUM_LANDMARKS, 3), np.nan, dtype=np.float32)
+
+def rows_to_columns(rows):
+    """
+    Args:
+        rows: dict rel_path -> (mtime, (height, width), landmarks or None)
+    """
+    paths = sorted(rows)
+    return {
+        "paths": np.array(paths, dtype=str),
+        "labels": np.array([p.split("/")[0] for p in paths], dtype=str),
+        "mtimes": np.array([rows[p][0] for p in paths], dtype=np.float64),
+        "sizes": np.array([rows[p][1] for p in paths], dtype=np.int32).reshape(-1, 2),
+        "has_hand": np.array([rows[p][2] is not None for p in paths], dtype=bool),
+        "landmarks": np.stack([empty_row() if rows[p][2] is None else rows[p][2] for p in paths])
+                     if paths else np.empty((0, NUM_LANDMARKS, 3), dtype=np.float32),
+    }
+
+def columns_to_rows(cache):
+    return {
+        path: (float(mtime), tuple(int(v) for v in size), landmarks if hand else None)
+        for path, mtime, size, hand, landmarks in zip(
+            cache["paths"], cache["mtimes"], cache["sizes"], cache["has_hand"], cache["landmarks"])
+    }
+
+def save_cache(path, rows):
+    tmp_path = str(path) + ".tmp.npz"
+    np.savez_compressed(tmp_path, **rows_to_columns(rows))
+    os.replace(tmp_path, path)
+
+def load_cache(path):
+    """Return the cache as a dict of arrays, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {name: data[name] for name in COLUMNS}
+
+def crop_boxes(cache, padding):
+    """
+    Padded crop boxes for every row, computed for the whole dataset at once.
+
+    Matches crop_hand() in preprocess_crops.py: pixel coordinates are truncated
+    to int before taking the min/max, then padded and clipped to the image.
+    Rows without a hand get the full image.
+
+    Returns:
+        (N, 4) int32 array of x_min, y_min, x_max, y_max.
+    """
+    sizes = cache["sizes"]
+    h = sizes[:, 0:1]
+    w = sizes[:, 1:2]
+    full = np.concatenate([np.zeros_like(w), np.zeros_like(h), w, h], axis=1)
+
+    hand = cache["has_hand"]
+    if not hand.any():
+        return full.astype(np.int32)
+
+    xy = cache["landmarks"][hand, :, :2]
+    px = (xy[..., 0] * w[hand]).astype(int)
+    py = (xy[..., 1] * h[hand]).astype(int)
+    boxes = np.stack([
+        np.maximum(0, px.min(axis=1) - padding),
+        np.maximum(0, py.min(axis=1) - padding),
+        np.minimum(w[hand, 0], px.max(axis=1) + padding),
+        np.minimum(h[hand, 0], py.max(axis=1) + padding),
+    ], axis=1)
+
+    full[hand] = boxes
+    return full.astype(np.int32)
+
+def keep_mask(cache):
+    """
+    Rows that produce a crop: hand classes need a hand, background needs none.
+    """
+    background = np.char.lower(cache["labels"]) == "background"
+    return np.where(background, ~cache["has_hand"], cache["has_hand"])
+
+def landmark_features(landmarks):
+    """
+    Translation- and scale-invariant features from (N, 21, 3) landmarks.
+
+    x, y are taken relative to the wrist and divided by the hand's larger
+    bounding-box side; z is already relative to the wrist in MediaPipe and is
+    scaled the same way.
+
+    Returns:
+        (N, 63) float32 array.
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float32)
+    relative = landmarks - landmarks[:, :1, :]
+    extent = (landmarks[:, :, :2].max(axis=1) - landmarks[:, :, :2].min(axis=1)).max(axis=1)
+    relative /= np.maximum(extent, 1e-6)[:, None, None]
+    return relative.reshape(len(landmarks), -1)
+
+def load_landmark_features(path, class_names=None):
+    """
+    Features and integer labels for every row that has a hand.
+
+    Args:
+        path: landmarks.npz written by preprocess_crops.py.
+        class_names: Label order; defaults to the sorted class names in the cache.
+
+    Returns:
+        (features, labels, mtimes, paths, class_names)
+    """
+    cache = load_cache(path)
+    if cache is None:
+        raise FileNotFoundError(f"Landmark cache not found: {path} (run preprocess_crops.py first)")
+    hand = cache["has_hand"]
+    labels = cache["labels"][hand]
+    if class_names is None:
+        class_names = sorted(set(labels.tolist()))
+    lookup = {name: idx for idx, name in enumerate(class_names)}
+    known = np.array([label in lookup for label in labels], dtype=bool)
+    features = landmark_features(cache["landmarks"][hand][known])
+    label_idx = np.array([lookup[label] for label in labels[known]], dtype=np.int32)
+    return features, label_idx, cache["mtimes"][hand][known], cache["paths"][hand][known], class_names
+
+def read_image(path):
+    """Decode an image, or None if it is missing or unreadable."""
+    try:
+        data = np.fromfile(path, dtype=np.uint8)
+    except OSError:
+        return None
+    return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+def recrop_images(cache, input_dir, padding=20, img_size=224):
+    """
+    Re-crop the dataset straight into memory instead of dataset_cropped.
+
+    Returns:
+        (images, paths): (N, img_size, img_size, 3) uint8 BGR crops and their
+        relative paths. Unreadable or empty crops are left out.
+    """
+    boxes = crop_boxes(cache, padding)
+    keep = keep_mask(cache) & (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+    paths = cache["paths"][keep]
+    images = np.empty((len(paths), img_size, img_size, 3), dtype=np.uint8)
+    valid = np.zeros(len(paths), dtype=bool)
+    for i, (rel_path, (x_min, y_min, x_max, y_max)) in enumerate(zip(paths, boxes[keep])):
+        img = read_image(os.path.join(input_dir, rel_path))
+        if img is None:
+            continue
+        cv2.resize(img[y_min:y_max, x_min:x_max], (img_size, img_size), dst=images[i])
+        valid[i] = True
+    return images[valid], paths[valid]
@@ -0,0 +1,79 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+import tensorflow as tf
+from dataset_index import open_index, SPLIT_METHODS
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Pack the cropped dataset into sharded TFRecord files")
+    parser.add_argument("--dataset_dir", type=str, default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "dataset_cropped"), help="Path to the cropped dataset")
+    parser.add_argument("--output_dir", type=str, default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "dataset_packed"), help="Where to write the shards")
+    parser.add_argument("--shards", type=int, default=8, help="Shards per split")
+    parser.add_argument("--split", type=str, choices=SPLIT_METHODS, default="time", help="Split method, as in pipeline.py")
+    parser.add_argument("--burst_gap", type=float, default=2.0, help="Seconds between captures that start a new burst (grouped split)")
+    parser.add_argument("--groups_file", type=str, default=None, help="JSON groups for the grouped split")
+    return parser.parse_args()
+
+def make_example(image_bytes, label, timestamp, path):
+    feature = {
+        "image": tf.train.Feature(bytes_list=tf.train.BytesList(value=[image_bytes])),
+        "label": tf.train.Feature(int64_list=tf.train.Int64List(value=[label])),
+        "timestamp": tf.train.Feature(float_list=tf.train.FloatList(value=[timestamp])),
+        "path": tf.train.Feature(bytes_list=tf.train.BytesList(value=[path.encode("utf-8")])),
+    }
+    return tf.train.Example(features=tf.train.Features(feature=feature))
+
+def write_split(records, split, output_dir, num_shards, dataset_dir):
+    """
+    Write one split. Encoded image bytes are stored as-is (no re-encoding);
+    records are shuffled before being dealt round-robin over the shards so
+    every shard holds a mix of classes and interleaved reads stay balanced.
+    """
+    if split == "train":
+        order = np.random.default_rng(72).permutation(len(records))
+        records = [records[i] for i in order]
+    num_shards = max(1, min(num_shards, len(records)))
+    shard_paths = [os.path.join(output_dir, f"{split}-{i:05d}-of-{num_shards:05d}.tfrecord") for i in range(num_shards)]
+    writers = [tf.io.TFRecordWriter(p) for p in shard_paths]
+    total_bytes = 0
+    try:
+        for i, (path, label, mtime) in enumerate(records):
+            with open(path, "rb") as f:
+                image_bytes = f.read()
+            total_bytes += len(image_bytes)
+            rel_path = os.path.relpath(path, dataset_dir).replace(os.sep, "/")
+            writers[i % num_shards].write(make_example(image_bytes, label, mtime, rel_path).SerializeToString())
+    finally:
+        for writer in writers:
+            writer.close()
+    return [os.path.basename(p) for p in shard_paths], total_bytes
+
+def main():
+    args = get_args()
+
+    if not os.path.exists(args.dataset_dir):
+        print(f"[ERROR] Dataset directory not found: {args.dataset_dir}")
+        return
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for name in os.listdir(args.output_dir):
+        if name.endswith(".tfrecord"):
+            os.remove(os.path.join(args.output_dir, name))
+
+    start = time.time()
+    index = open_index(args.dataset_dir, args.split, burst_gap=args.burst_gap, groups_file=args.groups_file)
+    info = {"class_names": index.class_names, "split": index.split_params, "splits": {}}
+    for split in ("train", "val"):
+        records = list(zip(*index.split(split)))
+        shards, total_bytes = write_split(records, split, args.output_dir, args.shards, args.dataset_dir)
+        info["splits"][split] = {"count": len(records), "shards": shards}
+        print(f"[INFO] {split}: {len(records)} images -> {len(shards)} shards ({total_bytes / 2**20:.1f} MB)")
+
+    with open(os.path.join(args.output_dir, "packed_info.json"), "w") as f:
+        json.dump(info, f, indent=2)
+    print(f"[INFO] Packed {args.dataset_dir} into {args.output_dir} in {time.time() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,19 @@
 import os
+import sys
+import json
+import time
+import hashlib
 import argparse
 import numpy as np
 import tensorflow as tf
 from tensorflow.keras import layers, models, optimizers, applications
-from tensorflow.keras.callbacks import ModelCheckpoint, EarlyStopping, ReduceLROnPlateau
+from tensorflow.keras.callbacks import Callback, ModelCheckpoint, EarlyStopping, ReduceLROnPlateau
 from sklearn.metrics import classification_report
+from landmark_cache import load_landmark_features
+from dataset_index import open_index, SPLIT_METHODS
+from feature_cache import FeatureCache, feature_batches
+from compute_config import (add_compute_args, configure_compute, apply_data_options, run_probe,
+                            probe_compute, write_training_config, save_float32)
 
 # Set random seeds for reproducibility
 tf.random.set_seed(72)
@@ -18,12 +27,29 @@ def get_args():
     parser.add_argument("--epochs", type=int, default=50, help="Number of epochs")
     parser.add_argument("--img_size", type=int, default=224, help="Input image size")
     parser.add_argument("--learning_rate", type=float, default=1e-4, help="Initial learning rate")
+    parser.add_argument("--unfrozen_layers", type=int, default=30, help="Trainable layers at the end of ResNet50")
+    parser.add_argument("--dropout", type=float, default=0.3, help="Dropout rate of the classification head")
+    parser.add_argument("--features", type=str, choices=["image", "landmarks"], default="image", help="Train ResNet50 on crops, or a small MLP on cached hand landmarks")
+    parser.add_argument("--split", type=str, choices=SPLIT_METHODS, default="time", help="time: oldest 80%% of each class trains; grouped: keep capture bursts on one side")
+    parser.add_argument("--burst_gap", type=float, default=2.0, help="Seconds between captures that start a new burst (grouped split)")
+    parser.add_argument("--groups_file", type=str, default=None, help="JSON groups (e.g. from dedup_dataset.py) for the grouped split")
+    parser.add_argument("--packed_dir", type=str, default=None, help="Read TFRecord shards written by pack_dataset.py instead of individual JPEGs")
+    parser.add_argument("--two_stage", action="store_true", help="Cache frozen ResNet50 activations once and train only the unfrozen tail + head")
+    parser.add_argument("--feature_cache", type=str, default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "feature_cache"), help="Directory for cached backbone activations (two-stage mode)")
+    parser.add_argument("--variants", type=int, default=4, help="Cached variants per image in two-stage mode (1 original + augmented)")
+    parser.add_argument("--distill", type=str, default=None, help="Teacher .keras model: train a compact student against its soft outputs")
+    parser.add_argument("--student", type=str, choices=["cnn", "mobilenetv3"], default="cnn", help="Student architecture for --distill")
+    parser.add_argument("--temperature", type=float, default=4.0, help="Distillation temperature")
+    parser.add_argument("--alpha", type=float, default=0.3, help="Weight of the hard-label loss (1 - alpha goes to the teacher's soft targets)")
+    parser.add_argument("--landmark_cache", type=str, default=None, help="landmarks.npz from preprocess_crops.py (default: <dataset_dir>/landmarks.npz)")
+    parser.add_argument("--progress_file", type=str, default=None, help="Append per-epoch metrics as JSON lines (used by sweep.py)")
+    parser.add_argument("--results_json", type=str, default=None, help="Write final validation metrics and latency to this file")
+    add_compute_args(parser)
     return parser.parse_args()
 
-def build_model(input_shape):
-
+def build_augmentation():
     # Data Augmentation Layers
-    data_augmentation = tf.keras.Sequential([
+    return tf.keras.Sequential([
         layers.RandomFlip("horizontal"),
         layers.RandomRotation(0.1),
         layers.RandomZoom(0.1),
@@ -31,6 +57,7 @@ def build_model(input_shape):
         layers.RandomBrightness(0.1),
     ], name="data_augmentation")
 
+def build_backbone(input_shape, unfrozen_layers=30):
     # Base Model
     base_model = applications.ResNet50(
         include_top=False,
@@ -40,84 +67,538 @@ def build_model(input_shape):
     
     # Fine-tuning configuration
     base_model.trainable = True
-    # Freeze all layers except the last 30
-    for layer in base_model.layers[:-30]:
+    # Freeze all layers except the last `unfrozen_layers` (30 by default)
+    for layer in base_model.layers[:len(base_model.layers) - unfrozen_layers]:
         layer.trainable = False
+    return base_model
+
+def build_head_layers(dropout=0.3):
+    return [
+        layers.GlobalAveragePooling2D(),
+        layers.Dropout(dropout),
+        layers.Dense(128, activation="relu"),
+        layers.Dropout(dropout),
+        # float32 output keeps the sigmoid stable under mixed precision
+        layers.Dense(1, activation="sigmoid", dtype="float32"),
+    ]
+
+def apply_layers(x, layer_list):
+    for layer in layer_list:
+        x = layer(x)
+    return x
+
+def build_model(input_shape, base_model=None, head_layers=None, unfrozen_layers=30, dropout=0.3):
+    if base_model is None:
+        base_model = build_backbone(input_shape, unfrozen_layers)
+    if head_layers is None:
+        head_layers = build_head_layers(dropout)
 
     inputs = tf.keras.Input(shape=input_shape)
-    x = data_augmentation(inputs)
+    x = build_augmentation()(inputs)
     
     # Preprocess input for ResNet50 (scales to [-1, 1] or similar expected by ResNet)
     # Wrapping in Lambda to avoid pickling issues with module references
     x = layers.Lambda(applications.resnet50.preprocess_input, name='preprocess_input')(x)
     
     x = base_model(x)
-    x = layers.GlobalAveragePooling2D()(x)
-    x = layers.Dropout(0.3)(x)
-    x = layers.Dense(128, activation="relu")(x)
-    x = layers.Dropout(0.3)(x)
-    outputs = layers.Dense(1, activation="sigmoid")(x)
+    outputs = apply_layers(x, head_layers)
 
     model = models.Model(inputs, outputs)
     return model
 
-def main():
-    args = get_args()
-    
+def split_backbone(base_model):
+    """
+    Cut the backbone at the last block output before its first trainable layer.
+
+    ResNet blocks have skip connections, so the only clean cut points are the
+    "*_out" layers. Frozen layers that come after the cut (e.g. the conv5
+    shortcut) simply stay frozen in the tail.
+
+    Returns:
+        (cut layer name, prefixes of the residual blocks after the cut)
+    """
+    first_trainable = next((i for i, layer in enumerate(base_model.layers) if layer.trainable), len(base_model.layers))
+    outs = [i for i, layer in enumerate(base_model.layers) if layer.name.endswith("_out")]
+    cut = max(i for i in outs if i < first_trainable)
+    return base_model.layers[cut].name, [base_model.layers[i].name[:-len("_out")] for i in outs if i > cut]
+
+def apply_residual_block(x, base_model, prefix):
+    """Re-apply one ResNet50 bottleneck block using the backbone's own layers (shared weights)."""
+    names = {layer.name for layer in base_model.layers}
+    get = base_model.get_layer
+    if f"{prefix}_0_conv" in names:
+        shortcut = get(f"{prefix}_0_bn")(get(f"{prefix}_0_conv")(x))
+    else:
+        shortcut = x
+    y = x
+    for part in ("1_conv", "1_bn", "1_relu", "2_conv", "2_bn", "2_relu", "3_conv", "3_bn"):
+        y = get(f"{prefix}_{part}")(y)
+    y = get(f"{prefix}_add")([shortcut, y])
+    return get(f"{prefix}_out")(y)
+
+def backbone_version(base_model, cut_name, img_size, variants):
+    """Cache key of the frozen prefix: its weights, cut point, input size and variant count."""
+    digest = hashlib.sha1(f"{cut_name}:{img_size}:{variants}".encode())
+    for layer in base_model.layers:
+        for weight in layer.get_weights():
+            digest.update(np.ascontiguousarray(weight).tobytes())
+        if layer.name == cut_name:
+            break
+    return digest.hexdigest()[:16]
+
+def cache_backbone_features(cache, base_model, cut_name, paths, hashes, img_size, batch_size):
+    """Run the frozen prefix once for every image (and augmented variant) not yet cached."""
+    missing = cache.missing(hashes)
+    if not missing:
+        return
+    path_of = {}
+    for path, h in zip(paths, hashes):
+        path_of.setdefault(h, path)
+
+    extractor = models.Model(base_model.input, base_model.get_layer(cut_name).output)
+    augmentation = build_augmentation()
+    preprocess = applications.resnet50.preprocess_input
+
+    def load_image(path):
+        img = tf.io.read_file(path)
+        img = tf.image.decode_jpeg(img, channels=3)
+        return tf.image.resize(img, [img_size, img_size])
+
+    ds = tf.data.Dataset.from_tensor_slices([path_of[h] for h in missing])
+    ds = ds.map(load_image, num_parallel_calls=tf.data.AUTOTUNE).batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+    print(f"[INFO] Caching backbone features for {len(missing)} images x {cache.variants} variants...")
+    start = time.time()
+    done = 0
+    for images in ds:
+        variants = [images] + [augmentation(images, training=True) for _ in range(cache.variants - 1)]
+        features = np.stack([extractor(preprocess(v), training=False).numpy() for v in variants], axis=1)
+        cache.add(missing[done:done + len(features)], features)
+        done += len(features)
+        print(f"  {done}/{len(missing)} images ({done / (time.time() - start):.1f} images/s)")
+
+def train_two_stage(args):
+    """
+    Train on cached frozen-prefix activations.
+
+    The frozen part of ResNet50 never changes, so its output for every image
+    (plus a few augmented variants) is computed once and memory-mapped from
+    disk. Each epoch only runs the unfrozen tail and the head, which share
+    their layer objects with the full model; the full image model is saved at
+    the end, in the usual format.
+    """
     print(f"[INFO] Dataset Directory: {args.dataset_dir}")
     if not os.path.exists(args.dataset_dir):
         print(f"[ERROR] Dataset directory not found: {args.dataset_dir}")
         return
 
-    # Custom Time-Based Splitting
-    print("[INFO] Loading and splitting datasets based on timestamps...")
-    
-    def load_and_split_paths(dataset_dir, split_ratio=0.8):
-        image_paths = []
-        labels = []
-        class_names = sorted([d for d in os.listdir(dataset_dir) if os.path.isdir(os.path.join(dataset_dir, d))])
-        
-        for label_idx, class_name in enumerate(class_names):
-            class_dir = os.path.join(dataset_dir, class_name)
-            # Get all files with full paths
-            files = [os.path.join(class_dir, f) for f in os.listdir(class_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-            
-            # Sort by modification time
-            files.sort(key=os.path.getmtime)
-            
-            # Split
-            split_point = int(len(files) * split_ratio)
-            train_files = files[:split_point]
-            val_files = files[split_point:]
-            
-            image_paths.extend(train_files)
-            labels.extend([label_idx] * len(train_files))
-            
-            image_paths.extend(val_files)
-            labels.extend([label_idx] * len(val_files))
-            
-        train_paths = []
-        train_labels = []
-        val_paths = []
-        val_labels = []
-        
-        for label_idx, class_name in enumerate(class_names):
-            class_dir = os.path.join(dataset_dir, class_name)
-            files = [os.path.join(class_dir, f) for f in os.listdir(class_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-            files.sort(key=os.path.getmtime)
-            
-            split_point = int(len(files) * split_ratio)
-            
-            train_paths.extend(files[:split_point])
-            train_labels.extend([label_idx] * len(files[:split_point]))
-            
-            val_paths.extend(files[split_point:])
-            val_labels.extend([label_idx] * len(files[split_point:]))
-            
-        return (train_paths, train_labels), (val_paths, val_labels), class_names
-
-    (train_paths, train_labels), (val_paths, val_labels), class_names = load_and_split_paths(args.dataset_dir)
-    
+    index = open_index(args.dataset_dir, args.split, burst_gap=args.burst_gap, groups_file=args.groups_file)
+    class_names = index.class_names
+    train_paths, train_labels, _ = index.split("train")
+    val_paths, val_labels, _ = index.split("val")
+    train_hashes, val_hashes = index.hashes(train_paths), index.hashes(val_paths)
+    print(f"[INFO] Classes found: {class_names}")
+    print(f"[INFO] Training samples: {len(train_paths)}")
+    print(f"[INFO] Validation samples: {len(val_paths)}")
+
+    input_shape = (args.img_size, args.img_size, 3)
+    base_model = build_backbone(input_shape, args.unfrozen_layers)
+    head_layers = build_head_layers(args.dropout)
+    full_model = build_model(input_shape, base_model, head_layers)
+
+    cut_name, tail_blocks = split_backbone(base_model)
+    feature_shape = tuple(base_model.get_layer(cut_name).output.shape[1:])
+    version = backbone_version(base_model, cut_name, args.img_size, args.variants)
+    print(f"[INFO] Frozen prefix ends at {cut_name} {feature_shape}, tail: {', '.join(tail_blocks)}")
+
+    feature_inputs = tf.keras.Input(shape=feature_shape)
+    x = feature_inputs
+    for prefix in tail_blocks:
+        x = apply_residual_block(x, base_model, prefix)
+    tail_model = models.Model(feature_inputs, apply_layers(x, head_layers))
+
+    cache = FeatureCache(args.feature_cache, version, feature_shape, args.variants)
+    cache_backbone_features(cache, base_model, cut_name, train_paths, train_hashes, args.img_size, args.batch_size)
+    cache_backbone_features(cache, base_model, cut_name, val_paths, val_hashes, args.img_size, args.batch_size)
+
+    features = cache.open()
+    train_rows, val_rows = cache.row_indices(train_hashes), cache.row_indices(val_hashes)
+    train_labels = np.array(train_labels, dtype=np.int32)
+    val_labels = np.array(val_labels, dtype=np.int32)
+
+    # The split model must match the full model exactly, or the saved model would differ
+    check = np.asarray(features[val_rows[:2], 0], dtype=np.float32)
+    probe = tf.stack([tf.image.resize(tf.image.decode_jpeg(tf.io.read_file(p), channels=3), input_shape[:2]) for p in val_paths[:2]])
+    if not np.allclose(tail_model(check, training=False), full_model(probe, training=False), atol=1e-3):
+        print("[ERROR] Tail model does not reproduce the full model, aborting two-stage training")
+        return
+
+    rng = np.random.default_rng(72)
+    signature = (tf.TensorSpec((None,) + feature_shape, tf.float32), tf.TensorSpec((None,), tf.int32))
+    train_ds = tf.data.Dataset.from_generator(
+        lambda: feature_batches(features, train_rows, train_labels, args.batch_size, args.variants, rng),
+        output_signature=signature).prefetch(2)
+    val_ds = tf.data.Dataset.from_generator(
+        lambda: feature_batches(features, val_rows, val_labels, args.batch_size, args.variants),
+        output_signature=signature).prefetch(2)
+
+    tail_model.compile(
+        optimizer=optimizers.Adam(learning_rate=args.learning_rate),
+        loss="binary_crossentropy",
+        metrics=["accuracy"],
+        jit_compile=args.xla
+    )
+    callbacks = [
+        EarlyStopping(monitor="val_loss", patience=5, restore_best_weights=True),
+        ReduceLROnPlateau(monitor="val_loss", factor=0.2, patience=3, min_lr=1e-6),
+        EpochStats(args.batch_size)
+    ]
+    print("[INFO] Starting two-stage training...")
+    tail_model.fit(train_ds, validation_data=val_ds, epochs=args.epochs, callbacks=callbacks)
+
+    os.makedirs(args.model_dir, exist_ok=True)
+    checkpoint_path = os.path.join(args.model_dir, "best_model.keras")
+    save_float32(full_model, lambda: build_model(input_shape, unfrozen_layers=args.unfrozen_layers, dropout=args.dropout), checkpoint_path)
+    print(f"[INFO] Training finished. Best model saved to {checkpoint_path}")
+
+    y_pred = (tail_model.predict(val_ds, verbose=0).flatten() > 0.5).astype(int)
+    print("\n[INFO] Classification Report:")
+    print(classification_report(val_labels, y_pred, target_names=class_names))
+
+def separable_block(x, filters, strides):
+    x = layers.DepthwiseConv2D(3, strides=strides, padding="same", use_bias=False)(x)
+    x = layers.BatchNormalization()(x)
+    x = layers.ReLU()(x)
+    x = layers.Conv2D(filters, 1, use_bias=False)(x)
+    x = layers.BatchNormalization()(x)
+    return layers.ReLU()(x)
+
+def build_student(input_shape, kind="cnn"):
+    """
+    Compact palm/fist model with the same contract as build_model(): float
+    RGB input in [0, 255], a layer named 'preprocess_input' (so the detector
+    feeds raw pixels), and a sigmoid palm probability. The last Dense emits
+    the logit, followed by a separate sigmoid so distillation can train on
+    logits.
+    """
+    inputs = tf.keras.Input(shape=input_shape)
+    x = build_augmentation()(inputs)
+    if kind == "mobilenetv3":
+        # MobileNetV3 rescales its input itself
+        x = layers.Activation("linear", name="preprocess_input")(x)
+        backbone = applications.MobileNetV3Small(
+            include_top=False,
+            weights="imagenet",
+            input_shape=input_shape,
+            minimalistic=True
+        )
+        x = backbone(x)
+    else:
+        x = layers.Lambda(applications.resnet50.preprocess_input, name='preprocess_input')(x)
+        # Hand crops do not need full resolution for two classes
+        x = layers.Resizing(112, 112)(x)
+        x = layers.Conv2D(24, 3, strides=2, padding="same", use_bias=False)(x)
+        x = layers.BatchNormalization()(x)
+        x = layers.ReLU()(x)
+        for filters, strides in ((32, 1), (64, 2), (64, 1), (128, 2), (128, 1), (256, 2)):
+            x = separable_block(x, filters, strides)
+    x = layers.GlobalAveragePooling2D()(x)
+    x = layers.Dropout(0.2)(x)
+    logits = layers.Dense(1, name="logits", dtype="float32")(x)
+    outputs = layers.Activation("sigmoid", name="palm_probability", dtype="float32")(logits)
+    return models.Model(inputs, outputs, name=f"student_{kind}")
+
+def distillation_loss(temperature, alpha):
+    """Hard-label BCE plus temperature-softened BCE against the teacher's logits."""
+    def loss(y_true, logits):
+        hard, teacher_logits = y_true[:, :1], y_true[:, 1:]
+        hard_loss = tf.keras.losses.binary_crossentropy(hard, logits, from_logits=True)
+        soft_targets = tf.sigmoid(teacher_logits / temperature)
+        soft_loss = tf.keras.losses.binary_crossentropy(soft_targets, logits / temperature, from_logits=True)
+        return alpha * hard_loss + (1.0 - alpha) * temperature ** 2 * soft_loss
+    return loss
+
+def hard_accuracy(y_true, logits):
+    return tf.keras.metrics.binary_accuracy(y_true[:, :1], logits, threshold=0.0)
+
+def cpu_latency_ms(model, input_shape, runs=50):
+    """Median single-image latency of a direct model call on the CPU."""
+    x = tf.random.uniform((1,) + tuple(input_shape), 0, 255)
+    timings = []
+    with tf.device("/CPU:0"):
+        for i in range(runs + 5):
+            start = time.perf_counter()
+            model(x, training=False)
+            if i >= 5:
+                timings.append((time.perf_counter() - start) * 1000.0)
+    return float(np.median(timings))
+
+def train_distilled(args):
+    """
+    Train a compact student against the soft outputs of a trained teacher.
+
+    The teacher's logits are computed once on the unaugmented images; the
+    student sees augmented images and learns from both the hard labels and
+    the teacher's softened probabilities. The student is saved as
+    student_model.keras and can be deployed like any other model.
+    """
+    print(f"[INFO] Dataset Directory: {args.dataset_dir}")
+    if not os.path.exists(args.dataset_dir) or not os.path.exists(args.distill):
+        print(f"[ERROR] Dataset or teacher model not found: {args.dataset_dir}, {args.distill}")
+        return
+
+    index = open_index(args.dataset_dir, args.split, burst_gap=args.burst_gap, groups_file=args.groups_file)
+    class_names = index.class_names
+    train_paths, train_labels, _ = index.split("train")
+    val_paths, val_labels, _ = index.split("val")
+    print(f"[INFO] Classes found: {class_names}")
+    print(f"[INFO] Training samples: {len(train_paths)}")
+    print(f"[INFO] Validation samples: {len(val_paths)}")
+
+    teacher = tf.keras.models.load_model(args.distill, custom_objects={'preprocess_input': applications.resnet50.preprocess_input})
+    input_shape = tuple(teacher.input_shape[1:])
+
+    def load_image(path, target):
+        img = tf.io.read_file(path)
+        img = tf.image.decode_jpeg(img, channels=3)
+        img = tf.image.resize(img, input_shape[:2])
+        return img, target
+
+    def teacher_logits(paths):
+        ds = tf.data.Dataset.from_tensor_slices((paths, tf.zeros(len(paths))))
+        ds = ds.map(load_image, num_parallel_calls=tf.data.AUTOTUNE).batch(args.batch_size)
+        probs = teacher.predict(ds, verbose=0).flatten()
+        probs = np.clip(probs, 1e-6, 1 - 1e-6)
+        return np.log(probs / (1 - probs)).astype(np.float32), probs
+
+    print("[INFO] Computing teacher soft targets...")
+    train_teacher, _ = teacher_logits(train_paths)
+    val_teacher, val_teacher_probs = teacher_logits(val_paths)
+
+    def make_ds(paths, labels, logits, training):
+        targets = np.stack([np.array(labels, dtype=np.float32), logits], axis=1)
+        ds = tf.data.Dataset.from_tensor_slices((paths, targets))
+        ds = ds.map(load_image, num_parallel_calls=tf.data.AUTOTUNE).cache()
+        if training:
+            ds = ds.shuffle(1000, seed=72)
+        return ds.batch(args.batch_size).prefetch(tf.data.AUTOTUNE)
+
+    train_ds = make_ds(train_paths, train_labels, train_teacher, True)
+    val_ds = make_ds(val_paths, val_labels, val_teacher, False)
+
+    student = build_student(input_shape, args.student)
+    trainer = models.Model(student.input, student.get_layer("logits").output)
+    trainer.compile(
+        optimizer=optimizers.Adam(learning_rate=args.learning_rate * 10),
+        loss=distillation_loss(args.temperature, args.alpha),
+        metrics=[hard_accuracy],
+        jit_compile=args.xla
+    )
+    callbacks = [
+        EarlyStopping(monitor="val_loss", patience=8, restore_best_weights=True),
+        ReduceLROnPlateau(monitor="val_loss", factor=0.2, patience=3, min_lr=1e-6),
+        EpochStats(args.batch_size)
+    ]
+    print(f"[INFO] Distilling {args.distill} into a {args.student} student...")
+    trainer.fit(train_ds, validation_data=val_ds, epochs=args.epochs, callbacks=callbacks)
+
+    os.makedirs(args.model_dir, exist_ok=True)
+    student_path = os.path.join(args.model_dir, "student_model.keras")
+    save_float32(student, lambda: build_student(input_shape, args.student), student_path)
+    print(f"[INFO] Student saved to {student_path}")
+
+    # Side-by-side report
+    y_true = np.array(val_labels)
+    student_probs = student.predict(val_ds.map(lambda x, y: x), verbose=0).flatten()
+    report = {}
+    for name, model, probs in (("teacher", teacher, val_teacher_probs), ("student", student, student_probs)):
+        report[name] = {
+            "accuracy": float(np.mean((probs > 0.5).astype(int) == y_true)),
+            "params": int(model.count_params()),
+            "cpu_latency_ms": cpu_latency_ms(model, input_shape)
+        }
+    report["agreement"] = float(np.mean((val_teacher_probs > 0.5) == (student_probs > 0.5)))
+    with open(os.path.join(args.model_dir, "distill_report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'model':<8} {'val acc':>8} {'params':>12} {'CPU ms/img':>11}")
+    for name in ("teacher", "student"):
+        r = report[name]
+        print(f"{name:<8} {r['accuracy']:>8.2%} {r['params']:>12,} {r['cpu_latency_ms']:>11.2f}")
+    print(f"[INFO] Teacher/student agreement on validation: {report['agreement']:.2%}")
+    print("\n[INFO] Student Classification Report:")
+    print(classification_report(y_true, (student_probs > 0.5).astype(int), target_names=class_names))
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None if unavailable."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # KB on Linux, bytes on macOS
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 2**20
+    except ImportError:
+        return None
+
+class EpochStats(Callback):
+    """Log wall time, training throughput and peak RSS of every epoch."""
+
+    def __init__(self, batch_size=None):
+        super().__init__()
+        self.batch_size = batch_size
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.start = time.time()
+        self.batches = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.batches += 1
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.time() - self.start
+        peak = peak_rss_mb()
+        peak = f"{peak:.0f} MB" if peak is not None else "n/a"
+        # Approximate: the last batch of an epoch may be smaller
+        throughput = f", {self.batches * self.batch_size / elapsed:.1f} images/s" if self.batch_size else ""
+        print(f"[INFO] Epoch {epoch + 1}: {elapsed:.1f}s{throughput}, peak RSS {peak}")
+
+class ProgressLog(Callback):
+    """Append each epoch's metrics to a JSON-lines file, for external monitors such as sweep.py."""
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.start = time.time()
+
+    def on_epoch_end(self, epoch, logs=None):
+        record = {"epoch": epoch + 1, "elapsed": round(time.time() - self.start, 1)}
+        record.update({k: float(v) for k, v in (logs or {}).items() if np.isscalar(v) or np.ndim(v) == 0})
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+def load_packed(packed_dir, split, img_size, batch_size, deterministic=False):
+    """
+    tf.data input from the shards of pack_dataset.py.
+
+    Shards are read in parallel with interleave, each JPEG is decoded once and
+    cached as uint8 (4x smaller than the float32 cache), and the float32 cast
+    happens per batch after the cache.
+    """
+    AUTOTUNE = tf.data.AUTOTUNE
+    training = split == "train"
+    pattern = os.path.join(packed_dir, f"{split}-*.tfrecord")
+    files = tf.data.Dataset.list_files(pattern, shuffle=training, seed=72)
+    ds = files.interleave(
+        tf.data.TFRecordDataset,
+        cycle_length=AUTOTUNE,
+        num_parallel_calls=AUTOTUNE,
+        deterministic=deterministic or not training
+    )
+
+    features = {
+        "image": tf.io.FixedLenFeature([], tf.string),
+        "label": tf.io.FixedLenFeature([], tf.int64),
+    }
+
+    def decode(record):
+        example = tf.io.parse_single_example(record, features)
+        img = tf.io.decode_jpeg(example["image"], channels=3)
+        img = tf.image.resize(img, [img_size, img_size])
+        img = tf.cast(tf.clip_by_value(tf.round(img), 0, 255), tf.uint8)
+        return img, tf.cast(example["label"], tf.int32)
+
+    ds = ds.map(decode, num_parallel_calls=AUTOTUNE).cache()
+    if training:
+        ds = ds.shuffle(2048, seed=72, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+    ds = ds.map(lambda img, label: (tf.cast(img, tf.float32), label), num_parallel_calls=AUTOTUNE)
+    if training:
+        ds = apply_data_options(ds, deterministic)
+    return ds.prefetch(AUTOTUNE)
+
+def build_landmark_model(num_features):
+    inputs = tf.keras.Input(shape=(num_features,))
+    x = layers.GaussianNoise(0.02)(inputs)
+    x = layers.Dense(128, activation="relu")(x)
+    x = layers.Dropout(0.3)(x)
+    x = layers.Dense(64, activation="relu")(x)
+    outputs = layers.Dense(1, activation="sigmoid", dtype="float32")(x)
+    return models.Model(inputs, outputs)
+
+def train_landmarks(args):
+    """
+    Train on the landmarks cached by preprocess_crops.py.
+
+    Features come straight from landmarks.npz, so no image is decoded and the
+    whole dataset fits in memory. The split is time-based per class, as for
+    the image model.
+    """
+    cache_path = args.landmark_cache or os.path.join(args.dataset_dir, "landmarks.npz")
+    print(f"[INFO] Loading landmark features from {cache_path}")
+    try:
+        features, labels, mtimes, _, class_names = load_landmark_features(cache_path)
+    except FileNotFoundError as e:
+        print(f"[ERROR] {e}")
+        return
+
+    train_idx, val_idx = [], []
+    for label_idx in range(len(class_names)):
+        idx = np.flatnonzero(labels == label_idx)
+        idx = idx[np.argsort(mtimes[idx], kind="stable")]
+        split_point = int(len(idx) * 0.8)
+        train_idx.extend(idx[:split_point])
+        val_idx.extend(idx[split_point:])
+
+    print(f"[INFO] Classes found: {class_names}")
+    print(f"[INFO] Training samples: {len(train_idx)}")
+    print(f"[INFO] Validation samples: {len(val_idx)}")
+
+    model = build_landmark_model(features.shape[1])
+    model.compile(
+        optimizer=optimizers.Adam(learning_rate=args.learning_rate * 10),
+        loss="binary_crossentropy",
+        metrics=["accuracy"],
+        jit_compile=args.xla
+    )
+
+    os.makedirs(args.model_dir, exist_ok=True)
+    checkpoint_path = os.path.join(args.model_dir, "landmark_model.keras")
+    callbacks = [
+        ModelCheckpoint(checkpoint_path, save_best_only=True, monitor="val_loss", mode="min"),
+        EarlyStopping(monitor="val_loss", patience=10, restore_best_weights=True)
+    ]
+    model.fit(
+        features[train_idx], labels[train_idx],
+        validation_data=(features[val_idx], labels[val_idx]),
+        batch_size=args.batch_size,
+        epochs=args.epochs,
+        shuffle=True,
+        callbacks=callbacks
+    )
+    print(f"[INFO] Training finished. Best model saved to {checkpoint_path}")
+
+    y_pred = (model.predict(features[val_idx], verbose=0).flatten() > 0.5).astype(int)
+    print("\n[INFO] Classification Report:")
+    print(classification_report(labels[val_idx], y_pred, target_names=class_names))
+
+def load_image_datasets(args):
+    """tf.data input from the individual JPEGs in dataset_dir."""
+    print(f"[INFO] Dataset Directory: {args.dataset_dir}")
+    if not os.path.exists(args.dataset_dir):
+        print(f"[ERROR] Dataset directory not found: {args.dataset_dir}")
+        return None, None, None
+
+    # Time-based (or grouped) split from the persistent dataset index
+    index = open_index(args.dataset_dir, args.split, burst_gap=args.burst_gap, groups_file=args.groups_file)
+    class_names = index.class_names
+    train_paths, train_labels, _ = index.split("train")
+    val_paths, val_labels, _ = index.split("val")
+
     print(f"[INFO] Classes found: {class_names}")
     print(f"[INFO] Training samples: {len(train_paths)}")
     print(f"[INFO] Validation samples: {len(val_paths)}")
@@ -137,21 +618,24 @@ def main():
     val_ds = val_ds.map(load_image, num_parallel_calls=tf.data.AUTOTUNE)
     val_ds = val_ds.batch(args.batch_size)
 
-    print(f"[INFO] Classes found: {class_names}")
-
     # Configure dataset for performance
     AUTOTUNE = tf.data.AUTOTUNE
     train_ds = train_ds.cache().shuffle(1000).prefetch(buffer_size=AUTOTUNE)
+    train_ds = apply_data_options(train_ds, args.deterministic)
     val_ds = val_ds.cache().prefetch(buffer_size=AUTOTUNE)
+    return train_ds, val_ds, class_names
 
+def train_and_evaluate(args, train_ds, val_ds, class_names):
     # Build Model
     print("[INFO] Building model...")
-    model = build_model((args.img_size, args.img_size, 3))
+    input_shape = (args.img_size, args.img_size, 3)
+    model = build_model(input_shape, unfrozen_layers=args.unfrozen_layers, dropout=args.dropout)
     
     model.compile(
         optimizer=optimizers.Adam(learning_rate=args.learning_rate),
         loss="binary_crossentropy",
-        metrics=["accuracy"]
+        metrics=["accuracy"],
+        jit_compile=args.xla
     )
     
     model.summary()
@@ -163,8 +647,11 @@ def main():
     callbacks = [
         ModelCheckpoint(checkpoint_path, save_best_only=True, monitor="val_loss", mode="min"),
         EarlyStopping(monitor="val_loss", patience=5, restore_best_weights=True),
-        ReduceLROnPlateau(monitor="val_loss", factor=0.2, patience=3, min_lr=1e-6)
+        ReduceLROnPlateau(monitor="val_loss", factor=0.2, patience=3, min_lr=1e-6),
+        EpochStats(args.batch_size)
     ]
+    if args.progress_file:
+        callbacks.append(ProgressLog(args.progress_file))
 
     # Train
     print("[INFO] Starting training...")
@@ -185,6 +672,7 @@ def main():
     except Exception as e:
         print(f"[ERROR] Failed to load weights: {e}")
         return
+    save_float32(model, lambda: build_model(input_shape, unfrozen_layers=args.unfrozen_layers, dropout=args.dropout), checkpoint_path)
 
     # Use model.predict for stability
     print("[INFO] Generating predictions...")
@@ -217,5 +705,70 @@ def main():
     except Exception as e:
         print(f"[ERROR] Classification report failed: {e}")
 
+    if args.results_json:
+        results = {
+            "val_accuracy": float(np.mean(y_pred == y_true)),
+            "best_val_loss": float(min(history.history["val_loss"])),
+            "epochs": len(history.history["loss"]),
+            "params": int(model.count_params()),
+            "cpu_latency_ms": cpu_latency_ms(model, input_shape)
+        }
+        with open(args.results_json, "w") as f:
+            json.dump(results, f, indent=2)
+
+def main():
+    args = get_args()
+
+    if args.probe_run:
+        configure_compute(args)
+        run_probe(args, build_model)
+        return
+
+    probe = None
+    if args.probe and (args.features == "landmarks" or args.distill):
+        # The probe times the ResNet50 image model, not the MLP or the student these modes train
+        print("[WARN] --probe only measures the image model, skipping it for --features landmarks / --distill")
+    elif args.probe:
+        probe = probe_compute(args, os.path.abspath(__file__))
+        args.batch_size = probe["best"]["batch_size"]
+        args.intra_op_threads = probe["best"]["intra_op_threads"]
+        args.inter_op_threads = probe["best"]["inter_op_threads"]
+    compute = configure_compute(args)
+    print(f"[INFO] Compute: {compute}")
+    write_training_config(args.model_dir, compute, probe)
+    
+    if args.features == "landmarks":
+        train_landmarks(args)
+        return
+
+    if args.two_stage:
+        train_two_stage(args)
+        return
+
+    if args.distill:
+        train_distilled(args)
+        return
+
+    if args.packed_dir:
+        info_path = os.path.join(args.packed_dir, "packed_info.json")
+        if not os.path.exists(info_path):
+            print(f"[ERROR] Packed dataset not found: {info_path} (run pack_dataset.py first)")
+            return
+        with open(info_path, "r") as f:
+            info = json.load(f)
+        class_names = info["class_names"]
+        print(f"[INFO] Packed dataset: {args.packed_dir}")
+        print(f"[INFO] Classes found: {class_names}")
+        print(f"[INFO] Training samples: {info['splits']['train']['count']}")
+        print(f"[INFO] Validation samples: {info['splits']['val']['count']}")
+        train_ds = load_packed(args.packed_dir, "train", args.img_size, args.batch_size, args.deterministic)
+        val_ds = load_packed(args.packed_dir, "val", args.img_size, args.batch_size)
+    else:
+        train_ds, val_ds, class_names = load_image_datasets(args)
+        if train_ds is None:
+            return
+
+    train_and_evaluate(args, train_ds, val_ds, class_names)
+
 if __name__ == "__main__":
     main()
@@ -1,8 +1,16 @@
 import os
 import cv2
-import mediapipe as mp
+import json
+import time
 import argparse
+import numpy as np
+import mediapipe as mp
+from multiprocessing import Pool
 from pathlib import Path
+from landmark_cache import crop_boxes, keep_mask, load_cache, save_cache, columns_to_rows, read_image
+from dataset_index import DatasetIndex
+
+MANIFEST_VERSION = 1
 
 def get_args():
     parser = argparse.ArgumentParser(description="Preprocess dataset by cropping hands")
@@ -10,17 +18,235 @@ def get_args():
     parser.add_argument("--output_dir", type=str, default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "dataset_cropped"), help="Path to save cropped dataset")
     parser.add_argument("--padding", type=int, default=20, help="Padding around the hand bounding box")
     parser.add_argument("--img_size", type=int, default=224, help="Target image size")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (1 = run in this process)")
+    parser.add_argument("--chunksize", type=int, default=16, help="Files handed to a worker at a time")
+    parser.add_argument("--force", action="store_true", help="Reprocess every file, ignoring the manifest")
+    parser.add_argument("--recrop", action="store_true", help="Regenerate crops from landmarks.npz without running MediaPipe")
     return parser.parse_args()
 
+# One MediaPipe Hands instance per worker process
+_hands = None
+_params = None
+
+def init_worker(params, with_hands=True):
+    global _hands, _params
+    _params = params
+    if with_hands:
+        _hands = mp.solutions.hands.Hands(
+            static_image_mode=True,
+            max_num_hands=1,
+            min_detection_confidence=0.5
+        )
+
+def crop_hand(img, hand_landmarks, padding):
+    # Get bounding box
+    h, w, _ = img.shape
+    coords = np.array([(lm.x * w, lm.y * h) for lm in hand_landmarks.landmark]).astype(int)
+    x_min, y_min = coords.min(axis=0)
+    x_max, y_max = coords.max(axis=0)
+
+    # Add padding
+    x_min = max(0, x_min - padding)
+    x_max = min(w, x_max + padding)
+    y_min = max(0, y_min - padding)
+    y_max = min(h, y_max + padding)
+
+    return img[y_min:y_max, x_min:x_max]
+
+def process_file(task):
+    """
+    Crop one image. Runs inside a worker process.
+
+    Returns the manifest entry and the landmark cache row for the file
+    (None when the file is unreadable).
+    """
+    rel_path, src, dst, size, mtime, content_hash = task
+    entry = {"size": size, "mtime": mtime, "sha1": content_hash, "output": None, "status": "unreadable"}
+
+    img = read_image(src)
+    if img is None:
+        return rel_path, entry, None
+
+    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    results = _hands.process(img_rgb)
+    class_name = Path(rel_path).parts[0]
+    img_size = _params["img_size"]
+    landmarks = None
+    if results.multi_hand_landmarks:
+        landmarks = np.array([(lm.x, lm.y, lm.z) for lm in results.multi_hand_landmarks[0].landmark],
+                             dtype=np.float32)
+    row = (mtime, img.shape[:2], landmarks)
+
+    if class_name.lower() == "background":
+        # For background, we expect NO hands.
+        # Save full image only if NO hand detected, to avoid polluting background with hands
+        if results.multi_hand_landmarks:
+            entry["status"] = "skipped"
+            return rel_path, entry, row
+        out = cv2.resize(img, (img_size, img_size))
+    else:
+        # For Palm/Fist, we expect hands. Only take the first hand.
+        if not results.multi_hand_landmarks:
+            entry["status"] = "skipped"
+            return rel_path, entry, row
+        crop = crop_hand(img, results.multi_hand_landmarks[0], _params["padding"])
+        if crop.size == 0:
+            entry["status"] = "skipped"
+            return rel_path, entry, row
+        out = cv2.resize(crop, (img_size, img_size))
+
+    Path(dst).parent.mkdir(parents=True, exist_ok=True)
+    cv2.imwrite(dst, out)
+    entry["output"] = os.path.relpath(dst, _params["output_dir"])
+    entry["status"] = "saved"
+    return rel_path, entry, row
+
+def recrop_file(task):
+    """Crop one image from a cached box. No MediaPipe involved."""
+    rel_path, src, dst, box = task
+    img = read_image(src)
+    if img is None:
+        return rel_path, None
+    x_min, y_min, x_max, y_max = box
+    crop = img[y_min:y_max, x_min:x_max]
+    if crop.size == 0:
+        return rel_path, None
+    img_size = _params["img_size"]
+    Path(dst).parent.mkdir(parents=True, exist_ok=True)
+    cv2.imwrite(dst, cv2.resize(crop, (img_size, img_size)))
+    return rel_path, os.path.relpath(dst, _params["output_dir"])
+
+def load_manifest(path, params=None):
+    """
+    Return the manifest's file entries, or {} if it is missing or was made
+    with other params (pass params=None to accept any).
+    """
+    if not path.exists():
+        return {}
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Ignoring unreadable manifest {path}: {e}")
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    if params is not None and manifest.get("params") != params:
+        print("[INFO] Padding/size changed since the last run, reprocessing everything "
+              "(use --recrop to reuse the cached landmarks instead)")
+        return {}
+    return manifest.get("files", {})
+
+def save_manifest(path, params, files):
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "params": params, "files": files}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def collect_tasks(index, output_path, previous, cached, force):
+    """
+    Keep the source images that are new or whose content changed.
+
+    Sizes, mtimes and hashes come from the dataset index, which only rehashes
+    files whose size or mtime changed. A file only counts as unchanged if its
+    landmarks are in the cache too.
+    """
+    tasks = []
+    unchanged = {}
+    for rel_path, item in sorted(index.entries.items()):
+        old = previous.get(rel_path)
+        if old and old["status"] != "unreadable" and rel_path not in cached:
+            old = None
+        if (not force and old and old["sha1"] == item["sha1"]
+                and (old["output"] is None or (output_path / old["output"]).exists())):
+            unchanged[rel_path] = {**old, "size": item["size"], "mtime": item["mtime"]}
+            continue
+        src = os.path.join(index.dataset_dir, rel_path)
+        dst = str(output_path / rel_path)
+        tasks.append((rel_path, src, dst, item["size"], item["mtime"], item["sha1"]))
+    return tasks, unchanged
+
+def make_results(function, tasks, workers, chunksize, params, with_hands):
+    """Map tasks over a worker pool (or in-process for a single worker)."""
+    if workers > 1:
+        pool = Pool(workers, initializer=init_worker, initargs=(params, with_hands))
+        return pool, pool.imap_unordered(function, tasks, chunksize=chunksize)
+    init_worker(params, with_hands)
+    return None, map(function, tasks)
+
+def finish_pool(pool, completed):
+    """Let the workers exit after a full run; kill them on an interrupt or error."""
+    if pool is None:
+        return
+    if completed:
+        pool.close()
+    else:
+        # close() would wait for every queued task to finish first
+        pool.terminate()
+    pool.join()
+
+def report_progress(done, total, start, last_report):
+    now = time.time()
+    if now - last_report >= 2.0 or done == total:
+        rate = done / max(now - start, 1e-6)
+        eta = (total - done) / rate
+        print(f"  {done}/{total} files ({rate:.1f} files/s, ETA {eta:.0f}s)")
+        return now
+    return last_report
+
+def print_summary(files):
+    for class_name in sorted({p.split("/")[0] for p in files}):
+        entries = [e for p, e in files.items() if p.startswith(class_name + "/")]
+        saved = sum(e["status"] == "saved" for e in entries)
+        print(f"[INFO] {class_name}: Saved: {saved}, Skipped: {len(entries) - saved}")
+
+def recrop(args, input_path, output_path, manifest_path, params):
+    """
+    Regenerate dataset_cropped from landmarks.npz for a new padding/size.
+
+    Boxes for the whole dataset are computed in one vectorized pass; workers
+    only decode, slice, resize and write.
+    """
+    cache = load_cache(output_path / "landmarks.npz")
+    if cache is None:
+        print(f"[ERROR] No landmark cache in {output_path}, run without --recrop first")
+        return
+
+    files = load_manifest(manifest_path)
+    boxes = crop_boxes(cache, args.padding)
+    keep = keep_mask(cache)
+    keep &= (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+    tasks = [(rel_path, str(input_path / rel_path), str(output_path / rel_path), tuple(box))
+             for rel_path, box in zip(cache["paths"][keep].tolist(), boxes[keep].tolist())]
+    print(f"[INFO] Re-cropping {len(tasks)}/{len(keep)} cached images with {args.workers} worker(s)")
+
+    # Crops of the old run that are not regenerated would be stale
+    for entry in files.values():
+        if entry.get("output"):
+            entry["output"] = None
+            entry["status"] = "skipped"
+
+    worker_params = {**params, "output_dir": str(output_path)}
+    start = time.time()
+    last_report = start
+    pool, results = make_results(recrop_file, tasks, args.workers, args.chunksize, worker_params, False)
+    completed = False
+    try:
+        for done, (rel_path, output) in enumerate(results, start=1):
+            entry = files.setdefault(rel_path, {"size": None, "mtime": None, "sha1": None})
+            entry["output"] = output
+            entry["status"] = "saved" if output else "unreadable"
+            last_report = report_progress(done, len(tasks), start, last_report)
+        completed = True
+    finally:
+        finish_pool(pool, completed)
+        save_manifest(manifest_path, params, files)
+
+    print_summary(files)
+    print(f"[INFO] Re-cropped {len(tasks)} files in {time.time() - start:.1f}s")
+
 def main():
     args = get_args()
-    
-    mp_hands = mp.solutions.hands
-    hands = mp_hands.Hands(
-        static_image_mode=True,
-        max_num_hands=1,
-        min_detection_confidence=0.5
-    )
 
     input_path = Path(args.input_dir)
     output_path = Path(args.output_dir)
@@ -29,82 +255,50 @@ def main():
         print(f"[ERROR] Input directory not found: {input_path}")
         return
 
-    # Process each class
-    for class_dir in input_path.iterdir():
-        if not class_dir.is_dir():
-            continue
-            
-        class_name = class_dir.name
-        print(f"[INFO] Processing class: {class_name}")
-        
-        output_class_dir = output_path / class_name
-        output_class_dir.mkdir(parents=True, exist_ok=True)
-        
-        files = list(class_dir.glob("*.[jJ][pP][gG]")) + list(class_dir.glob("*.[pP][nN][gG]"))
-        
-        count_saved = 0
-        count_skipped = 0
-        
-        for file_path in files:
-            img = cv2.imread(str(file_path))
-            if img is None:
-                continue
-                
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            results = hands.process(img_rgb)
-            
-            if class_name.lower() == "background":
-                # For background, we expect NO hands.
-                # If hands detected, we might want to skip to be safe (avoid polluting background with hands)
-                # OR just save the full image anyway if we trust our labels.
-                # Let's save full image if NO hand detected, to be pure.
-                if not results.multi_hand_landmarks:
-                    # Resize and save
-                    img_resized = cv2.resize(img, (args.img_size, args.img_size))
-                    cv2.imwrite(str(output_class_dir / file_path.name), img_resized)
-                    count_saved += 1
-                else:
-                    # Hand detected in background class -> Skip
-                    count_skipped += 1
-            else:
-                # For Palm/Fist, we expect hands.
-                if results.multi_hand_landmarks:
-                    for hand_landmarks in results.multi_hand_landmarks:
-                        # Get bounding box
-                        h, w, _ = img.shape
-                        x_min, x_max, y_min, y_max = w, 0, h, 0
-                        
-                        for lm in hand_landmarks.landmark:
-                            x, y = int(lm.x * w), int(lm.y * h)
-                            x_min = min(x_min, x)
-                            x_max = max(x_max, x)
-                            y_min = min(y_min, y)
-                            y_max = max(y_max, y)
-                        
-                        # Add padding
-                        x_min = max(0, x_min - args.padding)
-                        x_max = min(w, x_max + args.padding)
-                        y_min = max(0, y_min - args.padding)
-                        y_max = min(h, y_max + args.padding)
-                        
-                        # Crop
-                        crop = img[y_min:y_max, x_min:x_max]
-                        
-                        if crop.size == 0:
-                            continue
-                            
-                        # Resize
-                        crop_resized = cv2.resize(crop, (args.img_size, args.img_size))
-                        
-                        # Save
-                        cv2.imwrite(str(output_class_dir / file_path.name), crop_resized)
-                        count_saved += 1
-                        break # Only take the first hand
-                else:
-                    # No hand detected in Palm class -> Skip
-                    count_skipped += 1
-
-        print(f"  Saved: {count_saved}, Skipped: {count_skipped}")
+    output_path.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_path / "manifest.json"
+    params = {"padding": args.padding, "img_size": args.img_size}
+    if args.recrop:
+        recrop(args, input_path, output_path, manifest_path, params)
+        return
+
+    cache_path = output_path / "landmarks.npz"
+    cache = load_cache(cache_path)
+    previous_rows = columns_to_rows(cache) if cache is not None else {}
+    previous = load_manifest(manifest_path, params)
+
+    index = DatasetIndex(str(input_path))
+    index.refresh()
+    index.save()
+    tasks, files = collect_tasks(index, output_path, previous, previous_rows, args.force)
+    # Drop landmarks of deleted files; touched files keep their landmarks with the new mtime
+    rows = {p: (files[p]["mtime"],) + previous_rows[p][1:] for p in files if p in previous_rows}
+    print(f"[INFO] {len(files)} files unchanged, {len(tasks)} to process with {args.workers} worker(s)")
+    if not tasks:
+        save_manifest(manifest_path, params, files)
+        save_cache(cache_path, rows)
+        return
+
+    worker_params = {**params, "output_dir": str(output_path)}
+    start = time.time()
+    last_report = start
+    pool, results = make_results(process_file, tasks, args.workers, args.chunksize, worker_params, True)
+    completed = False
+    try:
+        for done, (rel_path, entry, row) in enumerate(results, start=1):
+            files[rel_path] = entry
+            if row is not None:
+                rows[rel_path] = row
+            last_report = report_progress(done, len(tasks), start, last_report)
+        completed = True
+    finally:
+        finish_pool(pool, completed)
+        # Keep progress even if interrupted, so the next run resumes
+        save_manifest(manifest_path, params, files)
+        save_cache(cache_path, rows)
+
+    print_summary(files)
+    print(f"[INFO] Processed {len(tasks)} files in {time.time() - start:.1f}s")
 
 if __name__ == "__main__":
     main()
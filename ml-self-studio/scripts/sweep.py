@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import itertools
+import subprocess
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPTS_DIR)
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep for pipeline.py")
+    parser.add_argument("--packed_dir", type=str, default=os.path.join(ROOT_DIR, "dataset_packed"), help="Packed dataset shared read-only by all trials (packed first if missing)")
+    parser.add_argument("--sweep_dir", type=str, default=os.path.join(ROOT_DIR, "models", "sweep"), help="Where trials, logs and the leaderboard go")
+    parser.add_argument("--learning_rate", type=float, nargs="+", default=[1e-4, 3e-4, 1e-3])
+    parser.add_argument("--batch_size", type=int, nargs="+", default=[16, 32])
+    parser.add_argument("--unfrozen_layers", type=int, nargs="+", default=[0, 30, 60])
+    parser.add_argument("--dropout", type=float, nargs="+", default=[0.2, 0.3, 0.5])
+    parser.add_argument("--trials", type=int, default=12, help="Configurations sampled from the grid")
+    parser.add_argument("--workers", type=int, default=0, help="Trials running at once (0 = cpus / threads)")
+    parser.add_argument("--threads", type=int, default=2, help="Intra-op threads per trial")
+    parser.add_argument("--max_epochs", type=int, default=12)
+    parser.add_argument("--min_epochs", type=int, default=2, help="First successive-halving rung")
+    parser.add_argument("--eta", type=int, default=3, help="Keep the top 1/eta of the trials at every rung")
+    parser.add_argument("--seed", type=int, default=72)
+    parser.add_argument("--measure", type=str, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def sample_configs(args):
+    keys = ("learning_rate", "batch_size", "unfrozen_layers", "dropout")
+    grid = [dict(zip(keys, values)) for values in itertools.product(*(getattr(args, k) for k in keys))]
+    random.Random(args.seed).shuffle(grid)
+    return grid[:args.trials]
+
+def rungs(args):
+    """Epochs at which trials are compared: min_epochs * eta^k below max_epochs."""
+    result = []
+    epoch = args.min_epochs
+    while epoch < args.max_epochs:
+        result.append(epoch)
+        epoch *= args.eta
+    return result
+
+def thread_env(threads):
+    """Keep every BLAS/OpenMP pool inside a trial to its share of the CPU."""
+    env = dict(os.environ)
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "TF_NUM_INTRAOP_THREADS"):
+        env[name] = str(threads)
+    env["TF_NUM_INTEROP_THREADS"] = "1"
+    env["TF_CPP_MIN_LOG_LEVEL"] = "2"
+    return env
+
+class Trial:
+    def __init__(self, trial_id, config, sweep_dir):
+        self.id = trial_id
+        self.config = config
+        self.dir = os.path.join(sweep_dir, f"trial_{trial_id:03d}")
+        self.progress_path = os.path.join(self.dir, "progress.jsonl")
+        self.results_path = os.path.join(self.dir, "results.json")
+        self.process = None
+        self.log = None
+        self.status = "pending"
+        self.history = []
+        self.checked_rungs = set()
+
+    def start(self, args):
+        os.makedirs(self.dir, exist_ok=True)
+        for path in (self.progress_path, self.results_path):
+            if os.path.exists(path):
+                os.remove(path)
+        command = [sys.executable, os.path.join(SCRIPTS_DIR, "pipeline.py"),
+                   "--packed_dir", args.packed_dir, "--model_dir", self.dir,
+                   "--epochs", str(args.max_epochs),
+                   "--learning_rate", str(self.config["learning_rate"]),
+                   "--batch_size", str(self.config["batch_size"]),
+                   "--unfrozen_layers", str(self.config["unfrozen_layers"]),
+                   "--dropout", str(self.config["dropout"]),
+                   "--intra_op_threads", str(args.threads), "--inter_op_threads", "1",
+                   "--precision", "float32",
+                   "--progress_file", self.progress_path, "--results_json", self.results_path]
+        self.log = open(os.path.join(self.dir, "log.txt"), "w")
+        self.process = subprocess.Popen(command, stdout=self.log, stderr=subprocess.STDOUT, env=thread_env(args.threads))
+        self.status = "running"
+
+    def poll(self):
+        """Read new epochs; returns True once the process has exited."""
+        if os.path.exists(self.progress_path):
+            with open(self.progress_path, "r") as f:
+                # The trial may be mid-write: the text after the last newline is read again next poll
+                lines = f.read().split("\n")[:-1]
+            self.history = [json.loads(line) for line in lines if line.strip()]
+        if self.process.poll() is None:
+            return False
+        self.log.close()
+        if self.status == "running":
+            self.status = "finished" if self.process.returncode == 0 and os.path.exists(self.results_path) else "failed"
+        return True
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.status = "stopped"
+
+    def score_at(self, epoch):
+        """Best validation accuracy up to ``epoch``."""
+        scores = [h.get("val_accuracy", 0.0) for h in self.history if h["epoch"] <= epoch]
+        return max(scores) if scores else None
+
+def halving_check(trial, trials, rung_epochs, eta):
+    """
+    Asynchronous successive halving: when a trial reaches a rung, it keeps
+    running only if it is in the top 1/eta of all trials that reached that rung.
+    """
+    reached = trial.history[-1]["epoch"] if trial.history else 0
+    for rung in rung_epochs:
+        if rung > reached or rung in trial.checked_rungs:
+            continue
+        trial.checked_rungs.add(rung)
+        peers = [t.score_at(rung) for t in trials if t.history and t.history[-1]["epoch"] >= rung]
+        peers = sorted((s for s in peers if s is not None), reverse=True)
+        if len(peers) < eta:
+            continue
+        cutoff = peers[max(1, len(peers) // eta) - 1]
+        if trial.score_at(rung) < cutoff:
+            return rung
+    return None
+
+def measure_latency(model_path, threads, runs=50):
+    """Median batch-1 latency, measured in a fresh process with a fixed thread count."""
+    command = [sys.executable, os.path.abspath(__file__), "--measure", model_path, "--threads", str(threads)]
+    result = subprocess.run(command, capture_output=True, text=True, env=thread_env(threads), timeout=600)
+    for line in result.stdout.splitlines():
+        if line.startswith("LATENCY_MS "):
+            return float(line.split()[1])
+    return None
+
+def run_measure(model_path, threads, runs=50):
+    import numpy as np
+    import tensorflow as tf
+    from tensorflow.keras.applications.resnet50 import preprocess_input
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    model = tf.keras.models.load_model(model_path, custom_objects={'preprocess_input': preprocess_input})
+    x = tf.random.uniform((1,) + tuple(model.input_shape[1:]), 0, 255)
+    timings = []
+    for i in range(runs + 5):
+        start = time.perf_counter()
+        model(x, training=False)
+        if i >= 5:
+            timings.append((time.perf_counter() - start) * 1000.0)
+    print(f"LATENCY_MS {float(np.median(timings)):.3f}")
+
+def write_leaderboard(trials, args):
+    rows = []
+    for trial in trials:
+        row = {"trial": trial.id, "status": trial.status, **trial.config,
+               "epochs": trial.history[-1]["epoch"] if trial.history else 0,
+               "best_val_accuracy": trial.score_at(args.max_epochs)}
+        if trial.status == "finished":
+            with open(trial.results_path, "r") as f:
+                results = json.load(f)
+            row["val_accuracy"] = results["val_accuracy"]
+            row["params"] = results["params"]
+            row["cpu_latency_ms"] = measure_latency(os.path.join(trial.dir, "best_model.keras"), args.threads)
+            row["model"] = os.path.join(trial.dir, "best_model.keras")
+        rows.append(row)
+
+    def sort_key(row):
+        finished = row["status"] == "finished"
+        accuracy = row.get("val_accuracy", row["best_val_accuracy"]) or 0.0
+        return (not finished, -accuracy, row.get("cpu_latency_ms") or float("inf"))
+    rows.sort(key=sort_key)
+
+    with open(os.path.join(args.sweep_dir, "leaderboard.json"), "w") as f:
+        json.dump(rows, f, indent=2)
+
+    print(f"\n{'#':>3} {'status':<9} {'lr':>8} {'batch':>5} {'unfrz':>5} {'drop':>5} {'epochs':>6} {'val acc':>8} {'CPU ms':>7}")
+    for row in rows:
+        accuracy = row.get("val_accuracy", row["best_val_accuracy"])
+        accuracy = f"{accuracy:.2%}" if accuracy is not None else "-"
+        latency = f"{row['cpu_latency_ms']:.1f}" if row.get("cpu_latency_ms") else "-"
+        print(f"{row['trial']:>3} {row['status']:<9} {row['learning_rate']:>8.0e} {row['batch_size']:>5} "
+              f"{row['unfrozen_layers']:>5} {row['dropout']:>5.2f} {row['epochs']:>6} {accuracy:>8} {latency:>7}")
+
+def main():
+    args = get_args()
+
+    if args.measure:
+        run_measure(args.measure, args.threads)
+        return
+
+    if not os.path.exists(os.path.join(args.packed_dir, "packed_info.json")):
+        print(f"[INFO] Packing the dataset into {args.packed_dir} (shared by all trials)...")
+        subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, "pack_dataset.py"), "--output_dir", args.packed_dir], check=True)
+
+    os.makedirs(args.sweep_dir, exist_ok=True)
+    workers = args.workers or max(1, (os.cpu_count() or 1) // args.threads)
+    rung_epochs = rungs(args)
+    trials = [Trial(i, config, args.sweep_dir) for i, config in enumerate(sample_configs(args))]
+    print(f"[INFO] {len(trials)} trials, {workers} at a time with {args.threads} threads each, rungs at epochs {rung_epochs}")
+
+    pending = list(trials)
+    running = []
+    start = time.time()
+    while pending or running:
+        while pending and len(running) < workers:
+            trial = pending.pop(0)
+            trial.start(args)
+            running.append(trial)
+            print(f"[INFO] Trial {trial.id} started: {trial.config}")
+
+        time.sleep(2.0)
+        for trial in list(running):
+            done = trial.poll()
+            if not done:
+                rung = halving_check(trial, trials, rung_epochs, args.eta)
+                if rung is None:
+                    continue
+                trial.stop()
+                trial.poll()
+                print(f"[INFO] Trial {trial.id} stopped at rung {rung} (val acc {trial.score_at(rung):.2%})")
+            else:
+                print(f"[INFO] Trial {trial.id} {trial.status} after {trial.history[-1]['epoch'] if trial.history else 0} epochs")
+            running.remove(trial)
+
+    print(f"[INFO] Sweep finished in {(time.time() - start) / 60:.1f} min")
+    write_leaderboard(trials, args)
+
+if __name__ == "__main__":
+    main()
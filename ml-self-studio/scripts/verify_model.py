@@ -1,4 +1,5 @@
 # Script untuk verifikasi model yang digunakan
+import argparse
 import os
 import sys
 import tensorflow as tf
@@ -8,6 +9,17 @@ from tensorflow import keras
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, root_dir)
 
+from dataset_index import SPLIT_METHODS, open_index
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Verifikasi kode, dataset dan file model")
+    parser.add_argument("--dataset_dir", type=str, default=os.path.join(root_dir, "dataset_cropped"))
+    # Samakan dengan argumen pipeline.py: open_index menyimpan split yang dipakai ke index.json
+    parser.add_argument("--split", type=str, choices=SPLIT_METHODS, default="time", help="Split method, as in pipeline.py")
+    parser.add_argument("--burst_gap", type=float, default=2.0)
+    parser.add_argument("--groups_file", type=str, default=None)
+    return parser.parse_args()
+
 def check_model_architecture(model_path):
     """Cek arsitektur model dari file .h5"""
     print("=" * 60)
@@ -117,14 +129,44 @@ def check_code_files():
             else:
                 print("[WARNING] main.py: Tidak ditemukan referensi model")
 
+def check_dataset(dataset_dir, split="time", burst_gap=2.0, groups_file=None):
+    """Cek dataset training lewat index (hanya file yang berubah yang dibaca ulang)"""
+    print("\n" + "=" * 60)
+    print("VERIFIKASI DATASET")
+    print("=" * 60)
+
+    if not os.path.exists(dataset_dir):
+        print(f"[WARNING] Dataset tidak ditemukan: {dataset_dir}")
+        return
+
+    index = open_index(dataset_dir, split, burst_gap=burst_gap, groups_file=groups_file)
+    for class_name in index.class_names:
+        entries = [e for e in index.entries.values() if e["class"] == class_name]
+        train = sum(e["split"] == "train" for e in entries)
+        print(f"  {class_name}: {len(entries)} gambar (train {train}, val {len(entries) - train})")
+
+    # File identik di train dan val membuat akurasi validasi terlalu optimis
+    splits_by_hash = {}
+    for entry in index.entries.values():
+        splits_by_hash.setdefault(entry["sha1"], set()).add(entry["split"])
+    leaked = sum(len(splits) > 1 for splits in splits_by_hash.values())
+    if leaked:
+        print(f"[WARNING] {leaked} gambar identik muncul di train dan val")
+    else:
+        print("[OK] Tidak ada gambar identik di train dan val")
+
 def main():
     """Main function"""
+    args = get_args()
     print("\n" + "=" * 60)
     print("VERIFIKASI SISTEM: ResNet50 vs EfficientNet")
     print("=" * 60)
     
     # Cek kode
     check_code_files()
+
+    # Cek dataset
+    check_dataset(args.dataset_dir, args.split, args.burst_gap, args.groups_file)
     
     # Cek model yang ada
     model_paths = [